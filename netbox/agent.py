@@ -0,0 +1,642 @@
+import concurrent.futures
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import socket
+import struct
+import threading
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import logger, metrics
+from .exception import AgentException, NetboxException
+from .version import __version__
+
+if t.TYPE_CHECKING:
+    from .core import Netbox
+
+DEFAULT_PORT = 5220
+# length of the JSON body in bytes, big endian
+FRAME_HEADER = struct.Struct("!I")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+def parse_address(address: str) -> t.Tuple[int, t.Any]:
+    """Parse an agent address.
+
+    Args:
+        address: 'unix:///path', 'tcp://host:port', 'host:port' or 'host'.
+
+    Returns:
+        Tuple of (socket family, socket address). For example: (AF_INET, ('127.0.0.1', 5220))
+    """
+    if address.startswith("unix://"):
+        return socket.AF_UNIX, address[len("unix://") :]
+    if address.startswith("tcp://"):
+        address = address[len("tcp://") :]
+    host, _, port = address.rpartition(":")
+    if not host:
+        host, port = port, str(DEFAULT_PORT)
+    return socket.AF_INET, (host.strip("[]"), int(port))
+
+
+def format_address(family: int, address: t.Any) -> str:
+    if family == socket.AF_UNIX:
+        return f"unix://{address}"
+    return f"tcp://{address[0]}:{address[1]}"
+
+
+def is_loopback(family: int, address: t.Any) -> bool:
+    """Determine whether a bound socket address is only reachable from this host."""
+    if family == socket.AF_UNIX:
+        return True
+    try:
+        return ipaddress.ip_address(address[0]).is_loopback
+    except ValueError:
+        return False
+
+
+def encode_frame(message: t.Mapping[str, t.Any]) -> bytes:
+    body = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    return FRAME_HEADER.pack(len(body)) + body
+
+
+def read_frame(reader: t.BinaryIO) -> t.Optional[t.Dict[str, t.Any]]:
+    """Read one frame from a buffered reader of a socket.
+
+    Raises:
+        AgentException: Frame is too large or not a JSON object.
+
+    Returns:
+        Decoded message or None if the peer closed the connection.
+    """
+    header = reader.read(FRAME_HEADER.size)
+    if len(header) < FRAME_HEADER.size:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise AgentException(message=f"Frame of {size} bytes is too large.")
+    body = reader.read(size)
+    if len(body) < size:
+        return None
+    try:
+        message = json.loads(body)
+    except ValueError as e:
+        raise AgentException(message=f"Frame is not JSON: {e}")
+    if not isinstance(message, dict):
+        raise AgentException(message="Frame is not a JSON object.")
+    return message
+
+
+# name -> (handler, uses wifi adapter), handlers return JSON serializable values
+Handler = t.Callable[..., t.Any]
+METHODS: t.Dict[str, t.Tuple[Handler, bool]] = {}
+
+
+def method(name: str, wifi: bool = False) -> t.Callable[[Handler], Handler]:
+    """Expose a function of Netbox as an agent method.
+
+    Args:
+        name: Method name of requests.
+        wifi: The method uses the wifi adapter, such calls are serialized.
+    """
+
+    def register(func: Handler) -> Handler:
+        METHODS[name] = (func, wifi)
+        return func
+
+    return register
+
+
+@method("version")
+def _version(netbox: "Netbox") -> str:
+    return __version__
+
+
+@method("methods")
+def _methods(netbox: "Netbox") -> t.List[str]:
+    return sorted(METHODS)
+
+
+@method("metrics")
+def _metrics(netbox: "Netbox") -> t.Optional[t.Dict[str, t.Any]]:
+    registry = metrics.get_registry()
+    return None if registry is None else registry.report()
+
+
+@method("ping")
+def _ping(netbox: "Netbox", host: str, timeout: float = 4.0) -> t.Any:
+    return netbox.check_hosts([host], timeout=timeout)[host]
+
+
+@method("check_hosts")
+def _check_hosts(
+    netbox: "Netbox", hosts: t.List[str], timeout: float = 4.0, concurrency: int = 256
+) -> t.Dict[str, t.Any]:
+    return netbox.check_hosts(hosts, timeout=timeout, concurrency=concurrency)
+
+
+@method("check_tcp")
+def _check_tcp(
+    netbox: "Netbox", targets: t.List[str], timeout: float = 2.0, concurrency: int = 512
+) -> t.Dict[str, t.Any]:
+    return netbox.check_tcp(targets, timeout=timeout, concurrency=concurrency)
+
+
+@method("trace")
+def _trace(
+    netbox: "Netbox", hosts: t.List[str], **params: t.Any
+) -> t.List[t.Dict[str, t.Any]]:
+    return [trace.to_dict() for trace in netbox.trace_many(hosts, **params)]
+
+
+@method("resolve")
+def _resolve(netbox: "Netbox", names: t.List[str]) -> t.Dict[str, t.Any]:
+    return netbox.resolve(names)
+
+
+@method("resolver_stats")
+def _resolver_stats(netbox: "Netbox") -> t.Dict[str, t.Any]:
+    return netbox.resolver_stats()
+
+
+@method("ping_series")
+def _ping_series(
+    netbox: "Netbox",
+    host: str,
+    count: int = 10,
+    interval: float = 1.0,
+    timeout: float = 4.0,
+) -> t.Dict[str, t.Any]:
+    return netbox.ping_series(host, count=count, interval=interval, timeout=timeout)
+
+
+@method("measure_throughput")
+def _measure_throughput(netbox: "Netbox", host: str, **params: t.Any) -> t.Any:
+    return netbox.measure_throughput(host, **params)
+
+
+@method("measure_udp_stream")
+def _measure_udp_stream(netbox: "Netbox", host: str, **params: t.Any) -> t.Any:
+    return netbox.measure_udp_stream(host, **params)
+
+
+@method("current_wifi_info", wifi=True)
+def _current_wifi_info(netbox: "Netbox") -> t.Any:
+    return json.loads(netbox.current_wifi_info)["data"]
+
+
+@method("scan", wifi=True)
+def _scan(netbox: "Netbox", max_age: t.Optional[float] = None) -> t.Any:
+    return netbox.scan(max_age=max_age).to_list()
+
+
+@method("ssid", wifi=True)
+def _ssid(netbox: "Netbox") -> t.Any:
+    return netbox.ssid
+
+
+@method("rssi", wifi=True)
+def _rssi(netbox: "Netbox") -> t.Any:
+    return netbox.rssi
+
+
+@method("wifi_state", wifi=True)
+def _wifi_state(netbox: "Netbox") -> t.Any:
+    return netbox.wifi_state
+
+
+@method("connect", wifi=True)
+def _connect(netbox: "Netbox", ssid: str, password: str, **params: t.Any) -> t.Any:
+    result = netbox.connect(ssid, password, **params)
+    return json.loads(result) if result else None
+
+
+@method("disconnect", wifi=True)
+def _disconnect(netbox: "Netbox") -> t.Any:
+    state = netbox.disconnect()
+    return state.name if state is not None else None
+
+
+@method("turn_on_wifi", wifi=True)
+def _turn_on_wifi(netbox: "Netbox") -> bool:
+    return netbox.turn_on_wifi()
+
+
+@method("turn_off_wifi", wifi=True)
+def _turn_off_wifi(netbox: "Netbox") -> bool:
+    return netbox.turn_off_wifi()
+
+
+@method("cache_info", wifi=True)
+def _cache_info(netbox: "Netbox") -> t.Dict[str, int]:
+    return netbox.cache_info()._asdict()
+
+
+@method("command_stats", wifi=True)
+def _command_stats(netbox: "Netbox") -> t.Any:
+    return netbox.command_stats()
+
+
+class AgentServer(object):
+    """Serve operations of one Netbox over length-prefixed JSON frames.
+
+    A frame is a 4 bytes big endian length followed by a JSON body, requests
+    are {"id": 1, "method": "ping", "params": {"host": "jd.com"}} and
+    responses are {"id": 1, "result": ...} or {"id": 1, "error": {...}}.
+    Requests of a connection are pipelined, they run on a worker pool and
+    their responses are written as soon as each finishes, so a slow request
+    does not hold back the ones behind it. Methods touching the wifi adapter
+    run one at a time.
+
+    A request carries the shared token as "token" when the agent has one, it
+    is required whenever the agent listens on a TCP address other than
+    loopback.
+
+    Args:
+        addresses: Addresses to listen on, see ``parse_address``.
+        netbox: Netbox to serve, defaults to a new one.
+        workers: Number of requests running at the same time.
+        max_pending: Requests of a connection read ahead before it waits.
+        token: Shared token requests must carry.
+
+    Raises:
+        AgentException: A non-loopback TCP address is given without a token.
+    """
+
+    def __init__(
+        self,
+        addresses: t.Sequence[str],
+        netbox: t.Optional["Netbox"] = None,
+        workers: int = 16,
+        max_pending: int = 256,
+        token: t.Optional[str] = None,
+    ) -> None:
+        if netbox is None:
+            from .core import Netbox
+
+            netbox = Netbox()
+        self.netbox = netbox
+        self.max_pending = max_pending
+        self.token = token
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="netbox-agent"
+        )
+        self._wifi_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: t.List[threading.Thread] = []
+        self._listeners: t.List[socket.socket] = []
+        for address in addresses:
+            family, addr = parse_address(address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            if family == socket.AF_UNIX:
+                if os.path.exists(addr):
+                    os.unlink(addr)
+            else:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._listeners.append(sock)
+            sock.bind(addr)
+            if token is None and not is_loopback(family, sock.getsockname()):
+                self.stop()
+                raise AgentException(
+                    message=f"Agent listening on {address} needs a token."
+                )
+            sock.listen(128)
+
+    @property
+    def addresses(self) -> t.List[str]:
+        """Listening addresses, useful when port 0 is given."""
+        return [
+            format_address(sock.family, sock.getsockname()) for sock in self._listeners
+        ]
+
+    def start(self) -> "AgentServer":
+        """Serve in background threads."""
+        for sock in self._listeners:
+            thread = threading.Thread(
+                target=self._accept, args=(sock,), name="netbox-agent", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def serve_forever(self) -> None:
+        """Serve until ``stop`` is called."""
+        self.start()
+        self._stopped.wait()
+
+    def _accept(self, sock: socket.socket) -> None:
+        while not self._stopped.is_set():
+            try:
+                conn, _ = sock.accept()
+            except OSError:
+                break
+            if conn.family != socket.AF_UNIX:
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        write_lock = threading.Lock()
+        pending = threading.BoundedSemaphore(self.max_pending)
+
+        def send(message: t.Dict[str, t.Any]) -> None:
+            try:
+                frame = encode_frame(message)
+            except (TypeError, ValueError) as e:
+                error = {"type": type(e).__name__, "message": str(e)}
+                frame = encode_frame({"id": message.get("id"), "error": error})
+            with write_lock:
+                conn.sendall(frame)
+
+        def respond(future: "Future[t.Dict[str, t.Any]]") -> None:
+            try:
+                send(future.result())
+            except Exception as e:
+                logger.debug(msg=f"Agent response failed: {e!r}")
+            finally:
+                pending.release()
+
+        with conn, conn.makefile("rb") as reader:
+            while not self._stopped.is_set():
+                try:
+                    request = read_frame(reader)
+                except AgentException as e:
+                    logger.debug(msg=f"Agent connection closed: {e}")
+                    error = {"type": type(e).__name__, "message": str(e)}
+                    try:
+                        send({"id": None, "error": error})
+                    except OSError:
+                        pass
+                    break
+                except OSError as e:
+                    logger.debug(msg=f"Agent connection closed: {e}")
+                    break
+                if request is None:
+                    break
+                pending.acquire()
+                self._executor.submit(self._handle, request).add_done_callback(respond)
+            # wait for responses in flight before closing
+            for _ in range(self.max_pending):
+                pending.acquire()
+
+    def _handle(self, request: t.Mapping[str, t.Any]) -> t.Dict[str, t.Any]:
+        request_id = request.get("id")
+        name = request.get("method")
+        try:
+            if self.token is not None and not hmac.compare_digest(
+                str(request.get("token", "")).encode("utf-8"),
+                self.token.encode("utf-8"),
+            ):
+                raise AgentException(message="Token of the request is invalid.")
+            if name not in METHODS:
+                raise AgentException(message=f"Unknown method {name}.")
+            handler, wifi = METHODS[t.cast(str, name)]
+            params = request.get("params") or {}
+            with metrics.span(f"agent.{name}"):
+                if wifi:
+                    with self._wifi_lock:
+                        result = handler(self.netbox, **params)
+                else:
+                    result = handler(self.netbox, **params)
+            return {"id": request_id, "result": result}
+        except Exception as e:
+            if not isinstance(e, NetboxException):
+                logger.debug(msg=f"Agent method {name} failed: {e!r}")
+            return {
+                "id": request_id,
+                "error": {"type": type(e).__name__, "message": str(e)},
+            }
+
+    def stop(self) -> None:
+        """Stop accepting connections and release listening sockets."""
+        self._stopped.set()
+        for sock in self._listeners:
+            path = sock.getsockname() if sock.family == socket.AF_UNIX else None
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+            if path:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._executor.shutdown(wait=False)
+
+
+class AgentClient(object):
+    """Persistent pipelined connection to one agent.
+
+    Requests are written as soon as they are submitted, a reader thread
+    resolves their futures by id in whatever order responses arrive.
+
+    Args:
+        address: Address of the agent, see ``parse_address``.
+        timeout: Seconds to connect and to wait for a response.
+        token: Shared token of the agent.
+    """
+
+    def __init__(
+        self, address: str, timeout: float = 30.0, token: t.Optional[str] = None
+    ) -> None:
+        self.address = address
+        self.timeout = timeout
+        self.token = token
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._sock: t.Optional[socket.socket] = None
+        self._pending: t.Dict[int, "Future[t.Any]"] = {}
+
+    def _connect(self) -> socket.socket:
+        if self._sock is None:
+            family, addr = parse_address(self.address)
+            sock = socket.socket(family, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(addr)
+            except OSError as e:
+                sock.close()
+                raise AgentException(
+                    message=f"Agent {self.address} is unreachable: {e}"
+                )
+            sock.settimeout(None)
+            if family != socket.AF_UNIX:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._sock = sock
+            threading.Thread(
+                target=self._read, args=(sock,), name="netbox-agent-client", daemon=True
+            ).start()
+        return self._sock
+
+    def _read(self, sock: socket.socket) -> None:
+        error = "connection closed"
+        try:
+            with sock.makefile("rb") as reader:
+                while True:
+                    response = read_frame(reader)
+                    if response is None:
+                        break
+                    response_id = response.get("id")
+                    # a frame without the id of a request resolves nothing
+                    if not isinstance(response_id, int):
+                        continue
+                    with self._lock:
+                        future = self._pending.pop(response_id, None)
+                    if future is None:
+                        continue
+                    if "error" in response:
+                        err = response["error"]
+                        if not isinstance(err, dict):
+                            err = {"type": "AgentException", "message": err}
+                        future.set_exception(
+                            AgentException(
+                                message=f"{err.get('type')}: {err.get('message')}"
+                            )
+                        )
+                    else:
+                        future.set_result(response.get("result"))
+        except (AgentException, OSError, ValueError) as e:
+            error = str(e)
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        sock.close()
+        for future in pending.values():
+            future.set_exception(
+                AgentException(message=f"Agent {self.address}: {error}.")
+            )
+
+    def submit(self, method: str, **params: t.Any) -> "Future[t.Any]":
+        """Send a request without waiting for its response.
+
+        Raises:
+            AgentException: Agent is unreachable.
+
+        Returns:
+            Future of the result, its exception is AgentException if the method failed.
+        """
+        future: "Future[t.Any]" = Future()
+        with self._lock:
+            sock = self._connect()
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            request = {"id": request_id, "method": method, "params": params}
+            if self.token is not None:
+                request["token"] = self.token
+            try:
+                sock.sendall(encode_frame(request))
+            except OSError as e:
+                del self._pending[request_id]
+                raise AgentException(message=f"Agent {self.address}: {e}")
+        return future
+
+    def call(self, method: str, **params: t.Any) -> t.Any:
+        """Send a request and wait for its result.
+
+        Raises:
+            AgentException: Agent is unreachable, timeout or the method failed.
+        """
+        future = self.submit(method, **params)
+        try:
+            return future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            raise AgentException(message=f"Agent {self.address}: {method} timeout.")
+
+    def close(self) -> None:
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            sock.close()
+
+    def __enter__(self) -> "AgentClient":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+
+class AgentPool(object):
+    """Persistent connections to many agents with concurrent fan-out.
+
+    Args:
+        addresses: Addresses of agents.
+        timeout: Seconds to connect and to wait for a response.
+        token: Shared token of the agents.
+    """
+
+    def __init__(
+        self,
+        addresses: t.Iterable[str],
+        timeout: float = 30.0,
+        token: t.Optional[str] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.token = token
+        self.clients = {
+            address: AgentClient(address, timeout, token) for address in addresses
+        }
+
+    def client(self, address: str) -> AgentClient:
+        """Obtain the connection to an agent, added to the pool if it is new."""
+        if address not in self.clients:
+            self.clients[address] = AgentClient(address, self.timeout, self.token)
+        return self.clients[address]
+
+    def fan_out(
+        self,
+        method: str,
+        addresses: t.Optional[t.Iterable[str]] = None,
+        **params: t.Any,
+    ) -> t.Dict[str, t.Any]:
+        """Call a method on many agents at the same time.
+
+        Every request is sent before any response is waited for, so the cost
+        is the slowest agent rather than the sum of them.
+
+        Args:
+            method: Method name.
+            addresses: Agents to call, defaults to all of the pool.
+
+        Returns:
+            Mapping of address to result, or to AgentException if it failed.
+        """
+        futures: t.Dict[str, t.Any] = {}
+        for address in addresses or list(self.clients):
+            try:
+                futures[address] = self.client(address).submit(method, **params)
+            except AgentException as e:
+                futures[address] = e
+        results: t.Dict[str, t.Any] = {}
+        for address, future in futures.items():
+            if isinstance(future, AgentException):
+                results[address] = future
+                continue
+            try:
+                results[address] = future.result(timeout=self.timeout)
+            except AgentException as e:
+                results[address] = e
+            except concurrent.futures.TimeoutError:
+                results[address] = AgentException(
+                    message=f"Agent {address}: {method} timeout."
+                )
+        return results
+
+    def close(self) -> None:
+        for client in self.clients.values():
+            client.close()
+
+    def __enter__(self) -> "AgentPool":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
@@ -0,0 +1,841 @@
+import asyncio
+import functools
+import json
+import os
+import socket
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger
+from .cache import CacheInfo, CommandCache
+from .connect import (
+    DEFAULT_TARGET,
+    DEFAULT_TIMEOUT,
+    ConnectPhases,
+    PhaseTimer,
+    backoff,
+)
+from .constant import WiFiState
+from .core import format_connect_result, format_wifi_info
+from .discovery import Discovery
+from .exception import CommandException, NetboxException
+from .helper import create_adapter
+from .ping import (
+    PingResult,
+    build_echo_request,
+    open_icmp_socket,
+    parse_echo_reply,
+)
+from .process import DEFAULT_TIMEOUT as COMMAND_TIMEOUT
+from .process import Argv, CommandResult, CommandRunner, redact, to_argv, to_string
+from .resolver import get_resolver
+from .scan import ScanResult
+from .wifi import MacAdapter, WifiAdapter
+
+
+async def wait_until_async(
+    predicate: t.Callable[[], t.Awaitable[t.Any]],
+    timeout: float,
+    initial: float = 0.05,
+    maximum: float = 0.5,
+) -> t.Any:
+    """Coroutine counterpart of ``connect.wait_until``.
+
+    Args:
+        predicate: Coroutine function to poll, a truthy result stops it.
+        timeout: Seconds to wait at most.
+        initial: First delay between two polls.
+        maximum: Upper bound of delay between two polls.
+
+    Returns:
+        Last result of predicate, falsy if timeout.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff(initial=initial, maximum=maximum):
+        value = await predicate()
+        remaining = deadline - time.monotonic()
+        if value or remaining <= 0:
+            return value
+        await asyncio.sleep(min(delay, remaining))
+
+
+class AsyncCommandRunner(CommandRunner):
+    """Execute commands as asyncio subprocesses without a shell.
+
+    It shares the statistics of CommandRunner, ``max_workers`` bounds the
+    number of processes alive at the same time.
+    """
+
+    def __init__(
+        self, max_workers: int = 4, timeout: t.Optional[float] = COMMAND_TIMEOUT
+    ) -> None:
+        super().__init__(max_workers=max_workers, timeout=timeout)
+        self._semaphore: t.Optional[asyncio.Semaphore] = None
+
+    async def run_async(
+        self, command: t.Union[str, Argv], timeout: t.Optional[float] = None
+    ) -> CommandResult:
+        """Execute a command and wait for it without blocking the event loop.
+
+        Args:
+            command: Argv list, a string is split by shell rules but never run by a shell.
+            timeout: Seconds to wait, defaults to the runner timeout.
+
+        Raises:
+            CommandException: The executable is not found or timeout.
+
+        Returns:
+            CommandResult of the command.
+        """
+        argv = to_argv(command)
+        timeout = self.timeout if timeout is None else timeout
+        if self._semaphore is None:
+            # created here so it belongs to the running loop
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *argv,
+                    stdin=asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                )
+            except OSError as e:
+                raise CommandException(
+                    message=f"Command: '{redact(argv)}' executed failed. {e}"
+                )
+            spawned = time.perf_counter()
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.communicate()
+                raise CommandException(message=f"Command: '{redact(argv)}' timeout.")
+        result = CommandResult(
+            argv=argv,
+            returncode=t.cast(int, process.returncode),
+            stdout=stdout.decode(errors="replace"),
+            stderr=stderr.decode(errors="replace"),
+            spawn=spawned - start,
+            elapsed=time.perf_counter() - start,
+        )
+        self._record(result)
+        return result
+
+
+class AsyncWifiAdapter(object):
+    """Asyncio counterpart of WifiAdapter.
+
+    Concurrent reads of the same cacheable command share one process, and
+    concurrent scans share one scan.
+    """
+
+    CACHE_TTL_RULES = WifiAdapter.CACHE_TTL_RULES
+    CACHE_INVALIDATION_RULES = WifiAdapter.CACHE_INVALIDATION_RULES
+    CACHE_MAXSIZE = WifiAdapter.CACHE_MAXSIZE
+    RUNNER_WORKERS = WifiAdapter.RUNNER_WORKERS
+    SCAN_MAX_AGE = WifiAdapter.SCAN_MAX_AGE
+    CONNECT_TIMEOUT = WifiAdapter.CONNECT_TIMEOUT
+
+    def __init__(self) -> None:
+        self._cache = CommandCache(
+            ttl_rules=self.CACHE_TTL_RULES,
+            invalidation_rules=self.CACHE_INVALIDATION_RULES,
+            maxsize=self.CACHE_MAXSIZE,
+        )
+        self._last_scan: t.Optional[ScanResult] = None
+        self._scanning: t.Optional["asyncio.Future[ScanResult]"] = None
+        self._reading: t.Dict[str, "asyncio.Future[str]"] = {}
+        self._runner = AsyncCommandRunner(max_workers=self.RUNNER_WORKERS)
+        # called with the exception of a failed command before it is raised
+        self.on_command_failure: t.Optional[t.Callable[[CommandException], None]] = None
+
+    async def scan(self, max_age: t.Optional[float] = None) -> ScanResult:
+        """Obtain surrounding wifi networks, reuse the last scan if fresh enough.
+
+        Args:
+            max_age (float, optional): Maximum age in seconds of a reused scan,
+                0 forces a rescan. Defaults to SCAN_MAX_AGE.
+
+        Returns:
+            ScanResult indexed by ssid, bssid and channel.
+        """
+        if max_age is None:
+            max_age = self.SCAN_MAX_AGE
+        if self._last_scan is not None and self._last_scan.is_fresh(max_age):
+            return self._last_scan
+        if self._scanning is None:
+            self._scanning = asyncio.ensure_future(self._scan())
+            self._scanning.add_done_callback(self._scan_done)
+        return await asyncio.shield(self._scanning)
+
+    def _scan_done(self, future: "asyncio.Future[ScanResult]") -> None:
+        self._scanning = None
+        if not future.cancelled() and future.exception() is None:
+            self._last_scan = future.result()
+
+    async def _scan(self) -> ScanResult:
+        """Scan surrounding wifi networks, implemented by each adapter."""
+        raise NotImplementedError
+
+    def _forget_scan(self) -> None:
+        """Drop the last scan, it is stale after the interface state changed."""
+        self._last_scan = None
+
+    async def execute_command(
+        self, command: t.Union[str, Argv], cache: bool = True
+    ) -> str:
+        """Execute the specified command and return the result.
+
+        Args:
+            command (str | list): Argv list, a string is split by shell rules.
+            cache (bool, optional): Serve output from cache. Defaults to True.
+
+        Raises:
+            CommandException: Exception of command executes failed.
+
+        Returns:
+            String results of command executes successfully.
+        """
+        argv = to_argv(command)
+        key = to_string(argv)
+        if not cache or self._cache.ttl(key) <= 0:
+            return await self._execute(argv, key)
+        output = self._cache.get(key)
+        if output is not None:
+            return output
+        reading = self._reading.get(key)
+        if reading is None:
+            reading = self._reading[key] = asyncio.ensure_future(
+                self._execute(argv, key)
+            )
+            reading.add_done_callback(lambda _: self._reading.pop(key, None))
+        return await asyncio.shield(reading)
+
+    async def _execute(self, argv: t.List[str], key: str) -> str:
+        result = await self._runner.run_async(argv)
+        self._cache.invalidate(key)
+        try:
+            result.check()
+        except CommandException as e:
+            if self.on_command_failure is not None:
+                self.on_command_failure(e)
+            raise
+        self._cache.set(key, result.stdout)
+        return result.stdout
+
+    async def execute_commands(
+        self, commands: t.Sequence[t.Union[str, Argv]], cache: bool = True
+    ) -> t.List[str]:
+        """Execute independent commands concurrently and return their results.
+
+        Args:
+            commands (list): Argv lists or command strings.
+            cache (bool, optional): Serve output from cache. Defaults to True.
+
+        Raises:
+            CommandException: Exception of any command executes failed.
+
+        Returns:
+            String results of each command in the given order.
+        """
+        return list(
+            await asyncio.gather(
+                *(self.execute_command(command, cache=cache) for command in commands)
+            )
+        )
+
+    def command_stats(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Obtain spawn latency statistics per executable."""
+        return self._runner.stats()
+
+    def cache_info(self) -> CacheInfo:
+        """Obtain hit and miss statistics of the command cache."""
+        return self._cache.info()
+
+    def clear_cache(self) -> None:
+        """Drop all cached command outputs."""
+        self._cache.clear()
+
+    async def close(self) -> None:
+        """Release resources held by the adapter."""
+
+
+class AsyncMacAdapter(AsyncWifiAdapter):
+    """Asyncio adapter of Wi-Fi operation under MacOS, parsing is shared with MacAdapter."""
+
+    AIRPORT_PATH = MacAdapter.AIRPORT_PATH
+    CACHE_TTL_RULES = MacAdapter.CACHE_TTL_RULES
+    CACHE_INVALIDATION_RULES = MacAdapter.CACHE_INVALIDATION_RULES
+
+    def __init__(self, interface: t.Optional[str] = None) -> None:
+        super().__init__()
+        self._interface = interface
+
+    async def get_interface(self) -> str:
+        """Obtain current wifi interface name. For example: en0"""
+        if self._interface:
+            return self._interface
+        command = ["networksetup", "-listallhardwareports"]
+        output = await self.execute_command(command=command)
+        return MacAdapter.parse_hardware_ports(output)
+
+    async def get_current_network(self, refresh: bool = False) -> t.Dict[str, str]:
+        """Obtain current connected wifi information.
+
+        Args:
+            refresh (bool, optional): Bypass the command cache.
+
+        Returns:
+            Connected wifi information. For example: {'SSID': 'TP-Link001', 'agrCtlRSSI': "-30"}
+        """
+        command = [self.AIRPORT_PATH, "-I"]
+        output = await self.execute_command(command=command, cache=not refresh)
+        return MacAdapter.parse_current_info(output)
+
+    async def _scan(self) -> ScanResult:
+        command = [self.AIRPORT_PATH, "-s"]
+        output = await self.execute_command(command=command, cache=False)
+        return MacAdapter.parse_scan_output(output)
+
+    async def get_networks(self) -> t.List[t.Dict[str, str]]:
+        return (await self.scan()).to_list()
+
+    async def get_all_ssid(self, refresh: bool = False) -> t.List[str]:
+        return (await self.scan(max_age=0 if refresh else None)).ssids()
+
+    async def is_on_or_off(self) -> WiFiState:
+        command = ["networksetup", "-getairportpower", await self.get_interface()]
+        if "On" in await self.execute_command(command=command):
+            return WiFiState.ON
+        return WiFiState.OFF
+
+    async def get_current_ssid(self) -> t.Optional[str]:
+        return (await self.get_current_network()).get("SSID", "")
+
+    async def get_current_rssi(self) -> t.Optional[str]:
+        return (await self.get_current_network()).get("agrCtlRSSI")
+
+    async def get_state(self) -> t.Optional[str]:
+        return (await self.get_current_network()).get("state")
+
+    async def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        """Connect a special wifi network.
+
+        Args:
+            ssid (str): The ssid for a special wifi network.
+            password (str): The password for a special wifi network.
+            timeout (float, optional): Seconds to wait for association. Defaults to CONNECT_TIMEOUT.
+
+        Returns:
+            CONNECTED if connected successfully, otherwise CONNECTED_FAILED.
+        """
+        interface = await self.get_interface()
+        command = ["networksetup", "-setairportnetwork", interface, ssid, password]
+        await self.execute_command(command=command)
+
+        async def associated() -> bool:
+            info = await self.get_current_network(refresh=True)
+            return info.get("state") == "running" and info.get("SSID") == ssid
+
+        if timeout is None:
+            timeout = self.CONNECT_TIMEOUT
+        if not await wait_until_async(associated, timeout=timeout):
+            return WiFiState.CONNECTED_FAILED
+        return WiFiState.CONNECTED
+
+    async def get_ip_address(self) -> t.Optional[str]:
+        """Obtain IPv4 address of wifi interface, None if DHCP has not finished yet."""
+        command = ["ipconfig", "getifaddr", await self.get_interface()]
+        try:
+            output = await self.execute_command(command=command, cache=False)
+        except CommandException:
+            return None
+        return output.strip() or None
+
+    async def disconnect(self) -> t.Optional[WiFiState]:
+        return WiFiState.DISCONNECTED if await self.turn_off() else None
+
+    async def _set_power(self, state: str) -> bool:
+        interface = await self.get_interface()
+        command = ["networksetup", "-setairportpower", interface, state]
+        try:
+            logger.debug(msg=f"Wlan interface {interface} will be {state}.")
+            self._forget_scan()
+            await self.execute_command(command=command)
+        except CommandException:
+            return False
+        expected = WiFiState.ON if state == "on" else WiFiState.OFF
+        return await self.is_on_or_off() == expected
+
+    async def turn_on(self) -> bool:
+        return await self._set_power("on")
+
+    async def turn_off(self) -> bool:
+        return await self._set_power("off")
+
+
+class ExecutorAdapter(object):
+    """Asyncio facade of a blocking WifiAdapter.
+
+    Calls run on one worker thread, so an adapter which holds a socket, such
+    as the wpa_supplicant control interface of LinuxAdapter, is never used
+    by two threads at once while the event loop stays free.
+
+    Args:
+        adapter: The blocking adapter.
+    """
+
+    def __init__(self, adapter: WifiAdapter) -> None:
+        self.adapter = adapter
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="netbox-adapter"
+        )
+
+    async def _call(
+        self, func: t.Callable[..., t.Any], *args: t.Any, **kwargs: t.Any
+    ) -> t.Any:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, functools.partial(func, *args, **kwargs)
+        )
+
+    @property
+    def on_command_failure(self) -> t.Optional[t.Callable[[CommandException], None]]:
+        return self.adapter.on_command_failure
+
+    @on_command_failure.setter
+    def on_command_failure(
+        self, callback: t.Optional[t.Callable[[CommandException], None]]
+    ) -> None:
+        self.adapter.on_command_failure = callback
+
+    async def get_interface(self) -> str:
+        return await self._call(lambda: self.adapter.interface)
+
+    async def scan(self, max_age: t.Optional[float] = None) -> ScanResult:
+        return await self._call(self.adapter.scan, max_age=max_age)
+
+    async def get_current_network(self, refresh: bool = False) -> t.Dict[str, str]:
+        return await self._call(self.adapter.get_current_network, refresh=refresh)
+
+    async def get_networks(self) -> t.List[t.Dict[str, str]]:
+        return await self._call(self.adapter.get_networks)
+
+    async def get_all_ssid(self, refresh: bool = False) -> t.List[str]:
+        return await self._call(self.adapter.get_all_ssid, refresh=refresh)
+
+    async def is_on_or_off(self) -> WiFiState:
+        return await self._call(self.adapter.is_on_or_off)
+
+    async def get_current_ssid(self) -> t.Optional[str]:
+        return await self._call(self.adapter.get_current_ssid)
+
+    async def get_current_rssi(self) -> t.Optional[str]:
+        return await self._call(self.adapter.get_current_rssi)
+
+    async def get_state(self) -> t.Optional[str]:
+        return await self._call(self.adapter.get_state)
+
+    async def get_ip_address(self) -> t.Optional[str]:
+        return await self._call(self.adapter.get_ip_address)
+
+    async def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        return await self._call(self.adapter.connect, ssid, password, timeout)
+
+    async def disconnect(self) -> t.Optional[WiFiState]:
+        return await self._call(self.adapter.disconnect)
+
+    async def turn_on(self) -> bool:
+        return await self._call(self.adapter.turn_on)
+
+    async def turn_off(self) -> bool:
+        return await self._call(self.adapter.turn_off)
+
+    def command_stats(self) -> t.Dict[str, t.Dict[str, float]]:
+        return self.adapter.command_stats()
+
+    def cache_info(self) -> CacheInfo:
+        return self.adapter.cache_info()
+
+    async def close(self) -> None:
+        close = getattr(self.adapter, "close", None)
+        if close is not None:
+            await self._call(close)
+        self._executor.shutdown(wait=False)
+
+
+AsyncAdapter = t.Union[AsyncMacAdapter, ExecutorAdapter]
+
+
+def create_async_adapter(
+    name: str, interface: t.Optional[str] = None
+) -> t.Optional[AsyncAdapter]:
+    """Create an asyncio adapter based on operating system information.
+
+    MacOS commands run as asyncio subprocesses, other adapters talk to
+    sockets and files and run on a worker thread.
+
+    Args:
+        name: Operating system name. For example: Darwin
+        interface: Wifi interface name, the adapter finds it if not given.
+
+    Returns:
+        An object of asyncio adapter or None if wifi is not supported on the system.
+    """
+    if name == "Darwin":
+        return AsyncMacAdapter(interface=interface)
+    adapter = create_adapter(name=name, interface=interface)
+    return None if adapter is None else ExecutorAdapter(adapter)
+
+
+class AsyncPinger(object):
+    """Ping hosts from coroutines over one shared ICMP socket.
+
+    The socket is watched by the event loop, every reply resolves the future
+    of its echo request, so any number of pings run concurrently.
+
+    Args:
+        timeout: Seconds to wait for each echo reply.
+        concurrency: Maximum number of outstanding echo requests.
+        size: Bytes of echo request payload.
+    """
+
+    def __init__(
+        self, timeout: float = 4.0, concurrency: int = 256, size: int = 56
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than 0.")
+        self.timeout = timeout
+        self.concurrency = min(concurrency, 0xFFFF)
+        self.payload = b"Q" * size
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+        self._sock: t.Optional[socket.socket] = None
+        self._raw = False
+        self._loop: t.Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: t.Optional[asyncio.Semaphore] = None
+        # sequence -> (address, send time, future of round trip time)
+        self._waiters: t.Dict[int, t.Tuple[str, float, "asyncio.Future[float]"]] = {}
+        # resolved when the socket is writable again after a full send buffer
+        self._writable: t.Optional["asyncio.Future[None]"] = None
+
+    def _open(self) -> socket.socket:
+        if self._sock is None:
+            self._loop = asyncio.get_event_loop()
+            self._sock, self._raw = open_icmp_socket()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loop.add_reader(self._sock.fileno(), self._on_readable)
+        return self._sock
+
+    def _next_seq(self) -> int:
+        while True:
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in self._waiters:
+                return self._seq
+
+    def _on_readable(self) -> None:
+        sock = t.cast(socket.socket, self._sock)
+        while True:
+            try:
+                packet, (addr, _) = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            received = time.perf_counter()
+            reply = parse_echo_reply(packet)
+            if reply is None:
+                continue
+            ident, seq = reply
+            if self._raw and ident != self._ident:
+                continue
+            waiter = self._waiters.get(seq)
+            if waiter is None or waiter[0] != addr:
+                continue
+            del self._waiters[seq]
+            if not waiter[2].done():
+                waiter[2].set_result(received - waiter[1])
+
+    def _on_writable(self) -> None:
+        loop = t.cast(asyncio.AbstractEventLoop, self._loop)
+        loop.remove_writer(t.cast(socket.socket, self._sock).fileno())
+        writable, self._writable = self._writable, None
+        if writable is not None and not writable.done():
+            writable.set_result(None)
+
+    async def _send(self, sock: socket.socket, packet: bytes, addr: str) -> None:
+        """Send an echo request, a full send buffer waits until it drains."""
+        while True:
+            try:
+                sock.sendto(packet, (addr, 0))
+                return
+            except (BlockingIOError, InterruptedError):
+                pass
+            if self._writable is None:
+                loop = t.cast(asyncio.AbstractEventLoop, self._loop)
+                self._writable = loop.create_future()
+                loop.add_writer(sock.fileno(), self._on_writable)
+            # shared by all blocked senders, one cancelled must not wake the others
+            await asyncio.shield(self._writable)
+
+    async def ping(self, host: str, timeout: t.Optional[float] = None) -> PingResult:
+        """Ping a host once.
+
+        Args:
+            host: IP address or domain.
+            timeout: Seconds to wait for the reply, defaults to the pinger timeout.
+
+        Raises:
+            PingException: ICMP socket can not be opened.
+
+        Returns:
+            Round trip time in seconds, None if timeout or False if the host
+            can not be resolved.
+        """
+        sock = self._open()
+        loop = t.cast(asyncio.AbstractEventLoop, self._loop)
+        resolver = get_resolver()
+        known, addr = resolver.cached(host)
+        if not known:
+            addr = await loop.run_in_executor(None, resolver.resolve, host)
+        if addr is None:
+            return False
+        async with t.cast(asyncio.Semaphore, self._semaphore):
+            seq = self._next_seq()
+            future: "asyncio.Future[float]" = loop.create_future()
+            packet = build_echo_request(self._ident, seq, self.payload)
+            self._waiters[seq] = (addr, time.perf_counter(), future)
+            timeout = self.timeout if timeout is None else timeout
+            try:
+                await asyncio.wait_for(self._send(sock, packet, addr), timeout)
+                self._waiters[seq] = (addr, time.perf_counter(), future)
+                return await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                return None
+            except OSError as e:
+                logger.debug(msg=f"Ping {host} send failed: {e}")
+                return None
+            finally:
+                self._waiters.pop(seq, None)
+
+    async def check_hosts(self, hosts: t.Iterable[str]) -> t.Dict[str, PingResult]:
+        """Ping all hosts concurrently.
+
+        Args:
+            hosts: IP addresses or domains.
+
+        Returns:
+            Mapping of host to result in the order of given hosts.
+        """
+        hosts = list(hosts)
+        # one batch of concurrent queries instead of a lookup per ping
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, get_resolver().resolve_many, hosts)
+        results = await asyncio.gather(*(self.ping(host) for host in hosts))
+        return dict(zip(hosts, results))
+
+    def close(self) -> None:
+        """Stop watching and close the ICMP socket."""
+        if self._sock is not None:
+            loop = t.cast(asyncio.AbstractEventLoop, self._loop)
+            loop.remove_reader(self._sock.fileno())
+            loop.remove_writer(self._sock.fileno())
+            self._sock.close()
+            self._sock = None
+        for _, _, future in self._waiters.values():
+            future.cancel()
+        self._waiters.clear()
+        if self._writable is not None:
+            self._writable.cancel()
+            self._writable = None
+
+
+class AsyncConnectPipeline(ConnectPhases):
+    """Asyncio counterpart of ConnectPipeline, runs the same phases.
+
+    Args:
+        adapter: Asyncio adapter.
+        reach: Coroutine function called with (host, timeout) to check reachability.
+        target: Host to check reachability with.
+        timeout: Seconds the whole connect may take.
+    """
+
+    def __init__(
+        self,
+        adapter: AsyncAdapter,
+        reach: t.Callable[[str, float], t.Awaitable[PingResult]],
+        target: str = DEFAULT_TARGET,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        super().__init__(target=target, timeout=timeout)
+        self.adapter = adapter
+        self.reach = reach
+
+    async def run(
+        self, ssid: str, password: str, retry: int = 5
+    ) -> t.Tuple[t.Optional[WiFiState], PingResult, PhaseTimer]:
+        """Run all phases, the same result as ``ConnectPipeline.run``."""
+        adapter = self.adapter
+        operations: t.Dict[str, t.Callable[..., t.Awaitable[t.Any]]] = {
+            "is_on_or_off": adapter.is_on_or_off,
+            "turn_on": adapter.turn_on,
+            "scan": adapter.scan,
+            "connect": adapter.connect,
+            "sleep": asyncio.sleep,
+            "ip_ready": lambda timeout: wait_until_async(
+                adapter.get_ip_address, timeout=timeout
+            ),
+            "reach": self.reach,
+        }
+        timer = PhaseTimer()
+        phases = self.phases(ssid, password, retry, timer)
+        value = None
+        while True:
+            try:
+                name, args = phases.send(value)
+            except StopIteration as stop:
+                state, ret = stop.value
+                return state, ret, timer
+            value = await operations[name](*args)
+
+
+class AsyncNetbox(object):
+    """Asyncio counterpart of Netbox, every operation is a coroutine.
+
+    For example:
+
+        async with AsyncNetbox() as netbox:
+            results = await asyncio.gather(netbox.wifi_scan(), netbox.check_hosts(hosts))
+
+    Args:
+        adapter: Asyncio adapter, created for current operating system on first use.
+        timeout: Seconds to wait for each echo reply.
+        concurrency: Maximum number of outstanding echo requests.
+    """
+
+    def __init__(
+        self,
+        adapter: t.Optional[AsyncAdapter] = None,
+        timeout: float = 4.0,
+        concurrency: int = 256,
+    ) -> None:
+        self._adapter = adapter
+        self.pinger = AsyncPinger(timeout=timeout, concurrency=concurrency)
+
+    @property
+    def adapter(self) -> AsyncAdapter:
+        if self._adapter is None:
+            discovery = Discovery()
+            name = discovery.facts()["os"]
+            adapter = create_async_adapter(name=name, interface=discovery.interface)
+            if adapter is None:
+                raise NetboxException(message=f"Wifi is not supported on {name}.")
+            adapter.on_command_failure = discovery.invalidate
+            self._adapter = adapter
+        return self._adapter
+
+    async def __aenter__(self) -> "AsyncNetbox":
+        return self
+
+    async def __aexit__(self, *args: t.Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the ICMP socket and the adapter."""
+        self.pinger.close()
+        if self._adapter is not None:
+            await self._adapter.close()
+
+    async def check_host_state(
+        self, host: str, timeout: t.Optional[float] = None
+    ) -> PingResult:
+        """Check special host is alive or not.
+
+        Args:
+            host: IP address or domain.
+            timeout: Seconds to wait for the reply.
+
+        Returns:
+            Time of ping successfully, None if timeout or False if unknown.
+        """
+        return await self.pinger.ping(host, timeout=timeout)
+
+    async def check_hosts(self, hosts: t.Iterable[str]) -> t.Dict[str, PingResult]:
+        """Check many hosts concurrently.
+
+        Returns:
+            Mapping of host to result. For example: {'127.0.0.1': 0.0001, 'unknown.invalid': False}
+        """
+        return await self.pinger.check_hosts(hosts)
+
+    async def scan(self, max_age: t.Optional[float] = None) -> ScanResult:
+        """Obtain surrounding wifi networks, reuse the last scan if fresh enough."""
+        return await self.adapter.scan(max_age=max_age)
+
+    async def wifi_scan(self) -> str:
+        """Obtain surrounding wifi network information as JSON string."""
+        ret = await self.adapter.get_networks()
+        return json.dumps(
+            {"code": 0, "message": "Scanning successfully.", "data": ret}, indent=4
+        )
+
+    async def current_wifi_info(self) -> str:
+        """Obtain current connected wifi information as JSON string."""
+        return format_wifi_info(await self.adapter.get_current_network())
+
+    async def ssid(self) -> t.Optional[str]:
+        return await self.adapter.get_current_ssid()
+
+    async def rssi(self) -> t.Optional[str]:
+        return await self.adapter.get_current_rssi()
+
+    async def wifi_state(self) -> t.Optional[str]:
+        return await self.adapter.get_state()
+
+    async def turn_on_wifi(self) -> bool:
+        return await self.adapter.turn_on()
+
+    async def turn_off_wifi(self) -> bool:
+        return await self.adapter.turn_off()
+
+    async def disconnect(self) -> t.Optional[WiFiState]:
+        return await self.adapter.disconnect()
+
+    async def connect(
+        self,
+        ssid: str,
+        password: str,
+        retry: int = 5,
+        target: str = DEFAULT_TARGET,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> str:
+        """Connect a special wifi network, the same phases as ``Netbox.connect``.
+
+        Args:
+            ssid: The ssid for a special wifi network.
+            password: The password for a special wifi network.
+            retry: Number of wifi scan retries.
+            target: Host pinged to check reachability, defaults to jd.com.
+            timeout: Seconds the whole connect may take, defaults to 30.
+
+        Returns:
+            JSON string of the result with milliseconds of each phase, empty if
+            the ssid is not found.
+        """
+        pipeline = AsyncConnectPipeline(
+            adapter=self.adapter,
+            reach=self.check_host_state,
+            target=target,
+            timeout=timeout,
+        )
+        state, ret, timer = await pipeline.run(ssid, password, retry=retry)
+        if state is None:
+            return ""
+        return format_connect_result(ssid, state, ret, target, timer.to_dict())
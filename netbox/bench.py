@@ -0,0 +1,336 @@
+"""Benchmarks of netbox, run with ``python -m netbox.bench``.
+
+Wi-Fi benchmarks run against ReplayAdapter, so they need no hardware and
+results of two runs are comparable. Metrics ending with ``_per_sec`` are
+better when higher, all others are latencies and better when lower.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import typing as t
+
+import click
+
+from .version import __version__
+
+Metrics = t.Dict[str, t.Any]
+BENCHMARKS: t.Dict[str, t.Callable[[bool], Metrics]] = {}
+
+
+def benchmark(
+    name: str,
+) -> t.Callable[[t.Callable[[bool], Metrics]], t.Callable[[bool], Metrics]]:
+    """Register a benchmark, it is called with ``quick`` and returns its metrics."""
+
+    def register(func: t.Callable[[bool], Metrics]) -> t.Callable[[bool], Metrics]:
+        BENCHMARKS[name] = func
+        return func
+
+    return register
+
+
+def measure(func: t.Callable[[], t.Any], quick: bool = False) -> float:
+    """Obtain the best seconds per call of a function.
+
+    Args:
+        func: Function to call.
+        quick: Take fewer samples.
+
+    Returns:
+        Seconds per call of the fastest repeat.
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    if quick:
+        number = max(1, number // 10)
+    return min(timer.repeat(repeat=2 if quick else 5, number=number)) / number
+
+
+@benchmark("scan_parse")
+def bench_scan_parse(quick: bool) -> Metrics:
+    from .replay import synthetic_scan_output
+    from .wifi import MacAdapter
+
+    metrics = {}
+    for count in (10, 1000, 10000):
+        output = synthetic_scan_output(count)
+        cost = measure(lambda: MacAdapter.parse_scan_output(output), quick=quick)
+        metrics[f"networks_per_sec_{count}"] = round(count / cost)
+    return metrics
+
+
+@benchmark("current_wifi_info")
+def bench_current_wifi_info(quick: bool) -> Metrics:
+    from .core import Netbox
+    from .replay import ReplayAdapter
+
+    netbox = Netbox()
+    adapter = netbox._adapter = ReplayAdapter()
+
+    def uncached() -> None:
+        adapter.clear_cache()
+        netbox.current_wifi_info
+
+    return {
+        "cached_us": round(measure(lambda: netbox.current_wifi_info, quick) * 1e6, 3),
+        "uncached_us": round(measure(uncached, quick) * 1e6, 3),
+    }
+
+
+@benchmark("connect")
+def bench_connect(quick: bool) -> Metrics:
+    from .core import Netbox
+    from .replay import ReplayAdapter
+
+    # latencies of a real MacBook, association and DHCP dominate
+    latency = (
+        (r"-setairportnetwork", 0.3),
+        (r"airport -s", 0.05),
+        (r"ipconfig", 0.02),
+        (r"", 0.005),
+    )
+    phases: t.Dict[str, t.List[float]] = {}
+    for _ in range(2 if quick else 5):
+        netbox = Netbox()
+        netbox._adapter = ReplayAdapter(latency=latency)
+        result = json.loads(
+            netbox.connect("Office WiFi", "password", target="127.0.0.1")
+        )
+        for name, value in result["data"]["phases"].items():
+            if value is not None:
+                phases.setdefault(name, []).append(value)
+    return {f"{name}_ms": round(min(values), 3) for name, values in phases.items()}
+
+
+@benchmark("ping_loopback")
+def bench_ping_loopback(quick: bool) -> Metrics:
+    from .exception import PingException
+    from .ping import PingEngine
+
+    count = 2000 if quick else 20000
+    engine = PingEngine(timeout=1.0)
+    start = time.perf_counter()
+    try:
+        received = sum(1 for _, rtt in engine.sweep(["127.0.0.1"] * count) if rtt)
+    except PingException as e:
+        return {"skipped": e.message}
+    elapsed = time.perf_counter() - start
+    return {"packets_per_sec": round(count / elapsed), "loss": count - received}
+
+
+@benchmark("tcp_connect")
+def bench_tcp_connect(quick: bool) -> Metrics:
+    import socket
+    import threading
+
+    from .tcp import TcpEngine
+
+    listener = socket.socket()
+    listener.bind(("0.0.0.0", 0))
+    listener.listen(4096)
+    port = listener.getsockname()[1]
+
+    def accept() -> None:
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            conn.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    count = 2000 if quick else 10000
+    # the whole 127/8 is loopback, spread over hosts to spare ephemeral ports
+    targets = [f"127.0.{i // 250}.{i % 250 + 1}:{port}" for i in range(count)]
+    start = time.perf_counter()
+    try:
+        connected = sum(1 for _, rtt, _ in TcpEngine().sweep(targets) if rtt)
+    finally:
+        listener.close()
+    elapsed = time.perf_counter() - start
+    return {"targets_per_sec": round(count / elapsed), "failed": count - connected}
+
+
+@benchmark("udp_stream")
+def bench_udp_stream(quick: bool) -> Metrics:
+    from .udp import UdpStreamServer, send_stream
+
+    server = UdpStreamServer(host="127.0.0.1", port=0).start()
+    try:
+        report = send_stream(
+            "127.0.0.1",
+            port=server.address[1],
+            rate=300000,
+            size=64,
+            duration=1.0 if quick else 3.0,
+        )
+    finally:
+        server.stop()
+    return {
+        "packets_per_sec": round(report["received"] / report["send_duration"]),
+        "loss": report["lost"],
+        "jitter_ms": report["jitter"],
+    }
+
+
+@benchmark("channel_analysis")
+def bench_channel_analysis(quick: bool) -> Metrics:
+    from .channels import analyze_channels
+
+    try:
+        import numpy as np
+    except ImportError:
+        return {"skipped": "numpy is not installed"}
+    # a day of scans every 2 seconds with 50 networks each
+    count = 1_000_000 if quick else 2_160_000
+    rng = np.random.default_rng(0)
+    scans: t.Dict[str, t.Any] = {
+        "ts": np.arange(count, dtype=np.int64) // 50 * 2000,
+        "rssi": rng.integers(-95, -30, count).astype(np.int16),
+        "channel": rng.choice([1, 3, 6, 11, 36, 40, 44, 149], count).astype(np.int32),
+        "bssid": rng.integers(0, 500, count).astype(np.uint64),
+    }
+    start = time.perf_counter()
+    analyze_channels(scans)
+    elapsed = time.perf_counter() - start
+    return {"rows_per_sec": round(count / elapsed)}
+
+
+@benchmark("schedule")
+def bench_schedule(quick: bool) -> Metrics:
+    from .core import Netbox
+    from .schedule import Check, Probe, Scheduler
+
+    # 10k checks every second against a probe which costs nothing, so the
+    # CPU left is the cost of the scheduler itself
+    noop = Probe(
+        lambda netbox, targets, timeout: dict.fromkeys(targets, 0.001),
+        concurrency=10000,
+        workers=4,
+        timeout=1.0,
+    )
+    checks = [Check("noop", str(i), 1.0, 1.0) for i in range(10000)]
+    duration = 2.0 if quick else 5.0
+    cpu = time.process_time()
+    report = Scheduler(Netbox(), checks, probes={"noop": noop}).run(duration)
+    cpu = time.process_time() - cpu
+    return {
+        "runs_per_sec": round(report["runs"] / duration),
+        "cpu_ms_per_sec": round(cpu * 1000 / duration, 3),
+        "lag_p99_ms": report["lag"]["p99"],
+        "missed": report["missed"],
+    }
+
+
+@benchmark("cold_start")
+def bench_cold_start(quick: bool) -> Metrics:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    argv = [
+        sys.executable,
+        "-c",
+        "from netbox.scripts.command import cli; cli(['version'])",
+    ]
+    costs = []
+    for _ in range(3 if quick else 10):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=root, stdout=subprocess.DEVNULL, check=False)
+        costs.append(time.perf_counter() - start)
+    return {"version_ms": round(min(costs) * 1000, 3)}
+
+
+def run(names: t.Optional[t.Iterable[str]] = None, quick: bool = False) -> Metrics:
+    """Run benchmarks.
+
+    Args:
+        names: Names of benchmarks, defaults to all of them.
+        quick: Take fewer samples.
+
+    Returns:
+        Report of the run. For example: {'netbox': '0.0.1', 'python': '3.10.8', ..., 'results': {'scan_parse': {...}}}
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        results[name] = BENCHMARKS[name](quick)
+    return {
+        "netbox": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": round(time.time(), 3),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def compare(
+    base: Metrics, current: Metrics, threshold: float = 0.1
+) -> t.List[t.Tuple[str, float, float, float, bool]]:
+    """Compare metrics of two reports.
+
+    Args:
+        base: Report of a previous run.
+        current: Report of this run.
+        threshold: Relative change counted as a regression.
+
+    Returns:
+        Rows of (metric, base, current, change, regressed), change is relative
+        and positive when it got better.
+    """
+    rows = []
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            old = base.get("results", {}).get(name, {}).get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                continue
+            if not old:
+                continue
+            change = (value - old) / old
+            if "_per_sec" not in metric:
+                change = -change
+            rows.append((f"{name}.{metric}", old, value, change, change < -threshold))
+    return rows
+
+
+@click.command(help="Run benchmarks and store results as JSON")
+@click.option("--output", "-o", type=click.Path(), help="File to write the report to")
+@click.option(
+    "--compare", "baseline", type=click.Path(exists=True), help="Report to compare with"
+)
+@click.option(
+    "--only",
+    multiple=True,
+    type=click.Choice(sorted(BENCHMARKS)),
+    help="Benchmark to run",
+)
+@click.option("--quick", is_flag=True, help="Take fewer samples")
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Relative change counted as a regression",
+)
+def main(output, baseline, only, quick, threshold):
+    report = run(names=only or None, quick=quick)
+    text = json.dumps(report, indent=4)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        click.echo(text)
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            rows = compare(json.load(f), report, threshold=threshold)
+        for metric, old, new, change, regressed in rows:
+            flag = " REGRESSION" if regressed else ""
+            click.echo(f"{metric}: {old} -> {new} ({change:+.1%}){flag}", err=True)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
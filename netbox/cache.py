@@ -0,0 +1,143 @@
+import collections
+import re
+import threading
+import time
+import typing as t
+
+CacheInfo = collections.namedtuple(
+    "CacheInfo", ["hits", "misses", "invalidations", "size", "maxsize"]
+)
+
+
+class CommandCache(object):
+    """LRU cache of command outputs with per-command TTL.
+
+    Only commands matched by ``ttl_rules`` are cached, a command matched by
+    ``invalidation_rules`` drops every cached entry its rule depends on.
+
+    Args:
+        ttl_rules: Sequence of (regex, seconds), the first matched rule wins.
+        invalidation_rules: Sequence of (regex, [regex, ...]), when a command
+            matches the first regex, cached entries match any of the others
+            are dropped.
+        maxsize: Maximum number of cached entries.
+    """
+
+    def __init__(
+        self,
+        ttl_rules: t.Sequence[t.Tuple[str, float]] = (),
+        invalidation_rules: t.Sequence[t.Tuple[str, t.Sequence[str]]] = (),
+        maxsize: int = 64,
+    ) -> None:
+        self.maxsize = maxsize
+        self._ttl_rules = [(re.compile(p), ttl) for p, ttl in ttl_rules]
+        self._invalidation_rules = [
+            (re.compile(p), [re.compile(d) for d in deps])
+            for p, deps in invalidation_rules
+        ]
+        self._entries: "collections.OrderedDict[str, t.Tuple[float, str]]" = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def ttl(self, command: str) -> float:
+        """Obtain TTL of the specified command.
+
+        Args:
+            command: Command string.
+
+        Returns:
+            Seconds the output stays fresh, 0 if it is not cacheable.
+        """
+        for pattern, ttl in self._ttl_rules:
+            if pattern.search(command):
+                return ttl
+        return 0.0
+
+    def get(self, command: str) -> t.Optional[str]:
+        """Obtain cached output of the specified command.
+
+        Args:
+            command: Command string.
+
+        Returns:
+            Cached output or None if it is missing, expired or not cacheable.
+        """
+        if self.ttl(command) <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(command)
+            if entry is not None:
+                expires, output = entry
+                if expires > time.monotonic():
+                    self._entries.move_to_end(command)
+                    self.hits += 1
+                    return output
+                del self._entries[command]
+            self.misses += 1
+            return None
+
+    def set(self, command: str, output: str) -> None:
+        """Cache output of the specified command if it is cacheable.
+
+        Args:
+            command: Command string.
+            output: Output of the command.
+        """
+        ttl = self.ttl(command)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[command] = (time.monotonic() + ttl, output)
+            self._entries.move_to_end(command)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, command: str) -> int:
+        """Drop cached entries which depend on the specified command.
+
+        Args:
+            command: Command string of a mutating command.
+
+        Returns:
+            Number of dropped entries.
+        """
+        deps = [
+            dep
+            for pattern, _deps in self._invalidation_rules
+            if pattern.search(command)
+            for dep in _deps
+        ]
+        if not deps:
+            return 0
+        with self._lock:
+            stale = [
+                key for key in self._entries if any(dep.search(key) for dep in deps)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> CacheInfo:
+        """Obtain statistics of the cache.
+
+        Returns:
+            CacheInfo(hits, misses, invalidations, size, maxsize)
+        """
+        with self._lock:
+            return CacheInfo(
+                self.hits,
+                self.misses,
+                self.invalidations,
+                len(self._entries),
+                self.maxsize,
+            )
@@ -0,0 +1,250 @@
+import typing as t
+
+from .exception import AnalysisException
+from .store import _bssid_to_bytes
+
+if t.TYPE_CHECKING:
+    import numpy as np
+
+    from .scan import ScanResult
+    from .store import ResultStore
+
+# channels recommended when none are given, they do not overlap each other
+CANDIDATES = {
+    "2.4": (1, 6, 11),
+    "5": (36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128)
+    + (132, 136, 140, 144, 149, 153, 157, 161, 165),
+}
+# MHz of a channel per band, signals of channels closer than this overlap
+CHANNEL_WIDTH = {"2.4": 22.0, "5": 20.0}
+# code of a missing rssi and channel in the history store
+MISSING_RSSI = -128
+MISSING_CHANNEL = 0xFFFF
+# columns of scans loaded into arrays and their types
+COLUMNS = {"ts": "int64", "rssi": "int16", "channel": "int32", "bssid": "uint64"}
+# numpy types of the codes of store fields
+_DTYPES = {"I": "<u4", "H": "<u2", "b": "i1", "B": "u1", "6s": "S6"}
+
+
+def _numpy() -> t.Any:
+    try:
+        import numpy
+    except ImportError:
+        raise AnalysisException(
+            message="Channel analysis needs numpy, install it with: pip install netbox[analyze]"
+        )
+    return numpy
+
+
+def frequency(channels: "np.ndarray") -> "np.ndarray":
+    """Center frequency in MHz of channels, 1 to 14 are 2.4 GHz and the rest 5 GHz."""
+    np = _numpy()
+    channels = np.asarray(channels, dtype=np.float64)
+    return np.where(
+        channels == 14,
+        2484.0,
+        np.where(channels <= 14, 2407.0 + 5 * channels, 5000.0 + 5 * channels),
+    )
+
+
+def load_scans(
+    store: "ResultStore", start: t.Optional[float] = None, end: t.Optional[float] = None
+) -> t.Dict[str, "np.ndarray"]:
+    """Load recorded scans within a time range into arrays.
+
+    Records are read from the mapped segments of the store as one array per
+    segment, nothing is decoded row by row.
+
+    Args:
+        store: History store the scans were recorded to.
+        start: Unix time from, inclusive.
+        end: Unix time until, exclusive.
+
+    Raises:
+        AnalysisException: numpy is not installed.
+
+    Returns:
+        Columns of all networks found. For example: {'ts': array([1671000000000, ...]), 'rssi': array([-52, ...]), 'channel': array([6, ...]), 'bssid': array([0x1cbfce001122, ...])}
+    """
+    np = _numpy()
+    columns: t.Dict[str, t.List[t.Any]] = {name: [] for name in COLUMNS}
+    for segment in store.segments("scan"):
+        if not len(segment):
+            continue
+        low = 0 if start is None else segment.bisect(int(start * 1000))
+        high = len(segment) if end is None else segment.bisect(int(end * 1000))
+        if low >= high:
+            continue
+        fields = segment.schema["fields"]
+        dtype = np.dtype(
+            {
+                "names": [field["name"] for field in fields],
+                "formats": [_DTYPES[field["code"]] for field in fields],
+            }
+        )
+        records = np.frombuffer(segment.buffer(low, high), dtype=dtype)
+        # columns are copied, the mapping is released when the store closes
+        columns["ts"].append(records["ts"].astype(COLUMNS["ts"]) + segment.base)
+        columns["rssi"].append(records["rssi"].astype(COLUMNS["rssi"]))
+        columns["channel"].append(records["channel"].astype(COLUMNS["channel"]))
+        columns["bssid"].append(_bssid_keys(np, records["bssid"]))
+        del records
+    return {
+        name: np.concatenate(parts) if parts else np.zeros(0, dtype=COLUMNS[name])
+        for name, parts in columns.items()
+    }
+
+
+def _bssid_keys(np: t.Any, bssids: "np.ndarray") -> "np.ndarray":
+    octets = np.ascontiguousarray(bssids).view(np.uint8).reshape(-1, 6)
+    shifts = np.arange(40, -8, -8, dtype=np.uint64)
+    return (octets.astype(np.uint64) << shifts).sum(axis=1)
+
+
+def scan_arrays(results: t.Iterable["ScanResult"]) -> t.Dict[str, "np.ndarray"]:
+    """Convert scans such as ``Netbox.scan()`` to the columns of ``load_scans``."""
+    np = _numpy()
+    rows = [
+        (
+            int(result.timestamp * 1000),
+            MISSING_RSSI if network.rssi is None else network.rssi,
+            network.primary_channel,
+            int.from_bytes(_bssid_to_bytes(network.bssid), "big"),
+        )
+        for result in results
+        for network in result
+    ]
+    ts, rssi, channel, bssid = zip(*rows) if rows else ((), (), (), ())
+    return {
+        name: np.array(values, dtype=COLUMNS[name])
+        for name, values in zip(COLUMNS, (ts, rssi, channel, bssid))
+    }
+
+
+def merge_scans(*scans: t.Mapping[str, "np.ndarray"]) -> t.Dict[str, "np.ndarray"]:
+    """Concatenate columns of several ``load_scans`` or ``scan_arrays``."""
+    np = _numpy()
+    return {
+        name: np.concatenate([np.asarray(columns[name], dtype) for columns in scans])
+        for name, dtype in COLUMNS.items()
+    }
+
+
+def analyze_channels(
+    scans: t.Mapping[str, "np.ndarray"],
+    candidates: t.Optional[t.Iterable[int]] = None,
+    top: int = 3,
+) -> t.Dict[str, t.Any]:
+    """Score channels by how busy they were over many scans.
+
+    Each scan is a snapshot, rows of one snapshot share their timestamp. The
+    interference of a channel is the mean power per snapshot received from
+    networks on it and on channels overlapping it, weighted by how much of
+    their ``CHANNEL_WIDTH`` overlaps, so a network on 2.4 GHz channel 3, 10
+    MHz away, adds 12/22 or about 55% of its power to channel 1. Channels
+    with the least interference and then the fewest networks are
+    recommended per band.
+
+    Args:
+        scans: Columns of ``load_scans`` or ``scan_arrays``.
+        candidates: Channels to recommend from, defaults to CANDIDATES.
+        top: Number of channels recommended per band.
+
+    Raises:
+        AnalysisException: numpy is not installed or there are no scans.
+
+    Returns:
+        Report of channels, rssi and interference in dBm. For example: {'rows': 1200000, 'snapshots': 40000, 'channels': [{'channel': 1, 'band': '2.4', 'networks': 12, 'occupancy': 4.2, 'rssi_avg': -71.3, 'rssi_max': -48, 'interference': -55.1}, ...], 'recommended': {'2.4': [11, 1, 6], '5': [149, 153, 157]}}
+    """
+    np = _numpy()
+    channel = np.asarray(scans["channel"])
+    valid = (channel > 0) & (channel != MISSING_CHANNEL)
+    channel = channel[valid]
+    ts = np.asarray(scans["ts"])[valid]
+    rssi = np.asarray(scans["rssi"])[valid].astype(np.float64)
+    bssid = np.asarray(scans["bssid"], dtype=np.uint64)[valid]
+    if not channel.size:
+        raise AnalysisException(message="There are no scan results to analyze.")
+
+    # scans of the store are in time order, no need to sort them
+    if np.all(ts[1:] >= ts[:-1]):
+        snapshots = int(np.count_nonzero(ts[1:] != ts[:-1])) + 1
+    else:
+        snapshots = np.unique(ts).size
+    if candidates is None:
+        wanted = np.array([c for band in CANDIDATES.values() for c in band])
+    else:
+        wanted = np.array(sorted(set(candidates)), dtype=np.int64)
+    # channel numbers are small, sums per channel are bins indexed by them
+    present = rssi != MISSING_RSSI
+    power = np.where(present, 10.0 ** (rssi / 10.0), 0.0)
+    rows = np.bincount(channel)
+    observed = np.flatnonzero(rows)
+    rows = rows[observed]
+    heard = np.bincount(channel, weights=present)[observed]
+    rssi_sum = np.bincount(channel, weights=np.where(present, rssi, 0.0))[observed]
+    channel_power = np.bincount(channel, weights=power)[observed]
+    rssi_max = np.full(observed[-1] + 1, -np.inf)
+    np.maximum.at(rssi_max, channel[present], rssi[present])
+    rssi_max = rssi_max[observed]
+    # networks are distinct bssids, a key holds the channel above the bssid
+    keys = np.unique((channel.astype(np.uint64) << np.uint64(48)) | bssid)
+    networks = np.bincount((keys >> np.uint64(48)).astype(np.int64))[observed]
+
+    # every channel either observed or a candidate is reported
+    channels = np.union1d(observed, wanted)
+    index = np.minimum(np.searchsorted(observed, channels), observed.size - 1)
+    seen = observed[index] == channels
+
+    def per_channel(values: t.Any, default: float) -> t.Any:
+        return np.where(seen, values[index], default)
+
+    bands = np.where(channels <= 14, "2.4", "5")
+    width = np.where(bands == "2.4", CHANNEL_WIDTH["2.4"], CHANNEL_WIDTH["5"])
+    distance = np.abs(frequency(channels)[:, None] - frequency(observed)[None, :])
+    overlap = np.clip(1.0 - distance / width[:, None], 0.0, 1.0)
+    interference = overlap @ channel_power / snapshots
+    occupancy = per_channel(rows, 0) / snapshots
+    with np.errstate(divide="ignore", invalid="ignore"):
+        interference_dbm = 10 * np.log10(interference)
+        rssi_avg = per_channel(rssi_sum / heard, np.nan)
+
+    recommended = {}
+    is_candidate = np.isin(channels, wanted)
+    for band in CANDIDATES:
+        choices = np.flatnonzero(is_candidate & (bands == band))
+        if choices.size:
+            order = np.lexsort((occupancy[choices], interference[choices]))
+            recommended[band] = channels[choices[order[:top]]].tolist()
+
+    def finite(value: float) -> t.Optional[float]:
+        return round(value, 1) if np.isfinite(value) else None
+
+    report = [
+        {
+            "channel": number,
+            "band": band,
+            "networks": count,
+            "occupancy": round(share, 3),
+            "rssi_avg": finite(average),
+            "rssi_max": int(strongest) if np.isfinite(strongest) else None,
+            "interference": finite(dbm),
+        }
+        for number, band, count, share, average, strongest, dbm in zip(
+            channels.tolist(),
+            bands.tolist(),
+            per_channel(networks, 0).tolist(),
+            occupancy.tolist(),
+            rssi_avg.tolist(),
+            per_channel(rssi_max, -np.inf).tolist(),
+            interference_dbm.tolist(),
+        )
+    ]
+    return {
+        "rows": int(channel.size),
+        "snapshots": int(snapshots),
+        "start": int(ts.min()) / 1000,
+        "end": int(ts.max()) / 1000,
+        "channels": report,
+        "recommended": recommended,
+    }
@@ -0,0 +1,253 @@
+import contextlib
+import time
+import typing as t
+
+from . import logger, metrics
+from .constant import WiFiState
+from .ping import PingResult
+
+if t.TYPE_CHECKING:
+    from .scan import ScanResult
+
+    class ConnectAdapter(t.Protocol):
+        """Operations of a wifi adapter the connect phases use."""
+
+        def is_on_or_off(self) -> WiFiState: ...
+
+        def turn_on(self) -> bool: ...
+
+        def connect(
+            self, ssid: str, password: str, timeout: t.Optional[float] = None
+        ) -> WiFiState: ...
+
+        def scan(self, max_age: t.Optional[float] = None) -> ScanResult: ...
+
+        def get_ip_address(self) -> t.Optional[str]: ...
+
+
+# host pinged after connected, unless another one is given
+DEFAULT_TARGET = "jd.com"
+# seconds a whole connect may take, from power-on to reachability
+DEFAULT_TIMEOUT = 30.0
+PHASES = ("power_on", "scan", "associate", "ip_ready", "reachability")
+
+# an operation of the connect phases, its name and arguments
+Step = t.Tuple[str, t.Tuple[t.Any, ...]]
+
+
+def backoff(
+    initial: float = 0.05, factor: float = 2.0, maximum: float = 1.0
+) -> t.Iterator[float]:
+    """Generate exponentially growing delays.
+
+    Args:
+        initial: First delay in seconds.
+        factor: Growth of each next delay.
+        maximum: Upper bound of a delay.
+
+    Yields:
+        Delay in seconds. For example: 0.05, 0.1, 0.2, 0.4, 0.8, 1.0, 1.0, ...
+    """
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def wait_until(
+    predicate: t.Callable[[], t.Any],
+    timeout: float,
+    initial: float = 0.05,
+    maximum: float = 0.5,
+) -> t.Any:
+    """Poll a condition with backoff until it holds or the deadline passes.
+
+    A state which changes quickly is noticed within ``initial`` seconds, a
+    slow one is not polled more often than every ``maximum`` seconds.
+
+    Args:
+        predicate: Condition to poll, a truthy return value stops it.
+        timeout: Seconds to wait at most.
+        initial: First delay between two polls.
+        maximum: Upper bound of delay between two polls.
+
+    Returns:
+        Last return value of predicate, falsy if timeout.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff(initial=initial, maximum=maximum):
+        value = predicate()
+        remaining = deadline - time.monotonic()
+        if value or remaining <= 0:
+            return value
+        time.sleep(min(delay, remaining))
+
+
+class PhaseTimer(object):
+    """Measure how long each named phase of an operation takes."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.phases: t.Dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> t.Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+            metrics.observe(f"connect.{name}", self.phases[name])
+
+    def to_dict(self) -> t.Dict[str, t.Optional[float]]:
+        """Obtain phase latencies in milliseconds, a skipped phase is None.
+
+        Returns:
+            Dict of latencies. For example: {'power_on': None, 'scan': 1.2, ..., 'total': 312.5}
+        """
+        info: t.Dict[str, t.Optional[float]] = {
+            name: round(self.phases[name] * 1000, 3) if name in self.phases else None
+            for name in PHASES
+        }
+        info["total"] = round((time.perf_counter() - self.start) * 1000, 3)
+        return info
+
+
+class ConnectPhases(object):
+    """Phases of a connect, shared by the blocking and the asyncio pipeline.
+
+    Phases yield the operations they need as steps and get their results
+    back, so the same phases run over a blocking adapter and an asyncio one.
+    Steps are the adapter operations ``is_on_or_off``, ``turn_on``, ``scan``
+    and ``connect``, ``sleep``, ``ip_ready`` which waits for an IP address
+    and ``reach``.
+
+    Args:
+        target: Host to check reachability with.
+        timeout: Seconds the whole connect may take.
+    """
+
+    def __init__(
+        self, target: str = DEFAULT_TARGET, timeout: float = DEFAULT_TIMEOUT
+    ) -> None:
+        self.target = target
+        self.timeout = timeout
+
+    def phases(
+        self, ssid: str, password: str, retry: int, timer: PhaseTimer
+    ) -> t.Generator[Step, t.Any, t.Tuple[t.Optional[WiFiState], PingResult]]:
+        """Generate the steps of all phases.
+
+        Args:
+            ssid: The ssid for a special wifi network.
+            password: The password for a special wifi network.
+            retry: Number of wifi scan retries.
+            timer: Timer of the phases.
+
+        Returns:
+            Tuple of (state, reachability result), state is None if the
+            interface can not be turned on or the ssid is not found.
+        """
+        deadline = time.monotonic() + self.timeout
+
+        def remaining() -> float:
+            return max(0.0, deadline - time.monotonic())
+
+        if (yield "is_on_or_off", ()) == WiFiState.OFF:
+            with timer.phase("power_on"):
+                if not (yield "turn_on", ()):
+                    return None, None
+
+        with timer.phase("scan"):
+            delays = backoff(initial=0.25, maximum=2.0)
+            for _retry in range(1, retry + 1):
+                # the first scan may be a fresh one reused, retries always rescan
+                rets = yield "scan", (None if _retry == 1 else 0,)
+                if ssid in rets:
+                    logger.info(
+                        msg=f"Scanning {_retry} times, SSID: {ssid} find already."
+                    )
+                    break
+                logger.info(msg=f"Scanning {_retry} times, SSID: {ssid} not found.")
+                if _retry == retry or remaining() <= 0:
+                    return None, None
+                yield "sleep", (min(next(delays), remaining()),)
+
+        with timer.phase("associate"):
+            state = yield "connect", (ssid, password, remaining())
+        if state != WiFiState.CONNECTED:
+            return state, None
+
+        with timer.phase("ip_ready"):
+            address = yield "ip_ready", (remaining(),)
+        if not address:
+            logger.info(msg=f"SSID: {ssid} got no IP address in time.")
+            return state, None
+        logger.debug(msg=f"SSID: {ssid} got IP address {address}.")
+
+        with timer.phase("reachability"):
+            # a reply takes 4 seconds at most, as ping3 waits by default
+            ret = yield "reach", (self.target, min(max(remaining(), 0.5), 4.0))
+        return state, ret
+
+
+class ConnectPipeline(ConnectPhases):
+    """Connect a wifi network and wait for each step to actually happen.
+
+    Every phase polls or waits for its state with backoff instead of a fixed
+    sleep, all of them share one deadline.
+
+    Args:
+        adapter: Wifi adapter.
+        reach: Called with (host, timeout) to check reachability after connected.
+        target: Host to check reachability with.
+        timeout: Seconds the whole connect may take.
+    """
+
+    def __init__(
+        self,
+        adapter: "ConnectAdapter",
+        reach: t.Callable[[str, float], PingResult],
+        target: str = DEFAULT_TARGET,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> None:
+        super().__init__(target=target, timeout=timeout)
+        self.adapter = adapter
+        self.reach = reach
+
+    def run(
+        self, ssid: str, password: str, retry: int = 5
+    ) -> t.Tuple[t.Optional[WiFiState], PingResult, PhaseTimer]:
+        """Run all phases.
+
+        Args:
+            ssid: The ssid for a special wifi network.
+            password: The password for a special wifi network.
+            retry: Number of wifi scan retries.
+
+        Returns:
+            Tuple of (state, reachability result, timer), state is None if the
+            interface can not be turned on or the ssid is not found.
+        """
+        adapter = self.adapter
+        operations: t.Dict[str, t.Callable[..., t.Any]] = {
+            "is_on_or_off": adapter.is_on_or_off,
+            "turn_on": adapter.turn_on,
+            "scan": adapter.scan,
+            "connect": adapter.connect,
+            "sleep": time.sleep,
+            "ip_ready": lambda timeout: wait_until(
+                adapter.get_ip_address, timeout=timeout
+            ),
+            "reach": self.reach,
+        }
+        timer = PhaseTimer()
+        phases = self.phases(ssid, password, retry, timer)
+        value = None
+        while True:
+            try:
+                name, args = phases.send(value)
+            except StopIteration as stop:
+                state, ret = stop.value
+                return state, ret, timer
+            value = operations[name](*args)
@@ -3,23 +3,166 @@ import logging
 import time
 import typing as t
 
-import ping3  # type:ignore
-
-from . import logger
+from . import logger, metrics
+from .connect import DEFAULT_TARGET, DEFAULT_TIMEOUT, ConnectPipeline
 from .constant import WiFiState
+from .discovery import Discovery
+from .exception import NetboxException, PingException
 from .helper import create_adapter, get_current_os_info
-from .wifi import LinuxAdapter, MacAdapter, WifiAdapter, WindowsAdapter
+from .monitor import sample, ticks, with_stats
+from .ping import PingEngine, PingResult
+from .resolver import get_resolver
+from .stats import LatencyStats
+from .tcp import TcpEngine
+from .trace import Trace, TraceEngine
 
+if t.TYPE_CHECKING:
+    from .scan import ScanResult
+    from .wifi import WifiAdapter
+
+
+def format_wifi_info(ret: t.Mapping[str, str]) -> str:
+    """Format current wifi information of an adapter.
+
+    Args:
+        ret: Output of adapter ``get_current_network``.
+
+    Returns:
+        JSON string of current wifi information.
+    """
+    info = {
+        "code": 0,
+        "message": "",
+        "data": {
+            "ssid": ret.get("SSID", ""),
+            "rssi": ret.get("agrCtlRSSI", ""),
+            "noise": ret.get("agrCtlNoise", ""),
+            "state": ret.get("state", ""),
+            "mode": ret.get("op mode", ""),
+            "tx_rate": ret.get("lastTxRate", ""),
+            "max_rate": ret.get("maxRate", ""),
+            "auth": ret.get("802.11 auth", ""),
+            "security": ret.get("link auth", ""),
+            "mcs": ret.get("MCS", ""),
+            "guard_interval": ret.get("guardInterval", ""),
+            "channel": ret.get("channel", ""),
+            "nss": ret.get("NSS", ""),
+        },
+    }
+    return json.dumps(info, indent=4)
 
-class Netbox(object):
-    """A class that contains commonly used network operation."""
 
-    def __init__(self) -> None:
-        self.ping = ping3.ping
-        self._wifi_adapter: t.Optional[WifiAdapter] = create_adapter(
-            name=get_current_os_info()
+def format_connect_result(
+    ssid: str,
+    state: t.Optional[WiFiState],
+    ret: t.Any = None,
+    domain: str = "",
+    phases: t.Optional[t.Mapping[str, t.Optional[float]]] = None,
+) -> str:
+    """Format result of connecting a wifi network.
+
+    Args:
+        ssid: The ssid for a special wifi network.
+        state: CONNECTED or CONNECTED_FAILED.
+        ret: Ping result of ``domain`` after connected.
+        domain: Host pinged after connected.
+        phases: Milliseconds each phase of connect took.
+
+    Returns:
+        JSON string of the result.
+    """
+    extra = {} if phases is None else {"phases": dict(phases)}
+    if state != WiFiState.CONNECTED:
+        logger.info(msg="Password or ssid verification failed.")
+        return json.dumps(
+            {
+                "code": 1,
+                "message": "Password or ssid verification failed.",
+                "data": {"state": WiFiState.CONNECTED_FAILED.value, **extra},
+            },
+            indent=4,
+        )
+    if ret:
+        logger.info(
+            msg=f"SSID: {ssid} connected successfully, ping cost is: {ret:.2f}s"
         )
+        return json.dumps(
+            {
+                "code": 0,
+                "message": "Connected successfully.",
+                "data": {
+                    "state": WiFiState.CONNECTED.value,
+                    "ssid": ssid,
+                    "ping_time_cost": f"{ret:.2f}s",
+                    "domain": domain,
+                    **extra,
+                },
+            },
+            indent=4,
+        )
+    logger.info(msg="Network is unreachable, please check it first!")
+    return json.dumps(
+        {
+            "code": 1000,
+            "message": "Network is unreachable, please check it first!",
+            "data": {
+                "state": WiFiState.CONNECTED.value,
+                "ssid": ssid,
+                "ping_time_cost": ret,
+                "domain": domain,
+                **extra,
+            },
+        },
+        indent=4,
+    )
+
+
+class Netbox(object):
+    """A class that contains commonly used network operation.
+
+    The wifi adapter is created on first use, so probes which do not touch
+    wifi never detect the operating system or import the adapters.
+    """
 
+    def __init__(self, discovery: t.Optional[Discovery] = None) -> None:
+        self._ping: t.Optional[t.Callable[..., t.Any]] = None
+        self._adapter: t.Optional["WifiAdapter"] = None
+        self._discovery = discovery
+
+    @property
+    def ping(self) -> t.Callable[..., t.Any]:
+        """``ping3.ping``, imported on first use."""
+        if self._ping is None:
+            import ping3  # type:ignore
+
+            self._ping = ping3.ping
+        return self._ping
+
+    @ping.setter
+    def ping(self, func: t.Callable[..., t.Any]) -> None:
+        self._ping = func
+
+    @property
+    def discovery(self) -> Discovery:
+        """Facts of the host kept across invocations."""
+        if self._discovery is None:
+            self._discovery = Discovery()
+        return self._discovery
+
+    @property
+    def _wifi_adapter(self) -> "WifiAdapter":
+        if self._adapter is None:
+            discovery = self.discovery
+            name = discovery.facts()["os"]
+            adapter = create_adapter(name=name, interface=discovery.interface)
+            if adapter is None:
+                raise NetboxException(message=f"Wifi is not supported on {name}.")
+            # a failing command may come from stale facts
+            adapter.on_command_failure = discovery.invalidate
+            self._adapter = adapter
+        return self._adapter
+
+    @metrics.timed("netbox.check_host_state")
     def check_host_state(
         self,
         host: str,
@@ -36,48 +179,298 @@ class Netbox(object):
         Returns:
             Time of ping successfully. For example: 0.07222890853881836
         """
+        # ping3 would resolve the name again on every call
+        addr = get_resolver().resolve(host)
+        if addr is None:
+            return False
         name = get_current_os_info()
-        if name == "Windows":
-            return self.ping(host=host, src_addr=src_addr)
+        with metrics.span("ping3"):
+            if name == "Windows":
+                return self.ping(host=addr, src_addr=src_addr)
+
+            elif name == "Linux":
+                return self.ping(host=addr, interface=interface)
+            else:
+                return self.ping(addr)
+
+    @metrics.timed("netbox.trace")
+    def trace(self, host: str, max_hops: int = 30, timeout: float = 2.0) -> Trace:
+        """Trace the path to a host, probes of all TTLs are sent at once.
+
+        Args:
+            host: IP address or domain.
+            max_hops: Largest TTL probed, defaults to 30.
+            timeout: Seconds to wait for silent hops, defaults to 2.0.
 
-        elif name == "Linux":
-            return self.ping(host=host, interface=interface)
-        else:
-            return self.ping(host)
+        Raises:
+            PingException: ICMP socket can not be opened.
+
+        Returns:
+            Trace of (host, address, hops, reached). For example: Trace(host='jd.com', address='111.13.149.108', hops=[Hop(ttl=1, address='192.168.1.1', rtt=0.0012), ...], reached=True)
+        """
+        return TraceEngine(max_hops=max_hops, timeout=timeout).trace(host)
+
+    def trace_many(
+        self,
+        hosts: t.Iterable[str],
+        max_hops: int = 30,
+        timeout: float = 2.0,
+        concurrency: int = 32,
+    ) -> t.Iterator[Trace]:
+        """Trace many hosts concurrently, yield traces as they finish.
+
+        Args:
+            hosts: IP addresses or domains.
+            max_hops: Largest TTL probed, defaults to 30.
+            timeout: Seconds to wait for silent hops, defaults to 2.0.
+            concurrency: Maximum number of traces in flight.
+
+        Raises:
+            PingException: ICMP socket can not be opened.
+
+        Yields:
+            Trace of each host.
+        """
+        engine = TraceEngine(
+            max_hops=max_hops, timeout=timeout, concurrency=concurrency
+        )
+        return engine.trace_many(hosts)
+
+    def sweep(
+        self,
+        hosts: t.Iterable[str],
+        timeout: float = 4.0,
+        concurrency: int = 256,
+    ) -> t.Iterator[t.Tuple[str, PingResult]]:
+        """Check many hosts concurrently, yield results as they arrive.
+
+        Args:
+            hosts: IP addresses or domains.
+            timeout: Seconds to wait for each echo reply, defaults to 4.0.
+            concurrency: Maximum number of outstanding echo requests.
+
+        Returns:
+            Iterator of (host, result). For example: ('127.0.0.1', 0.0001)
+        """
+        engine = PingEngine(timeout=timeout, concurrency=concurrency)
+        return engine.sweep(hosts)
+
+    @metrics.timed("netbox.check_hosts")
+    def check_hosts(
+        self,
+        hosts: t.Iterable[str],
+        timeout: float = 4.0,
+        concurrency: int = 256,
+    ) -> t.Dict[str, PingResult]:
+        """Check many hosts are alive or not over one shared ICMP socket.
+
+        Args:
+            hosts: IP addresses or domains.
+            timeout: Seconds to wait for each echo reply, defaults to 4.0.
+            concurrency: Maximum number of outstanding echo requests.
+
+        Returns:
+            Time of ping of each host, None if timeout and False if the host
+            can not be resolved. For example: {'127.0.0.1': 0.0001, '3.3.3.3': None}
+        """
+        engine = PingEngine(timeout=timeout, concurrency=concurrency)
+        return engine.check_hosts(hosts)
+
+    def tcp_sweep(
+        self,
+        targets: t.Iterable[str],
+        timeout: float = 2.0,
+        concurrency: int = 512,
+        port: int = 80,
+    ) -> t.Iterator[t.Tuple[str, PingResult, str]]:
+        """Check TCP handshakes of many targets, yield results as they finish.
+
+        It needs no privilege and passes where ICMP is filtered.
+
+        Args:
+            targets: host:port strings. For example: ['192.168.1.1:22', 'jd.com']
+            timeout: Seconds to wait for each handshake, defaults to 2.0.
+            concurrency: Maximum number of connects in flight.
+            port: Port of targets without one, defaults to 80.
+
+        Returns:
+            Iterator of (target, result, reason). For example: ('127.0.0.1:22', None, 'refused')
+        """
+        engine = TcpEngine(timeout=timeout, concurrency=concurrency, port=port)
+        return engine.sweep(targets)
+
+    @metrics.timed("netbox.check_tcp")
+    def check_tcp(
+        self,
+        targets: t.Iterable[str],
+        timeout: float = 2.0,
+        concurrency: int = 512,
+        port: int = 80,
+    ) -> t.Dict[str, PingResult]:
+        """Check many targets accept TCP connections or not.
+
+        Args:
+            targets: host:port strings. For example: ['192.168.1.1:22', 'jd.com']
+            timeout: Seconds to wait for each handshake, defaults to 2.0.
+            concurrency: Maximum number of connects in flight.
+            port: Port of targets without one, defaults to 80.
+
+        Returns:
+            Handshake time of each target, None if refused or timeout and
+            False if the host can not be resolved. For example: {'127.0.0.1:22': 0.0001, '10.0.0.1:80': None}
+        """
+        engine = TcpEngine(timeout=timeout, concurrency=concurrency, port=port)
+        return engine.check(targets)
+
+    @metrics.timed("netbox.resolve")
+    def resolve(self, names: t.Iterable[str]) -> t.Dict[str, t.Optional[str]]:
+        """Resolve names concurrently through the resolver shared by all probes.
+
+        Args:
+            names: IP addresses or domains.
+
+        Returns:
+            IPv4 address of each name, None if it can not be resolved. For example: {'jd.com': '111.13.149.108'}
+        """
+        return get_resolver().resolve_many(names)
+
+    def resolver_stats(self) -> t.Dict[str, t.Any]:
+        """Obtain hit rate and latency of the shared resolver.
+
+        Returns:
+            Statistics. For example: {'hits': 90, 'misses': 10, 'hit_rate': 0.9, 'p50': 1.2, ...}
+        """
+        return get_resolver().stats()
+
+    def ping_series(
+        self,
+        host: str,
+        count: t.Optional[int] = None,
+        interval: float = 1.0,
+        timeout: float = 4.0,
+        snapshot_interval: t.Optional[float] = None,
+        on_snapshot: t.Optional[t.Callable[[t.Dict[str, t.Any]], None]] = None,
+        stats: t.Optional[LatencyStats] = None,
+        on_result: t.Optional[t.Callable[[t.Optional[float]], None]] = None,
+    ) -> t.Dict[str, t.Any]:
+        """Ping a host periodically and summarize the series.
+
+        Memory does not grow with the number of probes, results are folded
+        into streaming statistics as they arrive.
+
+        Args:
+            host: IP address or domain.
+            count: Number of probes, defaults to infinite.
+            interval: Seconds between two probes, defaults to 1.0.
+            timeout: Seconds to wait for each reply, defaults to 4.0.
+            snapshot_interval: Seconds between two calls of ``on_snapshot``.
+            on_snapshot: Called with statistics so far while probing.
+            stats: Statistics to fold results into, the caller keeps what is
+                collected even if the series is interrupted.
+            on_result: Called with the round trip time in seconds of each
+                probe, None if it timed out.
+
+        Returns:
+            Statistics in milliseconds. For example: {'host': 'jd.com', 'sent': 100, 'received': 99, 'loss': 1.0, 'p50': 8.12, 'p99': 9.3, 'jitter': 0.2, ...}
+        """
+        stats = LatencyStats() if stats is None else stats
+        engine = PingEngine(timeout=timeout)
+        next_snapshot = time.monotonic() + (snapshot_interval or 0)
+        for _, rtt in engine.series(host, count=count, interval=interval):
+            stats.add(rtt)
+            if on_result is not None:
+                on_result(rtt)
+            if on_snapshot is not None and snapshot_interval:
+                now = time.monotonic()
+                if now >= next_snapshot:
+                    on_snapshot({"host": host, **stats.snapshot()})
+                    next_snapshot = now + snapshot_interval
+        return {"host": host, **stats.snapshot()}
+
+    @metrics.timed("netbox.measure_throughput")
+    def measure_throughput(
+        self,
+        host: str,
+        port: int = 5210,
+        streams: int = 4,
+        duration: float = 10.0,
+        interval: float = 1.0,
+        use_sendfile: bool = False,
+        on_interval: t.Optional[t.Callable[[t.Dict[str, float]], None]] = None,
+    ) -> t.Dict[str, t.Any]:
+        """Measure TCP throughput to a netbox speed server.
+
+        Args:
+            host: IP address or domain of the speed server.
+            port: Port of the speed server, defaults to 5210.
+            streams: Number of parallel TCP streams, defaults to 4.
+            duration: Seconds to send, defaults to 10.0.
+            interval: Seconds of each reported interval, defaults to 1.0.
+            use_sendfile: Send with ``socket.sendfile``, defaults to False.
+            on_interval: Called with each interval report as it finishes.
+
+        Returns:
+            Report of the test. For example: {'streams': 4, 'duration': 10.0, 'intervals': [...], 'gbps': 9.41, ...}
+        """
+        from .speed import measure_throughput
+
+        return measure_throughput(
+            host=host,
+            port=port,
+            streams=streams,
+            duration=duration,
+            interval=interval,
+            use_sendfile=use_sendfile,
+            on_interval=on_interval,
+        )
+
+    @metrics.timed("netbox.measure_udp_stream")
+    def measure_udp_stream(
+        self,
+        host: str,
+        port: int = 5211,
+        rate: float = 1000.0,
+        size: int = 200,
+        duration: float = 10.0,
+        batch: int = 64,
+    ) -> t.Dict[str, t.Any]:
+        """Measure loss, reordering and jitter of a paced UDP stream to a netbox udp-test server.
+
+        Args:
+            host: IP address or domain of the udp-test server.
+            port: Port of the udp-test server, defaults to 5211.
+            rate: Packets per second, defaults to 1000.0.
+            size: Bytes of each datagram, defaults to 200.
+            duration: Seconds to send, defaults to 10.0.
+            batch: Maximum datagrams sent in one call, defaults to 64.
+
+        Returns:
+            Report of the test, jitter in milliseconds. For example: {'sent': 10000, 'received': 9998, 'lost': 2, 'loss': 0.0002, 'reordered': 0, 'duplicates': 0, 'jitter': 0.041, ...}
+        """
+        from .udp import send_stream
+
+        return send_stream(
+            host=host,
+            port=port,
+            rate=rate,
+            size=size,
+            duration=duration,
+            batch=batch,
+        )
 
     @property
+    @metrics.timed("netbox.current_wifi_info")
     def current_wifi_info(self) -> str:
         """Obtain current connected wifi information.
 
         Returns:
             Connected wifi information. For example: {'SSID': 'TP-Link001', 'agrCtlRSSI': "-30"}
         """
-        info = {}
         ret = self._wifi_adapter.get_current_network()
-        info.update(
-            {
-                "code": 0,
-                "message": "",
-                "data": {
-                    "ssid": ret.get("SSID", ""),
-                    "rssi": ret.get("agrCtlRSSI", ""),
-                    "noise": ret.get("agrCtlNoise", ""),
-                    "state": ret.get("state", ""),
-                    "mode": ret.get("op mode", ""),
-                    "tx_rate": ret.get("lastTxRate", ""),
-                    "max_rate": ret.get("maxRate", ""),
-                    "auth": ret.get("802.11 auth", ""),
-                    "security": ret.get("link auth", ""),
-                    "mcs": ret.get("MCS", ""),
-                    "guard_interval": ret.get("guardInterval", ""),
-                    "channel": ret.get("channel", ""),
-                    "nss": ret.get("NSS", ""),
-                },
-            }
-        )
-        return json.dumps(info, indent=4)
+        return format_wifi_info(ret)
 
     @property
+    @metrics.timed("netbox.ssid")
     def ssid(self) -> t.Optional[str]:
         """Obtain ssid of current connected wifi.
 
@@ -88,6 +481,7 @@ class Netbox(object):
         return ssid
 
     @property
+    @metrics.timed("netbox.rssi")
     def rssi(self) -> t.Optional[str]:
         """Obtain the signal of currnet connected wifi.
 
@@ -98,39 +492,91 @@ class Netbox(object):
         # return json.dumps({"code": 0, "message": "", "data": {"ssid": ret}}, indent=4)
         return ret
 
-    def connect(self, ssid: str, password: str, retry: int = 5) -> None:
+    def monitor(
+        self,
+        interval: float = 1.0,
+        count: t.Optional[int] = None,
+        window: int = 120,
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Sample current wifi link continuously.
+
+        Memory is bounded by ``window`` no matter how long it runs.
+
+        Args:
+            interval: Seconds between two samples, defaults to 1.0.
+            count: Number of samples, defaults to infinite.
+            window: Number of samples the rolling statistics cover.
+
+        Returns:
+            Iterator of samples. For example: {'ts': 1671000000.0, 'ssid': 'TP-Link001', 'rssi': -45.0, ..., 'stats': {'rssi': {'min': -50.0, 'avg': -45.5, 'max': -41.0}, ...}}
+        """
+        samples = (
+            sample(self._wifi_adapter.get_current_network(refresh=True))
+            for _ in ticks(interval=interval, count=count)
+        )
+        return with_stats(samples, window=window)
+
+    @metrics.timed("netbox.connect")
+    def connect(
+        self,
+        ssid: str,
+        password: str,
+        retry: int = 5,
+        target: str = DEFAULT_TARGET,
+        timeout: float = DEFAULT_TIMEOUT,
+    ) -> str:
         """Connect a special wifi network.
 
+        The interface is turned on if needed, then it waits for association,
+        an IP address and a reply of ``target`` instead of sleeping a fixed time.
+
         Args:
             ssid: The ssid for a special wifi network.
             password: The password for a special wifi network.
             retry: Number of wifi scan retries.
+            target: Host pinged to check reachability, defaults to jd.com.
+            timeout: Seconds the whole connect may take, defaults to 30.
+
+        Returns:
+            JSON string of the result with milliseconds of each phase, empty if
+            the ssid is not found. For example: {'code': 0, ..., 'data': {'phases': {'power_on': None, 'scan': 2.1, 'associate': 280.4, ...}}}
         """
-        # Determine whether the current wifi interface is available
-        if self._wifi_adapter.is_on_or_off() == WiFiState.OFF:
-            # If the wifi interface is not available, start the wifi interface
-            if self._wifi_adapter.turn_on():
-                time.sleep(2)
-                return self._connect(ssid, password, retry=retry)
-        else:
-            logger.debug(
-                msg=f"Wlan interface {self._wifi_adapter.interface} is working normally."
-            )
-            return self._connect(ssid, password, retry=retry)
+        pipeline = ConnectPipeline(
+            adapter=self._wifi_adapter,
+            reach=self._reach,
+            target=target,
+            timeout=timeout,
+        )
+        state, ret, timer = pipeline.run(ssid, password, retry=retry)
+        if state is None:
+            return ""
+        return format_connect_result(ssid, state, ret, target, timer.to_dict())
 
+    @staticmethod
+    def _reach(host: str, timeout: float) -> PingResult:
+        try:
+            return PingEngine(timeout=timeout).check_hosts([host])[host]
+        except PingException as e:
+            logger.debug(msg=f"Reachability of {host} is unknown: {e}")
+            return None
+
+    @metrics.timed("netbox.disconnect")
     def disconnect(self) -> t.Optional[WiFiState]:
         """Disconnected current wifi network."""
         return self._wifi_adapter.disconnect()
 
+    @metrics.timed("netbox.turn_on_wifi")
     def turn_on_wifi(self) -> bool:
         """Enable wifi interface."""
         return self._wifi_adapter.turn_on()
 
+    @metrics.timed("netbox.turn_off_wifi")
     def turn_off_wifi(self) -> bool:
         """Disable wifi interface."""
         return self._wifi_adapter.turn_off()
 
     @property
+    @metrics.timed("netbox.wifi_state")
     def wifi_state(self):
         """Obtain current wifi state.
 
@@ -139,6 +585,7 @@ class Netbox(object):
         """
         return self._wifi_adapter.get_state()
 
+    @metrics.timed("netbox.wifi_scan")
     def wifi_scan(self) -> str:
         """Obtain surrounding wifi network information.
 
@@ -150,6 +597,35 @@ class Netbox(object):
             {"code": 0, "message": "Scanning successfully.", "data": ret}, indent=4
         )
 
+    def cache_info(self):
+        """Obtain hit and miss statistics of the adapter command cache.
+
+        Returns:
+            CacheInfo. For example: CacheInfo(hits=4, misses=3, invalidations=1, size=2, maxsize=64)
+        """
+        return self._wifi_adapter.cache_info()
+
+    @metrics.timed("netbox.scan")
+    def scan(self, max_age: t.Optional[float] = None) -> "ScanResult":
+        """Obtain surrounding wifi networks, reuse the last scan if fresh enough.
+
+        Args:
+            max_age: Maximum age in seconds of a reused scan, 0 forces a rescan.
+
+        Returns:
+            ScanResult indexed by ssid, bssid and channel.
+        """
+        return self._wifi_adapter.scan(max_age=max_age)
+
+    def command_stats(self):
+        """Obtain spawn latency statistics of adapter commands per executable.
+
+        Returns:
+            Dict of statistics. For example: {'networksetup': {'count': 3, 'failed': 0, 'spawn_avg': 0.002, ...}}
+        """
+        return self._wifi_adapter.command_stats()
+
+    @metrics.timed("netbox.get_all_ssid")
     def get_all_ssid(self):
         """Obtain a collection of available ssid.
 
@@ -157,71 +633,3 @@ class Netbox(object):
             Collection of ssid. For example: ['test01', 'ChinaNet-test001', 'TP-Link1111']
         """
         return self._wifi_adapter.get_all_ssid()
-
-    def _connect(self, ssid: str, password: str, retry: int) -> str:
-        """Connect a special wifi network.
-
-        Args:
-            ssid: The ssid for a special wifi network.
-            password: The password for a special wifi network.
-            retry: Number of wifi scan retries
-        """
-        _retry = 1
-        while _retry <= retry:
-            rets = self._wifi_adapter.get_all_ssid()
-            if ssid in rets:
-                logger.info(msg=f"Scanning {_retry} times, SSID: {ssid} find already.")
-                break
-            else:
-                logger.info(msg=f"Scanning {_retry} times, SSID: {ssid} not found.")
-            _retry = _retry + 1
-        else:
-            return ""
-        if (
-            self._wifi_adapter.connect(ssid=ssid, password=password)
-            == WiFiState.CONNECTED
-        ):
-            time.sleep(2)
-            ret = self.check_host_state("jd.com")
-            if ret:
-                logger.info(
-                    msg=f"SSID: {ssid} connected successfully, ping cost is: {ret:.2f}s"
-                )
-                return json.dumps(
-                    {
-                        "code": 0,
-                        "message": "Connected successfully.",
-                        "data": {
-                            "state": WiFiState.CONNECTED.value,
-                            "ssid": ssid,
-                            "ping_time_cost": f"{ret:.2f}s",
-                            "domain": "jd.com",
-                        },
-                    },
-                    indent=4,
-                )
-            else:
-                logger.info(msg="Network is unreachable, please check it first!")
-                return json.dumps(
-                    {
-                        "code": 1000,
-                        "message": "Network is unreachable, please check it first!",
-                        "data": {
-                            "state": WiFiState.CONNECTED.value,
-                            "ssid": ssid,
-                            "ping_time_cost": ret,
-                            "domain": "jd.com",
-                        },
-                    },
-                    indent=4,
-                )
-        else:
-            logger.info(msg="Password or ssid verification failed.")
-            return json.dumps(
-                {
-                    "code": 1,
-                    "message": "Password or ssid verification failed.",
-                    "data": {"state": WiFiState.CONNECTED_FAILED.value},
-                },
-                indent=4,
-            )
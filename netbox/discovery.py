@@ -0,0 +1,190 @@
+import json
+import os
+import platform
+import sys
+import time
+import typing as t
+
+from . import logger
+from .exception import NetboxException
+from .helper import get_user_cache_dir
+from .version import __version__
+
+# bump when facts change their layout, older files are discovered again
+DISCOVERY_VERSION = 2
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+
+Facts = t.Dict[str, t.Any]
+
+
+def get_boot_id() -> str:
+    """Obtain an identifier which changes on every boot.
+
+    Linux has a random boot id, the others use the boot time to ten seconds
+    from a clock which keeps counting while sleeping.
+
+    Returns:
+        Boot identifier. For example: 5e2f7c1a-...
+    """
+    try:
+        with open(BOOT_ID_PATH, "r", encoding="ascii") as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    clock = getattr(time, "CLOCK_MONOTONIC", None)
+    if sys.platform == "darwin" and clock is not None:
+        # unlike time.monotonic, it includes sleep on MacOS
+        uptime = time.clock_gettime(clock)
+    else:
+        uptime = time.monotonic()
+    return str(int(round(time.time() - uptime, -1)))
+
+
+def discover_interfaces(name: str) -> t.List[str]:
+    """Find wifi interfaces.
+
+    Args:
+        name: Operating system name. For example: Darwin
+
+    Returns:
+        Names of wifi interfaces, the first one is used. For example: ['en0']
+    """
+    if name == "Linux":
+        from .wifi import LinuxAdapter
+
+        try:
+            names = sorted(
+                entry
+                for entry in os.listdir(LinuxAdapter.CTRL_DIR)
+                if not entry.startswith("p2p-")
+            )
+        except OSError:
+            names = []
+        if not names:
+            try:
+                names = sorted(
+                    entry
+                    for entry in os.listdir("/sys/class/net")
+                    if os.path.isdir(os.path.join("/sys/class/net", entry, "wireless"))
+                )
+            except OSError:
+                names = []
+        return names
+    if name == "Darwin":
+        from .wifi import MacAdapter
+
+        try:
+            output = MacAdapter().execute_command(
+                ["networksetup", "-listallhardwareports"]
+            )
+        except (NetboxException, OSError) as e:
+            logger.debug(msg=f"Discover wifi interface failed: {e}")
+            return []
+        interface = MacAdapter.parse_hardware_ports(output)
+        return [interface] if interface else []
+    return []
+
+
+class Discovery(object):
+    """Facts about the host which every invocation would discover again.
+
+    Operating system, adapter class, wifi interfaces and tool paths are kept
+    in a versioned JSON file. The file is trusted while it is younger than
+    ``max_age``, written by this version of netbox and since the last boot,
+    checking it costs a stat and a small read instead of subprocesses.
+
+    Args:
+        path: Path of the file, defaults to discovery.json in the user cache directory.
+        max_age: Seconds the file is trusted.
+    """
+
+    def __init__(self, path: t.Optional[str] = None, max_age: float = 86400.0) -> None:
+        self.path = path or os.path.join(get_user_cache_dir(), "discovery.json")
+        self.max_age = max_age
+        self._facts: t.Optional[Facts] = None
+
+    def load(self) -> t.Optional[Facts]:
+        """Read facts of the file.
+
+        Returns:
+            Facts or None if the file is missing, stale or of another boot.
+        """
+        try:
+            if time.time() - os.stat(self.path).st_mtime > self.max_age:
+                return None
+            with open(self.path, "r", encoding="utf-8") as f:
+                facts = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (
+            not isinstance(facts, dict)
+            or facts.get("version") != DISCOVERY_VERSION
+            or facts.get("netbox") != __version__
+            or facts.get("platform") != sys.platform
+            or facts.get("boot_id") != get_boot_id()
+        ):
+            return None
+        return facts
+
+    def discover(self) -> Facts:
+        """Discover facts of the host.
+
+        Returns:
+            Facts. For example: {'os': 'Darwin', 'interfaces': ['en0'], ...}
+        """
+        name = platform.system()
+        return {
+            "version": DISCOVERY_VERSION,
+            "netbox": __version__,
+            "platform": sys.platform,
+            "boot_id": get_boot_id(),
+            "discovered_at": round(time.time(), 3),
+            "os": name,
+            "interfaces": discover_interfaces(name),
+        }
+
+    def save(self, facts: Facts) -> None:
+        """Write facts atomically, a failure only costs discovering again."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(facts, f, indent=4)
+            os.replace(temp, self.path)
+        except OSError as e:
+            logger.debug(msg=f"Save discovery to {self.path} failed: {e}")
+
+    def facts(self, refresh: bool = False) -> Facts:
+        """Obtain facts, from the file if it is valid.
+
+        Args:
+            refresh: Discover again and rewrite the file.
+
+        Returns:
+            Facts of the host.
+        """
+        if self._facts is None or refresh:
+            facts = None if refresh else self.load()
+            if facts is None:
+                facts = self.discover()
+                self.save(facts)
+            self._facts = facts
+        return self._facts
+
+    @property
+    def interface(self) -> t.Optional[str]:
+        """First wifi interface, None if none was found."""
+        interfaces = self.facts()["interfaces"]
+        return interfaces[0] if interfaces else None
+
+    def invalidate(self, *args: t.Any) -> None:
+        """Drop the file, so the next invocation discovers again.
+
+        It is the command failure callback of adapters, a wrong interface
+        or a moved tool is then corrected without waiting for ``max_age``.
+        """
+        self._facts = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
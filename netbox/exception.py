@@ -15,3 +15,23 @@ class AuthenticationFailed(NetboxException):
 
 class CommandException(NetboxException):
     """Raised if a command execute failed."""
+
+
+class PingException(NetboxException):
+    """Raised if a ping socket can not be created."""
+
+
+class SpeedException(NetboxException):
+    """Raised if a throughput test can not be finished."""
+
+
+class AgentException(NetboxException):
+    """Raised if an agent is unreachable or its method failed."""
+
+
+class PlanException(NetboxException):
+    """Raised if a plan of checks is invalid."""
+
+
+class AnalysisException(NetboxException):
+    """Raised if recorded results can not be analyzed."""
@@ -1,11 +1,16 @@
+import functools
+import os
 import platform
+import sys
 import typing as t
 
-from .wifi import LinuxAdapter, MacAdapter, WifiAdapter, WindowsAdapter
+if t.TYPE_CHECKING:
+    from .wifi import WifiAdapter
 
 
+@functools.lru_cache(maxsize=None)
 def get_current_os_info() -> str:
-    """Obtain operation system infromation.
+    """Obtain operation system infromation, it is looked up once per process.
 
     Returns:
         String of operaton system name. For example: Linux or Windows
@@ -13,17 +18,48 @@ def get_current_os_info() -> str:
     return platform.system()
 
 
-def create_adapter(name: str) -> t.Optional[WifiAdapter]:
-    """Create and adapter based on operating system information.
+def get_user_cache_dir() -> str:
+    """Obtain cache directory of netbox for current user.
+
+    NETBOX_CACHE_DIR overrides it, otherwise it follows the platform
+    convention: ~/Library/Caches/netbox on MacOS, %LOCALAPPDATA%\\netbox on
+    Windows and $XDG_CACHE_HOME/netbox (~/.cache/netbox) on the others.
 
     Returns:
-        An object of adapter.
+        Path of cache directory, it may not exist yet.
     """
-    adapter: t.Optional[WifiAdapter] = None
-    if name == "Windows":
-        adapter = WindowsAdapter()
-    elif name == "Linux":
-        adapter = LinuxAdapter()
+    path = os.environ.get("NETBOX_CACHE_DIR")
+    if path:
+        return path
+    if sys.platform == "darwin":
+        base = os.path.join(os.path.expanduser("~"), "Library", "Caches")
+    elif sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
     else:
-        adapter = MacAdapter()
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+            os.path.expanduser("~"), ".cache"
+        )
+    return os.path.join(base, "netbox")
+
+
+def create_adapter(
+    name: str, interface: t.Optional[str] = None
+) -> t.Optional["WifiAdapter"]:
+    """Create and adapter based on operating system information.
+
+    Args:
+        name: Operating system name. For example: Darwin
+        interface: Wifi interface name, the adapter finds it if not given.
+
+    Returns:
+        An object of adapter or None if wifi is not supported on the system.
+    """
+    # adapters are imported here, only commands which need them pay for it
+    from .wifi import LinuxAdapter, MacAdapter
+
+    adapter: t.Optional["WifiAdapter"] = None
+    if name == "Linux":
+        adapter = LinuxAdapter(interface=interface)
+    elif name == "Darwin":
+        adapter = MacAdapter(interface=interface)
     return adapter
@@ -0,0 +1,145 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import typing as t
+
+from .helper import get_user_cache_dir
+
+# directory of log files, NETBOX_LOG_DIR overrides it
+LOG_DIR = os.environ.get("NETBOX_LOG_DIR") or os.path.join(get_user_cache_dir(), "logs")
+LOG_FILE = "netbox.log"
+
+# detailed format, the caller lookup for funcName and lineno costs every record
+DETAILED_FORMAT = "%(asctime)s - %(filename)s - func:%(funcName)s - %(lineno)d - [%(levelname)s] %(message)s"
+# cheap format, only uses fields every record has anyway
+FAST_FORMAT = "%(asctime)s - %(name)s - [%(levelname)s] %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_lock = threading.Lock()
+_queue_handler: t.Optional[logging.handlers.QueueHandler] = None
+_listener: t.Optional[logging.handlers.QueueListener] = None
+_fast = True
+
+
+class _Logger(logging.Logger):
+    """Logger of netbox skips the caller lookup when the cheap format is used."""
+
+    def findCaller(self, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        if _fast:
+            return "(unknown file)", 0, "(unknown function)", None
+        return super().findCaller(*args, **kwargs)
+
+
+class _RotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotating file handler creates its directory and file when the first record comes."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def configure_logging(
+    console_level: int = logging.WARNING,
+    file_level: int = logging.DEBUG,
+    log_dir: t.Optional[str] = None,
+    max_bytes: int = 5 * 1024 * 1024,
+    backup_count: int = 3,
+    fast: bool = True,
+) -> logging.handlers.QueueHandler:
+    """Set up the background writer shared by all netbox loggers.
+
+    Records are put into a queue by the logging thread, a listener thread
+    formats them and writes them to console and a size rotated file. Calling
+    it again replaces the previous setup, handlers are never duplicated.
+
+    Args:
+        console_level: Level of console output. Defaults to logging.WARNING.
+        file_level: Level of log file. Defaults to logging.DEBUG.
+        log_dir: Directory of log file. Defaults to LOG_DIR.
+        max_bytes: Size of log file to rotate at. Defaults to 5MB.
+        backup_count: Number of rotated files kept. Defaults to 3.
+        fast: Use the cheap format and skip the caller lookup of records
+            logged by netbox loggers. Defaults to True.
+
+    Returns:
+        Queue handler attached by ``get_logger``.
+    """
+    global _queue_handler, _listener, _fast
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+        formatter = logging.Formatter(
+            fmt=FAST_FORMAT if fast else DETAILED_FORMAT, datefmt=DATE_FORMAT
+        )
+        _fast = fast
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(level=console_level)
+        console_handler.setFormatter(fmt=formatter)
+        file_handler = _RotatingFileHandler(
+            filename=os.path.join(log_dir or LOG_DIR, LOG_FILE),
+            maxBytes=max_bytes,
+            backupCount=backup_count,
+            encoding="utf-8",
+            delay=True,
+        )
+        file_handler.setLevel(level=file_level)
+        file_handler.setFormatter(fmt=formatter)
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        if _queue_handler is None:
+            _queue_handler = logging.handlers.QueueHandler(log_queue)
+        else:
+            _queue_handler.queue = log_queue
+        _queue_handler.setLevel(level=min(console_level, file_level))
+        _listener = logging.handlers.QueueListener(
+            log_queue, console_handler, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+        return _queue_handler
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the background writer."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str, level: int = logging.DEBUG) -> logging.Logger:
+    """Customization logger.
+
+    Args:
+        name (str): name of logger
+        level (str, optional): log level. Defaults to logging.DEBUG.
+
+    Returns:
+        Object of Logger.
+    """
+    # only loggers of netbox skip the lookup, others keep their class
+    with _lock:
+        logger_class = logging.getLoggerClass()
+        logging.setLoggerClass(_Logger)
+        try:
+            logger = logging.getLogger(name=name)
+        finally:
+            logging.setLoggerClass(logger_class)
+    logger.setLevel(level=level)
+    logger.propagate = False
+    handler = _queue_handler
+    if handler is None or _listener is None:
+        handler = configure_logging()
+    if handler not in logger.handlers:
+        logger.addHandler(handler)
+    return logger
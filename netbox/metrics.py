@@ -0,0 +1,299 @@
+"""Timing spans and counters of hot paths.
+
+Instrumentation is off unless :func:`enable` is called, then a span is a
+clock read on entry and exit and a counter is an addition, both behind one
+lock. Disabled, :func:`span` returns a shared object doing nothing and
+:func:`timed` functions only check a global before calling through.
+"""
+
+import functools
+import json
+import threading
+import time
+import typing as t
+
+from .stats import LatencyHistogram
+
+F = t.TypeVar("F", bound=t.Callable[..., t.Any])
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class SpanStats(object):
+    """Durations of one span."""
+
+    __slots__ = ("count", "total", "max", "histogram")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = LatencyHistogram()
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram.record(seconds)
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        def ms(value: t.Optional[float]) -> t.Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        return {
+            "count": self.count,
+            "total_ms": ms(self.total),
+            "avg_ms": ms(self.total / self.count if self.count else None),
+            "max_ms": ms(self.max),
+            **{
+                f"p{int(q * 100)}_ms": ms(self.histogram.percentile(q * 100))
+                for q in QUANTILES
+            },
+        }
+
+
+class Registry(object):
+    """Spans and counters collected since it was created."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.spans: t.Dict[str, SpanStats] = {}
+        self.counters: t.Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            stats = self.spans.get(name)
+            if stats is None:
+                stats = self.spans[name] = SpanStats()
+            stats.observe(seconds)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self) -> t.Dict[str, t.Any]:
+        """Obtain collected metrics.
+
+        Returns:
+            Dict of metrics in milliseconds, spans ordered by total time. For example: {'elapsed_ms': 812.4, 'spans': {'netbox.connect': {'count': 1, 'total_ms': 790.1, ...}}, 'counters': {'command.cache_hit': 3}}
+        """
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1].total)
+            return {
+                "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "spans": {name: stats.to_dict() for name, stats in spans},
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def to_prometheus(self) -> str:
+        """Format metrics in the Prometheus text exposition format.
+
+        Returns:
+            Text of summaries in seconds and counters. For example: netbox_span_seconds_count{span="parse.scan_output"} 3
+        """
+        lines = [
+            "# HELP netbox_span_seconds Time spent in instrumented spans.",
+            "# TYPE netbox_span_seconds summary",
+        ]
+        with self._lock:
+            for name, stats in sorted(self.spans.items()):
+                label = f'span="{escape_label(name)}"'
+                for q in QUANTILES:
+                    value = stats.histogram.percentile(q * 100)
+                    lines.append(
+                        f'netbox_span_seconds{{{label},quantile="{q}"}} '
+                        f"{format_value(value)}"
+                    )
+                lines.append(f"netbox_span_seconds_sum{{{label}}} {stats.total!r}")
+                lines.append(f"netbox_span_seconds_count{{{label}}} {stats.count}")
+            lines.append("# HELP netbox_events_total Events counted by netbox.")
+            lines.append("# TYPE netbox_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(
+                    f'netbox_events_total{{event="{escape_label(name)}"}} {value}'
+                )
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: t.Optional[float]) -> str:
+    return "NaN" if value is None else repr(value)
+
+
+class _Span(object):
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: Registry, name: str) -> None:
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.registry.observe(self.name, time.perf_counter() - self.start)
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+_registry: t.Optional[Registry] = None
+
+
+def enable() -> Registry:
+    """Start collecting metrics, a registry already collecting is kept.
+
+    Returns:
+        Registry metrics are collected into.
+    """
+    global _registry
+    if _registry is None:
+        _registry = Registry()
+    return _registry
+
+
+def disable() -> None:
+    """Stop collecting metrics and drop the registry."""
+    global _registry
+    _registry = None
+
+
+def get_registry() -> t.Optional[Registry]:
+    """Obtain the collecting registry, None if metrics are disabled."""
+    return _registry
+
+
+def span(name: str) -> t.ContextManager[t.Any]:
+    """Time a block of code.
+
+    Args:
+        name: Dotted span name. For example: command.spawn
+
+    Returns:
+        Context manager recording the duration of the block.
+    """
+    registry = _registry
+    if registry is None:
+        return _NULL_SPAN
+    return _Span(registry, name)
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record a duration measured elsewhere."""
+    registry = _registry
+    if registry is not None:
+        registry.observe(name, seconds)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Count events of a name."""
+    registry = _registry
+    if registry is not None:
+        registry.increment(name, value)
+
+
+def timed(name: str) -> t.Callable[[F], F]:
+    """Time every call of a function as a span."""
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            registry = _registry
+            if registry is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(name, time.perf_counter() - start)
+
+        return t.cast(F, wrapper)
+
+    return decorate
+
+
+def format_profile(report: t.Mapping[str, t.Any]) -> str:
+    """Format a report as a table of spans, the share is of the elapsed time.
+
+    Spans nest, so shares of a span and the spans inside it add up to more
+    than the whole.
+
+    Args:
+        report: Report of :meth:`Registry.report`.
+
+    Returns:
+        Text table.
+    """
+    elapsed = report["elapsed_ms"] or 1.0
+    rows = [
+        f"{'span':<32}{'count':>8}{'total ms':>12}{'avg ms':>10}"
+        f"{'p99 ms':>10}{'max ms':>10}{'share':>8}"
+    ]
+    for name, stats in report["spans"].items():
+        rows.append(
+            f"{name:<32}{stats['count']:>8}{stats['total_ms']:>12.3f}"
+            f"{stats['avg_ms']:>10.3f}{stats['p99_ms']:>10.3f}"
+            f"{stats['max_ms']:>10.3f}{stats['total_ms'] / elapsed:>8.1%}"
+        )
+    rows.append(f"{'elapsed':<32}{'':>8}{report['elapsed_ms']:>12.3f}")
+    for name, value in report["counters"].items():
+        rows.append(f"{name:<32}{value:>8}")
+    return "\n".join(rows)
+
+
+def serve(address: t.Tuple[str, int], registry: Registry) -> t.Any:
+    """Serve metrics over HTTP from a daemon thread.
+
+    ``/metrics`` answers the Prometheus text format and ``/metrics.json``
+    the report as JSON.
+
+    Args:
+        address: Tuple of (host, port), port 0 picks a free one.
+        registry: Registry to expose.
+
+    Returns:
+        The HTTP server, call ``shutdown`` and ``server_close`` to stop it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body = registry.to_prometheus().encode()
+                content_type = "text/plain; version=0.0.4; charset=utf-8"
+            elif path == "/metrics.json":
+                body = json.dumps(registry.report(), indent=4).encode()
+                content_type = "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: t.Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(address, Handler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="netbox-metrics", daemon=True
+    ).start()
+    return server
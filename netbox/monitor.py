@@ -0,0 +1,144 @@
+import array
+import time
+import typing as t
+
+# metrics sampled from current wifi information: (name, key of adapter output)
+METRICS = (
+    ("rssi", "agrCtlRSSI"),
+    ("noise", "agrCtlNoise"),
+    ("tx_rate", "lastTxRate"),
+    ("mcs", "MCS"),
+    ("channel", "channel"),
+)
+
+
+class RingBuffer(object):
+    """Fixed size buffer of floats backed by an array, the oldest is overwritten.
+
+    Args:
+        capacity: Maximum number of kept values.
+    """
+
+    __slots__ = ("capacity", "_data", "_next", "_size", "_sum")
+
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0.")
+        self.capacity = capacity
+        self._data = array.array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+        self._sum = 0.0
+
+    def append(self, value: float) -> None:
+        if self._size == self.capacity:
+            self._sum -= self._data[self._next]
+        else:
+            self._size += 1
+        self._data[self._next] = value
+        self._sum += value
+        self._next = (self._next + 1) % self.capacity
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> t.Iterator[float]:
+        start = (self._next - self._size) % self.capacity
+        for i in range(self._size):
+            yield self._data[(start + i) % self.capacity]
+
+    def stats(self) -> t.Optional[t.Dict[str, float]]:
+        """Obtain rolling min, avg and max of kept values.
+
+        Returns:
+            Dict of statistics or None if it is empty. For example: {'min': -50.0, 'avg': -45.5, 'max': -41.0}
+        """
+        if not self._size:
+            return None
+        values = self._data[: self._size]
+        return {
+            "min": min(values),
+            "avg": round(self._sum / self._size, 3),
+            "max": max(values),
+        }
+
+
+def parse_metric(name: str, value: t.Optional[str]) -> t.Optional[float]:
+    """Convert a raw value of current wifi information to number.
+
+    Args:
+        name: Name of metric.
+        value: Raw value. For example: '36,80' for channel.
+
+    Returns:
+        Number or None if the value is missing.
+    """
+    if not value:
+        return None
+    if name == "channel":
+        value = value.split(",", 1)[0]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def sample(info: t.Mapping[str, str]) -> t.Dict[str, t.Any]:
+    """Take a sample from current wifi information.
+
+    Args:
+        info: Output of adapter ``get_current_network``.
+
+    Returns:
+        Dict of sample. For example: {'ts': 1671000000.0, 'ssid': 'TP-Link001', 'rssi': -45.0, ...}
+    """
+    record: t.Dict[str, t.Any] = {"ts": round(time.time(), 3), "ssid": info.get("SSID")}
+    for name, key in METRICS:
+        record[name] = parse_metric(name, info.get(key))
+    return record
+
+
+def ticks(interval: float, count: t.Optional[int] = None) -> t.Iterator[int]:
+    """Yield on a fixed schedule without drift, a late tick is not repeated.
+
+    Args:
+        interval: Seconds between two ticks.
+        count: Number of ticks, defaults to infinite.
+
+    Yields:
+        Sequence number of the tick.
+    """
+    deadline = time.monotonic()
+    n = 0
+    while count is None or n < count:
+        yield n
+        n += 1
+        if n == count:
+            return
+        deadline += interval
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        else:
+            deadline = time.monotonic()
+
+
+def with_stats(
+    samples: t.Iterable[t.Dict[str, t.Any]], window: int
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Attach rolling statistics of the last ``window`` samples to each sample.
+
+    Args:
+        samples: Samples taken by ``sample``.
+        window: Number of samples the statistics cover.
+
+    Yields:
+        Sample with ``stats`` attached.
+    """
+    buffers = {name: RingBuffer(window) for name, _ in METRICS}
+    for record in samples:
+        for name, buffer in buffers.items():
+            if record.get(name) is not None:
+                buffer.append(record[name])
+        record["stats"] = {name: buffer.stats() for name, buffer in buffers.items()}
+        yield record
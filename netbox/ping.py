@@ -0,0 +1,313 @@
+import collections
+import os
+import select
+import socket
+import struct
+import time
+import typing as t
+
+from . import logger
+from .exception import PingException
+from .resolver import get_resolver
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_HEADER_FORMAT = "!BBHHH"
+ICMP_HEADER_SIZE = struct.calcsize(ICMP_HEADER_FORMAT)
+
+# Result type of a single host, keeps the same semantic as ``ping3.ping``:
+# float for the round trip time in seconds, None for timeout and False for
+# a host which can not be resolved.
+PingResult = t.Union[float, None, bool]
+
+
+def checksum(source: bytes) -> int:
+    """Calculate the internet checksum of the input bytes (RFC 1071).
+
+    Args:
+        source: The input to be calculated.
+
+    Returns:
+        Calculated 16-bit checksum.
+    """
+    if len(source) % 2:
+        source += b"\x00"
+    total = sum(struct.unpack(f"!{len(source) // 2}H", source))
+    while total >> 16:
+        total = (total & 0xFFFF) + (total >> 16)
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident: int, seq: int, payload: bytes) -> bytes:
+    """Build an ICMP echo request packet.
+
+    Args:
+        ident: Identifier of the echo request.
+        seq: Sequence number of the echo request.
+        payload: Data carried by the echo request.
+
+    Returns:
+        Bytes of the ICMP packet with a valid checksum.
+    """
+    header = struct.pack(ICMP_HEADER_FORMAT, ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = checksum(header + payload)
+    header = struct.pack(ICMP_HEADER_FORMAT, ICMP_ECHO_REQUEST, 0, csum, ident, seq)
+    return header + payload
+
+
+def parse_echo_reply(packet: bytes) -> t.Optional[t.Tuple[int, int]]:
+    """Parse an ICMP echo reply packet.
+
+    Raw sockets (and datagram sockets on MacOS) deliver the IP header as well,
+    it is skipped when present.
+
+    Args:
+        packet: Bytes received from the ICMP socket.
+
+    Returns:
+        Tuple of (identifier, sequence) or None if it is not an echo reply.
+    """
+    if packet and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4 :]
+    if len(packet) < ICMP_HEADER_SIZE:
+        return None
+    _type, _code, _, ident, seq = struct.unpack_from(ICMP_HEADER_FORMAT, packet)
+    if _type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+def open_icmp_socket() -> t.Tuple[socket.socket, bool]:
+    """Open a non-blocking ICMP socket.
+
+    A raw socket is preferred, the unprivileged datagram socket is used when
+    the process is not allowed to open raw sockets.
+
+    Raises:
+        PingException: Neither raw nor datagram ICMP socket is permitted.
+
+    Returns:
+        Tuple of (socket, raw or not).
+    """
+    for kind, raw in ((socket.SOCK_RAW, True), (socket.SOCK_DGRAM, False)):
+        try:
+            sock = socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP)
+        except PermissionError:
+            continue
+        sock.setblocking(False)
+        return sock, raw
+    raise PingException(
+        message="ICMP socket is not permitted, run as root or enable net.ipv4.ping_group_range."
+    )
+
+
+class _Probe(object):
+    """An echo request waiting for its reply."""
+
+    __slots__ = ("host", "addr", "sent")
+
+    def __init__(self, host: str, addr: str, sent: float) -> None:
+        self.host = host
+        self.addr = addr
+        self.sent = sent
+
+
+class PingEngine(object):
+    """Send ICMP echo requests to many hosts over one shared socket.
+
+    Replies are matched back to their host by identifier and sequence, so the
+    number of outstanding probes is only bounded by ``concurrency``.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 4.0,
+        concurrency: int = 256,
+        size: int = 56,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than 0.")
+        self.timeout = timeout
+        self.concurrency = min(concurrency, 0xFFFF)
+        self.payload = b"Q" * size
+        self._ident = os.getpid() & 0xFFFF
+        self._seq = 0
+
+    def _next_seq(self, inflight: t.Mapping[int, _Probe]) -> int:
+        while True:
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in inflight:
+                return self._seq
+
+    def sweep(self, hosts: t.Iterable[str]) -> t.Iterator[t.Tuple[str, PingResult]]:
+        """Ping all hosts and yield results in the order they arrive.
+
+        Args:
+            hosts: IP addresses or domains.
+
+        Raises:
+            PingException: ICMP socket can not be opened.
+
+        Yields:
+            Tuple of (host, result), result is the round trip time in seconds,
+            None if timeout or False if the host can not be resolved.
+        """
+        pending = collections.deque(hosts)
+        addresses = get_resolver().resolve_many(pending)
+        # ordered by send time, so the oldest probe is always the first one
+        inflight: "collections.OrderedDict[int, _Probe]" = collections.OrderedDict()
+        sock, raw = open_icmp_socket()
+        try:
+            while pending or inflight:
+                blocked = False
+                while pending and len(inflight) < self.concurrency:
+                    host = pending.popleft()
+                    addr = addresses[host]
+                    if addr is None:
+                        yield host, False
+                        continue
+                    seq = self._next_seq(inflight)
+                    packet = build_echo_request(self._ident, seq, self.payload)
+                    try:
+                        sock.sendto(packet, (addr, 0))
+                    except BlockingIOError:
+                        pending.appendleft(host)
+                        blocked = True
+                        break
+                    except OSError as e:
+                        logger.debug(msg=f"Ping {host} send failed: {e}")
+                        yield host, None
+                        continue
+                    inflight[seq] = _Probe(host, addr, time.perf_counter())
+
+                if not inflight and not blocked:
+                    continue
+                wait = self.timeout
+                if inflight:
+                    oldest = next(iter(inflight.values()))
+                    wait = max(0.0, oldest.sent + self.timeout - time.perf_counter())
+                if pending and len(inflight) < self.concurrency and not blocked:
+                    wait = 0.0
+                # a full send buffer waits until it drains instead of spinning
+                writable = [sock] if blocked else []
+                readable, _, _ = select.select([sock], writable, [], wait)
+                if readable:
+                    for _, probe, rtt in self._drain(sock, raw, inflight):
+                        yield probe.host, rtt
+
+                deadline = time.perf_counter() - self.timeout
+                while inflight:
+                    seq, probe = next(iter(inflight.items()))
+                    if probe.sent > deadline:
+                        break
+                    del inflight[seq]
+                    yield probe.host, None
+        finally:
+            sock.close()
+
+    def _drain(
+        self,
+        sock: socket.socket,
+        raw: bool,
+        inflight: t.MutableMapping[int, _Probe],
+    ) -> t.Iterator[t.Tuple[int, _Probe, float]]:
+        """Receive all queued replies, yield (sequence, probe, rtt) of matched ones."""
+        while inflight:
+            try:
+                packet, (addr, _) = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            received = time.perf_counter()
+            reply = parse_echo_reply(packet)
+            if reply is None:
+                continue
+            ident, seq = reply
+            # datagram sockets rewrite the identifier with the local port and
+            # only deliver replies of this socket, so only raw sockets check it.
+            if raw and ident != self._ident:
+                continue
+            probe = inflight.get(seq)
+            if probe is None or probe.addr != addr:
+                continue
+            del inflight[seq]
+            yield seq, probe, received - probe.sent
+
+    def series(
+        self,
+        host: str,
+        count: t.Optional[int] = None,
+        interval: float = 1.0,
+    ) -> t.Iterator[t.Tuple[int, t.Optional[float]]]:
+        """Ping one host periodically without waiting for previous replies.
+
+        Args:
+            host: IP address or domain.
+            count: Number of echo requests, defaults to infinite.
+            interval: Seconds between two echo requests.
+
+        Raises:
+            PingException: ICMP socket can not be opened or host is unknown.
+
+        Yields:
+            Tuple of (index, result) in the order results arrive, result is
+            the round trip time in seconds or None if timeout.
+        """
+        addr = get_resolver().resolve(host)
+        if addr is None:
+            raise PingException(message=f"Unknown host {host}.")
+        inflight: "collections.OrderedDict[int, _Probe]" = collections.OrderedDict()
+        indexes: t.Dict[int, int] = {}
+        sock, raw = open_icmp_socket()
+        sent = 0
+        next_send = time.perf_counter()
+        try:
+            while count is None or sent < count or inflight:
+                now = time.perf_counter()
+                if (count is None or sent < count) and now >= next_send:
+                    seq = self._next_seq(inflight)
+                    packet = build_echo_request(self._ident, seq, self.payload)
+                    try:
+                        sock.sendto(packet, (addr, 0))
+                        inflight[seq] = _Probe(host, addr, time.perf_counter())
+                        indexes[seq] = sent
+                    except OSError as e:
+                        logger.debug(msg=f"Ping {host} send failed: {e}")
+                        yield sent, None
+                    sent += 1
+                    next_send += interval
+                    # do not burst to catch up after a stall
+                    next_send = max(next_send, now)
+
+                waits = []
+                if count is None or sent < count:
+                    waits.append(next_send - time.perf_counter())
+                if inflight:
+                    oldest = next(iter(inflight.values()))
+                    waits.append(oldest.sent + self.timeout - time.perf_counter())
+                readable, _, _ = select.select([sock], [], [], max(0.0, min(waits)))
+                if readable:
+                    for seq, _, rtt in self._drain(sock, raw, inflight):
+                        yield indexes.pop(seq), rtt
+
+                deadline = time.perf_counter() - self.timeout
+                while inflight:
+                    seq, probe = next(iter(inflight.items()))
+                    if probe.sent > deadline:
+                        break
+                    del inflight[seq]
+                    yield indexes.pop(seq), None
+        finally:
+            sock.close()
+
+    def check_hosts(self, hosts: t.Iterable[str]) -> t.Dict[str, PingResult]:
+        """Ping all hosts and collect their results.
+
+        Args:
+            hosts: IP addresses or domains.
+
+        Returns:
+            Mapping of host to result in the order of given hosts.
+        """
+        hosts = list(hosts)
+        results = dict(self.sweep(hosts))
+        return {host: results.get(host) for host in hosts}
@@ -0,0 +1,363 @@
+import collections
+import json
+import threading
+import time
+import typing as t
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+from . import logger, metrics
+from .agent import METHODS, Handler
+from .exception import PlanException
+
+if t.TYPE_CHECKING:
+    from .core import Netbox
+
+STATUSES = ("ok", "failed", "timeout", "skipped")
+
+
+def _sleep(netbox: "Netbox", seconds: float) -> float:
+    time.sleep(seconds)
+    return seconds
+
+
+# methods of steps, agent methods plus a pause between steps
+STEP_METHODS: t.Dict[str, t.Tuple[Handler, bool]] = dict(METHODS, sleep=(_sleep, False))
+
+
+class Step(object):
+    """A call of a method, run after all steps it depends on."""
+
+    __slots__ = (
+        "id",
+        "method",
+        "params",
+        "after",
+        "timeout",
+        "retries",
+        "retry_delay",
+        "always",
+        "status",
+        "attempts",
+        "result",
+        "error",
+        "started",
+        "finished",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        method: str,
+        params: t.Optional[t.Dict[str, t.Any]] = None,
+        after: t.Sequence[str] = (),
+        timeout: t.Optional[float] = None,
+        retries: int = 0,
+        retry_delay: float = 1.0,
+        always: bool = False,
+    ) -> None:
+        self.id = id
+        self.method = method
+        self.params = params or {}
+        self.after = list(after)
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.always = always
+        self.status: t.Optional[str] = None
+        self.attempts = 0
+        self.result: t.Any = None
+        self.error: t.Optional[str] = None
+        self.started: t.Optional[float] = None
+        self.finished: t.Optional[float] = None
+
+
+def _expand(spec: t.Mapping[str, t.Any]) -> t.List[t.Dict[str, t.Any]]:
+    """Expand a step with ``each`` into one step per value."""
+    each = spec.get("each")
+    if each is None:
+        return [dict(spec)]
+    if not isinstance(each, dict) or len(each) != 1:
+        raise PlanException(
+            message=f"Step {spec['id']} each must map one parameter to a list of values."
+        )
+    ((param, values),) = each.items()
+    if not isinstance(values, list) or not values:
+        raise PlanException(message=f"Step {spec['id']} each has no values.")
+    steps = []
+    for value in values:
+        step = {key: item for key, item in spec.items() if key != "each"}
+        step["params"] = dict(spec.get("params") or {}, **{param: value})
+        step["id"] = f"{spec['id']}[{value}]"
+        steps.append(step)
+    return steps
+
+
+def load_steps(
+    plan: t.Union[str, t.Mapping[str, t.Any]],
+    methods: t.Mapping[str, t.Tuple[Handler, bool]] = STEP_METHODS,
+) -> t.Tuple[t.List[Step], t.Dict[str, t.Any]]:
+    """Load steps of a plan.
+
+    A plan is JSON such as ``{"workers": 8, "steps": [{"id": "join", "method":
+    "connect", "params": {"ssid": "Office", "password": "secret"}, "timeout":
+    30, "retries": 2}, {"id": "ping", "method": "ping", "each": {"host":
+    ["192.168.1.1", "jd.com"]}, "after": ["join"]}]}``. A step with ``each``
+    becomes one step per value, a step depending on it waits for all of them,
+    and a step with ``always`` runs even if steps it depends on failed.
+
+    Args:
+        plan: Path of the plan or its dict.
+        methods: Known methods of steps.
+
+    Raises:
+        PlanException: Plan is invalid or its steps depend on each other in a cycle.
+
+    Returns:
+        Tuple of (steps in plan order, options of PlanRunner).
+    """
+    if isinstance(plan, str):
+        try:
+            with open(plan, "r", encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as e:
+            raise PlanException(message=f"Plan can not be loaded: {e}")
+    plan = t.cast(t.Mapping[str, t.Any], plan)
+    specs = plan.get("steps")
+    if not isinstance(specs, list) or not specs:
+        raise PlanException(message="Plan has no steps.")
+
+    steps: t.Dict[str, Step] = {}
+    # id of a step in the plan -> ids of the steps it expanded to
+    groups: t.Dict[str, t.List[str]] = {}
+    for i, spec in enumerate(specs):
+        if not isinstance(spec, dict) or not isinstance(spec.get("id"), str):
+            raise PlanException(message=f"Step {i} has no id.")
+        if spec.get("method") not in methods:
+            raise PlanException(
+                message=f"Step {spec['id']} has unknown method {spec.get('method')}, choose from {sorted(methods)}."
+            )
+        timeout = spec.get("timeout")
+        if timeout is not None and (
+            not isinstance(timeout, (int, float)) or timeout <= 0
+        ):
+            raise PlanException(
+                message=f"Step {spec['id']} has invalid timeout {timeout}."
+            )
+        if spec["id"] in groups:
+            raise PlanException(message=f"Step id {spec['id']} is duplicated.")
+        groups[spec["id"]] = []
+        for item in _expand(spec):
+            if item["id"] in steps:
+                raise PlanException(message=f"Step id {item['id']} is duplicated.")
+            steps[item["id"]] = Step(
+                id=item["id"],
+                method=item["method"],
+                params=item.get("params"),
+                after=item.get("after", ()),
+                timeout=item.get("timeout"),
+                retries=int(item.get("retries", 0)),
+                retry_delay=float(item.get("retry_delay", 1.0)),
+                always=bool(item.get("always", False)),
+            )
+            groups[spec["id"]].append(item["id"])
+
+    for step in steps.values():
+        after = []
+        for name in step.after:
+            if name not in groups:
+                raise PlanException(
+                    message=f"Step {step.id} depends on unknown step {name}."
+                )
+            after.extend(groups[name])
+        step.after = after
+
+    # Kahn's algorithm, steps left over are in a cycle
+    indegree = {step.id: len(step.after) for step in steps.values()}
+    dependents = collections.defaultdict(list)
+    for step in steps.values():
+        for name in step.after:
+            dependents[name].append(step.id)
+    ready = [name for name, degree in indegree.items() if not degree]
+    while ready:
+        for name in dependents[ready.pop()]:
+            indegree[name] -= 1
+            if not indegree[name]:
+                ready.append(name)
+    cycle = sorted(name for name, degree in indegree.items() if degree)
+    if cycle:
+        raise PlanException(message=f"Steps {cycle} depend on each other in a cycle.")
+
+    options = {key: plan[key] for key in ("workers",) if key in plan}
+    return list(steps.values()), options
+
+
+class PlanRunner(object):
+    """Run steps of a plan as a DAG on a worker pool.
+
+    A step starts as soon as all steps it depends on finished, so independent
+    steps such as probes of many hosts run in parallel, while steps using the
+    wifi adapter run one at a time. A failed or timed out step is retried
+    after ``retry_delay`` doubling with each attempt, and steps depending on a
+    step which finally failed are skipped unless they are ``always`` steps.
+
+    A timed out call is not interrupted, its worker is only released when the
+    call returns, so a timeout should be longer than the step ever takes
+    when it works.
+
+    Args:
+        netbox: Netbox the steps call.
+        steps: Steps to run, see ``load_steps``.
+        workers: Number of steps running at the same time.
+        methods: Methods of steps, defaults to STEP_METHODS.
+        on_step: Called with each step when it finished.
+    """
+
+    def __init__(
+        self,
+        netbox: "Netbox",
+        steps: t.Sequence[Step],
+        workers: int = 8,
+        methods: t.Mapping[str, t.Tuple[Handler, bool]] = STEP_METHODS,
+        on_step: t.Optional[t.Callable[[Step], None]] = None,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be greater than 0.")
+        self.netbox = netbox
+        self.steps = {step.id: step for step in steps}
+        self.workers = workers
+        self.methods = methods
+        self.on_step = on_step
+        self._wifi_lock = threading.Lock()
+        self._start = 0.0
+
+    def _call(self, step: Step) -> t.Any:
+        handler, wifi = self.methods[step.method]
+        with metrics.span(f"step.{step.method}"):
+            if wifi:
+                with self._wifi_lock:
+                    return handler(self.netbox, **step.params)
+            return handler(self.netbox, **step.params)
+
+    def run(self) -> t.Dict[str, t.Any]:
+        """Run all steps and wait for them.
+
+        Returns:
+            Report in milliseconds. For example: {'status': 'passed', 'elapsed': 3120.5, 'summary': {'ok': 5, ...}, 'steps': {'join': {'method': 'connect', 'status': 'ok', 'attempts': 1, 'start': 0.2, 'elapsed': 2890.1, 'result': {...}, 'error': None}, ...}}
+        """
+        self._start = time.monotonic()
+        waiting = {step.id: set(step.after) for step in self.steps.values()}
+        blocked: t.Set[str] = set()
+        dependents = collections.defaultdict(list)
+        for step in self.steps.values():
+            for name in step.after:
+                dependents[name].append(step.id)
+        ready = collections.deque(
+            self.steps[name] for name, after in waiting.items() if not after
+        )
+        retrying: t.List[t.Tuple[float, Step]] = []
+        running: t.Dict["Future[t.Any]", t.Tuple[Step, float]] = {}
+
+        def finish(step: Step, status: str, error: t.Optional[str] = None) -> None:
+            step.status = status
+            step.error = error
+            step.finished = time.monotonic()
+            if self.on_step is not None:
+                self.on_step(step)
+            for name in dependents[step.id]:
+                waiting[name].discard(step.id)
+                if status != "ok":
+                    blocked.add(name)
+                if waiting[name]:
+                    continue
+                dependent = self.steps[name]
+                if name in blocked and not dependent.always:
+                    finish(dependent, "skipped", "A step it depends on failed.")
+                else:
+                    ready.append(dependent)
+
+        def fail(step: Step, status: str, error: str) -> None:
+            logger.debug(
+                msg=f"Step {step.id} attempt {step.attempts} {status}: {error}"
+            )
+            if step.attempts <= step.retries:
+                delay = step.retry_delay * 2 ** (step.attempts - 1)
+                retrying.append((time.monotonic() + delay, step))
+            else:
+                finish(step, status, error)
+
+        executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="netbox-step"
+        )
+        try:
+            while ready or running or retrying:
+                now = time.monotonic()
+                for item in [item for item in retrying if item[0] <= now]:
+                    retrying.remove(item)
+                    ready.append(item[1])
+                while ready:
+                    step = ready.popleft()
+                    step.attempts += 1
+                    if step.started is None:
+                        step.started = now
+                    deadline = now + step.timeout if step.timeout else float("inf")
+                    running[executor.submit(self._call, step)] = (step, deadline)
+
+                wakes = [deadline for _, deadline in running.values()]
+                wakes.extend(when for when, _ in retrying)
+                wake = min(wakes, default=float("inf"))
+                timeout = None if wake == float("inf") else max(0.0, wake - now)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step, _ = running.pop(future)
+                    try:
+                        step.result = future.result()
+                    except Exception as e:
+                        fail(step, "failed", f"{type(e).__name__}: {e}")
+                    else:
+                        finish(step, "ok")
+
+                now = time.monotonic()
+                for future, (step, deadline) in list(running.items()):
+                    if deadline <= now:
+                        del running[future]
+                        future.cancel()
+                        fail(step, "timeout", f"Step took longer than {step.timeout}s.")
+        finally:
+            # timed out calls can not be interrupted, do not wait for them
+            executor.shutdown(wait=False)
+        return self.report()
+
+    def report(self) -> t.Dict[str, t.Any]:
+        """Obtain the report of steps, see ``run``."""
+
+        def ms(value: t.Optional[float]) -> t.Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        summary = dict.fromkeys(STATUSES, 0)
+        steps = {}
+        finished = [self._start]
+        for step in self.steps.values():
+            summary[step.status or "skipped"] += 1
+            if step.finished is not None:
+                finished.append(step.finished)
+            steps[step.id] = {
+                "method": step.method,
+                "status": step.status,
+                "attempts": step.attempts,
+                "start": ms(
+                    None if step.started is None else step.started - self._start
+                ),
+                "elapsed": ms(
+                    None
+                    if step.started is None or step.finished is None
+                    else step.finished - step.started
+                ),
+                "result": step.result,
+                "error": step.error,
+            }
+        return {
+            "status": "passed" if summary["ok"] == len(self.steps) else "failed",
+            "elapsed": ms(max(finished) - self._start),
+            "summary": summary,
+            "steps": steps,
+        }
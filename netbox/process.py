@@ -0,0 +1,231 @@
+import os
+import shlex
+import subprocess
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from . import metrics
+from .exception import CommandException
+
+Argv = t.Sequence[str]
+# seconds a command may take unless the caller gives a timeout, so a hung
+# networksetup or airport does not block a worker forever
+DEFAULT_TIMEOUT = 60.0
+
+
+def to_argv(command: t.Union[str, Argv]) -> t.List[str]:
+    """Convert a command to argv list, a string is split by shell rules.
+
+    Args:
+        command: Command string or argv list. For example: "networksetup -getairportpower en0"
+
+    Returns:
+        Argv list. For example: ['networksetup', '-getairportpower', 'en0']
+    """
+    if isinstance(command, str):
+        return shlex.split(command)
+    return list(command)
+
+
+def to_string(argv: Argv) -> str:
+    """Convert argv list to a shell quoted command string."""
+    return " ".join(shlex.quote(arg) for arg in argv)
+
+
+def redact(argv: Argv) -> str:
+    """Describe a command for messages and logs without its argument values.
+
+    Arguments such as ssids and passwords are masked, only the executable and
+    options are kept.
+
+    Args:
+        argv: Argv list. For example: ['networksetup', '-setairportnetwork', 'en0', 'Office', 'secret']
+
+    Returns:
+        Masked command. For example: networksetup -setairportnetwork *** *** ***
+    """
+    if not argv:
+        return ""
+    masked = [arg if arg.startswith("-") else "***" for arg in argv[1:]]
+    return " ".join([os.path.basename(argv[0]), *masked])
+
+
+class CommandResult(object):
+    """Result of an executed command."""
+
+    __slots__ = ("argv", "returncode", "stdout", "stderr", "spawn", "elapsed")
+
+    def __init__(
+        self,
+        argv: Argv,
+        returncode: int,
+        stdout: str,
+        stderr: str,
+        spawn: float,
+        elapsed: float,
+    ) -> None:
+        self.argv = argv
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        # seconds spent on fork and exec
+        self.spawn = spawn
+        # seconds from spawn until the process exited
+        self.elapsed = elapsed
+
+    def check(self) -> "CommandResult":
+        """Raise CommandException if the command executed failed."""
+        if self.returncode != 0:
+            raise CommandException(
+                message=f"Command: '{redact(self.argv)}' executed failed. {self.stderr.strip()}"
+            )
+        return self
+
+
+class CommandStats(object):
+    """Latency statistics of one executable."""
+
+    __slots__ = ("count", "failed", "spawn_total", "spawn_max", "elapsed_total")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.failed = 0
+        self.spawn_total = 0.0
+        self.spawn_max = 0.0
+        self.elapsed_total = 0.0
+
+    def to_dict(self) -> t.Dict[str, float]:
+        return {
+            "count": self.count,
+            "failed": self.failed,
+            "spawn_avg": self.spawn_total / self.count if self.count else 0.0,
+            "spawn_max": self.spawn_max,
+            "elapsed_avg": self.elapsed_total / self.count if self.count else 0.0,
+        }
+
+
+class CommandRunner(object):
+    """Execute commands without a shell, independent commands run concurrently.
+
+    Args:
+        max_workers: Maximum number of commands running at the same time.
+        timeout: Default seconds to wait for a command, None waits forever.
+    """
+
+    def __init__(
+        self, max_workers: int = 4, timeout: t.Optional[float] = DEFAULT_TIMEOUT
+    ) -> None:
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor: t.Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._stats: t.Dict[str, CommandStats] = {}
+
+    def run(
+        self, command: t.Union[str, Argv], timeout: t.Optional[float] = None
+    ) -> CommandResult:
+        """Execute a command and wait for it.
+
+        Args:
+            command: Argv list, a string is split by shell rules but never run by a shell.
+            timeout: Seconds to wait, defaults to the runner timeout.
+
+        Raises:
+            CommandException: The executable is not found or timeout.
+
+        Returns:
+            CommandResult of the command.
+        """
+        argv = to_argv(command)
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+        except OSError as e:
+            raise CommandException(
+                message=f"Command: '{redact(argv)}' executed failed. {e}"
+            )
+        spawned = time.perf_counter()
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise CommandException(message=f"Command: '{redact(argv)}' timeout.")
+        result = CommandResult(
+            argv=argv,
+            returncode=process.returncode,
+            stdout=stdout,
+            stderr=stderr,
+            spawn=spawned - start,
+            elapsed=time.perf_counter() - start,
+        )
+        self._record(result)
+        return result
+
+    def run_many(
+        self,
+        commands: t.Iterable[t.Union[str, Argv]],
+        timeout: t.Optional[float] = None,
+    ) -> t.List[CommandResult]:
+        """Execute independent commands concurrently on the worker pool.
+
+        Args:
+            commands: Argv lists or command strings.
+            timeout: Seconds to wait for each command.
+
+        Returns:
+            CommandResult of each command in the given order.
+        """
+        commands = list(commands)
+        if len(commands) <= 1:
+            return [self.run(command, timeout=timeout) for command in commands]
+        executor = self._get_executor()
+        futures = [executor.submit(self.run, command, timeout) for command in commands]
+        return [future.result() for future in futures]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="netbox-runner"
+                )
+            return self._executor
+
+    def _record(self, result: CommandResult) -> None:
+        name = os.path.basename(result.argv[0]) if result.argv else ""
+        metrics.observe("command.spawn", result.spawn)
+        metrics.observe(f"command.{name}", result.elapsed)
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = CommandStats()
+            stats.count += 1
+            stats.failed += result.returncode != 0
+            stats.spawn_total += result.spawn
+            stats.spawn_max = max(stats.spawn_max, result.spawn)
+            stats.elapsed_total += result.elapsed
+
+    def stats(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Obtain latency statistics per executable.
+
+        Returns:
+            Dict of statistics. For example: {'networksetup': {'count': 3, 'failed': 0, 'spawn_avg': 0.002, ...}}
+        """
+        with self._lock:
+            return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def shutdown(self) -> None:
+        """Stop worker threads of the pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import time
+import typing as t
+
+from .process import Argv, CommandResult, CommandRunner, to_argv, to_string
+from .wifi import LinuxAdapter, MacAdapter
+from .wpa_ctrl import WpaCtrl, strip_priority
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+# recorded output, a list is served in order and its last item is repeated
+Recorded = t.Union[str, t.Sequence[str]]
+# seconds of every command, or (regex of command, seconds) rules
+Latency = t.Union[float, t.Sequence[t.Tuple[str, float]]]
+
+
+def load_fixture(name: str) -> t.Dict[str, t.Any]:
+    """Load recorded outputs.
+
+    Args:
+        name: Name of a bundled fixture or path of a JSON file. For example: mac
+
+    Returns:
+        Dict of the fixture.
+    """
+    path = name if os.path.exists(name) else os.path.join(FIXTURE_DIR, f"{name}.json")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def command_key(argv: Argv) -> str:
+    """Key of a command in a fixture, the executable is kept without its directory.
+
+    Returns:
+        Command string. For example: airport -I
+    """
+    return to_string([os.path.basename(argv[0]), *argv[1:]]) if argv else ""
+
+
+def record(
+    commands: t.Iterable[t.Union[str, Argv]], runner: t.Optional[CommandRunner] = None
+) -> t.Dict[str, str]:
+    """Run real commands and collect their outputs for a fixture.
+
+    Args:
+        commands: Argv lists or command strings.
+        runner: Runner of commands, defaults to a new CommandRunner.
+
+    Returns:
+        Mapping of command key to output, the ``commands`` of a fixture.
+    """
+    runner = runner or CommandRunner()
+    argvs = [to_argv(command) for command in commands]
+    return {
+        command_key(argv): result.stdout
+        for argv, result in zip(argvs, runner.run_many(argvs))
+    }
+
+
+class _Replay(object):
+    """Look up recorded outputs and simulate their latency."""
+
+    def __init__(self, recorded: t.Mapping[str, Recorded], latency: Latency) -> None:
+        self.recorded = dict(recorded)
+        if isinstance(latency, (int, float)):
+            self._rules: t.List[t.Tuple[t.Pattern[str], float]] = [
+                (re.compile(""), float(latency))
+            ]
+        else:
+            self._rules = [(re.compile(pattern), value) for pattern, value in latency]
+        self._served: t.Dict[str, int] = {}
+        self.calls: t.List[str] = []
+
+    def latency(self, command: str) -> float:
+        for pattern, value in self._rules:
+            if pattern.search(command):
+                return value
+        return 0.0
+
+    def find(self, command: str) -> t.Optional[str]:
+        """Find the recorded key of a command, the longest recorded prefix matches."""
+        if command in self.recorded:
+            return command
+        words = command.split(" ")
+        for end in range(len(words) - 1, 0, -1):
+            key = " ".join(words[:end])
+            if key in self.recorded:
+                return key
+        return None
+
+    def serve(self, command: str) -> t.Optional[str]:
+        """Sleep the simulated latency and serve the output, None if not recorded."""
+        self.calls.append(command)
+        delay = self.latency(command)
+        if delay > 0:
+            time.sleep(delay)
+        key = self.find(command)
+        if key is None:
+            return None
+        output = self.recorded[key]
+        if isinstance(output, str):
+            return output
+        index = self._served.get(key, 0)
+        self._served[key] = index + 1
+        return output[min(index, len(output) - 1)]
+
+
+class ReplayRunner(CommandRunner):
+    """CommandRunner which serves recorded outputs instead of spawning processes.
+
+    Args:
+        recorded: Mapping of command key to recorded output.
+        latency: Simulated seconds of each command. Defaults to 0.
+    """
+
+    def __init__(
+        self, recorded: t.Mapping[str, Recorded], latency: Latency = 0.0
+    ) -> None:
+        super().__init__()
+        self.replay = _Replay(recorded, latency)
+
+    def run(
+        self, command: t.Union[str, Argv], timeout: t.Optional[float] = None
+    ) -> CommandResult:
+        argv = to_argv(command)
+        start = time.perf_counter()
+        output = self.replay.serve(command_key(argv))
+        result = CommandResult(
+            argv=argv,
+            returncode=127 if output is None else 0,
+            stdout=output or "",
+            stderr="not recorded" if output is None else "",
+            spawn=0.0,
+            elapsed=time.perf_counter() - start,
+        )
+        self._record(result)
+        return result
+
+
+class ReplayAdapter(MacAdapter):
+    """MacAdapter which serves recorded airport and networksetup outputs.
+
+    Everything above the command runner, cache and parsing included, is the
+    real code, so it measures the adapter without Wi-Fi hardware.
+
+    Args:
+        fixture: Fixture dict or name of it. Defaults to the bundled mac fixture.
+        latency: Simulated seconds of each command. Defaults to 0.
+    """
+
+    def __init__(
+        self,
+        fixture: t.Union[str, t.Mapping[str, t.Any]] = "mac",
+        latency: Latency = 0.0,
+    ) -> None:
+        super().__init__()
+        if isinstance(fixture, str):
+            fixture = load_fixture(fixture)
+        self._runner = ReplayRunner(fixture["commands"], latency=latency)
+
+    @property
+    def replay(self) -> _Replay:
+        return t.cast(ReplayRunner, self._runner).replay
+
+
+class ReplayCtrl(WpaCtrl):
+    """WpaCtrl which replies recorded responses and emits recorded events.
+
+    Args:
+        responses: Mapping of request to recorded reply.
+        events: Mapping of request to events it triggers.
+        latency: Simulated seconds of each request. Defaults to 0.
+    """
+
+    def __init__(
+        self,
+        responses: t.Mapping[str, Recorded],
+        events: t.Mapping[str, t.Sequence[str]],
+        latency: Latency = 0.0,
+    ) -> None:
+        super().__init__(path="replay")
+        self.replay = _Replay(responses, latency)
+        self.triggers = {name: list(items) for name, items in events.items()}
+
+    def open(self) -> "ReplayCtrl":
+        return self
+
+    def close(self) -> None:
+        self.attached = False
+
+    def request(self, command: str, timeout: t.Optional[float] = None) -> str:
+        reply = self.replay.serve(command)
+        if reply is None:
+            reply = "UNKNOWN COMMAND\n"
+        self._events.extend(self.triggers.get(command.split(" ", 1)[0], ()))
+        return reply
+
+    def recv_event(self, timeout: t.Optional[float] = None) -> t.Optional[str]:
+        if self._events:
+            return strip_priority(self._events.popleft())
+        return None
+
+
+class LinuxReplayAdapter(LinuxAdapter):
+    """LinuxAdapter which talks to a ReplayCtrl instead of wpa_supplicant.
+
+    Args:
+        fixture: Fixture dict or name of it. Defaults to the bundled linux fixture.
+        latency: Simulated seconds of each request. Defaults to 0.
+        root: Root of procfs and sysfs.
+    """
+
+    def __init__(
+        self,
+        fixture: t.Union[str, t.Mapping[str, t.Any]] = "linux",
+        latency: Latency = 0.0,
+        root: str = "/nonexistent",
+    ) -> None:
+        if isinstance(fixture, str):
+            fixture = load_fixture(fixture)
+        super().__init__(interface=fixture["interface"], root=root, timeout=1.0)
+        self.replay_ctrl = ReplayCtrl(
+            fixture["responses"], fixture.get("events", {}), latency=latency
+        )
+
+    @property
+    def ctrl(self) -> WpaCtrl:
+        return self.replay_ctrl
+
+    @property
+    def monitor(self) -> WpaCtrl:
+        # one object, so events triggered by a request reach the monitor
+        return self.replay_ctrl
+
+    @property
+    def replay(self) -> _Replay:
+        return self.replay_ctrl.replay
+
+
+def synthetic_scan_output(count: int) -> str:
+    """Generate ``airport -s`` output of many networks.
+
+    Args:
+        count: Number of networks.
+
+    Returns:
+        Output with a header line. For example: '  SSID BSSID ...'
+    """
+    lines = [
+        "                            SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)"
+    ]
+    for i in range(count):
+        ssid = f"Net {i:05d}"
+        bssid = ":".join(f"{(i >> shift) & 0xFF:02x}" for shift in (0, 8, 16, 0, 8, 16))
+        channel = ("1", "6", "11", "36", "149,+1")[i % 5]
+        lines.append(
+            f"{ssid.rjust(32)} {bssid} -{30 + i % 60:<3} {channel:<7} Y  CN WPA2(PSK/AES/AES)"
+        )
+    return "\n".join(lines) + "\n"
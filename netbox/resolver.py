@@ -0,0 +1,514 @@
+import collections
+import ipaddress
+import random
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+import typing as t
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from . import logger
+from .stats import LatencyHistogram
+
+DNS_PORT = 53
+DNS_HEADER = struct.Struct("!HHHHHH")
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_SOA = 6
+CLASS_IN = 1
+RCODE_NXDOMAIN = 3
+
+# (host, port) of a nameserver
+Nameserver = t.Tuple[str, int]
+# address or None if the name does not exist
+Answer = t.Optional[str]
+
+
+def build_query(qid: int, name: str) -> bytes:
+    """Build a DNS query of the A record of a name, recursion desired.
+
+    Args:
+        qid: Identifier of the query.
+        name: Domain. For example: jd.com
+
+    Returns:
+        Bytes of the UDP payload.
+    """
+    question = b"".join(
+        bytes([len(label)]) + label
+        for label in name.rstrip(".").encode("idna").split(b".")
+    )
+    header = DNS_HEADER.pack(qid, 0x0100, 1, 0, 0, 0)
+    return header + question + b"\x00" + struct.pack("!HH", TYPE_A, CLASS_IN)
+
+
+def _read_name(packet: bytes, offset: int) -> t.Tuple[str, int]:
+    """Read a possibly compressed name, return it and the offset after it."""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = packet[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | packet[offset + 1]
+            continue
+        offset += 1
+        if not length:
+            break
+        labels.append(packet[offset : offset + length].decode("ascii", "replace"))
+        offset += length
+    else:
+        raise ValueError("Name has too many labels or a compression loop.")
+    return ".".join(labels).lower(), offset if end is None else end
+
+
+def parse_response(packet: bytes) -> t.Tuple[int, str, int, t.List[str], int]:
+    """Parse a DNS response.
+
+    Args:
+        packet: UDP payload received from a nameserver.
+
+    Raises:
+        ValueError: Packet is not a DNS response.
+
+    Returns:
+        Tuple of (identifier, question name, rcode, addresses, ttl). ttl is
+        the smallest TTL of the answer chain, or of the SOA record of a
+        negative answer, -1 if the answer tells none.
+    """
+    try:
+        qid, flags, qdcount, ancount, nscount, _ = DNS_HEADER.unpack_from(packet)
+        if not flags & 0x8000 or qdcount != 1:
+            raise ValueError("Packet is not a response of one question.")
+        name, offset = _read_name(packet, DNS_HEADER.size)
+        offset += 4
+        addresses = []
+        ttls = []
+        for index in range(ancount + nscount):
+            _, offset = _read_name(packet, offset)
+            rtype, _, ttl, size = struct.unpack_from("!HHIH", packet, offset)
+            offset += 10
+            data = packet[offset : offset + size]
+            offset += size
+            if index < ancount:
+                if rtype == TYPE_A and size == 4:
+                    addresses.append(socket.inet_ntoa(data))
+                    ttls.append(ttl)
+                elif rtype == TYPE_CNAME:
+                    ttls.append(ttl)
+            elif rtype == TYPE_SOA and not addresses:
+                # negative answers are cached as long as min(TTL, MINIMUM)
+                minimum = struct.unpack("!I", packet[offset - 4 : offset])[0]
+                ttls.append(min(ttl, minimum))
+    except (struct.error, IndexError) as e:
+        raise ValueError(f"Packet is truncated: {e}")
+    return qid, name, flags & 0x000F, addresses, min(ttls) if ttls else -1
+
+
+def read_resolv_conf(path: str = "/etc/resolv.conf") -> t.List[Nameserver]:
+    """Read nameservers of the system.
+
+    Returns:
+        List of (host, port). For example: [('192.168.1.1', 53)]
+    """
+    nameservers = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    # scoped IPv6 addresses are left to the system resolver
+                    if "%" not in fields[1]:
+                        nameservers.append((fields[1], DNS_PORT))
+    except OSError:
+        pass
+    return nameservers
+
+
+def read_hosts(path: str = "/etc/hosts") -> t.Dict[str, str]:
+    """Read IPv4 addresses of the hosts file.
+
+    Returns:
+        Mapping of lowercase name to address. For example: {'localhost': '127.0.0.1'}
+    """
+    hosts: t.Dict[str, str] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                fields = line.split("#", 1)[0].split()
+                if len(fields) < 2 or ":" in fields[0]:
+                    continue
+                for name in fields[1:]:
+                    hosts.setdefault(name.lower(), fields[0])
+    except OSError:
+        pass
+    return hosts
+
+
+def _literal(name: str) -> t.Optional[str]:
+    try:
+        return str(ipaddress.IPv4Address(name))
+    except ValueError:
+        return None
+
+
+class _Query(object):
+    """A query waiting for its response."""
+
+    __slots__ = ("name", "qid", "attempt", "sent", "started")
+
+    def __init__(self, name: str, qid: int, started: float) -> None:
+        self.name = name
+        self.qid = qid
+        self.attempt = 0
+        self.sent = started
+        self.started = started
+
+
+class Resolver(object):
+    """Resolve names to IPv4 addresses concurrently and cache the answers.
+
+    Queries of a batch are sent over one UDP socket and matched back by
+    identifier, answers are cached as long as their TTL allows and names
+    which do not exist as long as the SOA of the answer allows. A name
+    being resolved by one thread is waited for by the others instead of
+    being queried again. Names the nameservers do not answer or say do not
+    exist, names without a dot which rely on search domains and mDNS names
+    are left to the system resolver, which also knows nameservers of VPNs
+    and split DNS that resolv.conf does not list.
+
+    Args:
+        nameservers: (host, port) of nameservers, defaults to resolv.conf.
+            MacOS defaults to none, its resolv.conf lacks scoped nameservers
+            so every name is left to the system resolver there.
+        timeout: Seconds to wait for a response before the next attempt.
+        attempts: Number of queries of a name, nameservers take turns.
+        concurrency: Maximum number of queries in flight.
+        min_ttl: Lower bound of seconds an answer is cached.
+        max_ttl: Upper bound of seconds an answer is cached.
+        negative_ttl: Seconds a missing name is cached if the answer has no SOA.
+        system_ttl: Seconds an answer of the system resolver is cached.
+        hosts: Mapping of static names, defaults to the hosts file.
+    """
+
+    def __init__(
+        self,
+        nameservers: t.Optional[t.Sequence[Nameserver]] = None,
+        timeout: float = 1.0,
+        attempts: int = 2,
+        concurrency: int = 256,
+        min_ttl: float = 1.0,
+        max_ttl: float = 3600.0,
+        negative_ttl: float = 30.0,
+        system_ttl: float = 60.0,
+        hosts: t.Optional[t.Mapping[str, str]] = None,
+    ) -> None:
+        if nameservers is None:
+            nameservers = [] if sys.platform == "darwin" else read_resolv_conf()
+        self.nameservers = list(nameservers)
+        self.timeout = timeout
+        self.attempts = max(attempts, 1)
+        self.concurrency = concurrency
+        self.min_ttl = min_ttl
+        self.max_ttl = max_ttl
+        self.negative_ttl = negative_ttl
+        self.system_ttl = system_ttl
+        self.hosts = dict(read_hosts() if hosts is None else hosts)
+        self._cache: t.Dict[str, t.Tuple[float, Answer]] = {}
+        self._inflight: t.Dict[str, "Future[Answer]"] = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self.latency = LatencyHistogram()
+        self._counters = collections.Counter()  # type: t.Counter[str]
+
+    def _store(self, name: str, answer: Answer, ttl: float) -> None:
+        ttl = min(max(ttl, self.min_ttl), self.max_ttl)
+        self._cache[name] = (time.monotonic() + ttl, answer)
+
+    def cached(self, name: str) -> t.Tuple[bool, Answer]:
+        """Look a name up without querying.
+
+        Returns:
+            Tuple of (known, answer), known is False if ``resolve`` would query.
+        """
+        key = name.rstrip(".").lower()
+        literal = _literal(key) or self.hosts.get(key)
+        if literal is not None:
+            return True, literal
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is None or cached[0] <= time.monotonic():
+                return False, None
+            self._counters["hits"] += 1
+            if cached[1] is None:
+                self._counters["negative_hits"] += 1
+            return True, cached[1]
+
+    def resolve(self, name: str) -> Answer:
+        """Resolve a name.
+
+        Args:
+            name: IP address or domain. For example: jd.com
+
+        Returns:
+            IPv4 address or None if it can not be resolved.
+        """
+        return self.resolve_many([name])[name]
+
+    def resolve_many(self, names: t.Iterable[str]) -> t.Dict[str, Answer]:
+        """Resolve names concurrently.
+
+        Args:
+            names: IP addresses or domains, duplicates are resolved once.
+
+        Returns:
+            Mapping of each name to its IPv4 address, None if it can not be
+            resolved. For example: {'jd.com': '111.13.149.108', 'no.such': None}
+        """
+        results: t.Dict[str, Answer] = {}
+        waiting: t.Dict[str, "Future[Answer]"] = {}
+        owned: t.Dict[str, "Future[Answer]"] = {}
+        now = time.monotonic()
+        with self._lock:
+            for name in names:
+                if name in results or name in waiting or name in owned:
+                    continue
+                key = name.rstrip(".").lower()
+                literal = _literal(key) or self.hosts.get(key)
+                if literal is not None:
+                    results[name] = literal
+                    continue
+                cached = self._cache.get(key)
+                if cached is not None and cached[0] > now:
+                    self._counters["hits"] += 1
+                    if cached[1] is None:
+                        self._counters["negative_hits"] += 1
+                    results[name] = cached[1]
+                    continue
+                self._counters["misses"] += 1
+                future = self._inflight.get(key)
+                if future is not None:
+                    self._counters["coalesced"] += 1
+                    waiting[name] = future
+                    continue
+                future = self._inflight[key] = Future()
+                owned[name] = future
+        if owned:
+            keys = {name: name.rstrip(".").lower() for name in owned}
+            try:
+                answers = self._lookup(list(dict.fromkeys(keys.values())))
+            except Exception as e:
+                with self._lock:
+                    for name, future in owned.items():
+                        self._inflight.pop(keys[name], None)
+                        future.set_exception(e)
+                raise
+            with self._lock:
+                for name, future in owned.items():
+                    answer = answers[keys[name]]
+                    self._inflight.pop(keys[name], None)
+                    future.set_result(answer)
+                    results[name] = answer
+        for name, future in waiting.items():
+            results[name] = future.result()
+        return results
+
+    def _lookup(self, keys: t.List[str]) -> t.Dict[str, Answer]:
+        """Resolve names which are not cached, cache and return the answers."""
+        answers: t.Dict[str, Answer] = {}
+        # key -> ttl of names the nameservers say do not exist
+        negative: t.Dict[str, float] = {}
+        system = [
+            key
+            for key in keys
+            if "." not in key or key.endswith(".local") or not self.nameservers
+        ]
+        if len(system) < len(keys):
+            queried = [key for key in keys if key not in system]
+            for key, (answer, ttl) in self._query(queried).items():
+                if ttl is None:
+                    system.append(key)
+                    continue
+                if answer is None:
+                    # the system resolver may ask a nameserver which knows it
+                    negative[key] = ttl
+                    system.append(key)
+                    continue
+                with self._lock:
+                    self._store(key, answer, ttl)
+                answers[key] = answer
+        if system:
+            self._counters["system"] += len(system)
+            workers = min(len(system), 16)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for key, answer in zip(system, executor.map(self._system, system)):
+                    ttl = self.system_ttl
+                    if answer is None:
+                        ttl = negative.get(key, ttl)
+                    with self._lock:
+                        self._store(key, answer, ttl)
+                    answers[key] = answer
+        return answers
+
+    def _system(self, name: str) -> Answer:
+        start = time.perf_counter()
+        try:
+            return socket.gethostbyname(name)
+        except (socket.gaierror, UnicodeError, OSError):
+            return None
+        finally:
+            self.latency.record(time.perf_counter() - start)
+
+    def _query(
+        self, names: t.List[str]
+    ) -> t.Dict[str, t.Tuple[Answer, t.Optional[float]]]:
+        """Query nameservers, ttl is None if no nameserver answered."""
+        results: t.Dict[str, t.Tuple[Answer, t.Optional[float]]] = {}
+        servers = []
+        selector = selectors.DefaultSelector()
+        socks: t.Dict[int, socket.socket] = {}
+        for host, port in self.nameservers:
+            try:
+                family, _, _, _, sockaddr = socket.getaddrinfo(
+                    host, port, type=socket.SOCK_DGRAM, flags=socket.AI_NUMERICHOST
+                )[0]
+            except socket.gaierror:
+                continue
+            if family not in socks:
+                sock = socks[family] = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                selector.register(sock, selectors.EVENT_READ)
+            servers.append((socks[family], sockaddr))
+        if not servers:
+            selector.close()
+            return {name: (None, None) for name in names}
+        pending = collections.deque(names)
+        # ordered by send time, so the oldest query is always the first one
+        inflight: "collections.OrderedDict[int, _Query]" = collections.OrderedDict()
+
+        def send(query: _Query) -> None:
+            sock, sockaddr = servers[query.attempt % len(servers)]
+            query.sent = time.perf_counter()
+            self._counters["queries"] += 1
+            try:
+                sock.sendto(build_query(query.qid, query.name), sockaddr)
+            except (OSError, UnicodeError) as e:
+                logger.debug(msg=f"Query {query.name} failed: {e}")
+
+        try:
+            while pending or inflight:
+                while pending and len(inflight) < self.concurrency:
+                    name = pending.popleft()
+                    qid = self._random.getrandbits(16)
+                    while qid in inflight:
+                        qid = self._random.getrandbits(16)
+                    query = inflight[qid] = _Query(name, qid, time.perf_counter())
+                    send(query)
+
+                oldest = next(iter(inflight.values()))
+                wait = max(0.0, oldest.sent + self.timeout - time.perf_counter())
+                for key, _ in selector.select(wait):
+                    self._receive(t.cast(socket.socket, key.fileobj), inflight, results)
+
+                deadline = time.perf_counter() - self.timeout
+                while inflight:
+                    qid, query = next(iter(inflight.items()))
+                    if query.sent > deadline:
+                        break
+                    del inflight[qid]
+                    query.attempt += 1
+                    if query.attempt < self.attempts:
+                        inflight[qid] = query
+                        send(query)
+                    else:
+                        self._counters["timeouts"] += 1
+                        results[query.name] = (None, None)
+        finally:
+            for sock in socks.values():
+                sock.close()
+            selector.close()
+        return results
+
+    def _receive(
+        self,
+        sock: socket.socket,
+        inflight: t.MutableMapping[int, _Query],
+        results: t.Dict[str, t.Tuple[Answer, t.Optional[float]]],
+    ) -> None:
+        while inflight:
+            try:
+                packet = sock.recv(4096)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                # ICMP port unreachable of a previous query
+                logger.debug(msg=f"Receive of nameserver failed: {e}")
+                continue
+            try:
+                qid, name, rcode, addresses, ttl = parse_response(packet)
+            except ValueError:
+                continue
+            query = inflight.get(qid)
+            if query is None or query.name != name:
+                continue
+            if rcode not in (0, RCODE_NXDOMAIN):
+                # SERVFAIL or REFUSED, the next attempt asks the next server
+                continue
+            del inflight[qid]
+            self.latency.record(time.perf_counter() - query.started)
+            if addresses:
+                results[name] = (addresses[0], ttl if ttl >= 0 else self.min_ttl)
+            else:
+                results[name] = (None, ttl if ttl >= 0 else self.negative_ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> t.Dict[str, t.Any]:
+        """Obtain cache and latency statistics.
+
+        Returns:
+            Counters and milliseconds. For example: {'hits': 90, 'misses': 10, 'hit_rate': 0.9, 'queries': 10, 'timeouts': 0, 'p50': 1.2, 'p99': 20.1, ...}
+        """
+        counters = dict(self._counters)
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        stats: t.Dict[str, t.Any] = {
+            name: counters.get(name, 0)
+            for name in (
+                "hits",
+                "negative_hits",
+                "misses",
+                "coalesced",
+                "queries",
+                "timeouts",
+                "system",
+            )
+        }
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else None
+        stats["cached"] = len(self._cache)
+        for p in (50, 99):
+            value = self.latency.percentile(p)
+            stats[f"p{p}"] = None if value is None else round(value * 1000, 3)
+        return stats
+
+
+_default: t.Optional[Resolver] = None
+
+
+def get_resolver() -> Resolver:
+    """Obtain the resolver shared by all probes of the process."""
+    global _default
+    if _default is None:
+        _default = Resolver()
+    return _default
+
+
+def set_resolver(resolver: t.Optional[Resolver]) -> None:
+    """Replace the shared resolver, None creates a new one on next use."""
+    global _default
+    _default = resolver
@@ -0,0 +1,158 @@
+import time
+import typing as t
+
+
+class Network(object):
+    """A compact record of one access point found by a wifi scan."""
+
+    __slots__ = ("ssid", "bssid", "rssi", "channel", "ht", "cc", "security")
+
+    def __init__(
+        self,
+        ssid: str,
+        bssid: str,
+        rssi: int,
+        channel: str,
+        ht: str = "",
+        cc: str = "",
+        security: str = "",
+    ) -> None:
+        self.ssid = ssid
+        self.bssid = bssid
+        self.rssi = rssi
+        self.channel = channel
+        self.ht = ht
+        self.cc = cc
+        self.security = security
+
+    @property
+    def primary_channel(self) -> int:
+        """Obtain primary channel number.
+
+        Returns:
+            Channel number, 0 if it is unknown. For example: 36 for '36,+1'
+        """
+        head = self.channel.split(",", 1)[0]
+        return int(head) if head.isdigit() else 0
+
+    def to_dict(self) -> t.Dict[str, str]:
+        """Convert to the dict layout of scanning results.
+
+        Returns:
+            Dict of network. For example: {'ssid': 'TP-Link001', 'rssi': '-30', ...}
+        """
+        return {
+            "ssid": self.ssid,
+            "bssid": self.bssid,
+            "rssi": str(self.rssi),
+            "channel": self.channel,
+            "HT": self.ht,
+            "security": self.security,
+        }
+
+    def __repr__(self) -> str:
+        return (
+            f"Network(ssid={self.ssid!r}, bssid={self.bssid!r}, "
+            f"rssi={self.rssi}, channel={self.channel!r})"
+        )
+
+
+class ScanResult(object):
+    """Results of one wifi scan, indexed by ssid, bssid and channel.
+
+    Args:
+        networks: Networks found by the scan.
+        timestamp: Unix time of the scan, defaults to now.
+    """
+
+    def __init__(
+        self, networks: t.Iterable[Network], timestamp: t.Optional[float] = None
+    ) -> None:
+        self.networks: t.Tuple[Network, ...] = tuple(networks)
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._created = time.monotonic()
+        self.by_ssid: t.Dict[str, t.List[Network]] = {}
+        self.by_bssid: t.Dict[str, Network] = {}
+        self.by_channel: t.Dict[int, t.List[Network]] = {}
+        for network in self.networks:
+            self.by_ssid.setdefault(network.ssid, []).append(network)
+            if network.bssid:
+                self.by_bssid[network.bssid] = network
+            self.by_channel.setdefault(network.primary_channel, []).append(network)
+
+    @property
+    def age(self) -> float:
+        """Seconds since the scan was taken."""
+        return time.monotonic() - self._created
+
+    def is_fresh(self, max_age: float) -> bool:
+        """Determine whether the scan is younger than ``max_age`` seconds."""
+        return self.age <= max_age
+
+    def __len__(self) -> int:
+        return len(self.networks)
+
+    def __iter__(self) -> t.Iterator[Network]:
+        return iter(self.networks)
+
+    def __contains__(self, ssid: object) -> bool:
+        return ssid in self.by_ssid
+
+    def ssids(self) -> t.List[str]:
+        """Obtain a collection of found ssid without duplicates.
+
+        Returns:
+            Collection of ssid. For example: ['test01', 'ChinaNet-test001']
+        """
+        return list(self.by_ssid)
+
+    def filter(
+        self,
+        ssid: t.Optional[str] = None,
+        channel: t.Optional[int] = None,
+        min_rssi: t.Optional[int] = None,
+    ) -> t.List[Network]:
+        """Obtain networks matched all given conditions.
+
+        Args:
+            ssid: Name of wifi network.
+            channel: Primary channel number.
+            min_rssi: Minimum signal strength.
+
+        Returns:
+            Matched networks in scanning order.
+        """
+        if ssid is not None:
+            candidates: t.Sequence[Network] = self.by_ssid.get(ssid, [])
+        elif channel is not None:
+            candidates = self.by_channel.get(channel, [])
+        else:
+            candidates = self.networks
+        return [
+            network
+            for network in candidates
+            if (channel is None or network.primary_channel == channel)
+            and (min_rssi is None or network.rssi >= min_rssi)
+        ]
+
+    def strongest(
+        self, ssid: t.Optional[str] = None, channel: t.Optional[int] = None
+    ) -> t.Optional[Network]:
+        """Obtain the network with the strongest signal.
+
+        Args:
+            ssid: Name of wifi network.
+            channel: Primary channel number.
+
+        Returns:
+            Matched network or None if nothing matched.
+        """
+        return max(
+            self.filter(ssid=ssid, channel=channel),
+            key=lambda network: network.rssi,
+            default=None,
+        )
+
+    def to_list(self) -> t.List[t.Dict[str, str]]:
+        """Convert to the list layout of scanning results."""
+        return [network.to_dict() for network in self.networks]
@@ -0,0 +1,496 @@
+import collections
+import json
+import math
+import random
+import threading
+import time
+import typing as t
+from concurrent.futures import ThreadPoolExecutor
+
+from . import logger, metrics
+from .exception import PlanException
+from .stats import LatencyHistogram
+
+if t.TYPE_CHECKING:
+    from .core import Netbox
+
+# result of a probe of each target
+ProbeFunc = t.Callable[["Netbox", t.List[str], float], t.Dict[str, t.Any]]
+
+
+class Probe(t.NamedTuple):
+    """A type of check.
+
+    ``run`` probes a batch of targets at once, ``concurrency`` is the default
+    maximum number of targets being probed and ``workers`` the number of
+    batches running at the same time.
+    """
+
+    run: ProbeFunc
+    concurrency: int
+    workers: int
+    timeout: float
+
+
+PROBES: t.Dict[str, Probe] = {}
+
+
+def probe(
+    name: str, concurrency: int, workers: int = 4, timeout: float = 1.0
+) -> t.Callable[[ProbeFunc], ProbeFunc]:
+    """Register a probe type of the scheduler."""
+
+    def register(func: ProbeFunc) -> ProbeFunc:
+        PROBES[name] = Probe(func, concurrency, workers, timeout)
+        return func
+
+    return register
+
+
+@probe("ping", concurrency=1024)
+def probe_ping(
+    netbox: "Netbox", targets: t.List[str], timeout: float
+) -> t.Dict[str, t.Any]:
+    # one shared ICMP socket for the whole batch
+    return netbox.check_hosts(targets, timeout=timeout, concurrency=len(targets))
+
+
+@probe("tcp", concurrency=512, timeout=2.0)
+def probe_tcp(
+    netbox: "Netbox", targets: t.List[str], timeout: float
+) -> t.Dict[str, t.Any]:
+    return netbox.check_tcp(targets, timeout=timeout, concurrency=len(targets))
+
+
+@probe("rssi", concurrency=1, workers=1, timeout=5.0)
+def probe_rssi(
+    netbox: "Netbox", targets: t.List[str], timeout: float
+) -> t.Dict[str, t.Any]:
+    try:
+        rssi: t.Optional[float] = float(netbox.rssi)  # type: ignore
+    except (TypeError, ValueError):
+        rssi = None
+    return {target: rssi for target in targets}
+
+
+class TimerWheel(object):
+    """Hierarchical timer wheel.
+
+    Level 0 has a slot per tick, a slot of each following level is as long
+    as a whole turn of the level below and is cascaded into it when the turn
+    begins. Scheduling and expiring a timer are O(1) whatever the number of
+    timers, which wait without any cost.
+
+    Args:
+        tick: Seconds of a slot of level 0.
+        bits: log2 of the number of slots of each level.
+        start: Monotonic time of tick 0, defaults to now.
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        bits: t.Sequence[int] = (8, 6, 6, 6),
+        start: t.Optional[float] = None,
+    ) -> None:
+        self.tick = tick
+        self.origin = time.monotonic() if start is None else start
+        # ticks expired so far
+        self.current = 0
+        self._shifts = []
+        shift = 0
+        for n in bits:
+            self._shifts.append(shift)
+            shift += n
+        self._bits = list(bits)
+        self._span = 1 << shift
+        # slots hold [ticks, deadline, item]
+        self._levels: t.List[t.List[t.List[t.List[t.Any]]]] = [
+            [[] for _ in range(1 << n)] for n in bits
+        ]
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _place(self, entry: t.List[t.Any]) -> None:
+        delta = entry[0] - self.current
+        for shift, n, slots in zip(self._shifts, self._bits, self._levels):
+            if delta < 1 << (shift + n):
+                slots[(entry[0] >> shift) & ((1 << n) - 1)].append(entry)
+                return
+        # beyond the last level, kept in its farthest slot and placed again
+        shift, n = self._shifts[-1], self._bits[-1]
+        farthest = self.current + self._span - 1
+        self._levels[-1][(farthest >> shift) & ((1 << n) - 1)].append(entry)
+
+    def schedule(self, deadline: float, item: t.Any) -> None:
+        """Schedule an item, a deadline in the past expires on the next tick.
+
+        Args:
+            deadline: Monotonic time the item expires at.
+            item: Anything.
+        """
+        ticks = math.ceil((deadline - self.origin) / self.tick - 1e-9)
+        self._place([max(ticks, self.current + 1), deadline, item])
+        self._count += 1
+
+    def advance(self, now: t.Optional[float] = None) -> t.List[t.Tuple[float, t.Any]]:
+        """Expire every item whose tick has passed.
+
+        Args:
+            now: Monotonic time, defaults to now.
+
+        Returns:
+            List of (deadline, item) in the order of their ticks.
+        """
+        now = time.monotonic() if now is None else now
+        target = int((now - self.origin) / self.tick + 1e-9)
+        expired: t.List[t.Tuple[float, t.Any]] = []
+        levels = self._levels
+        while self.current < target:
+            self.current += 1
+            current = self.current
+            for level in range(len(levels) - 1, 0, -1):
+                shift = self._shifts[level]
+                if current & ((1 << shift) - 1):
+                    continue
+                index = (current >> shift) & ((1 << self._bits[level]) - 1)
+                slot = levels[level][index]
+                if slot:
+                    levels[level][index] = []
+                    for entry in slot:
+                        self._place(entry)
+            index = current & ((1 << self._bits[0]) - 1)
+            slot = levels[0][index]
+            if slot:
+                levels[0][index] = []
+                expired.extend((entry[1], entry[2]) for entry in slot)
+        self._count -= len(expired)
+        return expired
+
+    def next_expiry(self) -> t.Optional[float]:
+        """Monotonic time of the next tick which may expire an item.
+
+        It is the next non-empty slot of level 0, or the next cascade if
+        level 0 is empty, so an idle wheel is not advanced tick by tick.
+
+        Returns:
+            Monotonic time or None if the wheel is empty.
+        """
+        if not self._count:
+            return None
+        slots = self._levels[0]
+        mask = len(slots) - 1
+        ticks = self.current + 1
+        while True:
+            if slots[ticks & mask] or not ticks & mask:
+                return self.origin + ticks * self.tick
+            ticks += 1
+
+
+class Check(object):
+    """A periodic check of a target.
+
+    Args:
+        probe: Type of the check. For example: ping
+        target: Host probed. For example: 192.168.1.1
+        interval: Seconds between two runs.
+        timeout: Seconds to wait for a result.
+    """
+
+    __slots__ = (
+        "probe",
+        "target",
+        "interval",
+        "timeout",
+        "nominal",
+        "running",
+        "runs",
+        "missed",
+        "failures",
+        "last",
+    )
+
+    def __init__(
+        self, probe: str, target: str, interval: float, timeout: float
+    ) -> None:
+        self.probe = probe
+        self.target = target
+        self.interval = interval
+        self.timeout = timeout
+        # deadline before jitter
+        self.nominal = 0.0
+        self.running = False
+        self.runs = 0
+        self.missed = 0
+        self.failures = 0
+        self.last: t.Any = None
+
+    def __repr__(self) -> str:
+        return f"Check({self.probe}, {self.target!r}, every {self.interval}s)"
+
+
+def load_plan(
+    plan: t.Union[str, t.Mapping[str, t.Any]], probes: t.Mapping[str, Probe] = PROBES
+) -> t.Tuple[t.List[Check], t.Dict[str, t.Any]]:
+    """Load checks of a plan.
+
+    A plan is JSON such as ``{"jitter": 0.1, "concurrency": {"ping": 512},
+    "checks": [{"probe": "ping", "targets": ["192.168.1.1"], "interval": 1}]}``,
+    a check without targets probes once, which suits the rssi probe.
+
+    Args:
+        plan: Path of the plan or its dict.
+        probes: Known probe types.
+
+    Raises:
+        PlanException: Plan is invalid.
+
+    Returns:
+        Tuple of (checks, options of Scheduler).
+    """
+    if isinstance(plan, str):
+        try:
+            with open(plan, "r", encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as e:
+            raise PlanException(message=f"Plan can not be loaded: {e}")
+    plan = t.cast(t.Mapping[str, t.Any], plan)
+    checks = []
+    for i, spec in enumerate(plan.get("checks", [])):
+        name = spec.get("probe")
+        if name not in probes:
+            raise PlanException(
+                message=f"Check {i} has unknown probe {name}, choose from {sorted(probes)}."
+            )
+        interval = spec.get("interval", 1.0)
+        if not isinstance(interval, (int, float)) or interval <= 0:
+            raise PlanException(message=f"Check {i} has invalid interval {interval}.")
+        timeout = spec.get("timeout", min(probes[name].timeout, interval))
+        for target in spec.get("targets") or [spec.get("target", "")]:
+            checks.append(Check(name, target, float(interval), float(timeout)))
+    if not checks:
+        raise PlanException(message="Plan has no checks.")
+    options = {
+        key: plan[key] for key in ("tick", "jitter", "concurrency") if key in plan
+    }
+    return checks, options
+
+
+class Scheduler(object):
+    """Run periodic checks from one process.
+
+    Deadlines wait in a TimerWheel, first runs of checks of the same interval
+    are spread evenly over the interval and every run is delayed by a random
+    jitter. Due checks of a probe type are probed in batches with at most
+    ``concurrency`` targets in flight; a check still running or waiting when
+    its next run is due misses that run.
+
+    Args:
+        netbox: Netbox the probes call.
+        checks: Checks to run.
+        tick: Seconds of a tick of the timer wheel.
+        jitter: Maximum delay of a run as a fraction of its interval.
+        concurrency: Maximum targets in flight of each probe type.
+        probes: Probe types, defaults to PROBES.
+        on_result: Called with a check and its result after each run.
+    """
+
+    def __init__(
+        self,
+        netbox: "Netbox",
+        checks: t.Sequence[Check],
+        tick: float = 0.01,
+        jitter: float = 0.1,
+        concurrency: t.Optional[t.Mapping[str, int]] = None,
+        probes: t.Mapping[str, Probe] = PROBES,
+        on_result: t.Optional[t.Callable[[Check, t.Any], None]] = None,
+    ) -> None:
+        self.netbox = netbox
+        self.checks = list(checks)
+        self.jitter = jitter
+        self.probes = probes
+        self.on_result = on_result
+        self.wheel = TimerWheel(tick=tick)
+        self.concurrency = {name: probe.concurrency for name, probe in probes.items()}
+        self.concurrency.update(concurrency or {})
+        self._pending: t.Dict[str, t.Deque[t.Tuple[float, Check]]] = {}
+        self._inflight: t.Dict[str, int] = {}
+        self._executors: t.Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._random = random.Random()
+        # seconds from the tick of a deadline until the scheduler handled it
+        self.lag = LatencyHistogram()
+        # seconds from a deadline until the probe of the check started
+        self.delay = LatencyHistogram()
+        self.max_lag = 0.0
+        self.started = 0.0
+
+    def _jitter(self, check: Check) -> float:
+        return self._random.uniform(0, self.jitter * check.interval)
+
+    def _start(self) -> None:
+        self.started = now = time.monotonic()
+        self.wheel = TimerWheel(tick=self.wheel.tick, start=now)
+        groups: t.Dict[t.Tuple[str, float], t.List[Check]] = {}
+        for check in self.checks:
+            groups.setdefault((check.probe, check.interval), []).append(check)
+        for (name, interval), checks in groups.items():
+            self._pending.setdefault(name, collections.deque())
+            self._inflight.setdefault(name, 0)
+            if name not in self._executors:
+                self._executors[name] = ThreadPoolExecutor(
+                    max_workers=self.probes[name].workers,
+                    thread_name_prefix=f"netbox-{name}",
+                )
+            for i, check in enumerate(checks):
+                check.nominal = now + interval * i / len(checks)
+                self.wheel.schedule(check.nominal + self._jitter(check), check)
+
+    def _expire(self, now: float) -> None:
+        for deadline, check in self.wheel.advance(now):
+            lag = max(now - deadline, 0.0)
+            self.lag.record(lag)
+            self.max_lag = max(self.max_lag, lag)
+            check.nominal += check.interval
+            # runs which passed while the scheduler was stalled are missed
+            while check.nominal < now:
+                check.nominal += check.interval
+                check.missed += 1
+            self.wheel.schedule(check.nominal + self._jitter(check), check)
+            if check.running:
+                check.missed += 1
+            else:
+                check.running = True
+                self._pending[check.probe].append((deadline, check))
+
+    def _dispatch(self, now: float) -> None:
+        with self._lock:
+            for name, pending in self._pending.items():
+                free = self.concurrency[name] - self._inflight[name]
+                batch: t.List[t.Tuple[float, Check]] = []
+                while pending and len(batch) < free:
+                    deadline, check = pending.popleft()
+                    if now - deadline >= check.interval:
+                        check.running = False
+                        check.missed += 1
+                        continue
+                    batch.append((deadline, check))
+                if batch:
+                    self._inflight[name] += len(batch)
+                    self._executors[name].submit(self._run_batch, name, batch)
+
+    def _run_batch(self, name: str, batch: t.List[t.Tuple[float, Check]]) -> None:
+        start = time.monotonic()
+        for deadline, _ in batch:
+            self.delay.record(max(start - deadline, 0.0))
+        targets = list(dict.fromkeys(check.target for _, check in batch))
+        timeout = max(check.timeout for _, check in batch)
+        try:
+            with metrics.span(f"probe.{name}"):
+                results = self.probes[name].run(self.netbox, targets, timeout)
+        except Exception as e:
+            logger.debug(msg=f"Probe {name} of {len(targets)} targets failed: {e}")
+            results = {}
+        with self._lock:
+            self._inflight[name] -= len(batch)
+            for _, check in batch:
+                check.running = False
+                check.runs += 1
+                check.last = results.get(check.target)
+                if check.last is None or check.last is False:
+                    check.failures += 1
+        self._wake.set()
+        if self.on_result is not None:
+            for _, check in batch:
+                self.on_result(check, check.last)
+
+    def report(self) -> t.Dict[str, t.Any]:
+        """Obtain counters of the checks and latencies of the scheduler.
+
+        Returns:
+            Report in milliseconds. For example: {'uptime': 60.0, 'checks': 10000, 'runs': 600000, 'missed': 0, 'lag': {'p50': 0.1, 'p99': 1.2, 'max': 3.4}, 'probes': {'ping': {...}}}
+        """
+
+        def percentiles(histogram: LatencyHistogram) -> t.Dict[str, t.Any]:
+            return {
+                f"p{p}": None if value is None else round(value * 1000, 3)
+                for p, value in ((p, histogram.percentile(p)) for p in (50, 99))
+            }
+
+        probes: t.Dict[str, t.Dict[str, int]] = {}
+        with self._lock:
+            for check in self.checks:
+                counters = probes.setdefault(
+                    check.probe,
+                    {
+                        "checks": 0,
+                        "runs": 0,
+                        "missed": 0,
+                        "failures": 0,
+                        "inflight": self._inflight.get(check.probe, 0),
+                        "pending": len(self._pending.get(check.probe, ())),
+                    },
+                )
+                counters["checks"] += 1
+                counters["runs"] += check.runs
+                counters["missed"] += check.missed
+                counters["failures"] += check.failures
+        return {
+            "uptime": round(time.monotonic() - self.started, 3) if self.started else 0,
+            "checks": len(self.checks),
+            "runs": sum(counters["runs"] for counters in probes.values()),
+            "missed": sum(counters["missed"] for counters in probes.values()),
+            "lag": {**percentiles(self.lag), "max": round(self.max_lag * 1000, 3)},
+            "delay": percentiles(self.delay),
+            "probes": probes,
+        }
+
+    def run(
+        self,
+        duration: t.Optional[float] = None,
+        report_interval: t.Optional[float] = None,
+        on_report: t.Optional[t.Callable[[t.Dict[str, t.Any]], None]] = None,
+    ) -> t.Dict[str, t.Any]:
+        """Run checks until stopped.
+
+        Args:
+            duration: Seconds to run, defaults to until ``stop`` is called.
+            report_interval: Seconds between two calls of ``on_report``.
+            on_report: Called with ``report()`` while running.
+
+        Returns:
+            Final report.
+        """
+        self._start()
+        end = None if duration is None else self.started + duration
+        next_report = self.started + (report_interval or 0)
+        try:
+            while not self._stopped.is_set():
+                now = time.monotonic()
+                if end is not None and now >= end:
+                    break
+                self._expire(now)
+                self._dispatch(now)
+                if on_report is not None and report_interval and now >= next_report:
+                    on_report(self.report())
+                    next_report += report_interval
+                wake = self.wheel.next_expiry() or now + 1.0
+                if end is not None:
+                    wake = min(wake, end)
+                if on_report is not None and report_interval:
+                    wake = min(wake, next_report)
+                self._wake.wait(max(min(wake - time.monotonic(), 1.0), 0))
+                self._wake.clear()
+        finally:
+            for executor in self._executors.values():
+                executor.shutdown(wait=True)
+            self._executors.clear()
+        return self.report()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
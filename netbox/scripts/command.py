@@ -1,23 +1,107 @@
-import logging
+import functools
+import json
+import time
+import typing as t
 
 import click  # type:ignore
 
-from netbox import logger
-
 from ..constant import WiFiState
-from ..core import Netbox
+from ..exception import NetboxException
 from ..version import __version__
 
+if t.TYPE_CHECKING:
+    from ..core import Netbox
+
+# Modules of network operations are imported by the commands which need them,
+# so short-lived invocations such as `netbox-cli version` start fast.
+
+
+def get_netbox(ctx: click.Context) -> "Netbox":
+    """Obtain the Netbox shared by the whole invocation, create it on first use."""
+    meta = ctx.meta
+    if "netbox" not in meta:
+        from ..core import Netbox
+
+        netbox = meta["netbox"] = Netbox()
+        if meta.get("debug"):
+            ctx.call_on_close(functools.partial(log_command_stats, netbox))
+    return meta["netbox"]
+
+
+def log_command_stats(netbox: "Netbox") -> None:
+    """Log resolver statistics, and command statistics if wifi adapter was used."""
+    from netbox import logger
+
+    logger.debug(msg=f"Resolver: {netbox.resolver_stats()}")
+    if netbox._adapter is None:
+        return
+    logger.debug(
+        msg=f"Command cache: {netbox.cache_info()}, stats: {netbox.command_stats()}"
+    )
+
+
+def serve_metrics(address: t.Optional[str]) -> None:
+    """Serve metrics of the invocation if --metrics is given."""
+    if not address:
+        return
+    from .. import metrics
+
+    host, _, port = address.rpartition(":")
+    try:
+        server = metrics.serve((host or "0.0.0.0", int(port)), metrics.enable())
+    except (ValueError, OSError) as e:
+        raise click.BadParameter(f"{address}: {e}", param_hint="--metrics")
+    click.get_current_context().call_on_close(server.server_close)
+    click.get_current_context().call_on_close(server.shutdown)
+
+
+metrics_option = click.option(
+    "--metrics",
+    "metrics_address",
+    help="Serve Prometheus metrics on /metrics of host:port",
+    metavar="HOST:PORT",
+)
+
+
+def pass_netbox(f: t.Callable[..., t.Any]) -> t.Callable[..., t.Any]:
+    """Pass the shared Netbox as the first argument of a command.
+
+    A NetboxException the command leaves, such as wifi not being supported on
+    the system, is reported as a usage error instead of a traceback.
+    """
+
+    @click.pass_context
+    def new_func(ctx: click.Context, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        try:
+            return ctx.invoke(f, get_netbox(ctx), *args, **kwargs)
+        except NetboxException as e:
+            raise click.ClickException(e.format_message())
+
+    return functools.update_wrapper(new_func, f)
+
 
 @click.group()
 @click.version_option(version=__version__, help="Print version information and quit")
 @click.option("-D", "--debug", is_flag=True, help="Enable debug mode")
-def cli(debug):
+@click.option("--profile", is_flag=True, help="Print time spent in each phase on exit")
+@click.pass_context
+def cli(ctx, debug, profile):
     """A simple and flexible CLI tool for network testing"""
+    ctx.meta["debug"] = debug
+    if profile:
+        from .. import metrics
+
+        registry = metrics.enable()
+        ctx.call_on_close(
+            lambda: click.echo(metrics.format_profile(registry.report()), err=True)
+        )
     if debug:
-        for handler in logger.handlers:
-            if isinstance(handler, logging.StreamHandler):
-                handler.setLevel(logging.DEBUG)
+        import logging
+
+        from ..log import configure_logging
+
+        # detailed records with caller information on console as well
+        configure_logging(console_level=logging.DEBUG, fast=False)
 
 
 @cli.command()
@@ -26,50 +110,761 @@ def version():
     click.echo(f"Current version is {__version__}")
 
 
+@cli.command(help="Ping hosts concurrently")
+@click.argument("hosts", nargs=-1, required=True)
+@click.option(
+    "--timeout",
+    type=float,
+    default=4.0,
+    show_default=True,
+    help="Seconds to wait for each reply",
+    metavar="Float",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=256,
+    show_default=True,
+    help="Maximum number of outstanding requests",
+    metavar="Integer",
+)
+@click.option(
+    "--count",
+    type=int,
+    help="Ping a single host periodically and report statistics",
+    metavar="Integer",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds between two requests of --count",
+    metavar="Float",
+)
+@click.option(
+    "--snapshot",
+    type=float,
+    help="Seconds between two statistics lines of --count",
+    metavar="Float",
+)
+@click.option("--record", is_flag=True, help="Append results to the history store")
+@pass_netbox
+def ping(netbox, hosts, timeout, concurrency, count, interval, snapshot, record):
+    store = open_store(record)
+    if count is not None:
+        if len(hosts) != 1:
+            raise click.UsageError("--count pings exactly one host.")
+        ping_series(netbox, hosts[0], count, interval, timeout, snapshot, store)
+        return
+    try:
+        for host, ret in netbox.sweep(hosts, timeout=timeout, concurrency=concurrency):
+            if store is not None:
+                store.append_probe(host, ret)
+            if ret is False:
+                click.echo(f"{host} unknown host")
+            elif ret is None:
+                click.echo(f"{host} timeout")
+            else:
+                click.echo(f"{host} {ret * 1000:.3f}ms")
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+
+
+@cli.command(help="Measure TCP handshake time of host:port targets")
+@click.argument("targets", nargs=-1, required=True)
+@click.option(
+    "--port",
+    type=int,
+    default=80,
+    show_default=True,
+    help="Port of targets without one",
+    metavar="Integer",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=2.0,
+    show_default=True,
+    help="Seconds to wait for each handshake",
+    metavar="Float",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=512,
+    show_default=True,
+    help="Maximum number of connects in flight",
+    metavar="Integer",
+)
+@click.option("--record", is_flag=True, help="Append results to the history store")
+@pass_netbox
+def tcping(netbox, targets, port, timeout, concurrency, record):
+    store = open_store(record)
+    for target, ret, reason in netbox.tcp_sweep(
+        targets, timeout=timeout, concurrency=concurrency, port=port
+    ):
+        if store is not None:
+            store.append_probe(target, ret)
+        if ret:
+            click.echo(f"{target} {ret * 1000:.3f}ms")
+        else:
+            click.echo(f"{target} {reason}")
+
+
+@cli.command(help="Trace paths to hosts, all hops of a path are probed at once")
+@click.argument("hosts", nargs=-1, required=True)
+@click.option(
+    "--max-hops",
+    type=click.IntRange(1, 255),
+    default=30,
+    show_default=True,
+    help="Largest TTL probed",
+    metavar="Integer",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=2.0,
+    show_default=True,
+    help="Seconds to wait for silent hops",
+    metavar="Float",
+)
+@click.option(
+    "--concurrency",
+    type=int,
+    default=32,
+    show_default=True,
+    help="Maximum number of traces in flight",
+    metavar="Integer",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print traces as JSON")
+@pass_netbox
+def trace(netbox, hosts, max_hops, timeout, concurrency, as_json):
+    traces = netbox.trace_many(
+        hosts, max_hops=max_hops, timeout=timeout, concurrency=concurrency
+    )
+    try:
+        for route in traces:
+            if as_json:
+                click.echo(json.dumps(route.to_dict()))
+                continue
+            if route.address is None:
+                click.echo(f"{route.host} unknown host")
+                continue
+            click.echo(f"trace to {route.host} ({route.address})")
+            for hop in route.hops:
+                if hop.address is None:
+                    click.echo(f"{hop.ttl:>3}  *")
+                else:
+                    click.echo(f"{hop.ttl:>3}  {hop.address}  {hop.rtt * 1000:.3f}ms")
+            if not route.reached:
+                click.echo("     destination not reached")
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+
+
+@cli.command(help="Resolve names concurrently through the caching resolver")
+@click.argument("names", nargs=-1, required=True)
+@pass_netbox
+def resolve(netbox, names):
+    data = {"addresses": netbox.resolve(names), "stats": netbox.resolver_stats()}
+    click.echo(json.dumps({"code": 0, "message": "", "data": data}, indent=4))
+
+
+@cli.command(help="Show cached facts of adapter and interface detection")
+@click.option("--refresh", is_flag=True, help="Discover again and rewrite the cache")
+@pass_netbox
+def discover(netbox, refresh):
+    data = dict(netbox.discovery.facts(refresh=refresh), path=netbox.discovery.path)
+    click.echo(json.dumps({"code": 0, "message": "", "data": data}, indent=4))
+
+
+def open_store(record: bool) -> t.Any:
+    """Open the history store closed with the invocation if --record is given."""
+    if not record:
+        return None
+    from ..store import ResultStore
+
+    store = ResultStore()
+    click.get_current_context().call_on_close(store.close)
+    return store
+
+
+def ping_series(netbox, host, count, interval, timeout, snapshot, store=None):
+    from ..stats import LatencyStats
+
+    stats = LatencyStats()
+    try:
+        netbox.ping_series(
+            host,
+            count=count if count > 0 else None,
+            interval=interval,
+            timeout=timeout,
+            snapshot_interval=snapshot,
+            on_snapshot=lambda info: click.echo(json.dumps(info)),
+            stats=stats,
+            on_result=(
+                None if store is None else functools.partial(store.append_probe, host)
+            ),
+        )
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    except KeyboardInterrupt:
+        pass
+    info = {"host": host, **stats.snapshot()}
+    click.echo(json.dumps({"code": 0, "message": "", "data": info}, indent=4))
+
+
 @cli.group()
-@click.pass_context
-def wlan(ctx):
+def speed():
+    """Measure TCP throughput"""
+
+
+@speed.command(name="server", help="Receive throughput test streams")
+@click.option(
+    "--bind", default="0.0.0.0", show_default=True, help="Address to listen on"
+)
+@click.option(
+    "--port", type=int, default=5210, show_default=True, help="Port to listen on"
+)
+def speed_server(bind, port):
+    from ..speed import SpeedServer
+
+    server = SpeedServer(host=bind, port=port)
+    click.echo(f"Speed server listening on {bind}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+@speed.command(name="client", help="Send throughput test streams to a server")
+@click.argument("host")
+@click.option(
+    "--port", type=int, default=5210, show_default=True, help="Port of server"
+)
+@click.option(
+    "--streams",
+    "-P",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Number of parallel streams",
+)
+@click.option(
+    "--time",
+    "duration",
+    type=float,
+    default=10.0,
+    show_default=True,
+    help="Seconds to send",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds of each report",
+)
+@click.option("--sendfile", is_flag=True, help="Send with sendfile")
+@pass_netbox
+def speed_client(netbox, host, port, streams, duration, interval, sendfile):
+    def echo_interval(report):
+        click.echo(
+            f"[{report['start']:6.2f}-{report['end']:6.2f}s] {report['gbps']:.3f} Gbit/s"
+        )
+
+    try:
+        report = netbox.measure_throughput(
+            host=host,
+            port=port,
+            streams=streams,
+            duration=duration,
+            interval=interval,
+            use_sendfile=sendfile,
+            on_interval=echo_interval,
+        )
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    click.echo(json.dumps({"code": 0, "message": "", "data": report}, indent=4))
+
+
+@cli.group(name="udp-test")
+def udp_test():
+    """Measure UDP loss and jitter"""
+
+
+@udp_test.command(name="server", help="Receive paced UDP test streams")
+@click.option(
+    "--bind", default="127.0.0.1", show_default=True, help="Address to listen on"
+)
+@click.option(
+    "--port", type=int, default=5211, show_default=True, help="Port to listen on"
+)
+def udp_test_server(bind, port):
+    from ..udp import UdpStreamServer
+
+    server = UdpStreamServer(host=bind, port=port)
+    click.echo(f"UDP test server listening on {bind}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+@udp_test.command(name="client", help="Send a paced UDP stream to a server")
+@click.argument("host")
+@click.option(
+    "--port", type=int, default=5211, show_default=True, help="Port of server"
+)
+@click.option(
+    "--rate", type=float, default=1000.0, show_default=True, help="Packets per second"
+)
+@click.option(
+    "--size",
+    type=int,
+    default=200,
+    show_default=True,
+    help="Bytes of each datagram",
+)
+@click.option(
+    "--time",
+    "duration",
+    type=float,
+    default=10.0,
+    show_default=True,
+    help="Seconds to send",
+)
+@click.option(
+    "--batch",
+    type=int,
+    default=64,
+    show_default=True,
+    help="Maximum datagrams sent in one call",
+)
+@pass_netbox
+def udp_test_client(netbox, host, port, rate, size, duration, batch):
+    try:
+        report = netbox.measure_udp_stream(
+            host=host,
+            port=port,
+            rate=rate,
+            size=size,
+            duration=duration,
+            batch=batch,
+        )
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(json.dumps({"code": 0, "message": "", "data": report}, indent=4))
+
+
+@cli.command(help="Serve netbox operations to remote clients")
+@click.option(
+    "--listen",
+    "-l",
+    multiple=True,
+    default=["tcp://127.0.0.1:5220"],
+    show_default=True,
+    help="Address to listen on, tcp://host:port or unix:///path",
+)
+@click.option(
+    "--token",
+    envvar="NETBOX_AGENT_TOKEN",
+    help="Shared token requests must carry, required to listen beyond loopback",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=16,
+    show_default=True,
+    help="Number of requests running at the same time",
+    metavar="Integer",
+)
+@metrics_option
+@pass_netbox
+def agent(netbox, listen, token, workers, metrics_address):
+    from ..agent import AgentServer
+
+    serve_metrics(metrics_address)
+
+    try:
+        server = AgentServer(listen, netbox=netbox, workers=workers, token=token)
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    click.echo(f"Agent listening on {', '.join(server.addresses)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+def parse_params(params: t.Sequence[str]) -> t.Dict[str, t.Any]:
+    """Parse key=value parameters, a value is JSON if it can be decoded."""
+    parsed = {}
+    for param in params:
+        key, sep, value = param.partition("=")
+        if not sep:
+            raise click.BadParameter(f"{param} is not key=value", param_hint="--param")
+        try:
+            parsed[key] = json.loads(value)
+        except ValueError:
+            parsed[key] = value
+    return parsed
+
+
+@cli.command(help="Call a method on many agents concurrently")
+@click.argument("method")
+@click.option(
+    "--agent",
+    "-a",
+    "agents",
+    multiple=True,
+    required=True,
+    help="Address of an agent, host:port or unix:///path",
+)
+@click.option(
+    "--param",
+    "-p",
+    "params",
+    multiple=True,
+    help="Parameter of the method as key=value, value may be JSON",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=30.0,
+    show_default=True,
+    help="Seconds to wait for each agent",
+    metavar="Float",
+)
+@click.option(
+    "--token",
+    envvar="NETBOX_AGENT_TOKEN",
+    help="Shared token of the agents",
+)
+def fleet(method, agents, params, timeout, token):
+    from ..agent import AgentPool
+
+    with AgentPool(agents, timeout=timeout, token=token) as pool:
+        results = pool.fan_out(method, **parse_params(params))
+    data = {}
+    failed = 0
+    for address, result in results.items():
+        if isinstance(result, NetboxException):
+            failed += 1
+            data[address] = {"error": result.format_message()}
+        else:
+            data[address] = {"result": result}
+    message = f"{failed} of {len(results)} agents failed." if failed else ""
+    click.echo(
+        json.dumps(
+            {"code": 1 if failed else 0, "message": message, "data": data}, indent=4
+        )
+    )
+
+
+@cli.group()
+def schedule():
+    """Run periodic checks from one process"""
+
+
+@schedule.command(name="run", help="Run the checks of a JSON plan")
+@click.argument("plan", type=click.Path(exists=True, dir_okay=False))
+@click.option("--duration", type=float, help="Seconds to run, defaults to forever")
+@click.option(
+    "--report",
+    "report_interval",
+    type=float,
+    default=10.0,
+    show_default=True,
+    help="Seconds between two report lines",
+    metavar="Float",
+)
+@click.option("--record", is_flag=True, help="Append results to the history store")
+@metrics_option
+@pass_netbox
+def schedule_run(netbox, plan, duration, report_interval, record, metrics_address):
+    from ..schedule import Scheduler, load_plan
+
+    serve_metrics(metrics_address)
+    store = open_store(record)
+
+    def record_result(check, result):
+        if check.probe == "rssi":
+            store.append_sample({"ssid": netbox.ssid, "rssi": result})
+        else:
+            store.append_probe(check.target, result)
+
+    try:
+        checks, options = load_plan(plan)
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    scheduler = Scheduler(
+        netbox,
+        checks,
+        on_result=None if store is None else record_result,
+        **options,
+    )
+    try:
+        report = scheduler.run(
+            duration=duration,
+            report_interval=report_interval,
+            on_report=lambda info: click.echo(json.dumps(info)),
+        )
+    except KeyboardInterrupt:
+        scheduler.stop()
+        report = scheduler.report()
+    click.echo(json.dumps({"code": 0, "message": "", "data": report}, indent=4))
+
+
+@cli.command(name="run", help="Run the steps of a JSON plan as a DAG")
+@click.argument("plan", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--workers",
+    type=int,
+    help="Number of steps running at the same time, defaults to the plan or 8",
+    metavar="Integer",
+)
+@pass_netbox
+def run_plan(netbox, plan, workers):
+    from ..plan import PlanRunner, load_steps
+
+    def echo_step(step):
+        click.echo(f"{step.id} {step.status} attempts={step.attempts}", err=True)
+
+    try:
+        steps, options = load_steps(plan)
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    if workers is not None:
+        options["workers"] = workers
+    report = PlanRunner(netbox, steps, on_step=echo_step, **options).run()
+    passed = report["status"] == "passed"
+    message = "" if passed else "Some steps failed."
+    click.echo(
+        json.dumps(
+            {"code": 0 if passed else 1, "message": message, "data": report},
+            indent=4,
+        )
+    )
+    if not passed:
+        click.get_current_context().exit(1)
+
+
+@cli.group()
+def history():
+    """Query recorded probe, scan and monitor results"""
+
+
+@history.command(name="query", help="Query records or summaries of a time range")
+@click.argument("kind", type=click.Choice(["probe", "scan", "monitor"]))
+@click.option(
+    "--since",
+    default="1h",
+    show_default=True,
+    help="Start as an age such as 30m or 7d, Unix time or ISO datetime",
+)
+@click.option("--until", help="End in the same formats as --since, defaults to now")
+@click.option("--name", help="Only records of this target or ssid")
+@click.option("--field", help="Summarize a numeric field such as rtt or rssi")
+@click.option(
+    "--bucket",
+    help="Length of each summary of --field such as 1m or 1h",
+)
+@click.option(
+    "--limit",
+    type=int,
+    default=1000,
+    show_default=True,
+    help="Maximum number of records",
+    metavar="Integer",
+)
+@click.option("--path", type=click.Path(), help="Directory of the history store")
+def history_query(kind, since, until, name, field, bucket, limit, path):
+    from ..store import ResultStore, parse_time
+
+    now = time.time()
+    try:
+        start = parse_time(since, now=now)
+        end = None if until is None else parse_time(until, now=now)
+        width = None if bucket is None else now - parse_time(bucket, now=now)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    with ResultStore(path=path) as store:
+        try:
+            if field is not None:
+                data = store.aggregate(
+                    kind, field, start=start, end=end, name=name, bucket=width
+                )
+            else:
+                data = list(
+                    store.query(kind, start=start, end=end, name=name, limit=limit)
+                )
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--field")
+    click.echo(json.dumps({"code": 0, "message": "", "data": data}, indent=4))
+
+
+@cli.group()
+def wlan():
     """Manage wifi network"""
-    ctx.obj = Netbox()
 
 
 @wlan.command(help="Scan surround wifi network")
 @click.option("--ssid", type=str, help="Name of wifi network", metavar="String")
-@click.pass_obj
-def scan(netbox: Netbox, ssid: str) -> None:
-    if ssid is None:
+@click.option(
+    "--channel", type=int, help="Strongest network on a channel", metavar="Integer"
+)
+@click.option("--record", is_flag=True, help="Append results to the history store")
+@pass_netbox
+def scan(netbox: "Netbox", ssid: str, channel: int, record: bool) -> None:
+    store = open_store(record)
+    if store is not None:
+        store.append_scan(netbox.scan())
+    if ssid is None and channel is None:
         info = netbox.wifi_scan()
         click.echo(f"Surrounding wifi network:\n {info}")
         return
-    if ssid in netbox.get_all_ssid():
+    network = netbox.scan().strongest(ssid=ssid, channel=channel)
+    if network is None and channel is None:
+        click.echo(f"Current ssid {ssid} not found.")
+    elif network is None:
+        click.echo(f"Current ssid {ssid or '*'} on channel {channel} not found.")
+    elif ssid is not None and channel is None:
         click.echo(f"Current ssid {ssid} exists.")
     else:
-        click.echo(f"Current ssid {ssid} not found.")
+        click.echo(
+            f"Strongest network on channel {channel}: {network.ssid} "
+            f"{network.bssid} rssi {network.rssi}"
+        )
+
+
+@wlan.command(help="Recommend channels from recorded scans")
+@click.option(
+    "--since",
+    default="7d",
+    show_default=True,
+    help="Start as an age such as 30m or 7d, Unix time or ISO datetime",
+)
+@click.option("--until", help="End in the same formats as --since, defaults to now")
+@click.option(
+    "--channels",
+    help="Comma separated channels to recommend from, such as 1,6,11",
+)
+@click.option(
+    "--top",
+    type=int,
+    default=3,
+    show_default=True,
+    help="Channels recommended per band",
+    metavar="Integer",
+)
+@click.option("--scan", "with_scan", is_flag=True, help="Add a fresh scan")
+@click.option("--path", type=click.Path(), help="Directory of the history store")
+@pass_netbox
+def analyze(netbox, since, until, channels, top, with_scan, path):
+    from ..channels import analyze_channels, load_scans, merge_scans, scan_arrays
+    from ..store import ResultStore, parse_time
+
+    now = time.time()
+    try:
+        start = parse_time(since, now=now)
+        end = None if until is None else parse_time(until, now=now)
+        candidates = (
+            None
+            if channels is None
+            else [int(channel) for channel in channels.split(",") if channel.strip()]
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    try:
+        with ResultStore(path=path) as store:
+            scans = load_scans(store, start=start, end=end)
+        if with_scan:
+            scans = merge_scans(scans, scan_arrays([netbox.scan()]))
+        report = analyze_channels(scans, candidates=candidates, top=top)
+    except NetboxException as e:
+        raise click.ClickException(e.format_message())
+    click.echo(json.dumps({"code": 0, "message": "", "data": report}, indent=4))
 
 
 @wlan.command(help="Current wifi network information")
-@click.pass_obj
+@pass_netbox
 def current(netbox):
     info = netbox.current_wifi_info
     click.echo(info)
 
 
+@wlan.command(help="Monitor current wifi network continuously")
+@click.option(
+    "--interval",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Seconds between two samples",
+    metavar="Float",
+)
+@click.option("--count", type=int, help="Number of samples", metavar="Integer")
+@click.option(
+    "--window",
+    type=int,
+    default=120,
+    show_default=True,
+    help="Number of samples of rolling statistics",
+    metavar="Integer",
+)
+@click.option(
+    "--record", "record_", is_flag=True, help="Append samples to the history store"
+)
+@metrics_option
+@pass_netbox
+def monitor(netbox, interval, count, window, record_, metrics_address):
+    serve_metrics(metrics_address)
+    store = open_store(record_)
+    try:
+        for record in netbox.monitor(interval=interval, count=count, window=window):
+            if store is not None:
+                store.append_sample(record)
+            click.echo(json.dumps(record, separators=(",", ":")))
+    except KeyboardInterrupt:
+        pass
+
+
 @wlan.command(help="Connect a wifi network")
 @click.argument("ssid")
 @click.argument("password")
 @click.option(
     "--retry", type=int, help="Number of wifi scan retries", metavar="Integer"
 )
-@click.pass_obj
-def connect(netbox, ssid, password, retry):
-    if retry is None:
-        click.echo(netbox.connect(ssid=ssid, password=password))
-    else:
-        click.echo(netbox.connect(ssid=ssid, password=password, retry=retry))
+@click.option(
+    "--target",
+    default="jd.com",
+    show_default=True,
+    help="Host pinged to check reachability after connected",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=30.0,
+    show_default=True,
+    help="Seconds the whole connect may take",
+    metavar="Float",
+)
+@pass_netbox
+def connect(netbox, ssid, password, retry, target, timeout):
+    kwargs = {} if retry is None else {"retry": retry}
+    click.echo(
+        netbox.connect(
+            ssid=ssid, password=password, target=target, timeout=timeout, **kwargs
+        )
+    )
 
 
 @wlan.command(help="Disconnect current wifi network")
-@click.pass_obj
+@pass_netbox
 def disconnect(netbox):
     current_ssid = netbox.ssid
     if netbox.disconnect() == WiFiState.DISCONNECTED:
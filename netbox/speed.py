@@ -0,0 +1,254 @@
+import os
+import socket
+import struct
+import tempfile
+import threading
+import time
+import typing as t
+
+from . import logger
+from .exception import SpeedException
+
+DEFAULT_PORT = 5210
+# magic, version, stream index
+HEADER_FORMAT = "!4sHH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+MAGIC = b"NBSP"
+VERSION = 1
+# total bytes the server received on a stream
+RESULT_FORMAT = "!Q"
+RESULT_SIZE = struct.calcsize(RESULT_FORMAT)
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+class SpeedServer(object):
+    """Receiving side of the throughput test.
+
+    Every accepted stream is drained by its own thread into a preallocated
+    buffer with ``recv_into``, then the received bytes are sent back.
+
+    Args:
+        host: Address to listen on.
+        port: Port to listen on, 0 picks a free one.
+        buffer_size: Size of receive buffer of each stream.
+    """
+
+    def __init__(
+        self,
+        host: str = "0.0.0.0",
+        port: int = DEFAULT_PORT,
+        buffer_size: int = 1024 * 1024,
+    ) -> None:
+        self.buffer_size = buffer_size
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((host, port))
+        self._sock.listen(128)
+        self._stopped = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> t.Tuple[str, int]:
+        """Listening address, useful when port 0 is given."""
+        return self._sock.getsockname()
+
+    def start(self) -> "SpeedServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="netbox-speed-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Accept streams until ``stop`` is called."""
+        while not self._stopped.is_set():
+            try:
+                conn, addr = self._sock.accept()
+            except OSError:
+                break
+            threading.Thread(
+                target=self._handle, args=(conn, addr), daemon=True
+            ).start()
+
+    def _handle(self, conn: socket.socket, addr: t.Tuple[str, int]) -> None:
+        with conn:
+            header = _recv_exactly(conn, HEADER_SIZE)
+            if len(header) != HEADER_SIZE:
+                return
+            magic, version, index = struct.unpack(HEADER_FORMAT, header)
+            if magic != MAGIC or version != VERSION:
+                logger.debug(msg=f"Speed stream from {addr} has bad header.")
+                return
+            view = memoryview(bytearray(self.buffer_size))
+            received = 0
+            try:
+                while True:
+                    n = conn.recv_into(view)
+                    if not n:
+                        break
+                    received += n
+                conn.sendall(struct.pack(RESULT_FORMAT, received))
+            except OSError as e:
+                logger.debug(msg=f"Speed stream {index} from {addr} aborted: {e}")
+
+    def stop(self) -> None:
+        """Stop accepting streams."""
+        self._stopped.set()
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+
+class _Stream(object):
+    """Sending side of one TCP stream."""
+
+    __slots__ = ("index", "sock", "sent", "received", "error")
+
+    def __init__(self, index: int, sock: socket.socket) -> None:
+        self.index = index
+        self.sock = sock
+        self.sent = 0
+        self.received = 0
+        self.error: t.Optional[str] = None
+
+
+def measure_throughput(
+    host: str,
+    port: int = DEFAULT_PORT,
+    streams: int = 4,
+    duration: float = 10.0,
+    interval: float = 1.0,
+    buffer_size: int = 128 * 1024,
+    use_sendfile: bool = False,
+    on_interval: t.Optional[t.Callable[[t.Dict[str, float]], None]] = None,
+) -> t.Dict[str, t.Any]:
+    """Send to a SpeedServer over parallel TCP streams and measure throughput.
+
+    Each stream sends one preallocated buffer through a memoryview, or a
+    temporary file with ``socket.sendfile`` so the kernel copies pages
+    directly, no bytes are created per chunk.
+
+    Args:
+        host: Address of the server.
+        port: Port of the server.
+        streams: Number of parallel streams.
+        duration: Seconds to send.
+        interval: Seconds of each reported interval.
+        buffer_size: Bytes of each send call.
+        use_sendfile: Send with ``socket.sendfile`` instead of ``send``.
+        on_interval: Called with each interval report as it finishes.
+
+    Raises:
+        SpeedException: Server is unreachable or every stream failed.
+
+    Returns:
+        Report of the test. For example: {'streams': 4, 'duration': 10.0, 'intervals': [...], 'gbps': 9.41, ...}
+    """
+    if streams < 1:
+        raise ValueError("streams must be greater than 0.")
+    sockets = list()
+    try:
+        for index in range(streams):
+            sock = socket.create_connection((host, port), timeout=5)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.sendall(struct.pack(HEADER_FORMAT, MAGIC, VERSION, index))
+            sockets.append(sock)
+    except OSError as e:
+        for sock in sockets:
+            sock.close()
+        raise SpeedException(message=f"Speed server {host}:{port} is unreachable: {e}")
+
+    payload = memoryview(bytearray(os.urandom(16)) * (buffer_size // 16 + 1))[
+        :buffer_size
+    ]
+    source = None
+    if use_sendfile:
+        source = tempfile.TemporaryFile()
+        source.write(payload)
+        source.flush()
+    all_streams = [_Stream(index, sock) for index, sock in enumerate(sockets)]
+    start = time.monotonic()
+    deadline = start + duration
+
+    def send(stream: _Stream) -> None:
+        sock = stream.sock
+        try:
+            while time.monotonic() < deadline:
+                if source is not None:
+                    stream.sent += sock.sendfile(source, 0, buffer_size)
+                else:
+                    stream.sent += sock.send(payload)
+            sock.shutdown(socket.SHUT_WR)
+            result = _recv_exactly(sock, RESULT_SIZE)
+            if len(result) == RESULT_SIZE:
+                (stream.received,) = struct.unpack(RESULT_FORMAT, result)
+        except OSError as e:
+            stream.error = str(e)
+        finally:
+            sock.close()
+
+    threads = [
+        threading.Thread(target=send, args=(stream,), daemon=True)
+        for stream in all_streams
+    ]
+    for thread in threads:
+        thread.start()
+
+    intervals = list()
+    last_bytes = 0
+    last_time = start
+    while any(thread.is_alive() for thread in threads):
+        next_time = min(last_time + interval, deadline)
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        now = time.monotonic()
+        total = sum(stream.sent for stream in all_streams)
+        if now - last_time > 0 and last_time < deadline:
+            report = {
+                "start": round(last_time - start, 3),
+                "end": round(now - start, 3),
+                "bytes": total - last_bytes,
+                "gbps": round((total - last_bytes) * 8 / (now - last_time) / 1e9, 3),
+            }
+            intervals.append(report)
+            if on_interval is not None:
+                on_interval(report)
+        last_bytes, last_time = total, now
+        if now >= deadline:
+            for thread in threads:
+                thread.join()
+    if source is not None:
+        source.close()
+
+    errors = [stream.error for stream in all_streams if stream.error]
+    if len(errors) == streams:
+        raise SpeedException(message=f"All streams failed: {errors[0]}")
+    elapsed = time.monotonic() - start
+    sent = sum(stream.sent for stream in all_streams)
+    received = sum(stream.received for stream in all_streams)
+    return {
+        "host": host,
+        "port": port,
+        "streams": streams,
+        "duration": round(elapsed, 3),
+        "intervals": intervals,
+        "sent_bytes": sent,
+        "received_bytes": received,
+        "gbps": round(received * 8 / duration / 1e9, 3),
+        "errors": errors,
+    }
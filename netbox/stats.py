@@ -0,0 +1,150 @@
+import array
+import math
+import typing as t
+
+# bucket boundaries grow by 1%, so a reported percentile is within 1% of the
+# real sample, between 1us and 100s it takes 1852 buckets whatever the count
+_GROWTH = 1.01
+_LOG_GROWTH = math.log(_GROWTH)
+_LOWEST = 1e-6
+_HIGHEST = 100.0
+_BUCKETS = int(math.log(_HIGHEST / _LOWEST) / _LOG_GROWTH) + 2
+
+
+class LatencyHistogram(object):
+    """Log-linear histogram of latencies in seconds with constant memory."""
+
+    __slots__ = ("_counts", "count")
+
+    def __init__(self) -> None:
+        self._counts = array.array("Q", bytes(8 * _BUCKETS))
+        self.count = 0
+
+    @staticmethod
+    def _index(value: float) -> int:
+        if value <= _LOWEST:
+            return 0
+        return min(int(math.log(value / _LOWEST) / _LOG_GROWTH) + 1, _BUCKETS - 1)
+
+    @staticmethod
+    def _value(index: int) -> float:
+        # upper boundary of the bucket
+        return _LOWEST * _GROWTH**index
+
+    def record(self, value: float) -> None:
+        self._counts[self._index(value)] += 1
+        self.count += 1
+
+    def percentile(self, p: float) -> t.Optional[float]:
+        """Obtain the value below which ``p`` percent of samples fall.
+
+        Args:
+            p: Percent between 0 and 100.
+
+        Returns:
+            Latency in seconds or None if it is empty.
+        """
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index, n in enumerate(self._counts):
+            seen += n
+            if seen >= rank:
+                return self._value(index)
+        return self._value(_BUCKETS - 1)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for index, n in enumerate(other._counts):
+            if n:
+                self._counts[index] += n
+        self.count += other.count
+
+
+class LatencyStats(object):
+    """Streaming statistics of a probe series.
+
+    Percentiles come from a constant memory histogram, mean and standard
+    deviation from Welford's algorithm, and jitter is the RFC 3550
+    interarrival jitter of consecutive round trip times.
+    """
+
+    PERCENTILES = (50, 90, 99, 99.9)
+
+    def __init__(self) -> None:
+        self.histogram = LatencyHistogram()
+        self.sent = 0
+        self.received = 0
+        self.min: t.Optional[float] = None
+        self.max: t.Optional[float] = None
+        self.jitter = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._last: t.Optional[float] = None
+
+    def add(self, rtt: t.Optional[float]) -> None:
+        """Add the result of a probe.
+
+        Args:
+            rtt: Round trip time in seconds, None if the probe is lost.
+        """
+        self.sent += 1
+        if rtt is None:
+            return
+        self.received += 1
+        self.histogram.record(rtt)
+        delta = rtt - self._mean
+        self._mean += delta / self.received
+        self._m2 += delta * (rtt - self._mean)
+        self.min = rtt if self.min is None else min(self.min, rtt)
+        self.max = rtt if self.max is None else max(self.max, rtt)
+        if self._last is not None:
+            self.jitter += (abs(rtt - self._last) - self.jitter) / 16
+        self._last = rtt
+
+    @property
+    def mean(self) -> t.Optional[float]:
+        return self._mean if self.received else None
+
+    @property
+    def stddev(self) -> t.Optional[float]:
+        if not self.received:
+            return None
+        return math.sqrt(self._m2 / self.received)
+
+    @property
+    def loss(self) -> float:
+        """Percent of lost probes."""
+        if not self.sent:
+            return 0.0
+        return (self.sent - self.received) * 100 / self.sent
+
+    def snapshot(self) -> t.Dict[str, t.Any]:
+        """Obtain current statistics, latencies are in milliseconds.
+
+        Returns:
+            Dict of statistics. For example: {'sent': 100, 'received': 99, 'loss': 1.0, 'min': 0.05, 'p50': 0.08, ...}
+        """
+
+        def ms(value: t.Optional[float]) -> t.Optional[float]:
+            return None if value is None else round(value * 1000, 3)
+
+        info: t.Dict[str, t.Any] = {
+            "sent": self.sent,
+            "received": self.received,
+            "loss": round(self.loss, 3),
+            "min": ms(self.min),
+            "max": ms(self.max),
+            "mean": ms(self.mean),
+            "stddev": ms(self.stddev),
+            "jitter": ms(self.jitter if self.received > 1 else None),
+        }
+        for p in self.PERCENTILES:
+            value = self.histogram.percentile(p)
+            if value is not None:
+                # a bucket boundary may be out of the real range
+                value = min(
+                    max(value, t.cast(float, self.min)), t.cast(float, self.max)
+                )
+            info[f"p{p:g}"] = ms(value)
+        return info
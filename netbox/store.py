@@ -0,0 +1,553 @@
+import contextlib
+import datetime
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import typing as t
+
+from .helper import get_user_cache_dir
+
+# directory of history, NETBOX_STORE_DIR overrides it
+STORE_DIR = os.environ.get("NETBOX_STORE_DIR") or os.path.join(
+    get_user_cache_dir(), "history"
+)
+MAGIC = b"NBRS"
+VERSION = 1
+# magic, version, length of the JSON schema which follows
+PREFIX = struct.Struct("<4sHI")
+# timestamps are milliseconds since the base of their segment
+MAX_OFFSET = 0xFFFFFFFF
+
+
+class Field(t.NamedTuple):
+    """A fixed-width column of a record.
+
+    ``kind`` is 'time' for the timestamp, 'name' for an id of the name table,
+    'bytes' for raw bytes and 'number' for a value stored as ``value / scale``
+    with the largest (or smallest signed) code of the type meaning missing.
+    """
+
+    name: str
+    code: str
+    kind: str = "number"
+    scale: float = 1.0
+    unit: str = ""
+
+
+SCHEMAS: t.Dict[str, t.Tuple[Field, ...]] = {
+    # 8 bytes, rtt in 0.1ms up to 6.5s, a lost probe is missing
+    "probe": (
+        Field("ts", "I", "time"),
+        Field("target", "H", "name"),
+        Field("rtt", "H", scale=0.1, unit="ms"),
+    ),
+    # 15 bytes per network found
+    "scan": (
+        Field("ts", "I", "time"),
+        Field("ssid", "H", "name"),
+        Field("bssid", "6s", "bytes"),
+        Field("rssi", "b", unit="dBm"),
+        Field("channel", "H"),
+    ),
+    # 13 bytes per sample of ``wlan monitor``
+    "monitor": (
+        Field("ts", "I", "time"),
+        Field("ssid", "H", "name"),
+        Field("rssi", "b", unit="dBm"),
+        Field("noise", "b", unit="dBm"),
+        Field("tx_rate", "H", unit="Mbps"),
+        Field("mcs", "B"),
+        Field("channel", "H"),
+    ),
+}
+
+_LIMITS = {
+    "b": (-127, 127, -128),
+    "B": (0, 0xFE, 0xFF),
+    "H": (0, 0xFFFE, 0xFFFF),
+    "I": (0, 0xFFFFFFFE, 0xFFFFFFFF),
+}
+
+
+def _encode(field: Field, value: t.Any) -> t.Any:
+    if field.kind == "bytes":
+        return value
+    low, high, missing = _LIMITS[field.code]
+    if value is None:
+        return missing
+    return min(max(int(round(value / field.scale)), low), high)
+
+
+def _decoder(field: Field) -> t.Callable[[t.Any], t.Any]:
+    if field.kind != "number":
+        return lambda value: value
+    missing = _LIMITS[field.code][2]
+    scale = field.scale
+    if scale == 1:
+        return lambda value: None if value == missing else value
+    return lambda value: None if value == missing else round(value * scale, 3)
+
+
+def _bssid_to_bytes(bssid: str) -> bytes:
+    try:
+        return bytes(int(part, 16) for part in bssid.split(":")) if bssid else bytes(6)
+    except ValueError:
+        return bytes(6)
+
+
+class Segment(object):
+    """A file of fixed-width records of one kind, read through mmap.
+
+    Records are appended in time order, so a time range is found by binary
+    search and read as a slice of the mapping without copying.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, size = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a netbox result segment.")
+            self.schema = json.loads(f.read(size))
+        self.kind: str = self.schema["kind"]
+        self.base: int = self.schema["base"]
+        self.struct = struct.Struct(self.schema["format"])
+        self.offset = PREFIX.size + size
+        self._mmap: t.Optional[mmap.mmap] = None
+        self._view: t.Optional[memoryview] = None
+        self._count = 0
+
+    def refresh(self) -> None:
+        """Map records appended since the last read."""
+        size = os.path.getsize(self.path)
+        count = (size - self.offset) // self.struct.size
+        if count == self._count and self._view is not None:
+            return
+        self.close()
+        self._count = count
+        if count:
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)[
+                self.offset : self.offset + count * self.struct.size
+            ]
+
+    def close(self) -> None:
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def ts(self, index: int) -> int:
+        """Timestamp in epoch milliseconds of a record."""
+        assert self._view is not None
+        return self.base + t.cast(
+            int, self.struct.unpack_from(self._view, index * self.struct.size)[0]
+        )
+
+    def bisect(self, ts: int) -> int:
+        """Index of the first record not older than ``ts`` epoch milliseconds."""
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.ts(middle) < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def buffer(self, low: int = 0, high: t.Optional[int] = None) -> memoryview:
+        """Raw bytes of records from index ``low`` until ``high``, without copying."""
+        if self._view is None:
+            return memoryview(b"")
+        high = self._count if high is None else high
+        size = self.struct.size
+        return self._view[low * size : high * size]
+
+    def rows(self, low: int = 0, high: t.Optional[int] = None) -> t.Iterator[tuple]:
+        """Raw records from index ``low`` until ``high``, unpacked from the mapping."""
+        if self._view is None:
+            return iter(())
+        high = self._count if high is None else high
+        size = self.struct.size
+        return self.struct.iter_unpack(self._view[low * size : high * size])
+
+
+class ResultStore(object):
+    """Append-only store of probe, scan and monitor records.
+
+    Each kind is written to its own fixed-width binary segments with a small
+    JSON schema header, names such as hosts and ssids are kept once in a name
+    table. A segment is rolled over after ``segment_records`` records or when
+    its timestamps no longer fit. Processes may write to the same store, ids
+    of new names are assigned under a file lock except on Windows.
+
+    Args:
+        path: Directory of the store. Defaults to STORE_DIR.
+        segment_records: Maximum records of a segment.
+    """
+
+    def __init__(
+        self, path: t.Optional[str] = None, segment_records: int = 1 << 22
+    ) -> None:
+        self.path = path or STORE_DIR
+        self.segment_records = segment_records
+        self._lock = threading.Lock()
+        self._names: t.List[str] = []
+        self._ids: t.Dict[str, int] = {}
+        # kind -> (file, struct, base, last timestamp, records)
+        self._writers: t.Dict[str, t.List[t.Any]] = {}
+        self._segments: t.Dict[str, Segment] = {}
+        self._load_names()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def _load_names(self) -> None:
+        """Read the name table, other processes may have added names."""
+        try:
+            with open(os.path.join(self.path, "names.json"), encoding="utf-8") as f:
+                self._names = json.load(f)
+        except FileNotFoundError:
+            return
+        self._ids = {name: i for i, name in enumerate(self._names)}
+
+    @contextlib.contextmanager
+    def _names_locked(self) -> t.Iterator[None]:
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "names.lock"), "a") as f:
+            if sys.platform != "win32":
+                import fcntl
+
+                # released when the file is closed
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            yield
+
+    def _name_id(self, name: t.Optional[str]) -> int:
+        name = name or ""
+        index = self._ids.get(name)
+        if index is None:
+            with self._names_locked():
+                # the latest table, so ids of other writers are not reused
+                self._load_names()
+                index = self._ids.get(name)
+                if index is None:
+                    index = self._ids[name] = len(self._names)
+                    self._names.append(name)
+                    names = os.path.join(self.path, "names.json")
+                    with open(names + ".tmp", "w", encoding="utf-8") as f:
+                        json.dump(self._names, f)
+                    os.replace(names + ".tmp", names)
+        return index
+
+    def _writer(self, kind: str, ts: int) -> t.List[t.Any]:
+        writer = self._writers.get(kind)
+        if writer is not None:
+            _, _, base, last, count = writer
+            if last <= ts and ts - base <= MAX_OFFSET and count < self.segment_records:
+                return writer
+            writer[0].close()
+        fields = SCHEMAS[kind]
+        fmt = "<" + "".join(field.code for field in fields)
+        schema = {
+            "kind": kind,
+            "base": ts,
+            "format": fmt,
+            "fields": [field._asdict() for field in fields],
+        }
+        header = json.dumps(schema).encode("utf-8")
+        os.makedirs(self.path, exist_ok=True)
+        path = os.path.join(self.path, f"{kind}-{ts:013d}.seg")
+        f = open(path, "ab")
+        if f.tell() == 0:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header)) + header)
+            # readers of other processes open the segment by its header
+            f.flush()
+        writer = self._writers[kind] = [f, struct.Struct(fmt), ts, ts, 0]
+        return writer
+
+    def append(self, kind: str, ts: t.Optional[float] = None, **values: t.Any) -> None:
+        """Append a record.
+
+        Args:
+            kind: probe, scan or monitor.
+            ts: Unix time of the record, defaults to now.
+            values: Fields of the schema, names are given as strings.
+        """
+        ts_ms = int(round((time.time() if ts is None else ts) * 1000))
+        with self._lock:
+            writer = self._writer(kind, ts_ms)
+            row = []
+            for field in SCHEMAS[kind]:
+                if field.kind == "time":
+                    row.append(ts_ms - writer[2])
+                elif field.kind == "name":
+                    row.append(self._name_id(values.get(field.name)))
+                else:
+                    row.append(_encode(field, values.get(field.name)))
+            writer[0].write(writer[1].pack(*row))
+            writer[3] = ts_ms
+            writer[4] += 1
+
+    def append_probe(
+        self, target: str, rtt: t.Union[float, None, bool], ts: t.Optional[float] = None
+    ) -> None:
+        """Append a ping result, rtt is in seconds, None or False if lost."""
+        self.append("probe", ts=ts, target=target, rtt=rtt * 1000 if rtt else None)
+
+    def append_sample(self, record: t.Mapping[str, t.Any]) -> None:
+        """Append a sample taken by ``monitor.sample``."""
+        self.append("monitor", **{k: v for k, v in record.items() if k != "stats"})
+
+    def append_scan(self, result: t.Any) -> None:
+        """Append every network of a ScanResult."""
+        for network in result:
+            self.append(
+                "scan",
+                ts=result.timestamp,
+                ssid=network.ssid,
+                bssid=_bssid_to_bytes(network.bssid),
+                rssi=network.rssi,
+                channel=network.primary_channel,
+            )
+
+    def flush(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer[0].flush()
+
+    def close(self) -> None:
+        with self._lock:
+            for writer in self._writers.values():
+                writer[0].close()
+            self._writers.clear()
+            for segment in self._segments.values():
+                segment.close()
+            self._segments.clear()
+
+    def segments(self, kind: str) -> t.List[Segment]:
+        """Obtain segments of a kind in time order, mapped up to date."""
+        self.flush()
+        try:
+            files = sorted(
+                name
+                for name in os.listdir(self.path)
+                if name.startswith(f"{kind}-") and name.endswith(".seg")
+            )
+        except OSError:
+            files = []
+        segments = []
+        for name in files:
+            segment = self._segments.get(name)
+            if segment is None:
+                segment = self._segments[name] = Segment(os.path.join(self.path, name))
+            segment.refresh()
+            segments.append(segment)
+        return segments
+
+    def _chunks(
+        self,
+        kind: str,
+        start: t.Optional[float],
+        end: t.Optional[float],
+        bucket_ms: t.Optional[int] = None,
+    ) -> t.Iterator[t.Tuple[int, Segment, int, int]]:
+        """Yield (bucket start, segment, low, high) of records within a time range.
+
+        Bucket starts are epoch milliseconds, 0 if ``bucket_ms`` is not given.
+        """
+        start_ms = None if start is None else int(start * 1000)
+        end_ms = None if end is None else int(end * 1000)
+        for segment in self.segments(kind):
+            if not len(segment):
+                continue
+            if end_ms is not None and segment.ts(0) >= end_ms:
+                continue
+            if start_ms is not None and segment.ts(len(segment) - 1) < start_ms:
+                continue
+            low = 0 if start_ms is None else segment.bisect(start_ms)
+            high = len(segment) if end_ms is None else segment.bisect(end_ms)
+            while low < high:
+                if not bucket_ms:
+                    yield 0, segment, low, high
+                    break
+                ts = segment.ts(low)
+                key = ts - ts % bucket_ms
+                until = min(segment.bisect(key + bucket_ms), high)
+                yield key, segment, low, until
+                low = until
+
+    def _rows(
+        self,
+        kind: str,
+        start: t.Optional[float],
+        end: t.Optional[float],
+        name: t.Optional[str],
+        bucket_ms: t.Optional[int] = None,
+    ) -> t.Iterator[t.Tuple[int, int, t.Iterable[tuple]]]:
+        """Yield (bucket start, segment base, raw records) within a time range."""
+        name_index = name_id = None
+        if name is not None:
+            if name not in self._ids:
+                self._load_names()
+            if name not in self._ids:
+                return
+            name_id = self._ids[name]
+            name_index = [field.kind for field in SCHEMAS[kind]].index("name")
+        for key, segment, low, high in self._chunks(kind, start, end, bucket_ms):
+            rows: t.Iterable[tuple] = segment.rows(low, high)
+            if name_index is not None:
+                rows = (row for row in rows if row[name_index] == name_id)
+            yield key, segment.base, rows
+
+    def query(
+        self,
+        kind: str,
+        start: t.Optional[float] = None,
+        end: t.Optional[float] = None,
+        name: t.Optional[str] = None,
+        limit: t.Optional[int] = None,
+    ) -> t.Iterator[t.Dict[str, t.Any]]:
+        """Read records within a time range.
+
+        Args:
+            kind: probe, scan or monitor.
+            start: Unix time from, inclusive.
+            end: Unix time until, exclusive.
+            name: Only records of this target or ssid.
+            limit: Maximum number of records.
+
+        Yields:
+            Decoded record. For example: {'ts': 1671000000.0, 'target': 'jd.com', 'rtt': 8.1}
+        """
+        fields = SCHEMAS[kind]
+        decoders = [_decoder(field) for field in fields]
+        records = (
+            (base + row[0], row)
+            for _, base, rows in self._rows(kind, start, end, name)
+            for row in rows
+        )
+        for n, (ts, row) in enumerate(records):
+            if limit is not None and n >= limit:
+                return
+            record: t.Dict[str, t.Any] = {}
+            for field, decode, value in zip(fields, decoders, row):
+                if field.kind == "time":
+                    record[field.name] = ts / 1000
+                elif field.kind == "name":
+                    if value >= len(self._names):
+                        self._load_names()
+                    record[field.name] = self._names[value]
+                elif field.kind == "bytes":
+                    record[field.name] = ":".join(f"{b:02x}" for b in value)
+                else:
+                    record[field.name] = decode(value)
+            yield record
+
+    def aggregate(
+        self,
+        kind: str,
+        field: str,
+        start: t.Optional[float] = None,
+        end: t.Optional[float] = None,
+        name: t.Optional[str] = None,
+        bucket: t.Optional[float] = None,
+    ) -> t.List[t.Dict[str, t.Any]]:
+        """Summarize a numeric field within a time range.
+
+        Args:
+            kind: probe, scan or monitor.
+            field: Numeric field. For example: rtt
+            start: Unix time from, inclusive.
+            end: Unix time until, exclusive.
+            name: Only records of this target or ssid.
+            bucket: Seconds of each summary, defaults to one for the whole range.
+
+        Raises:
+            ValueError: Field is not numeric.
+
+        Returns:
+            Summaries in time order. For example: [{'start': 1671000000.0, 'count': 60, 'missing': 1, 'min': 7.9, 'avg': 8.3, 'max': 12.1}]
+        """
+        fields = SCHEMAS[kind]
+        numeric = [f.name for f in fields if f.kind == "number"]
+        if field not in numeric:
+            raise ValueError(
+                f"{field} is not a numeric field of {kind}, choose from {numeric}."
+            )
+        index = [f.name for f in fields].index(field)
+        spec = fields[index]
+        missing = _LIMITS[spec.code][2]
+        bucket_ms = int(bucket * 1000) if bucket else None
+        # bucket start -> [count, missing, min, max, sum]
+        buckets: t.Dict[int, t.List[t.Any]] = {}
+        for key, _, rows in self._rows(kind, start, end, name, bucket_ms):
+            values = [row[index] for row in rows]
+            if not values:
+                continue
+            present = [value for value in values if value != missing]
+            summary = buckets.setdefault(key, [0, 0, None, None, 0])
+            summary[0] += len(values)
+            summary[1] += len(values) - len(present)
+            if present:
+                low, high = min(present), max(present)
+                summary[2] = low if summary[2] is None else min(summary[2], low)
+                summary[3] = high if summary[3] is None else max(summary[3], high)
+                summary[4] += sum(present)
+        scale = spec.scale
+        summaries = []
+        for key in sorted(buckets):
+            count, lost, low, high, total = buckets[key]
+            present = count - lost
+            summaries.append(
+                {
+                    "start": key / 1000 if bucket_ms else start,
+                    "count": count,
+                    "missing": lost,
+                    "min": None if low is None else round(low * scale, 3),
+                    "avg": round(total * scale / present, 3) if present else None,
+                    "max": None if high is None else round(high * scale, 3),
+                }
+            )
+        return summaries
+
+
+def parse_time(value: str, now: t.Optional[float] = None) -> float:
+    """Parse a point in time of the command line.
+
+    Args:
+        value: Age such as 90s, 30m, 1h, 7d, Unix time or ISO 8601 datetime.
+        now: Unix time ages are relative to, defaults to now.
+
+    Raises:
+        ValueError: Value is not understood.
+
+    Returns:
+        Unix time. For example: 1671000000.0
+    """
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+    value = value.strip()
+    if value[-1:] in units:
+        try:
+            age = float(value[:-1]) * units[value[-1]]
+        except ValueError:
+            pass
+        else:
+            return (time.time() if now is None else now) - age
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value).timestamp()
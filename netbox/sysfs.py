@@ -0,0 +1,121 @@
+import os
+import typing as t
+
+# /proc/net/wireless reports -256 (or 0 with some drivers) if noise is unknown
+_UNKNOWN_NOISE = (-256.0, 0.0)
+
+
+class LinkStatsReader(object):
+    """Read link statistics of an interface from procfs and sysfs.
+
+    Files are opened once and re-read with ``os.pread`` at offset 0, procfs
+    and sysfs regenerate their content on every read from the beginning, so
+    no process is spawned and no file is reopened for a poll.
+
+    Args:
+        interface: Interface name. For example: wlan0
+        root: Root of filesystem, a fake tree can be used by tests.
+    """
+
+    def __init__(self, interface: str, root: str = "/") -> None:
+        self.interface = interface
+        self.root = root
+        self._fds: t.Dict[str, int] = {}
+
+    def _path(self, name: str) -> str:
+        if name == "wireless":
+            return os.path.join(self.root, "proc", "net", "wireless")
+        return os.path.join(self.root, "sys", "class", "net", self.interface, name)
+
+    def read(self, name: str, size: int = 4096) -> t.Optional[bytes]:
+        """Read a statistics file, keep it open for next read.
+
+        Args:
+            name: 'wireless' for /proc/net/wireless, otherwise an attribute of
+                /sys/class/net/<iface>/. For example: operstate
+            size: Maximum bytes to read.
+
+        Returns:
+            Content of the file or None if it does not exist.
+        """
+        fd = self._fds.get(name)
+        if fd is None:
+            try:
+                fd = os.open(self._path(name), os.O_RDONLY)
+            except OSError:
+                return None
+            self._fds[name] = fd
+        try:
+            return os.pread(fd, size, 0)
+        except OSError:
+            # interface has gone, reopen it next time
+            os.close(self._fds.pop(name))
+            return None
+
+    def close(self) -> None:
+        """Close all opened files."""
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+
+    def __enter__(self) -> "LinkStatsReader":
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def wireless(self) -> t.Optional[t.Dict[str, t.Optional[float]]]:
+        """Obtain link quality, signal level and noise from /proc/net/wireless.
+
+        Returns:
+            Dict of statistics or None if the interface is not wireless or not
+            associated. For example: {'link': 70.0, 'level': -40.0, 'noise': None}
+        """
+        content = self.read("wireless", size=16384)
+        if not content:
+            return None
+        prefix = f"{self.interface}:".encode()
+        for line in content.splitlines()[2:]:
+            line = line.strip()
+            if not line.startswith(prefix):
+                continue
+            fields = line[len(prefix) :].split()
+            try:
+                link, level, noise = (float(f.rstrip(b".")) for f in fields[1:4])
+            except ValueError:
+                return None
+            return {
+                "link": link,
+                "level": level,
+                "noise": None if noise in _UNKNOWN_NOISE else noise,
+            }
+        return None
+
+    def rssi(self) -> t.Optional[int]:
+        """Obtain signal level in dBm, None if it is unknown."""
+        stats = self.wireless()
+        if stats is None or stats["level"] is None:
+            return None
+        return int(stats["level"])
+
+    def operstate(self) -> str:
+        """Obtain operational state. For example: up, down, dormant or unknown"""
+        content = self.read("operstate", size=64)
+        return content.strip().decode() if content else "unknown"
+
+    def is_up(self) -> bool:
+        """Determine whether the interface is up and has carrier."""
+        return self.operstate() == "up"
+
+    def counters(self) -> t.Dict[str, int]:
+        """Obtain traffic counters from /sys/class/net/<iface>/statistics/.
+
+        Returns:
+            Dict of counters. For example: {'rx_bytes': 1024, 'tx_bytes': 2048, ...}
+        """
+        counters = {}
+        for name in ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets"):
+            content = self.read(os.path.join("statistics", name), size=32)
+            if content:
+                counters[name] = int(content)
+        return counters
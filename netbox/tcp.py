@@ -0,0 +1,224 @@
+import collections
+import errno
+import ipaddress
+import os
+import selectors
+import socket
+import struct
+import time
+import typing as t
+
+from .ping import PingResult
+from .resolver import get_resolver
+
+# a closed socket sends RST instead of FIN, so no TIME_WAIT is left behind
+_LINGER_RESET = struct.pack("ii", 1, 0)
+_IN_PROGRESS = (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY)
+
+# (family, sockaddr) of a target, None if it can not be resolved
+Address = t.Optional[t.Tuple[int, t.Tuple[t.Any, ...]]]
+
+
+def parse_target(target: str, port: int = 80) -> t.Tuple[str, int]:
+    """Split a target into host and port.
+
+    Args:
+        target: host, host:port, IPv6 address or [IPv6]:port.
+        port: Port of a target without one.
+
+    Raises:
+        ValueError: Port is not a number or out of range.
+
+    Returns:
+        Tuple of (host, port). For example: ('192.168.1.1', 22)
+    """
+    host, value = target, None
+    if target.startswith("["):
+        host, _, rest = target[1:].partition("]")
+        if rest.startswith(":"):
+            value = rest[1:]
+    elif target.count(":") == 1:
+        host, _, value = target.partition(":")
+    if value is not None:
+        if not value.isdigit():
+            raise ValueError(f"port {value} is not a number")
+        port = int(value)
+    if not 0 < port < 65536:
+        raise ValueError(f"port {port} is out of range")
+    return host, port
+
+
+class _Connect(object):
+    """A connect waiting for its handshake."""
+
+    __slots__ = ("target", "sock", "started")
+
+    def __init__(self, target: str, sock: socket.socket, started: float) -> None:
+        self.target = target
+        self.sock = sock
+        self.started = started
+
+
+class TcpEngine(object):
+    """Measure TCP handshake time of many targets with non-blocking connects.
+
+    Sockets are watched by one selector (epoll on Linux, kqueue on MacOS),
+    a connect finishes when the socket becomes writable and is closed right
+    away without sending anything, so no privilege is needed and no service
+    sees a request.
+
+    Args:
+        timeout: Seconds to wait for each handshake.
+        concurrency: Maximum number of connects in flight.
+        port: Port of targets without one.
+    """
+
+    def __init__(
+        self, timeout: float = 2.0, concurrency: int = 512, port: int = 80
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than 0.")
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.port = port
+        self._addresses: t.Dict[t.Tuple[str, int], Address] = {}
+        self._names: t.Dict[str, t.Optional[str]] = {}
+
+    def _prefetch(self, targets: t.Iterable[str]) -> None:
+        """Resolve names of all targets at once."""
+        names = set()
+        for target in targets:
+            try:
+                host, _ = parse_target(target, self.port)
+            except ValueError:
+                continue
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                names.add(host)
+        self._names.update(get_resolver().resolve_many(names))
+
+    def _resolve(self, target: str) -> Address:
+        host, port = parse_target(target, self.port)
+        key = (host, port)
+        if key not in self._addresses:
+            try:
+                ipaddress.ip_address(host)
+            except ValueError:
+                if host not in self._names:
+                    self._names[host] = get_resolver().resolve(host)
+                addr = self._names[host]
+                self._addresses[key] = (
+                    None if addr is None else (socket.AF_INET, (addr, port))
+                )
+            else:
+                family, _, _, _, sockaddr = socket.getaddrinfo(
+                    host, port, type=socket.SOCK_STREAM, flags=socket.AI_NUMERICHOST
+                )[0]
+                self._addresses[key] = (family, sockaddr)
+        return self._addresses[key]
+
+    def _open(self, target: str) -> t.Union[_Connect, t.Tuple[PingResult, str]]:
+        try:
+            address = self._resolve(target)
+        except ValueError as e:
+            return None, str(e)
+        if address is None:
+            return False, "unknown host"
+        family, sockaddr = address
+        try:
+            sock = socket.socket(family, socket.SOCK_STREAM)
+        except OSError as e:
+            return None, os.strerror(e.errno) if e.errno else str(e)
+        sock.setblocking(False)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, _LINGER_RESET)
+        started = time.perf_counter()
+        try:
+            code = sock.connect_ex(sockaddr)
+        except (OSError, OverflowError) as e:
+            sock.close()
+            return None, str(e)
+        if code == 0:
+            # loopback may finish the handshake within connect
+            sock.close()
+            return time.perf_counter() - started, ""
+        if code not in _IN_PROGRESS:
+            sock.close()
+            return None, self._reason(code)
+        return _Connect(target, sock, started)
+
+    @staticmethod
+    def _reason(code: int) -> str:
+        if code == errno.ECONNREFUSED:
+            return "refused"
+        return os.strerror(code)
+
+    def sweep(
+        self, targets: t.Iterable[str]
+    ) -> t.Iterator[t.Tuple[str, PingResult, str]]:
+        """Connect to all targets and yield results in the order they finish.
+
+        Args:
+            targets: host:port strings, hosts without a port use ``port``.
+
+        Yields:
+            Tuple of (target, result, reason), result is the handshake time in
+            seconds, None if it failed or timed out and False if the target
+            can not be resolved. Reason is empty if connected. For example:
+            ('192.168.1.1:22', None, 'refused')
+        """
+        pending = collections.deque(targets)
+        self._prefetch(pending)
+        # ordered by start time, so the oldest connect is always the first one
+        inflight: "collections.OrderedDict[int, _Connect]" = collections.OrderedDict()
+        selector = selectors.DefaultSelector()
+        try:
+            while pending or inflight:
+                while pending and len(inflight) < self.concurrency:
+                    target = pending.popleft()
+                    opened = self._open(target)
+                    if isinstance(opened, tuple):
+                        yield (target, *opened)
+                        continue
+                    fd = opened.sock.fileno()
+                    selector.register(fd, selectors.EVENT_WRITE, opened)
+                    inflight[fd] = opened
+
+                if not inflight:
+                    continue
+                oldest = next(iter(inflight.values()))
+                wait = max(0.0, oldest.started + self.timeout - time.perf_counter())
+                events = selector.select(wait)
+                finished = time.perf_counter()
+                for key, _ in events:
+                    connect = key.data
+                    del inflight[key.fd]
+                    selector.unregister(key.fd)
+                    code = connect.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    connect.sock.close()
+                    if code:
+                        yield connect.target, None, self._reason(code)
+                    else:
+                        yield connect.target, finished - connect.started, ""
+
+                deadline = time.perf_counter() - self.timeout
+                while inflight:
+                    fd, connect = next(iter(inflight.items()))
+                    if connect.started > deadline:
+                        break
+                    del inflight[fd]
+                    selector.unregister(fd)
+                    connect.sock.close()
+                    yield connect.target, None, "timeout"
+        finally:
+            for connect in inflight.values():
+                connect.sock.close()
+            selector.close()
+
+    def check(self, targets: t.Iterable[str]) -> t.Dict[str, PingResult]:
+        """Connect to all targets and collect results.
+
+        Returns:
+            Handshake time of each target. For example: {'127.0.0.1:22': 0.0001, '10.0.0.1:80': None}
+        """
+        return {target: result for target, result, _ in self.sweep(targets)}
@@ -0,0 +1,199 @@
+import socket
+import threading
+import time
+
+import pytest
+
+from ..agent import (
+    FRAME_HEADER,
+    METHODS,
+    AgentClient,
+    AgentPool,
+    AgentServer,
+    encode_frame,
+    parse_address,
+    read_frame,
+)
+from ..core import Netbox
+from ..exception import AgentException
+from ..replay import ReplayAdapter
+
+
+def replay_netbox(latency: float = 0.0) -> Netbox:
+    netbox = Netbox()
+    netbox._adapter = ReplayAdapter(latency=latency)
+    return netbox
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = AgentServer(
+        ["tcp://127.0.0.1:0", f"unix://{tmp_path / 'agent.sock'}"],
+        netbox=replay_netbox(latency=0.2),
+    ).start()
+    yield server
+    server.stop()
+
+
+def test_parse_address() -> None:
+    assert parse_address("10.0.0.1")[1] == ("10.0.0.1", 5220)
+    assert parse_address("tcp://10.0.0.1:80")[1] == ("10.0.0.1", 80)
+    assert parse_address("unix:///tmp/agent.sock")[1] == "/tmp/agent.sock"
+
+
+def test_pipelined_requests_over_tcp_and_unix(server) -> None:
+    for address in server.addresses:
+        with AgentClient(address) as client:
+            assert client.call("version")
+            # slow wifi request first, the fast ones are answered meanwhile
+            slow = client.submit("scan", max_age=0)
+            fast = [
+                client.submit("ping", host="127.0.0.1", timeout=1) for _ in range(20)
+            ]
+            for future in fast:
+                assert isinstance(future.result(timeout=5), float)
+            assert not slow.done()
+            assert slow.result(timeout=5)[0]["ssid"] == "Office WiFi"
+
+
+def test_errors_are_returned_per_request(server) -> None:
+    with AgentClient(server.addresses[0]) as client:
+        with pytest.raises(AgentException, match="Unknown method"):
+            client.call("format_disk")
+        with pytest.raises(AgentException, match="TypeError"):
+            client.call("ping", hostname="127.0.0.1")
+        # connection is still usable
+        assert "scan" in client.call("methods")
+
+
+def test_pool_fans_out_concurrently() -> None:
+    servers = [
+        AgentServer(["127.0.0.1:0"], netbox=replay_netbox(latency=0.2)).start()
+        for _ in range(5)
+    ]
+    addresses = [server.addresses[0] for server in servers]
+    try:
+        with AgentPool(addresses + ["127.0.0.1:1"], timeout=5) as pool:
+            start = time.perf_counter()
+            results = pool.fan_out("ssid")
+            elapsed = time.perf_counter() - start
+            # airport -I of each agent takes 0.2s, they run at the same time
+            assert elapsed < 0.2 * len(servers)
+            assert [results[address] for address in addresses] == ["Office WiFi"] * 5
+            assert isinstance(results["127.0.0.1:1"], AgentException)
+            # connections are kept and reused
+            socks = [pool.client(address)._sock for address in addresses]
+            pool.fan_out("version")
+            assert [pool.client(address)._sock for address in addresses] == socks
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def test_token_required_beyond_loopback() -> None:
+    with pytest.raises(AgentException, match="needs a token"):
+        AgentServer(["tcp://0.0.0.0:0"], netbox=replay_netbox())
+    server = AgentServer(
+        ["tcp://0.0.0.0:0"], netbox=replay_netbox(), token="secret"
+    ).start()
+    port = server.addresses[0].rsplit(":", 1)[1]
+    try:
+        with AgentClient(f"127.0.0.1:{port}") as client:
+            with pytest.raises(AgentException, match="Token"):
+                client.call("version")
+        with AgentClient(f"127.0.0.1:{port}", token="wrong") as client:
+            with pytest.raises(AgentException, match="Token"):
+                client.call("version")
+        with AgentPool([f"127.0.0.1:{port}"], timeout=5, token="secret") as pool:
+            assert pool.fan_out("version")[f"127.0.0.1:{port}"]
+    finally:
+        server.stop()
+
+
+def test_unencodable_result_is_an_error(server, monkeypatch) -> None:
+    monkeypatch.setitem(METHODS, "opaque", (lambda netbox: object(), False))
+    with AgentClient(server.addresses[0]) as client:
+        with pytest.raises(AgentException, match="TypeError"):
+            client.call("opaque")
+        assert client.call("version")
+
+
+def test_client_skips_frames_without_request_id() -> None:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def serve() -> None:
+        conn, _ = listener.accept()
+        with conn, conn.makefile("rb") as reader:
+            request = read_frame(reader)
+            assert request is not None
+            for request_id in (None, [1], "1"):
+                conn.sendall(encode_frame({"id": request_id, "result": "bogus"}))
+            conn.sendall(encode_frame({"id": request["id"], "result": "ok"}))
+            reader.read(1)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    host, port = listener.getsockname()
+    try:
+        with AgentClient(f"{host}:{port}", timeout=5) as client:
+            assert client.call("version") == "ok"
+    finally:
+        listener.close()
+
+
+def test_non_object_frame_is_answered_and_closed(server) -> None:
+    _, address = parse_address(server.addresses[0])
+    with socket.create_connection(address, timeout=5) as conn:
+        conn.sendall(FRAME_HEADER.pack(5) + b"[1,2]")
+        with conn.makefile("rb") as reader:
+            response = read_frame(reader)
+            assert response is not None and response["id"] is None
+            assert response["error"]["message"] == "Frame is not a JSON object."
+            assert read_frame(reader) is None
+    with AgentClient(server.addresses[0]) as client:
+        assert client.call("version")
+
+
+def test_failed_response_releases_its_slot(monkeypatch) -> None:
+    handle = AgentServer._handle
+
+    def broken_handle(self, request):
+        if request["method"] == "broken":
+            raise RuntimeError("broken")
+        return handle(self, request)
+
+    monkeypatch.setattr(AgentServer, "_handle", broken_handle)
+    server = AgentServer(["127.0.0.1:0"], netbox=replay_netbox(), max_pending=2)
+    server.start()
+    try:
+        with AgentClient(server.addresses[0], timeout=5) as client:
+            for _ in range(4):
+                client.submit("broken")
+            assert client.call("version")
+    finally:
+        server.stop()
+
+
+def test_client_fails_requests_on_non_object_reply() -> None:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+
+    def serve() -> None:
+        conn, _ = listener.accept()
+        with conn, conn.makefile("rb") as reader:
+            assert read_frame(reader) is not None
+            conn.sendall(FRAME_HEADER.pack(3) + b"[1]")
+            reader.read(1)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    host, port = listener.getsockname()
+    try:
+        with AgentClient(f"{host}:{port}", timeout=5) as client:
+            with pytest.raises(AgentException, match="not a JSON object"):
+                client.call("version")
+    finally:
+        listener.close()
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+import typing as t
+
+import pytest
+
+from ..aio import AsyncMacAdapter, AsyncNetbox, AsyncPinger, ExecutorAdapter
+from ..constant import WiFiState
+from ..exception import PingException
+from ..wifi import MacAdapter
+from .test_connect import FakeAdapter
+
+AIRPORT = """\
+import sys, time
+time.sleep(0.3)
+if sys.argv[1] == "-I":
+    print("     agrCtlRSSI: -45")
+    print("          state: running")
+    print("           SSID: Office WiFi")
+    print("          BSSID: a0:b0:c0:d0:e0:f0")
+else:
+    print("                            SSID BSSID             RSSI CHANNEL HT CC SECURITY")
+    print("                     Office WiFi a0:b0:c0:d0:e0:f0 -45  36      Y  CN WPA2(PSK/AES/AES)")
+"""
+
+
+def fake_mac_adapter(tmp_path) -> AsyncMacAdapter:
+    script = tmp_path / "airport"
+    script.write_text(f"#!{sys.executable}\n{AIRPORT}")
+    os.chmod(script, 0o755)
+    adapter = AsyncMacAdapter()
+    adapter.AIRPORT_PATH = str(script)
+    return adapter
+
+
+def test_gather_shares_reads_and_scans(tmp_path) -> None:
+    async def main():
+        netbox = AsyncNetbox(adapter=fake_mac_adapter(tmp_path))
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *[netbox.current_wifi_info() for _ in range(20)],
+            *[netbox.scan() for _ in range(20)],
+        )
+        return netbox, results, time.perf_counter() - start
+
+    netbox, results, elapsed = asyncio.run(main())
+    info = json.loads(results[0])["data"]
+    assert info["ssid"] == "Office WiFi" and info["rssi"] == "-45"
+    assert all(scan.strongest().ssid == "Office WiFi" for scan in results[20:])
+    # both commands ran once and at the same time
+    assert netbox.adapter.command_stats()["airport"]["count"] == 2
+    assert elapsed < 0.6 * 2
+
+
+def test_gather_pings_on_one_loop() -> None:
+    async def main():
+        async with AsyncNetbox(timeout=1.0) as netbox:
+            hosts = ["127.0.0.1"] * 50 + ["unknown.invalid"]
+            rtts = await asyncio.gather(*(netbox.check_host_state(h) for h in hosts))
+            return rtts, await netbox.check_hosts(["127.0.0.1", "unknown.invalid"])
+
+    try:
+        rtts, results = asyncio.run(main())
+    except PingException:
+        pytest.skip("ICMP socket is not permitted.")
+    assert all(isinstance(rtt, float) for rtt in rtts[:-1])
+    assert rtts[-1] is False
+    assert results["unknown.invalid"] is False
+
+
+def test_ping_waits_until_send_buffer_drains() -> None:
+    writable, peer = socket.socketpair()
+
+    class FullSocket(object):
+        sent = 0
+        blocked = 0
+
+        def fileno(self) -> int:
+            return writable.fileno()
+
+        def sendto(self, packet: bytes, address: t.Tuple[str, int]) -> None:
+            if self.blocked < 4:
+                self.blocked += 1
+                raise BlockingIOError
+            self.sent += 1
+
+    sock = FullSocket()
+
+    async def main():
+        pinger = AsyncPinger()
+        pinger._loop = asyncio.get_running_loop()
+        pinger._sock = sock  # type: ignore
+        sends = (pinger._send(sock, b"", "127.0.0.1") for _ in range(3))  # type: ignore
+        await asyncio.wait_for(asyncio.gather(*sends), 1.0)
+        return pinger._writable
+
+    try:
+        assert asyncio.run(main()) is None
+    finally:
+        writable.close()
+        peer.close()
+    assert (sock.blocked, sock.sent) == (4, 3)
+
+
+class SlowAdapter(MacAdapter):
+    def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        time.sleep(0.3)
+        return WiFiState.CONNECTED
+
+
+def test_executor_adapter_keeps_loop_free() -> None:
+    async def main():
+        adapter = ExecutorAdapter(SlowAdapter())
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            for _ in range(5):
+                await asyncio.sleep(0.02)
+                ticks += 1
+
+        state, _ = await asyncio.gather(adapter.connect("ssid", "pass"), tick())
+        await adapter.close()
+        return state, ticks
+
+    state, ticks = asyncio.run(main())
+    assert state == WiFiState.CONNECTED
+    assert ticks == 5
+
+
+def test_async_connect_reports_phases() -> None:
+    async def main():
+        netbox = AsyncNetbox(adapter=ExecutorAdapter(FakeAdapter()))
+        netbox.check_host_state = lambda host, timeout=None: asyncio.sleep(0, 0.01)
+        result = await netbox.connect("Office", "secret", target="10.0.0.1")
+        await netbox.close()
+        return json.loads(result)
+
+    result = asyncio.run(main())
+    assert result["code"] == 0
+    assert result["data"]["phases"]["ip_ready"] >= 200
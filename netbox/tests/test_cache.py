@@ -0,0 +1,39 @@
+import time
+
+from ..cache import CommandCache
+from ..wifi import MacAdapter
+
+
+class EchoAdapter(MacAdapter):
+    CACHE_TTL_RULES = (("^echo read", 60.0), ("^echo short", 0.05))
+    CACHE_INVALIDATION_RULES = (("^echo write", ("^echo read",)),)
+
+
+def test_cache_ttl_and_invalidation() -> None:
+    adapter = EchoAdapter()
+    assert adapter.execute_command("echo read") == "read\n"
+    assert adapter.execute_command("echo read") == "read\n"
+    assert adapter.cache_info().hits == 1
+    adapter.execute_command("echo write")
+    adapter.execute_command("echo read")
+    info = adapter.cache_info()
+    assert (info.hits, info.misses, info.invalidations) == (1, 2, 1)
+
+
+def test_cache_expired() -> None:
+    adapter = EchoAdapter()
+    adapter.execute_command("echo short")
+    time.sleep(0.06)
+    adapter.execute_command("echo short")
+    assert adapter.cache_info().hits == 0
+
+
+def test_cache_lru_eviction() -> None:
+    cache = CommandCache(ttl_rules=(("", 60.0),), maxsize=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.info().size == 2
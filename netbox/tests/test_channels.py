@@ -0,0 +1,102 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from ..channels import analyze_channels, load_scans, merge_scans, scan_arrays
+from ..scan import Network, ScanResult
+from ..scripts.command import cli
+from ..store import ResultStore
+
+np = pytest.importorskip("numpy")
+
+BASE = 1671000000.0
+
+
+def scans(count: int = 10):
+    """Scans every 10 seconds of a busy channel 1, a weaker channel 3 and a quiet 11."""
+    for i in range(count):
+        yield ScanResult(
+            [
+                Network("Office", "1c:bf:ce:00:00:01", -40, "1"),
+                Network("Lab", "1c:bf:ce:00:00:02", -50, "1"),
+                Network("Guest", "1c:bf:ce:00:00:03", -60, "3"),
+                Network("Far", "1c:bf:ce:00:00:04", -90, "11"),
+                Network("Office", "1c:bf:ce:00:00:05", -55, "36,+1"),
+                Network("Hidden", "", -70, "?"),
+            ],
+            timestamp=BASE + i * 10,
+        )
+
+
+def test_analyze_channels() -> None:
+    report = analyze_channels(scan_arrays(scans()), top=2)
+    channels = {row["channel"]: row for row in report["channels"]}
+
+    # the network of an unknown channel is left out
+    assert report["rows"] == 50
+    assert report["snapshots"] == 10
+    assert channels[1]["networks"] == 2
+    assert channels[1]["occupancy"] == 2.0
+    assert channels[1]["rssi_max"] == -40
+    assert channels[1]["rssi_avg"] == -45.0
+    # -40 and -50 dBm on channel 1 plus 12/22 of -60 dBm from channel 3
+    power = 10**-4 + 10**-5 + 12 / 22 * 10**-6
+    assert channels[1]["interference"] == round(10 * np.log10(power), 1)
+    # channel 6 is 25 MHz from channel 1 and 15 MHz from channel 3
+    assert channels[6]["networks"] == 0
+    assert channels[6]["interference"] == round(10 * np.log10(7 / 22 * 10**-6), 1)
+    # 5 GHz channels are 20 MHz wide, neighbours do not overlap
+    assert channels[40]["interference"] is None
+    assert channels[44]["interference"] is None
+    assert report["recommended"]["2.4"] == [11, 6]
+    assert report["recommended"]["5"] == [40, 44]
+
+    only = analyze_channels(scan_arrays(scans()), candidates=[1, 6, 36], top=5)
+    assert only["recommended"] == {"2.4": [6, 1], "5": [36]}
+
+
+def test_load_scans_from_store(tmp_path) -> None:
+    with ResultStore(path=str(tmp_path), segment_records=7) as store:
+        for result in scans():
+            store.append_scan(result)
+        loaded = load_scans(store)
+        recent = load_scans(store, start=BASE + 50)
+
+    expected = scan_arrays(scans())
+    for name in ("ts", "rssi", "channel", "bssid"):
+        assert loaded[name].tolist() == expected[name].tolist()
+    assert recent["ts"].min() == (BASE + 50) * 1000
+    assert len(recent["ts"]) == 30
+    assert analyze_channels(loaded) == analyze_channels(expected)
+
+    merged = merge_scans(recent, scan_arrays([next(scans())]))
+    assert len(merged["ts"]) == 36
+    assert merged["bssid"].dtype == np.uint64
+
+
+def test_analyze_command(tmp_path) -> None:
+    runner = CliRunner(mix_stderr=False)
+    result = runner.invoke(cli, ["wlan", "analyze", "--path", str(tmp_path)])
+    assert result.exit_code == 1
+    assert "no scan results" in result.stderr
+
+    with ResultStore(path=str(tmp_path)) as store:
+        for result in scans():
+            store.append_scan(result)
+    result = runner.invoke(
+        cli,
+        [
+            "wlan",
+            "analyze",
+            "--path",
+            str(tmp_path),
+            "--since",
+            "0",
+            "--channels",
+            "1,6",
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.stdout)["data"]
+    assert report["recommended"] == {"2.4": [6, 1]}
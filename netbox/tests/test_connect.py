@@ -0,0 +1,101 @@
+import json
+import time
+import typing as t
+
+from ..connect import ConnectPipeline, backoff, wait_until
+from ..constant import WiFiState
+from ..core import Netbox
+from ..scan import Network, ScanResult
+from ..wifi import MacAdapter
+
+
+class FakeAdapter(MacAdapter):
+    """Interface is off, the ssid shows up on the second scan, DHCP takes 0.2s."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.on = False
+        self.scans = 0
+        self.connected_at = 0.0
+        self.connect_timeout: t.Optional[float] = None
+
+    def is_on_or_off(self) -> WiFiState:
+        return WiFiState.ON if self.on else WiFiState.OFF
+
+    def turn_on(self) -> bool:
+        self.on = True
+        return True
+
+    def _scan(self) -> ScanResult:
+        self.scans += 1
+        networks = [Network("Office", "", -40, "36")] if self.scans > 1 else []
+        return ScanResult(networks)
+
+    def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        self.connected_at = time.monotonic()
+        self.connect_timeout = timeout
+        return (
+            WiFiState.CONNECTED if password == "secret" else WiFiState.CONNECTED_FAILED
+        )
+
+    def get_ip_address(self):
+        if self.connected_at and time.monotonic() - self.connected_at > 0.2:
+            return "192.168.1.8"
+        return None
+
+
+def test_backoff_is_capped() -> None:
+    delays = backoff(initial=0.1, maximum=0.5)
+    assert [next(delays) for _ in range(5)] == [0.1, 0.2, 0.4, 0.5, 0.5]
+
+
+def test_wait_until_deadline() -> None:
+    start = time.monotonic()
+    assert not wait_until(lambda: None, timeout=0.2)
+    assert 0.2 <= time.monotonic() - start < 0.4
+    assert wait_until(lambda: "ready", timeout=1) == "ready"
+
+
+def test_connect_reports_phases_without_fixed_sleeps() -> None:
+    netbox = Netbox()
+    netbox._adapter = FakeAdapter()
+    netbox._reach = lambda host, timeout: 0.012  # type: ignore
+    start = time.monotonic()
+    result = json.loads(netbox.connect("Office", "secret", target="10.0.0.1"))
+    assert time.monotonic() - start < 1.5
+    assert result["code"] == 0
+    assert result["data"]["domain"] == "10.0.0.1"
+    phases = result["data"]["phases"]
+    assert set(phases) == {
+        "power_on",
+        "scan",
+        "associate",
+        "ip_ready",
+        "reachability",
+        "total",
+    }
+    assert phases["ip_ready"] >= 200
+    assert phases["total"] >= sum(v for k, v in phases.items() if k != "total")
+
+
+def test_connect_failed_and_not_found() -> None:
+    adapter = FakeAdapter()
+    pipeline = ConnectPipeline(adapter, reach=lambda host, timeout: None)
+    state, ret, timer = pipeline.run("Office", "wrong")
+    assert state == WiFiState.CONNECTED_FAILED
+    assert timer.to_dict()["ip_ready"] is None
+    state, _, _ = ConnectPipeline(FakeAdapter(), reach=lambda h, t: None).run(
+        "Other", "secret", retry=2
+    )
+    assert state is None
+
+
+def test_connect_shares_deadline_with_adapter() -> None:
+    adapter = FakeAdapter()
+    pipeline = ConnectPipeline(adapter, reach=lambda h, t: None, timeout=5.0)
+    pipeline.run("Office", "secret")
+    # the scan retry spent part of the deadline before associating
+    assert adapter.connect_timeout is not None
+    assert 0 < adapter.connect_timeout < 5.0
@@ -0,0 +1,83 @@
+import json
+import os
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from .. import discovery as discovery_module
+from ..core import Netbox
+from ..discovery import Discovery
+from ..exception import CommandException, NetboxException
+from ..helper import create_adapter
+from ..replay import ReplayAdapter
+from ..scripts.command import cli
+from ..wifi import MacAdapter
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return Discovery(path=str(tmp_path / "discovery.json"))
+
+
+def test_facts_are_saved_and_loaded(cache):
+    facts = cache.facts()
+    assert facts["os"]
+    assert os.path.exists(cache.path)
+
+    other = Discovery(path=cache.path)
+    other.discover = None  # a valid file is never discovered again
+    assert other.facts() == facts
+
+
+@pytest.mark.parametrize(
+    "field,value",
+    [("boot_id", "another boot"), ("netbox", "0.0.0"), ("version", 0)],
+)
+def test_mismatched_file_is_discovered_again(cache, field, value):
+    facts = cache.facts()
+    with open(cache.path, "w", encoding="utf-8") as f:
+        json.dump(dict(facts, **{field: value}), f)
+    assert cache.load() is None
+    assert Discovery(path=cache.path).facts()[field] == facts[field]
+
+
+def test_stale_file_is_discovered_again(cache, monkeypatch):
+    cache.facts()
+    assert cache.load() is not None
+    old = time.time() - cache.max_age - 1
+    os.utime(cache.path, (old, old))
+    assert cache.load() is None
+
+    monkeypatch.setattr(discovery_module, "get_boot_id", lambda: "rebooted")
+    assert Discovery(path=cache.path).facts()["boot_id"] == "rebooted"
+
+
+def test_command_failure_invalidates_cache(cache):
+    cache.facts()
+    adapter = ReplayAdapter()
+    adapter.on_command_failure = cache.invalidate
+
+    with pytest.raises(CommandException):
+        adapter.execute_command(["networksetup", "-unrecorded"])
+    assert not os.path.exists(cache.path)
+
+
+def test_known_interface_runs_no_command():
+    adapter = MacAdapter(interface="en9")
+    adapter.execute_command = None  # type: ignore
+    assert adapter.interface == "en9"
+
+
+def test_unsupported_os_has_no_adapter(cache, monkeypatch):
+    cache._facts = dict(cache.facts(), os="Windows")
+    assert create_adapter(name="Windows") is None
+    netbox = Netbox()
+    netbox._discovery = cache
+    with pytest.raises(NetboxException, match="not supported on Windows"):
+        netbox.ssid
+
+    monkeypatch.setattr(Netbox, "discovery", cache)
+    result = CliRunner().invoke(cli, ["wlan", "current"])
+    assert result.exit_code == 1
+    assert result.output == "Error: Wifi is not supported on Windows.\n"
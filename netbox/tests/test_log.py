@@ -0,0 +1,49 @@
+import logging
+import os
+
+from .. import log
+
+
+def test_get_logger_is_idempotent(tmp_path) -> None:
+    log.configure_logging(log_dir=str(tmp_path), console_level=logging.CRITICAL)
+    logger = log.get_logger("netbox.tests.idempotent")
+    assert log.get_logger("netbox.tests.idempotent") is logger
+    assert len(logger.handlers) == 1
+    logger.info(msg="written by the background listener")
+    log.shutdown_logging()
+    with open(os.path.join(str(tmp_path), log.LOG_FILE)) as f:
+        line = f.read()
+    assert "netbox.tests.idempotent - [INFO] written by the background listener" in line
+
+
+def test_log_file_rotated(tmp_path) -> None:
+    log.configure_logging(
+        log_dir=str(tmp_path),
+        console_level=logging.CRITICAL,
+        max_bytes=1024,
+        backup_count=2,
+    )
+    logger = log.get_logger("netbox.tests.rotation")
+    for i in range(200):
+        logger.debug(msg=f"record {i:04d}")
+    log.shutdown_logging()
+    assert sorted(os.listdir(str(tmp_path))) == [
+        log.LOG_FILE,
+        f"{log.LOG_FILE}.1",
+        f"{log.LOG_FILE}.2",
+    ]
+    # restore the default setup for the other tests
+    log.configure_logging()
+
+
+def test_fast_format_skips_caller_lookup_of_netbox_loggers_only(tmp_path) -> None:
+    log.configure_logging(log_dir=str(tmp_path), console_level=logging.CRITICAL)
+    logger = log.get_logger("netbox.tests.caller")
+    assert isinstance(logger, log._Logger)
+    assert logging.getLoggerClass() is logging.Logger
+    assert logger.findCaller()[1] == 0
+    assert logging.getLogger("other").findCaller()[1] > 0
+    log.configure_logging(log_dir=str(tmp_path), fast=False)
+    assert logger.findCaller()[1] > 0
+    # restore the default setup for the other tests
+    log.configure_logging()
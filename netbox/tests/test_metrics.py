@@ -0,0 +1,85 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+from click.testing import CliRunner
+
+from .. import metrics
+from ..core import Netbox
+from ..replay import ReplayAdapter
+from ..scripts.command import cli
+
+
+@pytest.fixture
+def registry():
+    yield metrics.enable()
+    metrics.disable()
+
+
+def test_disabled_records_nothing():
+    metrics.disable()
+    assert metrics.span("anything") is metrics.span("other")
+    with metrics.span("anything"):
+        metrics.count("events")
+    assert metrics.timed("double")(lambda x: x * 2)(21) == 42
+    assert metrics.get_registry() is None
+
+
+def test_wifi_operation_is_broken_down(registry):
+    netbox = Netbox()
+    netbox._adapter = ReplayAdapter()
+    netbox.current_wifi_info
+    netbox.current_wifi_info
+
+    report = registry.report()
+    spans = report["spans"]
+    assert spans["netbox.current_wifi_info"]["count"] == 2
+    assert spans["parse.current_info"]["count"] == 2
+    assert spans["command.airport"]["count"] == 1
+    assert spans["command.spawn"]["count"] == 1
+    assert report["counters"] == {"command.cache_hit": 1, "command.cache_miss": 1}
+    # ordered by total time, the outermost span comes first
+    assert next(iter(spans)) == "netbox.current_wifi_info"
+
+
+def test_prometheus_format(registry):
+    registry.observe('odd"name', 0.25)
+    registry.increment("command.cache_hit", 3)
+    text = registry.to_prometheus()
+
+    assert "# TYPE netbox_span_seconds summary" in text
+    assert 'netbox_span_seconds_count{span="odd\\"name"} 1' in text
+    assert 'netbox_span_seconds_sum{span="odd\\"name"} 0.25' in text
+    assert 'netbox_events_total{event="command.cache_hit"} 3' in text
+    quantile = [line for line in text.splitlines() if 'quantile="0.5"' in line][0]
+    assert abs(float(quantile.split()[-1]) - 0.25) < 0.0025
+
+
+def test_serve_metrics(registry):
+    registry.observe("probe.ping", 0.01)
+    server = metrics.serve(("127.0.0.1", 0), registry)
+    base = "http://127.0.0.1:%d" % server.server_address[1]
+    try:
+        with urllib.request.urlopen(f"{base}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert 'span="probe.ping"' in response.read().decode()
+        with urllib.request.urlopen(f"{base}/metrics.json", timeout=5) as response:
+            assert json.load(response)["spans"]["probe.ping"]["count"] == 1
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{base}/other", timeout=5)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_profile_option():
+    try:
+        result = CliRunner(mix_stderr=False).invoke(
+            cli, ["--profile", "resolve", "127.0.0.1"]
+        )
+    finally:
+        metrics.disable()
+    assert result.exit_code == 0, result.output
+    assert result.stderr.splitlines()[0].startswith("span")
+    assert "netbox.resolve" in result.stderr
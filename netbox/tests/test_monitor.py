@@ -0,0 +1,30 @@
+import sys
+
+from ..monitor import RingBuffer, sample, ticks, with_stats
+
+
+def test_ring_buffer_keeps_latest() -> None:
+    buffer = RingBuffer(3)
+    assert buffer.stats() is None
+    for value in (1, 2, 3, 4, 5):
+        buffer.append(value)
+    assert list(buffer) == [3.0, 4.0, 5.0]
+    assert buffer.stats() == {"min": 3.0, "avg": 4.0, "max": 5.0}
+    assert sys.getsizeof(buffer._data) < 200
+
+
+def test_sample_with_rolling_stats() -> None:
+    infos = [
+        {"SSID": "TP-Link001", "agrCtlRSSI": "-40", "channel": "36,80", "MCS": "9"},
+        {"SSID": "TP-Link001", "agrCtlRSSI": "-50", "channel": "36,80", "MCS": ""},
+        {},
+    ]
+    records = list(with_stats((sample(info) for info in infos), window=2))
+    assert records[0]["channel"] == 36.0
+    assert records[1]["stats"]["rssi"] == {"min": -50.0, "avg": -45.0, "max": -40.0}
+    assert records[2]["rssi"] is None
+    assert records[2]["stats"]["mcs"] == {"min": 9.0, "avg": 9.0, "max": 9.0}
+
+
+def test_ticks_count() -> None:
+    assert list(ticks(interval=0.001, count=3)) == [0, 1, 2]
@@ -0,0 +1,85 @@
+import socket
+import struct
+import threading
+import typing as t
+
+import pytest
+
+from .. import ping as ping_module
+from ..exception import PingException
+from ..ping import PingEngine, build_echo_request, checksum, parse_echo_reply
+
+
+def test_echo_request_checksum_valid() -> None:
+    packet = build_echo_request(ident=0x1234, seq=7, payload=b"netbox")
+    assert checksum(packet) == 0
+
+
+def test_parse_echo_reply_skip_ip_header() -> None:
+    icmp = struct.pack("!BBHHH", 0, 0, 0, 0x1234, 7) + b"netbox"
+    ip_header = bytes([0x45]) + bytes(19)
+    assert parse_echo_reply(icmp) == (0x1234, 7)
+    assert parse_echo_reply(ip_header + icmp) == (0x1234, 7)
+    assert parse_echo_reply(struct.pack("!BBHHH", 8, 0, 0, 1, 1)) is None
+
+
+def test_sweep_loopback() -> None:
+    engine = PingEngine(timeout=1.0, concurrency=64)
+    hosts = [f"127.0.0.{i}" for i in range(1, 201)]
+    try:
+        results = engine.check_hosts(hosts + ["not.exist.invalid"])
+    except PingException:
+        pytest.skip("ICMP socket is not permitted.")
+    assert list(results)[:-1] == hosts
+    assert all(isinstance(results[host], float) for host in hosts)
+    assert results["not.exist.invalid"] is False
+
+
+class FullSocket(object):
+    """ICMP socket whose send buffer is full until ``drain`` is called."""
+
+    def __init__(self) -> None:
+        self.local, self.peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.local.setblocking(False)
+        self.sends = 0
+        try:
+            while True:
+                self.local.send(b"x" * 1024)
+        except BlockingIOError:
+            pass
+
+    def drain(self) -> None:
+        self.peer.setblocking(False)
+        try:
+            while True:
+                self.peer.recv(2048)
+        except BlockingIOError:
+            pass
+
+    def fileno(self) -> int:
+        return self.local.fileno()
+
+    def sendto(self, packet: bytes, address: t.Tuple[str, int]) -> int:
+        self.sends += 1
+        return self.local.send(packet)
+
+    def recvfrom(self, size: int) -> t.Tuple[bytes, t.Tuple[str, int]]:
+        raise BlockingIOError
+
+    def close(self) -> None:
+        self.local.close()
+        self.peer.close()
+
+
+def test_sweep_waits_for_full_send_buffer(monkeypatch) -> None:
+    sock = FullSocket()
+    monkeypatch.setattr(ping_module, "open_icmp_socket", lambda: (sock, False))
+    timer = threading.Timer(0.2, sock.drain)
+    timer.start()
+    try:
+        results = dict(PingEngine(timeout=0.1).sweep(["127.0.0.1"]))
+    finally:
+        timer.join()
+    assert results == {"127.0.0.1": None}
+    # blocked until the buffer drained instead of retrying in a busy loop
+    assert sock.sends < 5
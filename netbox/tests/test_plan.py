@@ -0,0 +1,191 @@
+import json
+import threading
+import time
+import typing as t
+
+import pytest
+from click.testing import CliRunner
+
+from ..exception import PlanException
+from ..plan import PlanRunner, load_steps
+from ..scripts.command import cli
+
+
+class Recorder(object):
+    """Methods of steps which record their calls instead of touching the network."""
+
+    def __init__(self) -> None:
+        self.calls: t.List[t.Tuple[str, str, float]] = []
+        self.failures: t.Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.wifi_busy = False
+
+    def probe(self, netbox, host, delay=0.1):
+        with self.lock:
+            self.calls.append(("probe", host, time.monotonic()))
+        time.sleep(delay)
+        with self.lock:
+            if self.failures.get(host, 0):
+                self.failures[host] -= 1
+                raise OSError(f"{host} is down")
+        return host
+
+    def wifi(self, netbox, name, delay=0.05):
+        assert not self.wifi_busy, "wifi steps must not overlap"
+        self.wifi_busy = True
+        time.sleep(delay)
+        with self.lock:
+            self.calls.append(("wifi", name, time.monotonic()))
+        self.wifi_busy = False
+        return name
+
+    @property
+    def methods(self):
+        return {"probe": (self.probe, False), "wifi": (self.wifi, True)}
+
+
+def run(plan, recorder, **kwargs):
+    steps, options = load_steps(plan, methods=recorder.methods)
+    return PlanRunner(None, steps, methods=recorder.methods, **options, **kwargs).run()
+
+
+def test_independent_steps_run_in_parallel():
+    recorder = Recorder()
+    plan = {
+        "workers": 8,
+        "steps": [
+            {"id": "on", "method": "wifi", "params": {"name": "on"}},
+            {"id": "join", "method": "wifi", "params": {"name": "join"}},
+            {
+                "id": "ping",
+                "method": "probe",
+                "each": {"host": [f"10.0.0.{i}" for i in range(1, 6)]},
+                "after": ["on", "join"],
+            },
+            {
+                "id": "off",
+                "method": "wifi",
+                "params": {"name": "off"},
+                "after": ["ping"],
+            },
+        ],
+    }
+    start = time.monotonic()
+    report = run(plan, recorder)
+    elapsed = time.monotonic() - start
+
+    assert report["status"] == "passed"
+    assert report["summary"]["ok"] == 8
+    assert report["steps"]["ping[10.0.0.3]"]["result"] == "10.0.0.3"
+    probes = [at for kind, _, at in recorder.calls if kind == "probe"]
+    wifi = {name: at for kind, name, at in recorder.calls if kind == "wifi"}
+    # probes start together after both wifi steps, off waits for all of them
+    assert min(probes) >= max(wifi["on"], wifi["join"])
+    assert max(probes) - min(probes) < 0.05
+    assert wifi["off"] >= max(probes)
+    # 2 serialized wifi steps, 1 round of probes and the last wifi step
+    assert elapsed < 0.5
+
+
+def test_retry_timeout_and_skip():
+    recorder = Recorder()
+    recorder.failures = {"flaky": 1, "down": 5}
+    plan = {
+        "steps": [
+            {
+                "id": "flaky",
+                "method": "probe",
+                "params": {"host": "flaky", "delay": 0},
+                "retries": 1,
+                "retry_delay": 0.01,
+            },
+            {"id": "down", "method": "probe", "params": {"host": "down", "delay": 0}},
+            {
+                "id": "slow",
+                "method": "probe",
+                "params": {"host": "slow", "delay": 1.0},
+                "timeout": 0.1,
+            },
+            {
+                "id": "next",
+                "method": "probe",
+                "params": {"host": "n"},
+                "after": ["down"],
+            },
+            {
+                "id": "cleanup",
+                "method": "probe",
+                "params": {"host": "c", "delay": 0},
+                "after": ["down", "slow"],
+                "always": True,
+            },
+        ]
+    }
+    start = time.monotonic()
+    report = run(plan, recorder)
+    steps = report["steps"]
+
+    assert time.monotonic() - start < 0.5
+    assert report["status"] == "failed"
+    assert steps["flaky"]["status"] == "ok" and steps["flaky"]["attempts"] == 2
+    assert steps["down"]["status"] == "failed"
+    assert "down is down" in steps["down"]["error"]
+    assert steps["slow"]["status"] == "timeout"
+    assert steps["next"]["status"] == "skipped" and steps["next"]["attempts"] == 0
+    assert steps["cleanup"]["status"] == "ok"
+    assert report["summary"] == {"ok": 2, "failed": 1, "timeout": 1, "skipped": 1}
+
+
+@pytest.mark.parametrize(
+    "steps,message",
+    [
+        ([], "no steps"),
+        ([{"id": "a", "method": "nope"}], "unknown method"),
+        ([{"id": "a", "method": "probe", "after": ["b"]}], "unknown step"),
+        (
+            [{"id": "a", "method": "probe"}, {"id": "a", "method": "probe"}],
+            "duplicated",
+        ),
+        (
+            [
+                {"id": "a", "method": "probe", "after": ["b"]},
+                {"id": "b", "method": "probe", "after": ["a"]},
+                {"id": "c", "method": "probe"},
+            ],
+            "['a', 'b'] depend on each other in a cycle",
+        ),
+    ],
+)
+def test_invalid_plan(steps, message):
+    with pytest.raises(PlanException) as e:
+        load_steps({"steps": steps}, methods=Recorder().methods)
+    assert message in e.value.message
+
+
+def test_run_command(tmp_path):
+    plan = tmp_path / "plan.json"
+    plan.write_text(
+        json.dumps(
+            {
+                "steps": [
+                    {
+                        "id": "lookup",
+                        "method": "resolve",
+                        "params": {"names": ["127.0.0.1"]},
+                    },
+                    {
+                        "id": "wait",
+                        "method": "sleep",
+                        "params": {"seconds": 0},
+                        "after": ["lookup"],
+                    },
+                ]
+            }
+        )
+    )
+    result = CliRunner(mix_stderr=False).invoke(cli, ["run", str(plan)])
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.stdout)
+    assert report["code"] == 0
+    assert report["data"]["steps"]["lookup"]["result"] == {"127.0.0.1": "127.0.0.1"}
+    assert "wait ok attempts=1" in result.stderr
@@ -0,0 +1,67 @@
+import sys
+import time
+
+import pytest
+
+from ..exception import CommandException
+from ..process import DEFAULT_TIMEOUT, CommandRunner, redact, to_argv, to_string
+from ..wifi import MacAdapter
+
+HARDWARE_PORTS = """\
+Hardware Port: Ethernet
+Device: en1
+Ethernet Address: a0:b0:c0:d0:e0:f0
+
+Hardware Port: Wi-Fi
+Device: en0
+Ethernet Address: a0:b0:c0:d0:e0:f1
+"""
+
+
+def test_argv_keeps_spaces_without_shell() -> None:
+    argv = [
+        sys.executable,
+        "-c",
+        "import sys; print(sys.argv[1:])",
+        "My WiFi",
+        "p@ss word;ls",
+    ]
+    assert to_argv(to_string(argv)) == argv
+    output = MacAdapter().execute_command(argv)
+    assert output.strip() == "['My WiFi', 'p@ss word;ls']"
+
+
+def test_run_many_concurrently() -> None:
+    runner = CommandRunner(max_workers=4)
+    sleep = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+    start = time.perf_counter()
+    results = runner.run_many([sleep] * 4)
+    assert time.perf_counter() - start < 1.0
+    assert [result.returncode for result in results] == [0] * 4
+    stats = runner.stats()[sys.executable.rsplit("/", 1)[-1]]
+    assert stats["count"] == 4 and stats["spawn_max"] > 0
+    runner.shutdown()
+
+
+def test_failed_command_raises() -> None:
+    adapter = MacAdapter()
+    with pytest.raises(CommandException):
+        adapter.execute_command([sys.executable, "-c", "raise SystemExit(1)"])
+    with pytest.raises(CommandException):
+        adapter.execute_command(["netbox-not-exist-command"])
+
+
+def test_parse_hardware_ports() -> None:
+    assert MacAdapter.parse_hardware_ports(HARDWARE_PORTS) == "en0"
+    assert MacAdapter.parse_hardware_ports("") == ""
+
+
+def test_command_messages_hide_arguments() -> None:
+    argv = ["/usr/sbin/networksetup", "-setairportnetwork", "en0", "Office", "secret"]
+    assert redact(argv) == "networksetup -setairportnetwork *** *** ***"
+    runner = CommandRunner()
+    assert runner.timeout == DEFAULT_TIMEOUT
+    with pytest.raises(CommandException) as e:
+        runner.run([sys.executable, "-c", "import time; time.sleep(5)", "secret"], 0.2)
+    assert "secret" not in e.value.message
+    assert "timeout" in e.value.message
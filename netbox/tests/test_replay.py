@@ -0,0 +1,75 @@
+import json
+import time
+
+from ..bench import compare, run
+from ..core import Netbox
+from ..replay import (
+    LinuxReplayAdapter,
+    ReplayAdapter,
+    load_fixture,
+    record,
+    synthetic_scan_output,
+)
+from ..wifi import MacAdapter
+
+
+def test_replay_adapter_serves_recorded_outputs() -> None:
+    netbox = Netbox()
+    netbox._adapter = ReplayAdapter()
+    info = json.loads(netbox.current_wifi_info)["data"]
+    assert (info["ssid"], info["rssi"], info["channel"]) == (
+        "Office WiFi",
+        "-45",
+        "36,80",
+    )
+    strongest = netbox.scan().strongest("Office WiFi")
+    assert strongest is not None and strongest.bssid == "a0:b0:c0:d0:e0:f0"
+    assert netbox._adapter.get_ip_address() == "192.168.1.8"
+
+
+def test_replay_latency_and_sequences() -> None:
+    fixture = load_fixture("mac")
+    fixture["commands"]["ipconfig getifaddr en0"] = ["", "", "10.0.0.2\n"]
+    adapter = ReplayAdapter(fixture, latency=((r"^airport -s", 0.1),))
+    start = time.perf_counter()
+    adapter.scan()
+    assert time.perf_counter() - start >= 0.1
+    addresses = [adapter.get_ip_address() for _ in range(4)]
+    assert addresses == [None, None, "10.0.0.2", "10.0.0.2"]
+    assert adapter.replay.calls.count("airport -s") == 1
+
+
+def test_linux_replay_adapter_connects() -> None:
+    adapter = LinuxReplayAdapter()
+    assert "ChinaNet-test001" in adapter.scan()
+    assert adapter.get_current_network()["agrCtlRSSI"] == "-45"
+    assert adapter.connect("Office WiFi", "password").name == "CONNECTED"
+    assert adapter.replay.calls[-1] == "SELECT_NETWORK 0"
+
+
+def test_record_uses_executable_name() -> None:
+    outputs = record([["/bin/echo", "-n", "ok"]])
+    assert outputs == {"echo -n ok": "ok"}
+
+
+def test_synthetic_scan_output_parses() -> None:
+    result = MacAdapter.parse_scan_output(synthetic_scan_output(100))
+    assert len(result.networks) == 100
+
+
+def test_bench_report_and_compare() -> None:
+    report = run(names=["scan_parse", "current_wifi_info"], quick=True)
+    metrics = report["results"]["scan_parse"]
+    assert set(metrics) == {
+        "networks_per_sec_10",
+        "networks_per_sec_1000",
+        "networks_per_sec_10000",
+    }
+    json.dumps(report)
+    slower = json.loads(json.dumps(report))
+    slower["results"]["scan_parse"]["networks_per_sec_10"] *= 2
+    slower["results"]["current_wifi_info"]["cached_us"] /= 2
+    rows = {row[0]: row for row in compare(slower, report)}
+    assert rows["scan_parse.networks_per_sec_10"][-1]
+    assert rows["current_wifi_info.cached_us"][-1]
+    assert not rows["scan_parse.networks_per_sec_1000"][-1]
@@ -0,0 +1,207 @@
+import socket
+import struct
+import threading
+import time
+import typing as t
+
+import pytest
+
+from ..resolver import (
+    Resolver,
+    build_query,
+    parse_response,
+    read_hosts,
+    set_resolver,
+)
+from ..tcp import TcpEngine
+
+
+class StubDNSServer(object):
+    """UDP nameserver answering A queries from a mapping of name to (address, ttl)."""
+
+    def __init__(self, records: t.Dict[str, t.Tuple[str, int]], delay: float = 0.0):
+        self.records = records
+        self.delay = delay
+        self.queries: t.List[str] = []
+        self.drop = set()  # type: t.Set[str]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.address = self.sock.getsockname()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                packet, addr = self.sock.recvfrom(512)
+            except OSError:
+                return
+            threading.Thread(target=self._answer, args=(packet, addr)).start()
+
+    def _answer(self, packet: bytes, addr: t.Tuple[str, int]) -> None:
+        qid = struct.unpack("!H", packet[:2])[0]
+        end = packet.index(b"\x00", 12) + 5
+        question = packet[12:end]
+        labels, offset = [], 12
+        while packet[offset]:
+            labels.append(packet[offset + 1 : offset + 1 + packet[offset]].decode())
+            offset += packet[offset] + 1
+        name = ".".join(labels)
+        self.queries.append(name)
+        if name in self.drop:
+            return
+        time.sleep(self.delay)
+        record = self.records.get(name)
+        if record is None:
+            # NXDOMAIN with an SOA of 60s in the authority section
+            header = struct.pack("!HHHHHH", qid, 0x8183, 1, 0, 1, 0)
+            soa = b"\x00" * 2 + b"\x00\x00" + struct.pack("!IIIII", 1, 2, 3, 4, 60)
+            answer = b"\xc0\x0c" + struct.pack("!HHIH", 6, 1, 300, len(soa)) + soa
+        else:
+            header = struct.pack("!HHHHHH", qid, 0x8180, 1, 1, 0, 0)
+            answer = (
+                b"\xc0\x0c"
+                + struct.pack("!HHIH", 1, 1, record[1], 4)
+                + socket.inet_aton(record[0])
+            )
+        try:
+            self.sock.sendto(header + question + answer, addr)
+        except OSError:
+            pass
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+@pytest.fixture
+def system(monkeypatch) -> t.List[str]:
+    """Stand-in system resolver, it knows names of a split DNS nameserver."""
+    names = {"split.test": "10.1.0.1"}
+    lookups: t.List[str] = []
+
+    def gethostbyname(name: str) -> str:
+        lookups.append(name)
+        if name not in names:
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return names[name]
+
+    monkeypatch.setattr(socket, "gethostbyname", gethostbyname)
+    return lookups
+
+
+@pytest.fixture
+def server(system):
+    server = StubDNSServer(
+        {
+            "box1.test": ("127.0.0.1", 300),
+            "box2.test": ("127.0.0.2", 1),
+        },
+        delay=0.1,
+    )
+    yield server
+    server.close()
+
+
+def make_resolver(server: StubDNSServer, **kwargs: t.Any) -> Resolver:
+    kwargs.setdefault("hosts", {"localhost": "127.0.0.1"})
+    return Resolver(nameservers=[server.address], **kwargs)
+
+
+def test_query_and_response_round_trip() -> None:
+    packet = build_query(0x1234, "Box1.Test.")
+    assert packet[:2] == b"\x12\x34"
+    assert b"\x04Box1\x04Test\x00" in packet
+    assert read_hosts("/nonexistent") == {}
+    with pytest.raises(ValueError):
+        parse_response(packet)
+
+
+def test_resolves_batch_concurrently_and_caches(server) -> None:
+    resolver = make_resolver(server)
+    start = time.perf_counter()
+    answers = resolver.resolve_many(
+        ["box1.test", "box2.test", "missing.test", "box1.test", "localhost", "10.0.0.1"]
+    )
+    elapsed = time.perf_counter() - start
+    assert answers == {
+        "box1.test": "127.0.0.1",
+        "box2.test": "127.0.0.2",
+        "missing.test": None,
+        "localhost": "127.0.0.1",
+        "10.0.0.1": "10.0.0.1",
+    }
+    # three queries of 0.1s each at the same time, duplicates and literals skipped
+    assert elapsed < 0.25
+    assert sorted(server.queries) == ["box1.test", "box2.test", "missing.test"]
+    # positive and negative answers are cached
+    assert resolver.resolve_many(["box1.test", "missing.test"]) == {
+        "box1.test": "127.0.0.1",
+        "missing.test": None,
+    }
+    assert len(server.queries) == 3
+    # TTL of 1 second expires
+    time.sleep(1.1)
+    assert resolver.resolve("box2.test") == "127.0.0.2"
+    assert server.queries[-1] == "box2.test"
+    stats = resolver.stats()
+    assert stats["hits"] == 2 and stats["negative_hits"] == 1
+    assert stats["misses"] == 4 and stats["hit_rate"] == 0.3333
+    assert stats["p50"] >= 100
+
+
+def test_in_flight_lookups_are_shared(server) -> None:
+    resolver = make_resolver(server)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(resolver.resolve("box1.test")))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ["127.0.0.1"] * 10
+    assert server.queries == ["box1.test"]
+    assert resolver.stats()["coalesced"] == 9
+
+
+def test_unanswered_names_fall_back_to_system(server) -> None:
+    server.drop.add("localhost.test")
+    resolver = make_resolver(server, timeout=0.1, attempts=2)
+    assert resolver.resolve("localhost.test") is None
+    # two attempts, then the system resolver
+    assert server.queries == ["localhost.test", "localhost.test"]
+    stats = resolver.stats()
+    assert stats["timeouts"] == 1 and stats["system"] == 1
+
+
+def test_missing_names_are_asked_to_system_before_cached(server, system) -> None:
+    resolver = make_resolver(server)
+    assert resolver.resolve_many(["split.test", "missing.test"]) == {
+        "split.test": "10.1.0.1",
+        "missing.test": None,
+    }
+    assert sorted(system) == ["missing.test", "split.test"]
+    # the negative answer is cached, neither is asked again
+    assert resolver.resolve("missing.test") is None
+    assert sorted(server.queries) == ["missing.test", "split.test"]
+    assert len(system) == 2
+
+
+def test_probes_use_the_shared_resolver(server) -> None:
+    set_resolver(make_resolver(server))
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(16)
+    port = listener.getsockname()[1]
+    try:
+        results = TcpEngine().check(
+            [f"box1.test:{port}"] * 3 + [f"missing.test:{port}"]
+        )
+    finally:
+        listener.close()
+        set_resolver(None)
+    rtt = results[f"box1.test:{port}"]
+    assert isinstance(rtt, float) and rtt > 0
+    assert results[f"missing.test:{port}"] is False
+    assert sorted(server.queries) == ["box1.test", "missing.test"]
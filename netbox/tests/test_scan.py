@@ -0,0 +1,74 @@
+import typing as t
+
+from click.testing import CliRunner
+
+from ..core import Netbox
+from ..scripts.command import cli
+from ..wifi import Argv, MacAdapter
+
+AIRPORT_SCAN = """\
+                            SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
+                    Hellboycc 5G 10:20:30:40:50:61 -45  36,+1   Y  CN WPA2(PSK/AES/AES)
+                    Hellboycc 5G 10:20:30:40:50:62 -70  149,80  Y  CN WPA2(PSK/AES/AES)
+                      TP-Link001 a0:b0:c0:d0:e0:f0 -60  6       Y  -- WPA(PSK/TKIP/TKIP) WPA2(PSK/AES/TKIP)
+                         Guest36 a0:b0:c0:d0:e0:f1 -50  36      Y  -- NONE
+"""
+
+AIRPORT_SCAN_REDACTED = """\
+                            SSID BSSID             RSSI CHANNEL HT CC SECURITY (auth/unicast/group)
+                      TP-Link001                   -60  6       Y  -- WPA2(PSK/AES/AES)
+"""
+
+
+def test_parse_scan_output_indexes() -> None:
+    result = MacAdapter.parse_scan_output(AIRPORT_SCAN)
+    assert len(result) == 4
+    assert result.ssids() == ["Hellboycc 5G", "TP-Link001", "Guest36"]
+    assert "TP-Link001" in result
+    assert result.by_bssid["10:20:30:40:50:62"].channel == "149,80"
+    assert result.by_ssid["TP-Link001"][0].security == (
+        "WPA(PSK/TKIP/TKIP) WPA2(PSK/AES/TKIP)"
+    )
+    strongest = result.strongest(channel=36)
+    assert strongest is not None and strongest.ssid == "Hellboycc 5G"
+    guest = result.strongest(ssid="Guest36")
+    assert guest is not None and guest.rssi == -50
+    assert result.filter(min_rssi=-55)[1].ssid == "Guest36"
+    assert result.strongest(channel=1) is None
+
+
+def test_parse_scan_output_without_bssid() -> None:
+    result = MacAdapter.parse_scan_output(AIRPORT_SCAN_REDACTED)
+    network = result.by_ssid["TP-Link001"][0]
+    assert (network.bssid, network.rssi, network.primary_channel) == ("", -60, 6)
+    assert result.to_list()[0]["rssi"] == "-60"
+
+
+def test_scan_reused_while_fresh() -> None:
+    class FakeAdapter(MacAdapter):
+        scans = 0
+
+        def execute_command(
+            self, command: t.Union[str, Argv], cache: bool = True
+        ) -> str:
+            self.scans += 1
+            return AIRPORT_SCAN
+
+    adapter = FakeAdapter()
+    assert adapter.scan() is adapter.scan()
+    assert adapter.get_all_ssid()[0] == "Hellboycc 5G"
+    assert adapter.scans == 1
+    adapter.get_all_ssid(refresh=True)
+    assert adapter.scans == 2
+
+
+def test_scan_command_messages(monkeypatch) -> None:
+    result = MacAdapter.parse_scan_output(AIRPORT_SCAN)
+    monkeypatch.setattr(Netbox, "scan", lambda self, max_age=None: result)
+    runner = CliRunner()
+    output = runner.invoke(cli, ["wlan", "scan", "--ssid", "Nowhere"]).output
+    assert output == "Current ssid Nowhere not found.\n"
+    output = runner.invoke(cli, ["wlan", "scan", "--channel", "11"]).output
+    assert output == "Current ssid * on channel 11 not found.\n"
+    output = runner.invoke(cli, ["wlan", "scan", "--ssid", "Guest36"]).output
+    assert output == "Current ssid Guest36 exists.\n"
@@ -0,0 +1,130 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from ..core import Netbox
+from ..exception import PlanException
+from ..schedule import Check, Probe, Scheduler, TimerWheel, load_plan
+from ..scripts.command import cli
+
+
+def test_timer_wheel_expires_on_time() -> None:
+    wheel = TimerWheel(tick=0.01, bits=(4, 3, 3), start=0.0)
+    rng = random.Random(1)
+    # beyond the span of all levels as well
+    deadlines = [rng.uniform(0, 30) for _ in range(2000)]
+    for deadline in deadlines:
+        wheel.schedule(deadline, deadline)
+    now = 0.0
+    expired = []
+    while len(wheel):
+        next_expiry = wheel.next_expiry()
+        assert next_expiry is not None and next_expiry > now
+        now = next_expiry
+        for deadline, item in wheel.advance(now):
+            assert deadline == item
+            # not before its deadline, not later than a tick after it
+            assert deadline <= now < deadline + 0.01 + 1e-9
+            expired.append(item)
+    assert sorted(expired) == sorted(deadlines)
+    assert wheel.next_expiry() is None
+
+
+def counting_probe(calls: list, delay: float = 0.0) -> Probe:
+    lock = threading.Lock()
+    inflight = [0]
+
+    def run(netbox, targets, timeout):
+        with lock:
+            inflight[0] += len(targets)
+            calls.append(inflight[0])
+        time.sleep(delay)
+        with lock:
+            inflight[0] -= len(targets)
+        return {target: 0.001 for target in targets}
+
+    return Probe(run, concurrency=1000, workers=4, timeout=1.0)
+
+
+def test_scheduler_runs_thousands_of_checks() -> None:
+    calls: list = []
+    checks = [
+        Check("fake", f"10.0.{i // 256}.{i % 256}", 0.2, 0.1) for i in range(5000)
+    ]
+    scheduler = Scheduler(
+        Netbox(), checks, jitter=0.1, probes={"fake": counting_probe(calls)}
+    )
+    cpu = time.process_time()
+    report = scheduler.run(duration=1.0)
+    cpu = time.process_time() - cpu
+    assert report["missed"] == 0
+    # 5 runs of each check, the first runs are spread over the first interval
+    assert 4 * 5000 <= report["runs"] <= 5 * 5000
+    assert report["lag"]["p99"] < 50
+    # start times are spread into many small batches
+    assert len(calls) > 50
+    assert cpu < 1.0
+
+
+def test_scheduler_caps_concurrency_and_reports_misses() -> None:
+    calls: list = []
+    checks = [Check("slow", str(i), 0.1, 0.1) for i in range(20)]
+    results = []
+    scheduler = Scheduler(
+        Netbox(),
+        checks,
+        concurrency={"slow": 5},
+        probes={"slow": counting_probe(calls, delay=0.15)},
+        on_result=lambda check, result: results.append(result),
+    )
+    report = scheduler.run(duration=0.6)
+    assert max(calls) <= 5
+    assert report["missed"] > 0
+    assert report["probes"]["slow"]["runs"] == len(results) > 0
+
+
+def test_load_plan(tmp_path) -> None:
+    checks, options = load_plan(
+        {
+            "jitter": 0.2,
+            "concurrency": {"ping": 10},
+            "checks": [
+                {"probe": "ping", "targets": ["127.0.0.1", "127.0.0.2"], "interval": 1},
+                {"probe": "rssi", "interval": 60},
+            ],
+        }
+    )
+    assert [(c.probe, c.target, c.interval) for c in checks] == [
+        ("ping", "127.0.0.1", 1.0),
+        ("ping", "127.0.0.2", 1.0),
+        ("rssi", "", 60.0),
+    ]
+    assert options == {"jitter": 0.2, "concurrency": {"ping": 10}}
+    with pytest.raises(PlanException, match="unknown probe"):
+        load_plan({"checks": [{"probe": "dns"}]})
+    with pytest.raises(PlanException, match="interval"):
+        load_plan({"checks": [{"probe": "ping", "interval": 0}]})
+    with pytest.raises(PlanException, match="can not be loaded"):
+        load_plan(str(tmp_path / "missing.json"))
+
+
+def test_schedule_run_command(tmp_path) -> None:
+    plan = tmp_path / "plan.json"
+    plan.write_text(
+        json.dumps(
+            {"checks": [{"probe": "ping", "targets": ["127.0.0.1"], "interval": 0.1}]}
+        )
+    )
+    result = CliRunner().invoke(
+        cli, ["schedule", "run", str(plan), "--duration", "0.5", "--report", "0.2"]
+    )
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert json.loads(lines[0])["checks"] == 1
+    report = json.loads("\n".join(lines[lines.index("{") :]))["data"]
+    assert report["probes"]["ping"]["runs"] >= 3
+    assert report["probes"]["ping"]["failures"] == 0
@@ -0,0 +1,27 @@
+import typing as t
+
+from ..speed import SpeedServer, measure_throughput
+
+
+def test_throughput_over_loopback() -> None:
+    server = SpeedServer(host="127.0.0.1", port=0).start()
+    host, port = server.address
+    reports: t.List[t.Dict[str, t.Any]] = []
+    try:
+        for use_sendfile in (False, True):
+            report = measure_throughput(
+                host,
+                port=port,
+                streams=2,
+                duration=0.5,
+                interval=0.25,
+                use_sendfile=use_sendfile,
+                on_interval=reports.append,
+            )
+            assert report["errors"] == []
+            assert report["received_bytes"] == report["sent_bytes"] > 0
+            assert report["gbps"] > 0
+            assert len(report["intervals"]) == 2
+    finally:
+        server.stop()
+    assert len(reports) == 4
@@ -0,0 +1,55 @@
+import os
+import re
+import subprocess
+import sys
+
+# import time budget of `netbox-cli version` in milliseconds, click included
+STARTUP_BUDGET_MS = float(os.environ.get("NETBOX_STARTUP_BUDGET_MS", "150"))
+
+HEAVY_MODULES = (
+    "logging",
+    "ping3",
+    "subprocess",
+    "netbox.core",
+    "netbox.wifi",
+    "netbox.ping",
+)
+
+VERSION_SCRIPT = """
+import sys
+from netbox.scripts.command import cli
+try:
+    cli(["version"])
+except SystemExit:
+    pass
+print(",".join(sorted(sys.modules)))
+"""
+
+
+def run_version(*options: str) -> subprocess.CompletedProcess:
+    root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    return subprocess.run(
+        [sys.executable, *options, "-c", VERSION_SCRIPT],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        check=True,
+    )
+
+
+def test_version_does_not_import_heavy_modules() -> None:
+    output = run_version().stdout
+    assert output.startswith("Current version is")
+    modules = set(output.splitlines()[-1].split(","))
+    assert not modules.intersection(HEAVY_MODULES)
+
+
+def test_version_import_time_budget() -> None:
+    best = None
+    for _ in range(3):
+        stderr = run_version("-X", "importtime").stderr
+        match = re.search(r"\|\s*(\d+) \| netbox\.scripts\.command$", stderr, re.M)
+        assert match is not None
+        cost = int(match.group(1)) / 1000
+        best = cost if best is None else min(best, cost)
+    assert best is not None and best < STARTUP_BUDGET_MS, f"import cost {best:.1f}ms"
@@ -0,0 +1,53 @@
+import random
+import sys
+
+import pytest
+
+from ..exception import PingException
+from ..ping import PingEngine
+from ..stats import LatencyHistogram, LatencyStats
+
+
+def test_percentiles_within_one_percent() -> None:
+    rng = random.Random(7)
+    samples = sorted(rng.uniform(0.001, 0.2) for _ in range(20000))
+    histogram = LatencyHistogram()
+    for value in samples:
+        histogram.record(value)
+    for p in (50, 90, 99, 99.9):
+        exact = samples[int(len(samples) * p / 100) - 1]
+        estimate = histogram.percentile(p)
+        assert estimate is not None
+        assert abs(estimate - exact) / exact < 0.011
+    size = sys.getsizeof(histogram._counts)
+    for value in samples:
+        histogram.record(value)
+    assert sys.getsizeof(histogram._counts) == size
+
+
+def test_loss_mean_stddev_and_jitter() -> None:
+    stats = LatencyStats()
+    for rtt in (0.010, 0.020, None, 0.010, 0.020):
+        stats.add(rtt)
+    info = stats.snapshot()
+    assert (info["sent"], info["received"], info["loss"]) == (5, 4, 20.0)
+    assert (info["min"], info["max"], info["mean"], info["stddev"]) == (
+        10.0,
+        20.0,
+        15.0,
+        5.0,
+    )
+    # J = J + (|D| - J) / 16 with |D| = 10ms three times
+    assert info["jitter"] == pytest.approx(10 * (1 - (15 / 16) ** 3), abs=0.001)
+    assert info["p50"] == pytest.approx(10.0, rel=0.01)
+    assert LatencyStats().snapshot()["p99"] is None
+
+
+def test_series_over_loopback() -> None:
+    engine = PingEngine(timeout=1.0)
+    try:
+        results = list(engine.series("127.0.0.1", count=20, interval=0.005))
+    except PingException:
+        pytest.skip("ICMP socket is not permitted.")
+    assert sorted(index for index, _ in results) == list(range(20))
+    assert all(rtt is not None for _, rtt in results)
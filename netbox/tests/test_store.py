@@ -0,0 +1,138 @@
+import os
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from ..replay import ReplayAdapter
+from ..scripts.command import cli
+from ..store import SCHEMAS, ResultStore, parse_time
+
+BASE = 1_671_000_000.0
+
+
+def test_probe_records_round_trip(tmp_path) -> None:
+    with ResultStore(path=str(tmp_path)) as store:
+        store.append_probe("jd.com", 0.0081, ts=BASE)
+        store.append_probe("jd.com", None, ts=BASE + 1)
+        store.append_probe("127.0.0.1", 0.00005, ts=BASE + 2)
+        store.append_probe("jd.com", 10.0, ts=BASE + 3)
+        records = list(store.query("probe"))
+    assert records[0] == {"ts": BASE, "target": "jd.com", "rtt": 8.1}
+    assert records[1]["rtt"] is None
+    # clamped to the largest value of 0.1ms units
+    assert records[3]["rtt"] == 6553.4
+    assert [r["ts"] for r in store.query("probe", name="jd.com")] == [
+        BASE,
+        BASE + 1,
+        BASE + 3,
+    ]
+    assert list(store.query("probe", name="unknown")) == []
+    # 8 bytes per probe
+    assert SCHEMAS["probe"][0].code + SCHEMAS["probe"][2].code == "IH"
+
+
+def test_time_range_spans_segments(tmp_path) -> None:
+    with ResultStore(path=str(tmp_path), segment_records=100) as store:
+        for i in range(1000):
+            store.append_probe("jd.com", 0.001 * (i % 10 + 1), ts=BASE + i)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".seg")]) == 10
+    # a new store reads what was written before
+    with ResultStore(path=str(tmp_path)) as store:
+        records = list(store.query("probe", start=BASE + 150, end=BASE + 450))
+        assert len(records) == 300
+        assert records[0]["ts"] == BASE + 150 and records[-1]["ts"] == BASE + 449
+        assert len(list(store.query("probe", start=BASE + 150, limit=5))) == 5
+        summary = store.aggregate("probe", "rtt", start=BASE, end=BASE + 100)
+        assert summary == [
+            {
+                "start": BASE,
+                "count": 100,
+                "missing": 0,
+                "min": 1.0,
+                "avg": 5.5,
+                "max": 10.0,
+            }
+        ]
+        buckets = store.aggregate("probe", "rtt", bucket=100)
+        assert len(buckets) == 10 and all(b["count"] == 100 for b in buckets)
+        with pytest.raises(ValueError):
+            store.aggregate("probe", "target")
+
+
+def test_reads_see_records_being_appended(tmp_path) -> None:
+    store = ResultStore(path=str(tmp_path))
+    store.append_sample(
+        {"ts": BASE, "ssid": "Office WiFi", "rssi": -45, "noise": -90, "tx_rate": 867}
+    )
+    assert len(list(store.query("monitor"))) == 1
+    store.append_sample({"ts": BASE + 1, "ssid": "Office WiFi", "rssi": -50})
+    records = list(store.query("monitor"))
+    assert records[1] == {
+        "ts": BASE + 1,
+        "ssid": "Office WiFi",
+        "rssi": -50,
+        "noise": None,
+        "tx_rate": None,
+        "mcs": None,
+        "channel": None,
+    }
+    store.close()
+
+
+def test_scan_records(tmp_path) -> None:
+    result = ReplayAdapter().scan()
+    with ResultStore(path=str(tmp_path)) as store:
+        store.append_scan(result)
+        records = list(store.query("scan"))
+    assert len(records) == len(result)
+    assert records[0]["ssid"] == result.to_list()[0]["ssid"]
+    assert records[0]["bssid"] == result.to_list()[0]["bssid"]
+
+
+def test_writers_share_the_name_table(tmp_path) -> None:
+    # two stores of the same directory stand in for two processes
+    first, second = ResultStore(path=str(tmp_path)), ResultStore(path=str(tmp_path))
+    with first, second:
+        first.append_probe("jd.com", 0.001, ts=BASE)
+        second.append_probe("baidu.com", 0.002, ts=BASE + 1)
+        first.append_probe("qq.com", 0.003, ts=BASE + 2)
+        second.append_probe("jd.com", 0.004, ts=BASE + 3)
+        second.flush()
+        # each writer has its own segment, the ids of their names are distinct
+        assert sorted(r["target"] for r in first.query("probe")) == [
+            "baidu.com",
+            "jd.com",
+            "jd.com",
+            "qq.com",
+        ]
+        assert [r["rtt"] for r in second.query("probe", name="qq.com")] == [3.0]
+
+
+def test_parse_time() -> None:
+    assert parse_time("90s", now=BASE) == BASE - 90
+    assert parse_time("7d", now=BASE) == BASE - 7 * 86400
+    assert parse_time(str(BASE)) == BASE
+    assert parse_time("2022-12-14T06:40:00+00:00") == BASE
+    with pytest.raises(ValueError):
+        parse_time("yesterday")
+
+
+def test_history_query_command(tmp_path) -> None:
+    now = time.time()
+    with ResultStore(path=str(tmp_path)) as store:
+        for i in range(120):
+            store.append_probe("jd.com", 0.008, ts=now - 120 + i)
+    runner = CliRunner()
+    path = ["--path", str(tmp_path)]
+    result = runner.invoke(cli, ["history", "query", "probe", "--since", "1m", *path])
+    assert result.exit_code == 0, result.output
+    assert '"target": "jd.com"' in result.output
+    result = runner.invoke(
+        cli,
+        ["history", "query", "probe", "--field", "rtt", "--bucket", "1m", *path],
+    )
+    assert result.exit_code == 0, result.output
+    assert '"avg": 8.0' in result.output
+    result = runner.invoke(cli, ["history", "query", "probe", "--field", "ts", *path])
+    assert result.exit_code != 0
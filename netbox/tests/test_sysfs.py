@@ -0,0 +1,51 @@
+import os
+
+from ..sysfs import LinkStatsReader
+from ..wifi import LinuxAdapter
+
+WIRELESS = """\
+Inter-| sta-|   Quality        |   Discarded packets               | Missed | WE
+ face | tus | link level noise |  nwid  crypt   frag  retry   misc | beacon | 22
+  wlan0: 0000   70.  -40.  -256        0      0      0      0      0        0
+"""
+
+
+def make_tree(root: str, wireless: str = WIRELESS, operstate: str = "up") -> None:
+    os.makedirs(os.path.join(root, "proc", "net"))
+    statistics = os.path.join(root, "sys", "class", "net", "wlan0", "statistics")
+    os.makedirs(statistics)
+    with open(os.path.join(root, "proc", "net", "wireless"), "w") as f:
+        f.write(wireless)
+    with open(
+        os.path.join(root, "sys", "class", "net", "wlan0", "operstate"), "w"
+    ) as f:
+        f.write(f"{operstate}\n")
+    for name, value in (("rx_bytes", 1024), ("tx_bytes", 2048)):
+        with open(os.path.join(statistics, name), "w") as f:
+            f.write(f"{value}\n")
+
+
+def test_read_link_stats(tmp_path) -> None:
+    root = str(tmp_path)
+    make_tree(root)
+    with LinkStatsReader("wlan0", root=root) as reader:
+        assert reader.wireless() == {"link": 70.0, "level": -40.0, "noise": None}
+        assert reader.rssi() == -40
+        assert reader.is_up()
+        assert reader.counters() == {"rx_bytes": 1024, "tx_bytes": 2048}
+        # files are kept open and re-read
+        with open(os.path.join(root, "proc", "net", "wireless"), "w") as f:
+            f.write(WIRELESS.replace("-40.", "-55."))
+        assert reader.rssi() == -55
+        assert reader.read("missing") is None
+    assert LinkStatsReader("wlan1", root=root).wireless() is None
+
+
+def test_linux_adapter_serves_from_link_stats(tmp_path) -> None:
+    root = str(tmp_path)
+    make_tree(root, operstate="down")
+    adapter = LinuxAdapter(interface="wlan0", ctrl_dir=root, root=root)
+    assert adapter.get_current_rssi() == "-40"
+    assert adapter.get_state() == "init"
+    assert adapter.get_link_stats()["link_quality"] == 70.0
+    adapter.close()
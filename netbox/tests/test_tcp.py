@@ -0,0 +1,139 @@
+import re
+import socket
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from ..core import Netbox
+from ..scripts.command import cli
+from ..tcp import TcpEngine, parse_target
+
+
+@pytest.fixture
+def listener():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(4096)
+    yield sock
+    sock.close()
+
+
+def closed_port() -> int:
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_parse_target() -> None:
+    assert parse_target("10.0.0.1:22") == ("10.0.0.1", 22)
+    assert parse_target("jd.com", port=443) == ("jd.com", 443)
+    assert parse_target("[::1]:8080") == ("::1", 8080)
+    assert parse_target("::1") == ("::1", 80)
+    with pytest.raises(ValueError, match="not a number"):
+        parse_target("host:http")
+    with pytest.raises(ValueError, match="out of range"):
+        parse_target("localhost:70000")
+    with pytest.raises(ValueError, match="out of range"):
+        parse_target("[::1]:0")
+
+
+def test_handshake_time_of_local_listener(listener) -> None:
+    port = listener.getsockname()[1]
+    refused = closed_port()
+    targets = [
+        f"127.0.0.1:{port}",
+        f"127.0.0.1:{refused}",
+        "host.invalid:80",
+        "x:y",
+        "localhost:70000",
+    ]
+    results = {
+        target: (ret, reason) for target, ret, reason in TcpEngine().sweep(targets)
+    }
+    rtt, reason = results[f"127.0.0.1:{port}"]
+    assert reason == "" and isinstance(rtt, float) and 0 < rtt < 0.1
+    assert results[f"127.0.0.1:{refused}"] == (None, "refused")
+    assert results["host.invalid:80"] == (False, "unknown host")
+    assert results["x:y"] == (None, "port y is not a number")
+    assert results["localhost:70000"] == (None, "port 70000 is out of range")
+
+
+def test_timeout_when_syn_is_dropped() -> None:
+    # a full accept queue drops SYNs, so the handshake never finishes
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen(0)
+    port = sock.getsockname()[1]
+    clients = []
+    try:
+        for _ in range(3):
+            client = socket.socket()
+            client.setblocking(False)
+            client.connect_ex(("127.0.0.1", port))
+            clients.append(client)
+        time.sleep(0.05)
+        start = time.perf_counter()
+        assert list(TcpEngine(timeout=0.3).sweep([f"127.0.0.1:{port}"])) == [
+            (f"127.0.0.1:{port}", None, "timeout")
+        ]
+        assert 0.3 <= time.perf_counter() - start < 1.0
+    finally:
+        for client in clients:
+            client.close()
+        sock.close()
+
+
+def accept_forever(listener: socket.socket) -> None:
+    while True:
+        try:
+            conn, _ = listener.accept()
+        except OSError:
+            return
+        conn.close()
+
+
+def test_many_targets_with_bounded_concurrency() -> None:
+    listener = socket.socket()
+    listener.bind(("0.0.0.0", 0))
+    listener.listen(4096)
+    port = listener.getsockname()[1]
+    threading.Thread(target=accept_forever, args=(listener,), daemon=True).start()
+    # the whole 127/8 is loopback, so 250 hosts share the listener
+    targets = [f"127.0.0.{i % 250 + 1}:{port}" for i in range(2000)]
+    try:
+        start = time.perf_counter()
+        results = list(TcpEngine(concurrency=200).sweep(targets))
+        elapsed = time.perf_counter() - start
+    finally:
+        listener.close()
+    assert len(results) == 2000
+    assert all(reason == "" for _, _, reason in results)
+    assert elapsed < 2.0
+
+
+def test_check_tcp_and_tcping_command(listener) -> None:
+    port = listener.getsockname()[1]
+    refused = closed_port()
+    results = Netbox().check_tcp([f"127.0.0.1:{port}", f"127.0.0.1:{refused}"])
+    rtt = results[f"127.0.0.1:{port}"]
+    assert isinstance(rtt, float) and rtt > 0
+    assert results[f"127.0.0.1:{refused}"] is None
+    result = CliRunner().invoke(
+        cli,
+        [
+            "tcping",
+            "127.0.0.1",
+            f"127.0.0.1:{refused}",
+            "localhost:70000",
+            "--port",
+            str(port),
+        ],
+    )
+    assert result.exit_code == 0, result.output
+    assert "localhost:70000 port 70000 is out of range" in result.output
+    assert re.search(r"^127\.0\.0\.1 [\d.]+ms$", result.output, re.M)
+    assert f"127.0.0.1:{refused} refused" in result.output
@@ -0,0 +1,170 @@
+import socket
+import struct
+import threading
+import time
+import typing as t
+
+import pytest
+
+from .. import trace as trace_module
+from ..ping import ICMP_HEADER_FORMAT, build_echo_request
+from ..trace import TraceEngine, parse_extended_err, parse_icmp
+
+
+def ip_header(src: str, dst: str) -> bytes:
+    return struct.pack(
+        "!BBHHHBBH4s4s",
+        0x45,
+        0,
+        0,
+        0,
+        0,
+        64,
+        socket.IPPROTO_ICMP,
+        0,
+        socket.inet_aton(src),
+        socket.inet_aton(dst),
+    )
+
+
+class SimulatedNetwork(object):
+    """Raw ICMP socket of a host in front of fixed paths.
+
+    Routers of a path answer time exceeded, a router named None stays silent,
+    and the destination answers echo replies. Answers are delivered after
+    ``delay`` seconds per hop through a local UDP socket, so select works.
+    """
+
+    def __init__(
+        self, paths: t.Mapping[str, t.Sequence[t.Optional[str]]], delay: float = 0.01
+    ) -> None:
+        self.paths = paths
+        self.delay = delay
+        self.ttl = 64
+        self.sent = 0
+        self._inbox = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._inbox.bind(("127.0.0.1", 0))
+        self._inbox.setblocking(False)
+        self._outbox = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def fileno(self) -> int:
+        return self._inbox.fileno()
+
+    def setsockopt(self, level: int, option: int, value: int) -> None:
+        assert (level, option) == (socket.IPPROTO_IP, socket.IP_TTL)
+        self.ttl = value
+
+    def sendto(self, packet: bytes, address: t.Tuple[str, int]) -> int:
+        self.sent += 1
+        dst = address[0]
+        path = self.paths[dst]
+        if self.ttl <= len(path):
+            src = path[self.ttl - 1]
+            if src is None:
+                return len(packet)
+            quoted = ip_header("10.0.0.2", dst) + packet[:8]
+            answer = struct.pack("!BBHI", 11, 0, 0, 0) + quoted
+        else:
+            src = dst
+            _, _, _, ident, seq = struct.unpack_from(ICMP_HEADER_FORMAT, packet)
+            answer = struct.pack(ICMP_HEADER_FORMAT, 0, 0, 0, ident, seq)
+        hops = min(self.ttl, len(path) + 1)
+        datagram = socket.inet_aton(src) + ip_header(src, "10.0.0.2") + answer
+        timer = threading.Timer(self.delay * hops, self._deliver, args=(datagram,))
+        timer.daemon = True
+        timer.start()
+        return len(packet)
+
+    def _deliver(self, datagram: bytes) -> None:
+        try:
+            self._outbox.sendto(datagram, self._inbox.getsockname())
+        except OSError:
+            pass  # answer after the trace finished
+
+    def recvfrom(self, size: int) -> t.Tuple[bytes, t.Tuple[str, int]]:
+        datagram = self._inbox.recv(size)
+        return datagram[4:], (socket.inet_ntoa(datagram[:4]), 0)
+
+    def close(self) -> None:
+        self._inbox.close()
+        self._outbox.close()
+
+
+@pytest.fixture
+def network(monkeypatch):
+    paths = {
+        "192.0.2.10": ["10.0.0.1", "10.1.0.1", "10.2.0.1"],
+        "192.0.2.20": ["10.0.0.1", None, "10.3.0.1"],
+        "192.0.2.30": ["10.0.0.1"] + [None] * 40,
+    }
+    sim = SimulatedNetwork(paths)
+    monkeypatch.setattr(trace_module, "open_icmp_socket", lambda: (sim, True))
+    return sim
+
+
+def test_parse_icmp_answers() -> None:
+    request = build_echo_request(0x1234, 7, b"netbox")
+    quoted = ip_header("10.0.0.2", "192.0.2.10") + request[:8]
+    exceeded = struct.pack("!BBHI", 11, 0, 0, 0) + quoted
+    reply = struct.pack(ICMP_HEADER_FORMAT, 0, 0, 0, 0x1234, 7)
+
+    assert parse_icmp(ip_header("10.0.0.1", "10.0.0.2") + exceeded) == (11, 0x1234, 7)
+    assert parse_icmp(reply) == (0, 0x1234, 7)
+    assert parse_icmp(request) is None
+    assert parse_icmp(struct.pack("!BBHI", 11, 0, 0, 0) + b"short") is None
+
+
+def test_parse_extended_err() -> None:
+    request = build_echo_request(0x1234, 9, b"netbox")
+    err = struct.pack("=IBBBBII", 113, 2, 11, 0, 0, 0, 0)
+    offender = struct.pack("=HH4s8x", socket.AF_INET, 0, socket.inet_aton("10.0.0.1"))
+    ancdata = [(socket.IPPROTO_IP, trace_module.IP_RECVERR, err + offender)]
+
+    assert parse_extended_err(request, ancdata) == (11, 9, "10.0.0.1")
+    assert parse_extended_err(request, []) is None
+
+
+def test_trace_finishes_in_one_round_trip(network) -> None:
+    start = time.perf_counter()
+    route = TraceEngine(max_hops=30, timeout=5.0).trace("192.0.2.10")
+    elapsed = time.perf_counter() - start
+
+    assert route.reached
+    assert [hop.address for hop in route.hops] == [
+        "10.0.0.1",
+        "10.1.0.1",
+        "10.2.0.1",
+        "192.0.2.10",
+    ]
+    assert all(hop.rtt is not None and hop.rtt > 0 for hop in route.hops)
+    assert network.sent == 30
+    # done when the destination answers after 40ms, not after the timeout
+    assert elapsed < 0.5
+
+
+def test_silent_hops_cost_one_timeout(network) -> None:
+    engine = TraceEngine(max_hops=30, timeout=0.3, grace=0.05)
+    start = time.perf_counter()
+    routes = {
+        route.host: route
+        for route in engine.trace_many(
+            ["192.0.2.10", "192.0.2.20", "192.0.2.30", "no.such.invalid"]
+        )
+    }
+    elapsed = time.perf_counter() - start
+
+    silent = routes["192.0.2.20"]
+    assert silent.reached
+    assert [hop.address for hop in silent.hops] == [
+        "10.0.0.1",
+        None,
+        "10.3.0.1",
+        "192.0.2.20",
+    ]
+    unreached = routes["192.0.2.30"]
+    assert not unreached.reached
+    assert [hop.address for hop in unreached.hops] == ["10.0.0.1"]
+    assert routes["no.such.invalid"].address is None
+    assert routes["192.0.2.10"].reached
+    # all traces run at once, the silent ones wait a single timeout
+    assert elapsed < 1.0
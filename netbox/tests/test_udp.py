@@ -0,0 +1,130 @@
+import json
+import socket
+
+import pytest
+from click.testing import CliRunner
+
+from ..exception import SpeedException
+from ..scripts.command import cli
+from ..udp import (
+    DATA,
+    HEADER,
+    REPORT_REQUEST,
+    StreamStats,
+    UdpStreamServer,
+    send_stream,
+)
+
+
+def test_stream_stats_loss_reorder_duplicates() -> None:
+    stats = StreamStats()
+    for seq in [0, 1, 3, 2, 2, 5, 6, 6]:
+        stats.record(seq, sent_ns=seq * 1000, arrived_ns=seq * 1000 + 500, size=100)
+
+    info = stats.to_dict(sent=8)
+    assert info["received"] == 6
+    assert info["lost"] == 2  # 4 and 7
+    assert info["loss"] == 0.25
+    assert info["reordered"] == 1
+    assert info["duplicates"] == 2
+    assert info["bytes"] == 600
+    # constant transit time has no jitter
+    assert info["jitter"] == 0
+    assert stats.to_dict()["expected"] == 7
+
+
+def test_stream_stats_jitter() -> None:
+    stats = StreamStats()
+    # transit alternates between 1ms and 3ms, jitter converges to 2ms
+    for seq in range(200):
+        transit = 1_000_000 if seq % 2 else 3_000_000
+        stats.record(seq, seq * 10_000_000, seq * 10_000_000 + transit, 100)
+    assert stats.to_dict()["jitter"] == pytest.approx(2.0, rel=0.01)
+
+
+def test_record_many_matches_record() -> None:
+    one, many = StreamStats(), StreamStats()
+    blocks = [[0, 1, 2, 3], [4, 5], [7, 8], [6], [8, 9, 10]]
+    for i, seqs in enumerate(blocks):
+        sent = [seq * 1000 for seq in seqs]
+        arrived = 20_000 + i * 1500
+        for seq, sent_ns in zip(seqs, sent):
+            one.record(seq, sent_ns, arrived, 64)
+        many.record_many(seqs, sent, arrived, 64)
+    assert one.to_dict(sent=11) == many.to_dict(sent=11)
+    assert many.to_dict(sent=11)["reordered"] == 1
+    assert many.to_dict(sent=11)["duplicates"] == 1
+
+
+def test_stream_over_loopback() -> None:
+    server = UdpStreamServer(host="127.0.0.1", port=0).start()
+    try:
+        report = send_stream(
+            "127.0.0.1", port=server.address[1], rate=20000, size=64, duration=0.25
+        )
+    finally:
+        server.stop()
+    assert report["sent"] == 5000
+    assert report["received"] + report["lost"] == 5000
+    assert report["duplicates"] == 0
+    assert report["loss"] < 0.05
+    # paced to the rate, not sent as fast as possible
+    assert report["send_duration"] >= 0.24
+
+
+def test_invalid_stream() -> None:
+    with pytest.raises(ValueError):
+        send_stream("127.0.0.1", port=9, size=10)
+    with pytest.raises(SpeedException):
+        # nobody listens on the discard port of loopback
+        send_stream("127.0.0.1", port=9, rate=100, duration=0.01, timeout=0.2)
+
+
+def test_reports_only_to_senders_of_the_session() -> None:
+    server = UdpStreamServer(host="127.0.0.1", port=0).start()
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    other = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for sock in (sender, other):
+            sock.settimeout(0.3)
+            sock.connect(server.address)
+        sender.send(HEADER.pack(DATA, 7, 0, 0))
+        # neither another address nor another session of the sender is answered
+        other.send(HEADER.pack(REPORT_REQUEST, 7, 1, 0))
+        sender.send(HEADER.pack(REPORT_REQUEST, 8, 1, 0))
+        sender.send(HEADER.pack(REPORT_REQUEST, 7, 1, 0))
+        reply = sender.recv(65536)
+        assert HEADER.unpack_from(reply)[1] == 7
+        with pytest.raises(socket.timeout):
+            other.recv(65536)
+        with pytest.raises(socket.timeout):
+            sender.recv(65536)
+    finally:
+        sender.close()
+        other.close()
+        server.stop()
+
+
+def test_udp_test_command() -> None:
+    server = UdpStreamServer(host="127.0.0.1", port=0).start()
+    try:
+        result = CliRunner(mix_stderr=False).invoke(
+            cli,
+            [
+                "udp-test",
+                "client",
+                "127.0.0.1",
+                "--port",
+                str(server.address[1]),
+                "--rate",
+                "1000",
+                "--time",
+                "0.1",
+            ],
+        )
+    finally:
+        server.stop()
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.stdout)["data"]
+    assert report["sent"] == 100
+    assert report["size"] == 200
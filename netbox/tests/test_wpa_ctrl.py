@@ -0,0 +1,184 @@
+import os
+import socket
+import threading
+import typing as t
+
+import pytest
+
+from ..constant import WiFiState
+from ..exception import CommandException
+from ..wifi import LinuxAdapter
+from ..wpa_ctrl import wpa_psk
+
+SCAN_RESULTS = (
+    "bssid / frequency / signal level / flags / ssid\n"
+    "10:20:30:40:50:61\t5180\t-45\t[WPA2-PSK-CCMP][ESS]\tHellboycc 5G\n"
+    "a0:b0:c0:d0:e0:f0\t2437\t-60\t[WPA2-PSK-CCMP][ESS]\tTP-Link001\n"
+)
+
+
+class FakeWpaSupplicant(threading.Thread):
+    """Stand-in wpa_supplicant speaks the control interface protocol."""
+
+    def __init__(self, path: str, password: str = "12345678") -> None:
+        super().__init__(daemon=True)
+        self.password = password
+        self.requests: t.List[str] = []
+        self.monitors: t.Set[str] = set()
+        self.networks: t.Dict[str, t.Dict[str, str]] = {}
+        self.state = {"wpa_state": "SCANNING"}
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(path)
+
+    def event(self, message: str) -> None:
+        for addr in self.monitors:
+            self.sock.sendto(message.encode(), addr)
+
+    def handle(self, command: str, addr: str) -> str:
+        name, _, args = command.partition(" ")
+        if name == "ATTACH":
+            self.monitors.add(addr)
+        elif name == "DETACH":
+            self.monitors.discard(addr)
+        elif name == "SCAN":
+            self.sock.sendto(b"OK\n", addr)
+            self.event("<2>CTRL-EVENT-SCAN-STARTED ")
+            self.event("<2>CTRL-EVENT-SCAN-RESULTS ")
+            return ""
+        elif name == "SCAN_RESULTS":
+            return SCAN_RESULTS
+        elif name == "STATUS":
+            return "".join(f"{k}={v}\n" for k, v in self.state.items())
+        elif name == "SIGNAL_POLL":
+            return "RSSI=-45\nLINKSPEED=866\nNOISE=9999\nFREQUENCY=5180\n"
+        elif name == "ADD_NETWORK":
+            network_id = str(max(map(int, self.networks), default=-1) + 1)
+            self.networks[network_id] = {}
+            return f"{network_id}\n"
+        elif name == "LIST_NETWORKS":
+            return "network id / ssid / bssid / flags\n" + "".join(
+                f"{network_id}\t{bytes.fromhex(network['ssid']).decode()}\tany\t\n"
+                for network_id, network in self.networks.items()
+                if "ssid" in network
+            )
+        elif name == "SET_NETWORK":
+            network_id, key, value = args.split(" ", 2)
+            self.networks[network_id][key] = value
+        elif name == "REMOVE_NETWORK":
+            self.networks.pop(args, None)
+        elif name == "SELECT_NETWORK":
+            self.sock.sendto(b"OK\n", addr)
+            network = self.networks[args]
+            ssid = bytes.fromhex(network["ssid"]).decode()
+            if network.get("psk") == wpa_psk(ssid, self.password):
+                self.state = {
+                    "bssid": "10:20:30:40:50:61",
+                    "freq": "5180",
+                    "ssid": ssid,
+                    "mode": "station",
+                    "key_mgmt": "WPA2-PSK",
+                    "wpa_state": "COMPLETED",
+                }
+                self.event(
+                    "<3>CTRL-EVENT-CONNECTED - Connection to 10:20:30:40:50:61 completed"
+                )
+            else:
+                self.event(
+                    f'<3>CTRL-EVENT-SSID-TEMP-DISABLED id={args} ssid="{ssid}" reason=WRONG_KEY'
+                )
+            return ""
+        elif name == "DISCONNECT":
+            self.state = {"wpa_state": "DISCONNECTED"}
+        elif name == "RECONNECT":
+            self.state = {"wpa_state": "SCANNING"}
+        else:
+            return "UNKNOWN COMMAND\n"
+        return "OK\n"
+
+    def run(self) -> None:
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(4096)
+            except OSError:
+                return
+            command = data.decode()
+            self.requests.append(command)
+            reply = self.handle(command, addr)
+            if reply:
+                self.sock.sendto(reply.encode(), addr)
+
+
+@pytest.fixture
+def adapter(tmp_path):
+    server = FakeWpaSupplicant(os.path.join(str(tmp_path), "wlan0"))
+    server.start()
+    adapter = LinuxAdapter(ctrl_dir=str(tmp_path), timeout=2.0)
+    adapter.server = server
+    yield adapter
+    adapter.close()
+    server.sock.close()
+
+
+def test_scan_waits_for_scan_results_event(adapter) -> None:
+    assert adapter.interface == "wlan0"
+    result = adapter.scan()
+    assert result.ssids() == ["Hellboycc 5G", "TP-Link001"]
+    assert result.by_bssid["a0:b0:c0:d0:e0:f0"].channel == "6"
+    assert adapter.server.requests.count("SCAN") == 1
+
+
+def test_connect_and_current_network(adapter) -> None:
+    assert adapter.connect("Hellboycc 5G", "12345678") == WiFiState.CONNECTED
+    info = adapter.get_current_network()
+    assert info["SSID"] == "Hellboycc 5G"
+    assert (info["state"], info["channel"], info["agrCtlRSSI"]) == (
+        "running",
+        "36",
+        "-45",
+    )
+    assert info["agrCtlNoise"] == ""
+    assert adapter.connect("TP-Link001", "wrong-password") == WiFiState.CONNECTED_FAILED
+    assert "REMOVE_NETWORK 1" in adapter.server.requests
+
+
+def test_reconnect_reuses_network(adapter) -> None:
+    for _ in range(3):
+        assert adapter.connect("Hellboycc 5G", "12345678") == WiFiState.CONNECTED
+    assert list(adapter.server.networks) == ["0"]
+    assert adapter.server.requests.count("ADD_NETWORK") == 1
+    # a configured network is kept even if connecting it fails
+    assert adapter.connect("Hellboycc 5G", "wrong") == WiFiState.CONNECTED_FAILED
+    assert list(adapter.server.networks) == ["0"]
+
+
+def test_get_all_ssid(adapter) -> None:
+    assert adapter.get_all_ssid() == ["Hellboycc 5G", "TP-Link001"]
+    assert adapter.get_all_ssid() == ["Hellboycc 5G", "TP-Link001"]
+    assert adapter.server.requests.count("SCAN") == 1
+    adapter.get_all_ssid(refresh=True)
+    assert adapter.server.requests.count("SCAN") == 2
+
+
+def test_psk_is_sent_raw(adapter) -> None:
+    # test vector of IEEE 802.11i
+    assert wpa_psk("IEEE", "password") == (
+        "f42c6fc52df0ebef9ebb4b90b38a5f902e83fe1b135a70e23aed762e9710a12e"
+    )
+    raw = "AB" * 32
+    assert wpa_psk("Office", raw) == raw.lower()
+    adapter.server.password = 'pass "word" \\'
+    assert adapter.connect("Hellboycc 5G", 'pass "word" \\') == WiFiState.CONNECTED
+    psk = adapter.server.networks["0"]["psk"]
+    assert psk == wpa_psk("Hellboycc 5G", 'pass "word" \\') and '"' not in psk
+
+
+def test_turn_off_and_on(adapter) -> None:
+    assert adapter.disconnect() == WiFiState.DISCONNECTED
+    assert adapter.is_on_or_off() == WiFiState.OFF
+    assert adapter.turn_on()
+
+
+def test_unreachable_control_socket(tmp_path) -> None:
+    adapter = LinuxAdapter(interface="wlan9", ctrl_dir=str(tmp_path))
+    with pytest.raises(CommandException):
+        adapter.get_current_ssid()
@@ -0,0 +1,353 @@
+import collections
+import os
+import select
+import socket
+import struct
+import sys
+import time
+import typing as t
+
+from . import logger
+from .ping import (
+    ICMP_ECHO_REPLY,
+    ICMP_HEADER_FORMAT,
+    ICMP_HEADER_SIZE,
+    build_echo_request,
+    open_icmp_socket,
+)
+from .resolver import get_resolver
+
+ICMP_DEST_UNREACHABLE = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_ECHO_REQUEST = 8
+
+# Linux datagram ICMP sockets queue ICMP errors instead of delivering them,
+# they are read from the error queue with the offender in a control message
+IP_RECVERR = getattr(socket, "IP_RECVERR", 11)
+MSG_ERRQUEUE = getattr(socket, "MSG_ERRQUEUE", 0x2000)
+SO_EE_ORIGIN_ICMP = 2
+# struct sock_extended_err, the offender sockaddr_in follows it
+_EXTENDED_ERR = struct.Struct("=IBBBBII")
+_USE_ERRQUEUE = sys.platform.startswith("linux")
+
+
+class Hop(t.NamedTuple):
+    """A router or the destination answering a TTL, address is None if silent."""
+
+    ttl: int
+    address: t.Optional[str]
+    rtt: t.Optional[float]
+
+
+class Trace(t.NamedTuple):
+    """Path to a host, address is None if the host can not be resolved."""
+
+    host: str
+    address: t.Optional[str]
+    hops: t.List[Hop]
+    reached: bool
+
+    def to_dict(self) -> t.Dict[str, t.Any]:
+        """Obtain the trace with round trip times in milliseconds."""
+        return {
+            "host": self.host,
+            "address": self.address,
+            "reached": self.reached,
+            "hops": [
+                {
+                    "ttl": hop.ttl,
+                    "address": hop.address,
+                    "rtt": None if hop.rtt is None else round(hop.rtt * 1000, 3),
+                }
+                for hop in self.hops
+            ],
+        }
+
+
+def parse_icmp(packet: bytes) -> t.Optional[t.Tuple[int, int, int]]:
+    """Parse an ICMP packet answering an echo request.
+
+    Time exceeded and destination unreachable errors quote the IP header and
+    the first 8 bytes of the request, the identifier and sequence are taken
+    from the quoted echo request.
+
+    Args:
+        packet: Bytes received from the ICMP socket, with or without IP header.
+
+    Returns:
+        Tuple of (type, identifier, sequence) or None if it answers nothing.
+    """
+    if packet and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4 :]
+    if len(packet) < ICMP_HEADER_SIZE:
+        return None
+    _type = packet[0]
+    if _type == ICMP_ECHO_REPLY:
+        _, _, _, ident, seq = struct.unpack_from(ICMP_HEADER_FORMAT, packet)
+        return _type, ident, seq
+    if _type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+        return None
+    quoted = packet[ICMP_HEADER_SIZE:]
+    if len(quoted) < 20 or quoted[0] >> 4 != 4:
+        return None
+    quoted = quoted[(quoted[0] & 0x0F) * 4 :]
+    if len(quoted) < ICMP_HEADER_SIZE or quoted[0] != ICMP_ECHO_REQUEST:
+        return None
+    _, _, _, ident, seq = struct.unpack_from(ICMP_HEADER_FORMAT, quoted)
+    return _type, ident, seq
+
+
+def parse_extended_err(
+    data: bytes, ancdata: t.Iterable[t.Tuple[int, int, bytes]]
+) -> t.Optional[t.Tuple[int, int, str]]:
+    """Parse a message of the error queue of a Linux datagram ICMP socket.
+
+    Args:
+        data: Echo request which caused the error, without IP header.
+        ancdata: Control messages of ``recvmsg``.
+
+    Returns:
+        Tuple of (type, sequence, offender) or None if it is not an ICMP error.
+    """
+    if len(data) < ICMP_HEADER_SIZE or data[0] != ICMP_ECHO_REQUEST:
+        return None
+    _, _, _, _, seq = struct.unpack_from(ICMP_HEADER_FORMAT, data)
+    for level, kind, value in ancdata:
+        if level != socket.IPPROTO_IP or kind != IP_RECVERR:
+            continue
+        if len(value) < _EXTENDED_ERR.size + 8:
+            continue
+        _, origin, _type, _, _, _, _ = _EXTENDED_ERR.unpack_from(value)
+        if origin != SO_EE_ORIGIN_ICMP:
+            continue
+        offset = _EXTENDED_ERR.size + 4
+        offender = socket.inet_ntoa(value[offset : offset + 4])
+        return _type, seq, offender
+    return None
+
+
+class _Route(object):
+    """A trace in flight, hops are filled as answers arrive."""
+
+    __slots__ = ("host", "address", "hops", "reached", "deadline", "pending")
+
+    def __init__(self, host: str, address: str, max_hops: int) -> None:
+        self.host = host
+        self.address = address
+        self.hops: t.List[t.Optional[t.Tuple[str, float]]] = [None] * max_hops
+        # lowest TTL the destination answered, the length of the path
+        self.reached: t.Optional[int] = None
+        self.deadline = 0.0
+        self.pending = 0
+
+    def answer(self, ttl: int, address: str, rtt: float, final: bool) -> None:
+        if self.hops[ttl - 1] is None:
+            self.hops[ttl - 1] = (address, rtt)
+        if final and (self.reached is None or ttl < self.reached):
+            self.reached = ttl
+
+    def done(self, now: float) -> bool:
+        if now >= self.deadline or not self.pending:
+            return True
+        if self.reached is None:
+            return False
+        return all(hop is not None for hop in self.hops[: self.reached])
+
+    def result(self) -> Trace:
+        last = self.reached or len(self.hops)
+        if self.reached is None:
+            # silent hops at the end are the timeout, not the path
+            while last and self.hops[last - 1] is None:
+                last -= 1
+        hops = [
+            Hop(ttl, *answer) if answer else Hop(ttl, None, None)
+            for ttl, answer in enumerate(self.hops[:last], 1)
+        ]
+        # a router may answer unreachable instead of the destination
+        reached = bool(hops) and hops[-1].address == self.address
+        return Trace(self.host, self.address, hops, reached)
+
+
+class _TtlProbe(object):
+    __slots__ = ("route", "ttl", "sent")
+
+    def __init__(self, route: _Route, ttl: int, sent: float) -> None:
+        self.route = route
+        self.ttl = ttl
+        self.sent = sent
+
+
+class TraceEngine(object):
+    """Trace paths by sending echo requests of every TTL at once.
+
+    Classic traceroute waits for each hop before probing the next one, so a
+    silent hop costs a whole timeout. Here all TTLs of a trace are sent in one
+    burst and answers are matched back by sequence, a trace finishes as soon
+    as the destination and every hop before it answered, or after a single
+    ``timeout`` when some hops stay silent.
+
+    Args:
+        max_hops: Largest TTL probed.
+        timeout: Seconds to wait for the answers of a trace.
+        concurrency: Maximum number of traces in flight.
+        grace: Seconds to wait for silent hops after the destination answered,
+            at least the round trip time of the destination.
+    """
+
+    def __init__(
+        self,
+        max_hops: int = 30,
+        timeout: float = 2.0,
+        concurrency: int = 32,
+        grace: float = 0.1,
+        size: int = 56,
+    ) -> None:
+        if not 0 < max_hops <= 255:
+            raise ValueError("max_hops must be between 1 and 255.")
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than 0.")
+        self.max_hops = max_hops
+        self.timeout = timeout
+        # every trace in flight holds max_hops sequence numbers
+        self.concurrency = min(concurrency, 0xFFFF // max_hops)
+        self.grace = grace
+        self.payload = b"Q" * size
+        # differs from PingEngine, raw sockets of both see all answers
+        self._ident = (os.getpid() ^ 0x8000) & 0xFFFF
+        self._seq = 0
+
+    def _next_seq(self, inflight: t.Mapping[int, _TtlProbe]) -> int:
+        while True:
+            self._seq = (self._seq + 1) & 0xFFFF
+            if self._seq not in inflight:
+                return self._seq
+
+    def _send(
+        self, sock: t.Any, route: _Route, inflight: t.Dict[int, _TtlProbe]
+    ) -> None:
+        for ttl in range(1, self.max_hops + 1):
+            seq = self._next_seq(inflight)
+            packet = build_echo_request(self._ident, seq, self.payload)
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+                sock.sendto(packet, (route.address, 0))
+            except OSError as e:
+                # a full send buffer or an unreachable network, the hop is silent
+                logger.debug(msg=f"Trace {route.host} TTL {ttl} send failed: {e}")
+                continue
+            inflight[seq] = _TtlProbe(route, ttl, time.perf_counter())
+            route.pending += 1
+        route.deadline = time.perf_counter() + self.timeout
+
+    def _receive(
+        self, sock: t.Any, raw: bool
+    ) -> t.Iterator[t.Tuple[int, int, str, float]]:
+        """Read all queued answers, yield (type, sequence, address, received)."""
+        while True:
+            try:
+                packet, (addr, _) = sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # a queued error of a datagram socket makes recvfrom fail
+                break
+            received = time.perf_counter()
+            parsed = parse_icmp(packet)
+            if parsed is None:
+                continue
+            _type, ident, seq = parsed
+            # datagram sockets rewrite the identifier with the local port
+            if raw and ident != self._ident:
+                continue
+            yield _type, seq, addr, received
+        if raw or not _USE_ERRQUEUE:
+            return
+        while True:
+            try:
+                data, ancdata, _, _ = sock.recvmsg(2048, 512, MSG_ERRQUEUE)
+            except (BlockingIOError, InterruptedError):
+                return
+            received = time.perf_counter()
+            error = parse_extended_err(data, ancdata)
+            if error is not None:
+                _type, seq, offender = error
+                yield _type, seq, offender, received
+
+    def trace_many(self, hosts: t.Iterable[str]) -> t.Iterator[Trace]:
+        """Trace many hosts concurrently and yield traces as they finish.
+
+        Args:
+            hosts: IP addresses or domains.
+
+        Raises:
+            PingException: ICMP socket can not be opened.
+
+        Yields:
+            Trace of each host.
+        """
+        pending = collections.deque(hosts)
+        addresses = get_resolver().resolve_many(pending)
+        inflight: t.Dict[int, _TtlProbe] = {}
+        routes: t.List[_Route] = []
+        sock, raw = open_icmp_socket()
+        if not raw and _USE_ERRQUEUE:
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        try:
+            while pending or routes:
+                while pending and len(routes) < self.concurrency:
+                    host = pending.popleft()
+                    address = addresses[host]
+                    if address is None:
+                        yield Trace(host, None, [], False)
+                        continue
+                    route = _Route(host, address, self.max_hops)
+                    self._send(sock, route, inflight)
+                    routes.append(route)
+
+                if not routes:
+                    continue
+                wait = min(route.deadline for route in routes) - time.perf_counter()
+                readable, _, _ = select.select([sock], [], [], max(0.0, wait))
+                if readable:
+                    for _type, seq, addr, received in self._receive(sock, raw):
+                        probe = inflight.pop(seq, None)
+                        if probe is None:
+                            continue
+                        route = probe.route
+                        route.pending -= 1
+                        final = _type != ICMP_TIME_EXCEEDED
+                        if _type == ICMP_ECHO_REPLY and addr != route.address:
+                            continue
+                        rtt = received - probe.sent
+                        route.answer(probe.ttl, addr, rtt, final)
+                        if final and probe.ttl == route.reached:
+                            # hops before the destination answer in about its
+                            # round trip time, do not wait the whole timeout
+                            route.deadline = min(
+                                route.deadline, received + max(rtt, self.grace)
+                            )
+
+                now = time.perf_counter()
+                for route in [route for route in routes if route.done(now)]:
+                    routes.remove(route)
+                    if route.pending:
+                        for seq in [
+                            seq
+                            for seq, probe in inflight.items()
+                            if probe.route is route
+                        ]:
+                            del inflight[seq]
+                    yield route.result()
+        finally:
+            sock.close()
+
+    def trace(self, host: str) -> Trace:
+        """Trace a single host.
+
+        Args:
+            host: IP address or domain.
+
+        Returns:
+            Trace of the host.
+        """
+        return next(self.trace_many([host]))
@@ -0,0 +1,464 @@
+import errno
+import functools
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import typing as t
+
+from . import logger
+from .exception import SpeedException
+
+DEFAULT_PORT = 5211
+# kind, session, sequence, send time in nanoseconds of the sender clock
+HEADER = struct.Struct("!BxxxIQQ")
+DATA, REPORT_REQUEST, REPORT = 0, 1, 2
+MIN_SIZE = HEADER.size
+MAX_SIZE = 1472
+
+# Linux sends a buffer of many datagrams in one call with UDP_SEGMENT (GSO),
+# and coalesces received datagrams of a flow with UDP_GRO
+SOL_UDP = getattr(socket, "SOL_UDP", 17)
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+UDP_GRO = getattr(socket, "UDP_GRO", 104)
+# GSO takes at most 64 segments of one buffer
+MAX_BATCH = 64
+# sequences remembered to tell duplicates from late packets
+WINDOW = 1 << 16
+# longest burst of packets sent at once by the pacer, in seconds
+BURST = 0.0002
+_ONES = b"\x01" * MAX_BATCH * 1024
+
+
+class StreamStats(object):
+    """Receiving statistics of one stream, updated per packet in constant memory.
+
+    A bitmap over the last ``WINDOW`` sequences tells a late packet from a
+    duplicate, a packet older than the window is counted as late. Jitter is
+    the RFC 3550 interarrival jitter, the difference of transit times of two
+    packets does not depend on the offset between sender and receiver clocks.
+    """
+
+    __slots__ = (
+        "received",
+        "bytes",
+        "highest",
+        "reordered",
+        "duplicates",
+        "jitter",
+        "first",
+        "last",
+        "_transit",
+        "_seen",
+    )
+
+    def __init__(self) -> None:
+        self.received = 0
+        self.bytes = 0
+        self.highest = -1
+        self.reordered = 0
+        self.duplicates = 0
+        self.jitter = 0.0
+        self.first = 0.0
+        self.last = 0.0
+        self._transit: t.Optional[int] = None
+        self._seen = bytearray(WINDOW)
+
+    def record(self, seq: int, sent_ns: int, arrived_ns: int, size: int) -> None:
+        seen = self._seen
+        slot = seq & (WINDOW - 1)
+        highest = self.highest
+        if seq > highest:
+            if seq - highest > WINDOW:
+                seen[:] = bytes(WINDOW)
+            else:
+                for skipped in range(highest + 1, seq):
+                    seen[skipped & (WINDOW - 1)] = 0
+            seen[slot] = 1
+            self.highest = seq
+        elif highest - seq >= WINDOW:
+            self.reordered += 1
+        elif seen[slot]:
+            self.duplicates += 1
+            return
+        else:
+            seen[slot] = 1
+            self.reordered += 1
+
+        if not self.received:
+            self.first = arrived_ns / 1e9
+        self.last = arrived_ns / 1e9
+        self.received += 1
+        self.bytes += size
+        transit = arrived_ns - sent_ns
+        if self._transit is not None:
+            d = abs(transit - self._transit) / 1e9
+            self.jitter += (d - self.jitter) / 16
+        self._transit = transit
+
+    def record_many(
+        self, seqs: t.List[int], sent_ns: t.List[int], arrived_ns: int, size: int
+    ) -> None:
+        """Record datagrams received in one call, in-order runs skip the per packet path."""
+        first = seqs[0]
+        count = len(seqs)
+        if first != self.highest + 1 or seqs != list(range(first, first + count)):
+            for seq, sent in zip(seqs, sent_ns):
+                self.record(seq, sent, arrived_ns, size)
+            return
+        start = first & (WINDOW - 1)
+        head = min(count, WINDOW - start)
+        self._seen[start : start + head] = _ONES[:head]
+        self._seen[: count - head] = _ONES[: count - head]
+        self.highest = seqs[-1]
+        if not self.received:
+            self.first = arrived_ns / 1e9
+        self.last = arrived_ns / 1e9
+        self.received += count
+        self.bytes += count * size
+        previous = self._transit
+        jitter = self.jitter
+        for sent in sent_ns:
+            transit = arrived_ns - sent
+            if previous is not None:
+                jitter += (abs(transit - previous) / 1e9 - jitter) / 16
+            previous = transit
+        self._transit = previous
+        self.jitter = jitter
+
+    def to_dict(self, sent: t.Optional[int] = None) -> t.Dict[str, t.Any]:
+        """Obtain statistics, loss is counted against ``sent`` if it is known.
+
+        Returns:
+            Dict of statistics, jitter in milliseconds. For example: {'received': 49990, 'lost': 10, 'loss': 0.0002, 'reordered': 3, 'duplicates': 0, 'jitter': 0.041, ...}
+        """
+        expected = self.highest + 1 if sent is None else sent
+        lost = max(expected - self.received, 0)
+        duration = self.last - self.first
+        return {
+            "received": self.received,
+            "expected": expected,
+            "lost": lost,
+            "loss": round(lost / expected, 6) if expected else 0.0,
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "jitter": round(self.jitter * 1000, 4),
+            "bytes": self.bytes,
+            "duration": round(duration, 6),
+            "mbps": round(self.bytes * 8 / duration / 1e6, 3) if duration else 0.0,
+        }
+
+
+def _enable_gro(sock: socket.socket) -> bool:
+    if not sys.platform.startswith("linux"):
+        return False
+    try:
+        sock.setsockopt(SOL_UDP, UDP_GRO, 1)
+    except OSError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def segments(size: int) -> struct.Struct:
+    """Struct of a header followed by the rest of a datagram of ``size`` bytes."""
+    return struct.Struct(f"{HEADER.format}{size - HEADER.size}x")
+
+
+class UdpStreamServer(object):
+    """Receiving side of the UDP stream test.
+
+    One thread receives datagrams of all streams into a preallocated buffer,
+    on Linux several datagrams of a stream arrive in one call with UDP_GRO.
+    Datagrams coalesced in one call share its arrival time. A stream is
+    answered its statistics when its sender asks for them, and forgotten
+    after ``idle`` seconds without packets. Only an address which sent data
+    of a session is answered, so the server does not reflect reports to
+    spoofed addresses.
+
+    Args:
+        host: Address to listen on.
+        port: Port to listen on, 0 picks a free one.
+        idle: Seconds a silent stream is kept.
+    """
+
+    def __init__(
+        self, host: str = "0.0.0.0", port: int = DEFAULT_PORT, idle: float = 60.0
+    ) -> None:
+        self.idle = idle
+        self.streams: t.Dict[t.Tuple[t.Any, int], StreamStats] = {}
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+        self._sock.bind((host, port))
+        self._sock.settimeout(0.5)
+        self._gro = _enable_gro(self._sock)
+        self._stopped = threading.Event()
+        self._thread: t.Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> t.Tuple[str, int]:
+        """Listening address, useful when port 0 is given."""
+        return self._sock.getsockname()
+
+    def start(self) -> "UdpStreamServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="netbox-udp-server", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Receive streams until ``stop`` is called."""
+        sock = self._sock
+        buffer = bytearray(65536)
+        view = memoryview(buffer)
+        unpack_from = HEADER.unpack_from
+        clock = time.monotonic_ns
+        streams = self.streams
+        cmsg_size = socket.CMSG_SPACE(4)
+        last_sweep = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                if self._gro:
+                    n, ancdata, _, addr = sock.recvmsg_into([view], cmsg_size)
+                else:
+                    n, addr = sock.recvfrom_into(view)
+                    ancdata = []
+            except socket.timeout:
+                n = 0
+            except OSError:
+                break
+            now = time.monotonic()
+            if now - last_sweep > self.idle:
+                self._forget(now)
+                last_sweep = now
+            if not n:
+                continue
+            arrived = clock()
+            segment = n
+            for level, kind, data in ancdata:
+                if level == SOL_UDP and kind == UDP_GRO:
+                    (segment,) = struct.unpack("=i", data[:4])
+            if segment < HEADER.size:
+                continue
+            # headers of all full segments are unpacked in one call
+            full = n - n % segment
+            packets = segments(segment).iter_unpack(view[:full]) if full else []
+            if full < n and n - full >= HEADER.size:
+                packets = [*packets, unpack_from(buffer, full)]
+            batch = list(packets)
+            kind, session = batch[0][0], batch[0][1]
+            if kind == DATA and all(
+                packet[0] == DATA and packet[1] == session for packet in batch
+            ):
+                key = (addr, session)
+                stats = streams.get(key)
+                if stats is None:
+                    stats = streams[key] = StreamStats()
+                stats.record_many(
+                    [packet[2] for packet in batch],
+                    [packet[3] for packet in batch],
+                    arrived,
+                    segment,
+                )
+                continue
+            for kind, session, seq, sent_ns in batch:
+                key = (addr, session)
+                stats = streams.get(key)
+                if kind == DATA:
+                    if stats is None:
+                        stats = streams[key] = StreamStats()
+                    stats.record(seq, sent_ns, arrived, segment)
+                elif kind == REPORT_REQUEST and stats is not None:
+                    self._report(addr, session, seq, stats)
+
+    def _report(
+        self,
+        addr: t.Any,
+        session: int,
+        sent: int,
+        stats: StreamStats,
+    ) -> None:
+        info = stats.to_dict(sent)
+        body = json.dumps(info).encode()
+        try:
+            self._sock.sendto(HEADER.pack(REPORT, session, sent, 0) + body, addr)
+        except OSError as e:
+            logger.debug(msg=f"UDP stream report to {addr} failed: {e}")
+
+    def _forget(self, now: float) -> None:
+        oldest = time.monotonic_ns() / 1e9 - self.idle
+        for key in [key for key, stats in self.streams.items() if stats.last < oldest]:
+            del self.streams[key]
+
+    def stop(self) -> None:
+        """Stop receiving streams."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._sock.close()
+
+
+class _Pacer(object):
+    """Tell how many packets are due at a constant rate.
+
+    Sleeps while the next packet is far, then spins on the high resolution
+    clock for the last ``spin`` seconds, so packets leave on time without
+    burning a CPU at low rates. At high rates the sender turns spinning off
+    and sends the packets due after each sleep at once.
+    """
+
+    def __init__(self, rate: float, spin: float = 0.0002) -> None:
+        self.rate = rate
+        self.spin = spin
+        self.start = time.perf_counter()
+
+    def due(self, sent: int) -> int:
+        return int((time.perf_counter() - self.start) * self.rate) + 1 - sent
+
+    def wait(self, sent: int) -> None:
+        target = self.start + sent / self.rate
+        while True:
+            remaining = target - time.perf_counter()
+            if remaining <= 0:
+                return
+            if remaining > self.spin:
+                time.sleep(remaining - self.spin)
+
+
+def send_stream(
+    host: str,
+    port: int = DEFAULT_PORT,
+    rate: float = 1000.0,
+    size: int = 200,
+    duration: float = 10.0,
+    batch: int = MAX_BATCH,
+    timeout: float = 2.0,
+) -> t.Dict[str, t.Any]:
+    """Send a paced stream of datagrams to a UdpStreamServer and obtain its statistics.
+
+    Datagrams carry a session, a sequence number and the send time. Packets
+    due at the same time are sent in one call, with UDP_SEGMENT on Linux and
+    one ``send`` per datagram elsewhere, so the rate holds at hundreds of
+    thousands of packets per second while a low rate is paced per packet.
+
+    Args:
+        host: Address of the server.
+        port: Port of the server.
+        rate: Packets per second.
+        size: Bytes of each datagram, including the 24 bytes header.
+        duration: Seconds to send.
+        batch: Maximum datagrams sent in one call.
+        timeout: Seconds to wait for the statistics of the server.
+
+    Raises:
+        SpeedException: Server is unreachable or does not answer.
+
+    Returns:
+        Report of the test, jitter in milliseconds. For example: {'sent': 50000, 'rate': 5000.0, 'received': 49990, 'lost': 10, 'loss': 0.0002, 'jitter': 0.041, ...}
+    """
+    if rate <= 0:
+        raise ValueError("rate must be greater than 0.")
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise ValueError(f"size must be between {MIN_SIZE} and {MAX_SIZE}.")
+    batch = max(1, min(batch, MAX_BATCH, 65507 // size))
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        sock.connect((host, port))
+    except OSError as e:
+        raise SpeedException(message=f"UDP server {host}:{port} is unreachable: {e}")
+    session = int.from_bytes(os.urandom(4), "big")
+    buffer = bytearray(os.urandom(size)) * batch
+    view = memoryview(buffer)
+    pack_into = HEADER.pack_into
+    clock = time.monotonic_ns
+    gso: t.Optional[t.List[t.Tuple[int, int, bytes]]] = None
+    if sys.platform.startswith("linux") and batch > 1:
+        gso = [(SOL_UDP, UDP_SEGMENT, struct.pack("=H", size))]
+
+    total = int(rate * duration)
+    sent = 0
+    dropped = 0
+    batches = 0
+    pacer = _Pacer(rate)
+    try:
+        # at high rates packets wait for a batch worth ``BURST`` seconds
+        # without spinning, a wakeup per packet leaves no CPU to the receiver
+        burst = max(0, min(batch, int(rate * BURST)) - 1)
+        if burst:
+            pacer.spin = 0.0
+        while sent < total:
+            due = pacer.due(sent)
+            if due <= burst and sent + due < total:
+                pacer.wait(min(sent + burst, total - 1))
+                continue
+            count = min(due, batch, total - sent)
+            now = clock()
+            for i in range(count):
+                pack_into(buffer, i * size, DATA, session, sent + i, now)
+            try:
+                if gso is not None and count > 1:
+                    sock.sendmsg([view[: count * size]], gso)
+                else:
+                    for i in range(count):
+                        sock.send(view[i * size : (i + 1) * size])
+            except OSError as e:
+                if e.errno == errno.EIO and gso is not None:
+                    # GSO is not supported by the device, send one by one
+                    gso = None
+                    continue
+                if e.errno not in (errno.ENOBUFS, errno.EAGAIN, errno.ECONNREFUSED):
+                    raise SpeedException(message=f"UDP stream send failed: {e}")
+                # a full queue drops the datagrams like the network would
+                dropped += count
+            sent += count
+            batches += 1
+        elapsed = time.perf_counter() - pacer.start
+        report = _request_report(sock, session, sent, timeout)
+    finally:
+        sock.close()
+    report.update(
+        {
+            "host": host,
+            "port": port,
+            "size": size,
+            "sent": sent,
+            "send_dropped": dropped,
+            "batches": batches,
+            "rate": round(sent / elapsed, 1) if elapsed else 0.0,
+            "target_rate": rate,
+            "send_duration": round(elapsed, 6),
+        }
+    )
+    return report
+
+
+def _request_report(
+    sock: socket.socket, session: int, sent: int, timeout: float
+) -> t.Dict[str, t.Any]:
+    """Ask the server for statistics of the session, the request is repeated if lost."""
+    request = HEADER.pack(REPORT_REQUEST, session, sent, 0)
+    sock.settimeout(timeout / 4)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            sock.send(request)
+            while True:
+                packet = sock.recv(65536)
+                if len(packet) < HEADER.size:
+                    continue
+                kind, reply_session, _, _ = HEADER.unpack_from(packet)
+                if kind == REPORT and reply_session == session:
+                    return json.loads(packet[HEADER.size :])
+        except socket.timeout:
+            continue
+        except (OSError, ValueError) as e:
+            raise SpeedException(message=f"UDP server did not report: {e}")
+    raise SpeedException(
+        message=f"UDP server did not report within {timeout}s, it may have received nothing."
+    )
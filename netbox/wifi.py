@@ -1,24 +1,150 @@
+import abc
+import os
 import re
-import subprocess
 import typing as t
 
-from . import logger
+from . import logger, metrics
+from .cache import CacheInfo, CommandCache
+from .connect import wait_until
 from .constant import WiFiState
 from .exception import CommandException
+from .process import Argv, CommandRunner, to_argv, to_string
+from .scan import Network, ScanResult
+from .sysfs import LinkStatsReader
+from .wpa_ctrl import (
+    WpaCtrl,
+    freq_to_channel,
+    parse_key_values,
+    printf_encode,
+    wpa_psk,
+)
+
+_BSSID = re.compile(r"^[0-9a-fA-F]{1,2}(:[0-9a-fA-F]{1,2}){5}$")
+
+
+class WifiAdapter(abc.ABC):
+    """A class that contains generic properties and methods.
+
+    Each adapter implements the abstract wifi operations of its platform.
+    """
+
+    # (regex of command, seconds) output of matched read command is cached
+    CACHE_TTL_RULES: t.Sequence[t.Tuple[str, float]] = ()
+    # (regex of mutating command, [regex of dependent read command, ...])
+    CACHE_INVALIDATION_RULES: t.Sequence[t.Tuple[str, t.Sequence[str]]] = ()
+    CACHE_MAXSIZE = 64
+    # maximum number of commands of a batch running at the same time
+    RUNNER_WORKERS = 4
+    # seconds a scan is reused by lookups which do not ask for a fresh one
+    SCAN_MAX_AGE = 5.0
+    # seconds to wait for association after a connect request
+    CONNECT_TIMEOUT = 10.0
 
+    def __init__(self) -> None:
+        self._cache = CommandCache(
+            ttl_rules=self.CACHE_TTL_RULES,
+            invalidation_rules=self.CACHE_INVALIDATION_RULES,
+            maxsize=self.CACHE_MAXSIZE,
+        )
+        self._last_scan: t.Optional[ScanResult] = None
+        self._runner = CommandRunner(max_workers=self.RUNNER_WORKERS)
+        # called with the exception of a failed command before it is raised
+        self.on_command_failure: t.Optional[t.Callable[[CommandException], None]] = None
+
+    def scan(self, max_age: t.Optional[float] = None) -> ScanResult:
+        """Obtain surrounding wifi networks, reuse the last scan if fresh enough.
 
-class WifiAdapter(object):
-    """A class that contains generic properties and methods."""
+        Args:
+            max_age (float, optional): Maximum age in seconds of a reused scan,
+                0 forces a rescan. Defaults to SCAN_MAX_AGE.
 
-    def __init__(self) -> None:
-        pass
+        Returns:
+            ScanResult indexed by ssid, bssid and channel.
+        """
+        if max_age is None:
+            max_age = self.SCAN_MAX_AGE
+        if self._last_scan is None or not self._last_scan.is_fresh(max_age):
+            self._last_scan = self._scan()
+        return self._last_scan
 
-    @staticmethod
-    def execute_command(command: str) -> str:
+    @abc.abstractmethod
+    def _scan(self) -> ScanResult:
+        """Scan surrounding wifi networks."""
+
+    def _forget_scan(self) -> None:
+        """Drop the last scan, it is stale after the interface state changed."""
+        self._last_scan = None
+
+    @property
+    @abc.abstractmethod
+    def interface(self) -> str:
+        """Obtain current wifi interface name."""
+
+    @abc.abstractmethod
+    def get_ip_address(self) -> t.Optional[str]:
+        """Obtain IPv4 address of wifi interface.
+
+        Returns:
+            IP address or None if DHCP has not finished yet. For example: 192.168.1.8
+        """
+
+    @abc.abstractmethod
+    def get_current_network(self, refresh: bool = False) -> t.Dict[str, str]:
+        """Obtain current connected wifi information."""
+
+    @abc.abstractmethod
+    def get_networks(self) -> t.List[t.Dict[str, str]]:
+        """Obtain surrounding wifi networks as dicts."""
+
+    @abc.abstractmethod
+    def get_all_ssid(self, refresh: bool = False) -> t.List[str]:
+        """Obtain a collection of available ssid."""
+
+    @abc.abstractmethod
+    def get_current_ssid(self) -> t.Optional[str]:
+        """Obtain ssid of current wifi network."""
+
+    @abc.abstractmethod
+    def get_current_rssi(self) -> t.Optional[str]:
+        """Obtain rssi of current wifi network."""
+
+    @abc.abstractmethod
+    def get_state(self) -> t.Optional[str]:
+        """Obtain state of current wifi network."""
+
+    @abc.abstractmethod
+    def is_on_or_off(self) -> WiFiState:
+        """Obtain state of wifi interface on or off."""
+
+    @abc.abstractmethod
+    def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        """Connect a special wifi network."""
+
+    @abc.abstractmethod
+    def disconnect(self) -> t.Optional[WiFiState]:
+        """Disconnect current wifi network."""
+
+    @abc.abstractmethod
+    def turn_on(self) -> bool:
+        """Turn on wifi interface."""
+
+    @abc.abstractmethod
+    def turn_off(self) -> bool:
+        """Turn off wifi interface."""
+
+    @metrics.timed("adapter.execute_command")
+    def execute_command(self, command: t.Union[str, Argv], cache: bool = True) -> str:
         """Execute the specified command and return the result.
 
+        Commands never run through a shell, so arguments with spaces are safe.
+        Output of read commands is served from the command cache while it is
+        fresh, a mutating command invalidates the read commands depend on it.
+
         Args:
-            command (str): Commands to be executed.
+            command (str | list): Argv list, a string is split by shell rules.
+            cache (bool, optional): Serve output from cache. Defaults to True.
 
         Raises:
             CommandException: Exception of command executes failed.
@@ -26,38 +152,103 @@ class WifiAdapter(object):
         Returns:
             String results of command executes successfully.
         """
-        process = subprocess.run(command, shell=True, capture_output=True, text=True)
-        if process.returncode != 0:
-            raise CommandException(message=f"Command: '{command}' executed failed.")
-        return process.stdout
+        argv = to_argv(command)
+        key = to_string(argv)
+        output = self._cache.get(key) if cache else None
+        if output is not None:
+            metrics.count("command.cache_hit")
+            return output
+        metrics.count("command.cache_miss")
+        result = self._runner.run(argv)
+        self._cache.invalidate(key)
+        try:
+            result.check()
+        except CommandException as e:
+            if self.on_command_failure is not None:
+                self.on_command_failure(e)
+            raise
+        self._cache.set(key, result.stdout)
+        return result.stdout
+
+    def command_stats(self) -> t.Dict[str, t.Dict[str, float]]:
+        """Obtain spawn latency statistics per executable.
+
+        Returns:
+            Dict of statistics. For example: {'networksetup': {'count': 3, 'failed': 0, 'spawn_avg': 0.002, ...}}
+        """
+        return self._runner.stats()
+
+    def cache_info(self) -> CacheInfo:
+        """Obtain hit and miss statistics of the command cache.
+
+        Returns:
+            CacheInfo(hits, misses, invalidations, size, maxsize)
+        """
+        return self._cache.info()
+
+    def clear_cache(self) -> None:
+        """Drop all cached command outputs."""
+        self._cache.clear()
 
 
 class MacAdapter(WifiAdapter):
-    """Adapter of Wi-Fi operation under MacOS."""
+    """Adapter of Wi-Fi operation under MacOS.
+
+    Args:
+        interface: Wifi interface name, defaults to the Wi-Fi hardware port.
+    """
 
     AIRPORT_PATH = "/System/Library/PrivateFrameworks/Apple80211.framework/Versions/Current/Resources/airport"
 
-    def __init__(self) -> None:
-        pass
+    CACHE_TTL_RULES: t.Sequence[t.Tuple[str, float]] = (
+        (r"^networksetup -listallhardwareports", 300.0),
+        (r"^networksetup -getairportpower ", 2.0),
+        (r"airport -I$", 1.0),
+    )
+    CACHE_INVALIDATION_RULES: t.Sequence[t.Tuple[str, t.Sequence[str]]] = (
+        (r"^networksetup -setairportpower ", (r"-getairportpower ", r"airport -I$")),
+        (r"^networksetup -setairportnetwork ", (r"airport -I$",)),
+    )
+
+    def __init__(self, interface: t.Optional[str] = None) -> None:
+        super().__init__()
+        self._interface = interface
 
-    def get_current_network(self) -> t.Dict[str, str]:
-        return self._get_current_wifi_info()
+    def get_current_network(self, refresh: bool = False) -> t.Dict[str, str]:
+        return self._get_current_wifi_info(refresh=refresh)
 
     def get_networks(self) -> t.List[t.Dict[str, str]]:
         return self._get_scan_results()
 
-    def _get_current_wifi_info(self) -> t.Dict[str, str]:
+    def _get_current_wifi_info(self, refresh: bool = False) -> t.Dict[str, str]:
         """Obtain current connected wifi information.
 
+        Args:
+            refresh (bool, optional): Bypass the command cache.
+
+        Returns:
+            Connected wifi information. For example: {'SSID': 'TP-Link001', 'agrCtlRSSI': "-30"}
+        """
+        command = [self.AIRPORT_PATH, "-I"]
+        output = self.execute_command(command=command, cache=not refresh)
+        return self.parse_current_info(output)
+
+    @staticmethod
+    @metrics.timed("parse.current_info")
+    def parse_current_info(output: str) -> t.Dict[str, str]:
+        """Parse output of ``airport -I``.
+
+        Args:
+            output: Output with a 'key: value' pair per line.
+
         Returns:
             Connected wifi information. For example: {'SSID': 'TP-Link001', 'agrCtlRSSI': "-30"}
         """
-        command = f"{self.AIRPORT_PATH} -I"
-        output = self.execute_command(command=command)
         info = {}
         for line in output.split("\n"):
             if ":" in line:
-                (k, v) = line.split(":")
+                # BSSID contains colons as well
+                (k, v) = line.split(":", 1)
                 k = k.strip()
                 v = v.strip()
                 info.update({k: v})
@@ -70,50 +261,109 @@ class MacAdapter(WifiAdapter):
         Returns:
             Wifi interface name. For example: en0
         """
-        command = "networksetup -listallhardwareports | awk '/Wi-Fi|AirPort/ {getline; print $NF}'"
+        if self._interface:
+            return self._interface
+        command = ["networksetup", "-listallhardwareports"]
         output = self.execute_command(command=command)
-        return output.strip()
+        return self.parse_hardware_ports(output)
+
+    @staticmethod
+    @metrics.timed("parse.hardware_ports")
+    def parse_hardware_ports(output: str) -> str:
+        """Parse device name of Wi-Fi port in ``networksetup -listallhardwareports``.
 
-    def _get_scan_results(self) -> t.List[t.Dict[str, str]]:
+        Args:
+            output: Output with 'Hardware Port: Wi-Fi' followed by 'Device: en0'.
+
+        Returns:
+            Wifi interface name or empty string if it is not found.
+        """
+        lines = output.splitlines()
+        for i, line in enumerate(lines[:-1]):
+            if line.startswith("Hardware Port:") and (
+                "Wi-Fi" in line or "AirPort" in line
+            ):
+                return lines[i + 1].split(":", 1)[-1].strip()
+        return ""
+
+    def _scan(self) -> ScanResult:
+        """Scan surrounding wifi networks with airport.
+
+        Returns:
+            ScanResult of the output.
+        """
+        command = [self.AIRPORT_PATH, "-s"]
+        output = self.execute_command(command=command, cache=False)
+        return self.parse_scan_output(output)
+
+    @staticmethod
+    @metrics.timed("parse.scan_output")
+    def parse_scan_output(output: str) -> ScanResult:
+        """Parse output of ``airport -s``.
+
+        SSID column is right aligned to the end of its header, so a ssid with
+        spaces is kept as it is. BSSID is missing if location service is not
+        authorized.
+
+        Args:
+            output: Output of ``airport -s``.
+
+        Returns:
+            ScanResult of the output.
+        """
+        lines = output.split("\n")
+        header = lines[0]
+        ssid_end = header.find("SSID") + 4 if "SSID" in header else 0
+        networks = list()
+        for line in lines[1:]:
+            if not line.strip():
+                continue
+            if ssid_end:
+                ssid, fields = line[:ssid_end].strip(), line[ssid_end:].split()
+            else:
+                _line = re.sub(r"\s{2,}", "|", line.strip()).split("|")
+                ssid, fields = _line[0], " ".join(_line[1:]).split()
+            bssid = fields.pop(0) if fields and _BSSID.match(fields[0]) else ""
+            if len(fields) < 2:
+                continue
+            try:
+                rssi = int(fields[0])
+            except ValueError:
+                continue
+            networks.append(
+                Network(
+                    ssid=ssid,
+                    bssid=bssid,
+                    rssi=rssi,
+                    channel=fields[1],
+                    ht=fields[2] if len(fields) > 2 else "",
+                    cc=fields[3].replace("--", "") if len(fields) > 3 else "",
+                    security=" ".join(fields[4:]),
+                )
+            )
+        return ScanResult(networks)
+
+    def _get_scan_results(self, refresh: bool = False) -> t.List[t.Dict[str, str]]:
         """Obtain surrounding wifi network information.
 
+        Args:
+            refresh (bool, optional): Rescan even if the last scan is fresh.
+
         Returns:
             Wifi network information.
         """
-        command = f"{self.AIRPORT_PATH} -s"
-        output = self.execute_command(command=command)
-        # clean output data
-        _rets = list()
-        rets = list()
-        for line in output.split("\n")[1:]:
-            if line != "":
-                line = re.sub(r"\s{2,}", "|", line.strip().replace("--", ""))
-                _rets.append(line)
-        for line in _rets:
-            _line = line.split("|")
-            rets.append(
-                {
-                    "ssid": _line[0],
-                    "rssi": _line[1],
-                    "channel": _line[2],
-                    "HT": _line[3],
-                    "security": _line[4],
-                }
-            )
-        return rets
+        return self.scan(max_age=0 if refresh else None).to_list()
 
-    def get_all_ssid(self):
+    def get_all_ssid(self, refresh: bool = False):
         """Obtain a collection of available ssid.
 
+        Args:
+            refresh (bool, optional): Rescan even if the last scan is fresh.
+
         Returns:
             Collection of ssid. For example: ['test01', 'ChinaNet-test001', 'TP-Link1111']
         """
-        results = self._get_scan_results()
-        all_ssid = list()
-        for item in results:
-            ssid = item.get("ssid", "")
-            all_ssid.append(ssid)
-        return all_ssid
+        return self.scan(max_age=0 if refresh else None).ssids()
 
     def is_on_or_off(self) -> WiFiState:
         """Obtain state of wifi interface on or off.
@@ -121,7 +371,7 @@ class MacAdapter(WifiAdapter):
         Returns:
             ON if wifi interface state is on, otherwise OFF.
         """
-        command = f"networksetup -getairportpower {self.interface}"
+        command = ["networksetup", "-getairportpower", self.interface]
         if "On" in self.execute_command(command=command):
             return WiFiState.ON
         else:
@@ -143,22 +393,45 @@ class MacAdapter(WifiAdapter):
         """
         return self._get_current_wifi_info().get("agrCtlRSSI")
 
-    def connect(self, ssid: str, password: str) -> WiFiState:
+    def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
         """Connect a special wifi network.
 
         Args:
             ssid (str): The ssid for a special wifi network.
             password (str): The password for a special wifi network.
+            timeout (float, optional): Seconds to wait for association. Defaults to CONNECT_TIMEOUT.
 
         Returns:
             True if connected successfully, otherwise False.
         """
-        command = f"networksetup -setairportnetwork {self.interface} {ssid} {password}"
+        if timeout is None:
+            timeout = self.CONNECT_TIMEOUT
+        command = ["networksetup", "-setairportnetwork", self.interface, ssid, password]
         self.execute_command(command=command)
-        if self._get_state() != "running" or self.get_current_ssid() != ssid:
+        if not wait_until(lambda: self.is_associated(ssid), timeout=timeout):
             return WiFiState.CONNECTED_FAILED
         return WiFiState.CONNECTED
 
+    def is_associated(self, ssid: str) -> bool:
+        """Determine whether the interface is associated with the ssid right now."""
+        info = self._get_current_wifi_info(refresh=True)
+        return info.get("state") == "running" and info.get("SSID") == ssid
+
+    def get_ip_address(self) -> t.Optional[str]:
+        """Obtain IPv4 address of wifi interface.
+
+        Returns:
+            IP address or None if DHCP has not finished yet. For example: 192.168.1.8
+        """
+        command = ["ipconfig", "getifaddr", self.interface]
+        try:
+            output = self.execute_command(command=command, cache=False)
+        except CommandException:
+            return None
+        return output.strip() or None
+
     def disconnect(self) -> t.Optional[WiFiState]:
         """Disconnected current wifi network.
 
@@ -171,15 +444,19 @@ class MacAdapter(WifiAdapter):
     def _get_state(self) -> t.Optional[str]:
         return self._get_current_wifi_info().get("state")
 
+    def get_state(self) -> t.Optional[str]:
+        return self._get_state()
+
     def turn_on(self) -> bool:
         """Turn on wifi interface.
 
         Returns:
             True or False
         """
-        command = f"networksetup -setairportpower {self.interface} on"
+        command = ["networksetup", "-setairportpower", self.interface, "on"]
         try:
             logger.debug(msg=f"Wlan interface {self.interface} will be on.")
+            self._forget_scan()
             self.execute_command(command=command)
         except CommandException as e:
             return False
@@ -191,24 +468,378 @@ class MacAdapter(WifiAdapter):
         Returns:
             True or False.
         """
-        command = f"networksetup -setairportpower {self.interface} off"
+        command = ["networksetup", "-setairportpower", self.interface, "off"]
         try:
             logger.debug(msg=f"Wlan interface {self.interface} will be off.")
+            self._forget_scan()
             self.execute_command(command=command)
         except CommandException as e:
             return False
         return self.is_on_or_off() == WiFiState.OFF
 
 
-class WindowsAdapter(WifiAdapter):
-    """Adapter of Wi-Fi operation under Windows."""
-
-    def __init__(self) -> None:
+class LinuxAdapter(WifiAdapter):
+    """Adapter of Wi-Fi operation under Linux.
+
+    Talks to wpa_supplicant over its control socket with a persistent client,
+    another attached client receives unsolicited events such as
+    CTRL-EVENT-CONNECTED and CTRL-EVENT-SCAN-RESULTS. Link statistics are
+    read from procfs and sysfs without any request.
+
+    Args:
+        interface: Wifi interface name, defaults to the first one found in ``ctrl_dir``.
+        ctrl_dir: Directory of wpa_supplicant control sockets.
+        timeout: Seconds to wait for a reply or an event.
+        root: Root of procfs and sysfs, defaults to /.
+    """
+
+    CTRL_DIR = "/var/run/wpa_supplicant"
+
+    def __init__(
+        self,
+        interface: t.Optional[str] = None,
+        ctrl_dir: t.Optional[str] = None,
+        timeout: float = 10.0,
+        root: str = "/",
+    ) -> None:
         super().__init__()
+        self.ctrl_dir = ctrl_dir or self.CTRL_DIR
+        self.timeout = timeout
+        self.root = root
+        self._interface = interface
+        self._ctrl: t.Optional[WpaCtrl] = None
+        self._monitor: t.Optional[WpaCtrl] = None
+        self._link: t.Optional[LinkStatsReader] = None
 
+    @property
+    def interface(self) -> str:
+        """Obtain current wifi interface name.
 
-class LinuxAdapter(WifiAdapter):
-    """Adapter of Wi-Fi operation under Linux."""
+        Returns:
+            Wifi interface name. For example: wlan0
+        """
+        if self._interface is None:
+            try:
+                names = sorted(
+                    name
+                    for name in os.listdir(self.ctrl_dir)
+                    if not name.startswith("p2p-")
+                )
+            except OSError:
+                names = []
+            if not names:
+                raise CommandException(
+                    message=f"No wpa_supplicant control socket found in {self.ctrl_dir}."
+                )
+            self._interface = names[0]
+        return self._interface
 
-    def __init__(self) -> None:
-        super().__init__()
+    @property
+    def ctrl(self) -> WpaCtrl:
+        """Persistent client for requests."""
+        if self._ctrl is None:
+            path = os.path.join(self.ctrl_dir, self.interface)
+            self._ctrl = WpaCtrl(path, timeout=self.timeout).open()
+        return self._ctrl
+
+    @property
+    def monitor(self) -> WpaCtrl:
+        """Persistent client attached to unsolicited events."""
+        if self._monitor is None:
+            path = os.path.join(self.ctrl_dir, self.interface)
+            monitor = WpaCtrl(path, timeout=self.timeout).open()
+            monitor.attach()
+            self._monitor = monitor
+        return self._monitor
+
+    @property
+    def link(self) -> LinkStatsReader:
+        """Reader of link statistics in procfs and sysfs."""
+        if self._link is None:
+            self._link = LinkStatsReader(self.interface, root=self.root)
+        return self._link
+
+    def close(self) -> None:
+        """Release control sockets and opened statistics files."""
+        for ctrl in (self._ctrl, self._monitor):
+            if ctrl is not None:
+                ctrl.close()
+        self._ctrl = self._monitor = None
+        if self._link is not None:
+            self._link.close()
+            self._link = None
+
+    def request(self, command: str) -> str:
+        """Send a control interface command.
+
+        Raises:
+            CommandException: wpa_supplicant replied FAIL or no reply.
+
+        Returns:
+            Reply of the command.
+        """
+        reply = self.ctrl.request(command)
+        if reply.startswith("FAIL") or reply.startswith("UNKNOWN COMMAND"):
+            name = command.split(" ", 1)[0]
+            raise CommandException(message=f"wpa_supplicant command {name} failed.")
+        return reply
+
+    def events(self, timeout: t.Optional[float] = None) -> t.Iterator[str]:
+        """Yield unsolicited events until no event arrives within ``timeout``."""
+        while True:
+            event = self.monitor.recv_event(timeout=timeout)
+            if event is None:
+                return
+            yield event
+
+    def _status(self) -> t.Dict[str, str]:
+        return parse_key_values(self.request("STATUS"))
+
+    def get_current_network(self, refresh: bool = False) -> t.Dict[str, str]:
+        """Obtain current connected wifi information.
+
+        Keys follow the airport output, so all adapters share one layout.
+
+        Returns:
+            Connected wifi information. For example: {'SSID': 'TP-Link001', 'agrCtlRSSI': "-30"}
+        """
+        status = self._status()
+        info = {
+            "SSID": status.get("ssid", ""),
+            "BSSID": status.get("bssid", ""),
+            "state": "running" if status.get("wpa_state") == "COMPLETED" else "init",
+            "op mode": status.get("mode", ""),
+            "link auth": status.get("key_mgmt", ""),
+        }
+        freq = status.get("freq", "")
+        if freq.isdigit():
+            info["channel"] = str(freq_to_channel(int(freq)))
+        if status.get("wpa_state") == "COMPLETED":
+            try:
+                signal = parse_key_values(self.request("SIGNAL_POLL"))
+            except CommandException:
+                signal = {}
+            noise = signal.get("NOISE", "")
+            info.update(
+                {
+                    "agrCtlRSSI": signal.get("RSSI", ""),
+                    # 9999 means the driver does not report noise
+                    "agrCtlNoise": "" if noise == "9999" else noise,
+                    "lastTxRate": signal.get("LINKSPEED", ""),
+                }
+            )
+        return info
+
+    def get_networks(self) -> t.List[t.Dict[str, str]]:
+        return self.scan().to_list()
+
+    def get_all_ssid(self, refresh: bool = False) -> t.List[str]:
+        """Obtain a collection of available ssid.
+
+        Args:
+            refresh (bool, optional): Rescan even if the last scan is fresh.
+
+        Returns:
+            Collection of ssid. For example: ['test01', 'ChinaNet-test001', 'TP-Link1111']
+        """
+        return self.scan(max_age=0 if refresh else None).ssids()
+
+    def _scan(self) -> ScanResult:
+        """Trigger a scan and wait for CTRL-EVENT-SCAN-RESULTS.
+
+        Returns:
+            ScanResult of SCAN_RESULTS.
+        """
+        monitor = self.monitor
+        monitor.flush_events()
+        try:
+            self.request("SCAN")
+        except CommandException:
+            # FAIL-BUSY, a scan is running already, wait for its results
+            pass
+        event = monitor.wait_event(["CTRL-EVENT-SCAN-RESULTS"], timeout=self.timeout)
+        if event is None:
+            logger.debug(msg="Waiting scan results timeout, use the last results.")
+        return self.parse_scan_results(self.request("SCAN_RESULTS"))
+
+    @staticmethod
+    @metrics.timed("parse.scan_results")
+    def parse_scan_results(output: str) -> ScanResult:
+        """Parse reply of SCAN_RESULTS.
+
+        Args:
+            output: Tab separated lines, 'bssid / frequency / signal level / flags / ssid'.
+
+        Returns:
+            ScanResult of the output.
+        """
+        networks = list()
+        for line in output.splitlines()[1:]:
+            fields = line.split("\t")
+            if len(fields) < 4:
+                continue
+            bssid, freq, level, flags = fields[:4]
+            try:
+                rssi = int(level)
+                channel = freq_to_channel(int(freq))
+            except ValueError:
+                continue
+            networks.append(
+                Network(
+                    ssid=fields[4] if len(fields) > 4 else "",
+                    bssid=bssid,
+                    rssi=rssi,
+                    channel=str(channel),
+                    security=flags,
+                )
+            )
+        return ScanResult(networks)
+
+    def is_on_or_off(self) -> WiFiState:
+        """Obtain state of wifi interface on or off.
+
+        Returns:
+            OFF if wpa_supplicant is disabled or disconnected by request, otherwise ON.
+        """
+        state = self._status().get("wpa_state", "")
+        if state in ("INTERFACE_DISABLED", "DISCONNECTED"):
+            return WiFiState.OFF
+        return WiFiState.ON
+
+    def get_current_ssid(self) -> t.Optional[str]:
+        return self._status().get("ssid", "")
+
+    def get_current_rssi(self) -> t.Optional[str]:
+        """Obtain rssi of current connected ssid.
+
+        Read from /proc/net/wireless, SIGNAL_POLL is only requested if the
+        driver does not report it there.
+
+        Returns:
+            String value of rssi.
+        """
+        rssi = self.link.rssi()
+        if rssi is not None:
+            return str(rssi)
+        return parse_key_values(self.request("SIGNAL_POLL")).get("RSSI")
+
+    def get_state(self) -> t.Optional[str]:
+        """Obtain wifi state from operstate of the interface.
+
+        Returns:
+            running if the interface is up, otherwise init.
+        """
+        return "running" if self.link.is_up() else "init"
+
+    def get_ip_address(self) -> t.Optional[str]:
+        """Obtain IPv4 address of wifi interface from wpa_supplicant STATUS.
+
+        Returns:
+            IP address or None if DHCP has not finished yet. For example: 192.168.1.8
+        """
+        return self._status().get("ip_address") or None
+
+    def get_link_stats(self) -> t.Dict[str, t.Any]:
+        """Obtain link statistics without spawning or requesting anything.
+
+        Returns:
+            Dict of statistics. For example: {'rssi': -40, 'link_quality': 70.0, 'noise': None, 'up': True, 'rx_bytes': 1024, ...}
+        """
+        wireless = self.link.wireless() or {}
+        stats: t.Dict[str, t.Any] = {
+            "rssi": self.link.rssi(),
+            "link_quality": wireless.get("link"),
+            "noise": wireless.get("noise"),
+            "up": self.link.is_up(),
+        }
+        stats.update(self.link.counters())
+        return stats
+
+    def connect(
+        self, ssid: str, password: str, timeout: t.Optional[float] = None
+    ) -> WiFiState:
+        """Connect a special wifi network.
+
+        Args:
+            ssid (str): The ssid for a special wifi network.
+            password (str): The password for a special wifi network, empty for open network.
+            timeout (float, optional): Seconds to wait for the connected event. Defaults to self.timeout.
+
+        Returns:
+            CONNECTED after CTRL-EVENT-CONNECTED, otherwise CONNECTED_FAILED.
+        """
+        monitor = self.monitor
+        monitor.flush_events()
+        # a network of the same ssid is reused, so reconnecting does not pile
+        # up network blocks, one added here is removed again if it fails
+        network_id = self._find_network(ssid)
+        added = network_id is None
+        if network_id is None:
+            network_id = self.request("ADD_NETWORK").strip()
+        try:
+            # hex ssid needs no quoting, whatever characters it has
+            self.request(f"SET_NETWORK {network_id} ssid {ssid.encode('utf-8').hex()}")
+            if password:
+                self.request(f"SET_NETWORK {network_id} key_mgmt WPA-PSK")
+                psk = wpa_psk(ssid, password)
+                self.request(f"SET_NETWORK {network_id} psk {psk}")
+            else:
+                self.request(f"SET_NETWORK {network_id} key_mgmt NONE")
+            self.request(f"SELECT_NETWORK {network_id}")
+        except CommandException:
+            if added:
+                self.request(f"REMOVE_NETWORK {network_id}")
+            return WiFiState.CONNECTED_FAILED
+        event = monitor.wait_event(
+            ["CTRL-EVENT-CONNECTED", "CTRL-EVENT-SSID-TEMP-DISABLED"],
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        if event is None or not event.startswith("CTRL-EVENT-CONNECTED"):
+            logger.debug(msg=f"Connect {ssid} failed: {event}")
+            if added:
+                self.request(f"REMOVE_NETWORK {network_id}")
+            return WiFiState.CONNECTED_FAILED
+        return WiFiState.CONNECTED
+
+    def _find_network(self, ssid: str) -> t.Optional[str]:
+        """Obtain id of a configured network of ``ssid`` from LIST_NETWORKS."""
+        escaped = printf_encode(ssid.encode("utf-8"))
+        for line in self.request("LIST_NETWORKS").splitlines()[1:]:
+            fields = line.split("\t")
+            if len(fields) > 1 and fields[1] == escaped:
+                return fields[0]
+        return None
+
+    def disconnect(self) -> t.Optional[WiFiState]:
+        """Disconnected current wifi network.
+
+        Returns:
+            Wifi disconnected or None.
+        """
+        return WiFiState.DISCONNECTED if self.turn_off() else None
+
+    def turn_on(self) -> bool:
+        """Allow wpa_supplicant to associate again.
+
+        Returns:
+            True or False
+        """
+        self._forget_scan()
+        try:
+            self.request("RECONNECT")
+        except CommandException:
+            return False
+        return self.is_on_or_off() == WiFiState.ON
+
+    def turn_off(self) -> bool:
+        """Disconnect and keep wpa_supplicant from associating.
+
+        Returns:
+            True or False.
+        """
+        self._forget_scan()
+        try:
+            self.request("DISCONNECT")
+        except CommandException:
+            return False
+        return self.is_on_or_off() == WiFiState.OFF
@@ -0,0 +1,262 @@
+import collections
+import hashlib
+import itertools
+import os
+import socket
+import string
+import tempfile
+import time
+import typing as t
+
+from .exception import CommandException
+
+_counter = itertools.count()
+
+
+def is_event(message: str) -> bool:
+    """Determine whether a message is an unsolicited event, e.g. '<3>CTRL-EVENT-CONNECTED ...'."""
+    return message.startswith("<") and message[1:2].isdigit()
+
+
+def strip_priority(event: str) -> str:
+    """Remove the priority prefix of an event.
+
+    Returns:
+        Event without priority. For example: 'CTRL-EVENT-SCAN-RESULTS '
+    """
+    return event[event.find(">") + 1 :] if is_event(event) else event
+
+
+class WpaCtrl(object):
+    """Persistent client of the wpa_supplicant control interface.
+
+    Talks to wpa_supplicant over its unix datagram socket, the same protocol
+    ``wpa_cli`` speaks, so no process is spawned for a request.
+
+    Args:
+        path: Path of control socket. For example: /var/run/wpa_supplicant/wlan0
+        timeout: Seconds to wait for a reply.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0) -> None:
+        self.path = path
+        self.timeout = timeout
+        self.attached = False
+        self._sock: t.Optional[socket.socket] = None
+        self._local = ""
+        self._events: t.Deque[str] = collections.deque(maxlen=1024)
+
+    def open(self) -> "WpaCtrl":
+        """Bind a local socket and connect it to wpa_supplicant.
+
+        Raises:
+            CommandException: Control socket is not reachable.
+        """
+        if self._sock is not None:
+            return self
+        self._local = os.path.join(
+            tempfile.gettempdir(), f"netbox_wpa_ctrl_{os.getpid()}-{next(_counter)}"
+        )
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            if os.path.exists(self._local):
+                os.unlink(self._local)
+            sock.bind(self._local)
+            sock.connect(self.path)
+        except OSError as e:
+            sock.close()
+            self._unlink()
+            raise CommandException(
+                message=f"wpa_supplicant control socket {self.path} is unreachable: {e}"
+            )
+        self._sock = sock
+        return self
+
+    def close(self) -> None:
+        """Detach if attached and release the local socket."""
+        if self._sock is None:
+            return
+        if self.attached:
+            try:
+                self.detach()
+            except CommandException:
+                pass
+        self._sock.close()
+        self._sock = None
+        self._unlink()
+
+    def _unlink(self) -> None:
+        try:
+            os.unlink(self._local)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "WpaCtrl":
+        return self.open()
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.close()
+
+    def _recv(self, timeout: t.Optional[float]) -> t.Optional[str]:
+        assert self._sock is not None
+        self._sock.settimeout(timeout)
+        try:
+            data = self._sock.recv(65536)
+        except socket.timeout:
+            return None
+        except OSError as e:
+            raise CommandException(message=f"wpa_supplicant {self.path}: {e}")
+        return data.decode("utf-8", errors="replace")
+
+    def request(self, command: str, timeout: t.Optional[float] = None) -> str:
+        """Send a command and wait for its reply.
+
+        Unsolicited events received meanwhile are queued for ``recv_event``.
+
+        Args:
+            command: Control interface command. For example: STATUS
+
+        Raises:
+            CommandException: No reply before timeout.
+
+        Returns:
+            Reply of the command.
+        """
+        self.open()
+        assert self._sock is not None
+        try:
+            self._sock.send(command.encode("utf-8"))
+        except OSError as e:
+            raise CommandException(message=f"wpa_supplicant {self.path}: {e}")
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            remain = deadline - time.monotonic()
+            message = self._recv(max(remain, 0)) if remain > 0 else None
+            if message is None:
+                name = command.split(" ", 1)[0]
+                raise CommandException(
+                    message=f"wpa_supplicant command {name} timeout."
+                )
+            if is_event(message):
+                self._events.append(message)
+                continue
+            return message
+
+    def attach(self) -> None:
+        """Subscribe unsolicited events of wpa_supplicant."""
+        if self.request("ATTACH").strip() != "OK":
+            raise CommandException(message="wpa_supplicant ATTACH failed.")
+        self.attached = True
+
+    def detach(self) -> None:
+        """Unsubscribe unsolicited events of wpa_supplicant."""
+        self.attached = False
+        self.request("DETACH")
+
+    def recv_event(self, timeout: t.Optional[float] = None) -> t.Optional[str]:
+        """Obtain the next unsolicited event.
+
+        Args:
+            timeout: Seconds to wait, 0 only takes queued events.
+
+        Returns:
+            Event without priority prefix or None if timeout.
+        """
+        if self._events:
+            return strip_priority(self._events.popleft())
+        self.open()
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            remain = deadline - time.monotonic()
+            message = self._recv(remain) if remain > 0 else None
+            if message is None:
+                return None
+            if is_event(message):
+                return strip_priority(message)
+
+    def flush_events(self) -> None:
+        """Drop queued and pending events."""
+        self._events.clear()
+        while self.recv_event(timeout=0.0001) is not None:
+            pass
+
+    def wait_event(
+        self, prefixes: t.Sequence[str], timeout: t.Optional[float] = None
+    ) -> t.Optional[str]:
+        """Wait for the first event starts with any of ``prefixes``.
+
+        Args:
+            prefixes: Event names. For example: ['CTRL-EVENT-CONNECTED']
+            timeout: Seconds to wait.
+
+        Returns:
+            Matched event or None if timeout.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            event = self.recv_event(max(deadline - time.monotonic(), 0))
+            if event is None:
+                return None
+            if event.startswith(tuple(prefixes)):
+                return event
+
+
+def parse_key_values(output: str) -> t.Dict[str, str]:
+    """Parse 'key=value' lines of STATUS and SIGNAL_POLL."""
+    info = {}
+    for line in output.splitlines():
+        if "=" in line:
+            k, v = line.split("=", 1)
+            info[k.strip()] = v.strip()
+    return info
+
+
+def freq_to_channel(freq: int) -> int:
+    """Convert frequency in MHz to channel number, 0 if unknown."""
+    if freq == 2484:
+        return 14
+    if 2412 <= freq < 2484:
+        return (freq - 2407) // 5
+    if 5150 <= freq <= 5895:
+        return (freq - 5000) // 5
+    if 5955 <= freq <= 7115:
+        return (freq - 5950) // 5
+    return 0
+
+
+# escapes of printf_encode in wpa_supplicant, which lists ssids with it
+_PRINTF_ESCAPES = {
+    0x22: '\\"',
+    0x5C: "\\\\",
+    0x1B: "\\e",
+    0x0A: "\\n",
+    0x0D: "\\r",
+    0x09: "\\t",
+}
+
+
+def printf_encode(data: bytes) -> str:
+    """Escape bytes like wpa_supplicant prints ssids. For example: 'Caf\\xc3\\xa9'"""
+    return "".join(
+        _PRINTF_ESCAPES.get(byte)
+        or (chr(byte) if 32 <= byte < 127 else f"\\x{byte:02x}")
+        for byte in data
+    )
+
+
+def wpa_psk(ssid: str, password: str) -> str:
+    """Obtain the raw PSK of a network as SET_NETWORK psk takes it unquoted.
+
+    A password of 64 hex digits already is the raw PSK, any other is a
+    passphrase hashed the same way as ``wpa_passphrase`` does, so it needs
+    no quoting or escaping whatever characters it has.
+
+    Returns:
+        64 hex digits. For example: 'e8b6...'
+    """
+    if len(password) == 64 and all(c in string.hexdigits for c in password):
+        return password.lower()
+    key = hashlib.pbkdf2_hmac(
+        "sha1", password.encode("utf-8"), ssid.encode("utf-8"), 4096, 32
+    )
+    return key.hex()
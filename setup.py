@@ -22,8 +22,12 @@ setup(
     # The packages where I want to build
     packages=find_packages(),
     include_package_data=True,
+    # recorded outputs served by the replay adapters
+    package_data={"netbox": ["fixtures/*.json"]},
     # The dependencies the library needs in order to run
     install_requires=["click>=8.1.3", "ping3==4.0.3"],
+    # optional dependencies, channel analysis of `wlan analyze` needs numpy
+    extras_require={"analyze": ["numpy>=1.17"]},
     # Python version required
     python_requires=">=3.7",
     # Here are the keywords of my library.